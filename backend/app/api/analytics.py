@@ -0,0 +1,109 @@
+from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, Field
+from datetime import datetime
+from app.core.auth import get_current_admin_user
+from app.models.user import User
+from app.services.analytics_service import AnalyticsRequest, AnalyticsType, TimeFrame
+from app.services.analytics_job_service import analytics_job_service, AnalyticsQueueFull, JobStatus
+
+router = APIRouter(tags=["Analytics"])
+
+class AnalyticsJobRequest(BaseModel):
+    """Request model for an analytics job"""
+    analytics_type: AnalyticsType = Field(..., description="Type of analytics to generate")
+    time_frame: TimeFrame = Field(default=TimeFrame.MONTHLY, description="Aggregation period")
+    start_date: datetime = Field(..., description="Start of the analysed range")
+    end_date: datetime = Field(..., description="End of the analysed range")
+    filters: Dict[str, Any] = Field(default={}, description="Optional filters")
+    include_predictions: bool = Field(default=False, description="Include forecasts")
+    segment_by: Optional[str] = Field(None, description="Optional segmentation dimension")
+
+class AnalyticsJobResponse(BaseModel):
+    """Response model for analytics job status"""
+    job_id: str
+    status: str
+    analytics_type: str
+    time_frame: str
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    expires_at: Optional[str] = None
+    error: Optional[str] = None
+
+@router.post("/jobs", response_model=AnalyticsJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_analytics_job(
+    job_request: AnalyticsJobRequest,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Queue an analytics request; identical requests share one job"""
+    if job_request.end_date < job_request.start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date must be after start_date"
+        )
+
+    try:
+        job = await analytics_job_service.submit(AnalyticsRequest(
+            analytics_type=job_request.analytics_type,
+            time_frame=job_request.time_frame,
+            start_date=job_request.start_date,
+            end_date=job_request.end_date,
+            filters=job_request.filters or None,
+            include_predictions=job_request.include_predictions,
+            segment_by=job_request.segment_by
+        ))
+    except AnalyticsQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
+    return job.to_dict()
+
+@router.get("/jobs", response_model=List[AnalyticsJobResponse])
+async def list_analytics_jobs(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """List pending, running and cached analytics jobs"""
+    return [job.to_dict() for job in analytics_job_service.list_jobs()]
+
+@router.get("/jobs/{job_id}", response_model=AnalyticsJobResponse)
+async def get_analytics_job(
+    job_id: str,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Get analytics job status"""
+    job = analytics_job_service.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analytics job not found"
+        )
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}/result")
+async def get_analytics_job_result(
+    job_id: str,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Get the result of a completed analytics job"""
+    job = analytics_job_service.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analytics job not found"
+        )
+
+    if job.status == JobStatus.FAILED:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Analytics job failed: {job.error}"
+        )
+
+    if job.status != JobStatus.COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Analytics job is {job.status.value}"
+        )
+
+    return job.result
@@ -6,7 +6,7 @@ from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.auth import (
     auth_manager, rate_limiter, create_user_tokens, verify_refresh_token,
-    get_current_user, get_current_active_user
+    get_current_user, get_current_active_user, user_cache
 )
 from app.core.utils import ValidationUtils, NotificationUtils, SecurityUtils
 from app.models.user import User
@@ -52,7 +52,7 @@ async def register(
     ).first()
     
     if existing_user:
-        rate_limiter.record_attempt(f"register_{client_ip}")
+        rate_limiter.record_attempt(f"register_{client_ip}", window_minutes=60)
         if existing_user.email == user_data.email:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -81,7 +81,7 @@ async def register(
         )
     
     # Create new user
-    hashed_password = auth_manager.get_password_hash(user_data.password)
+    hashed_password = await auth_manager.get_password_hash_async(user_data.password)
     
     new_user = User(
         email=user_data.email.lower(),
@@ -112,7 +112,7 @@ async def register(
         )
         
         # Clear rate limiting on successful registration
-        rate_limiter.clear_attempts(f"register_{client_ip}")
+        rate_limiter.clear_attempts(f"register_{client_ip}", window_minutes=60)
         
         return new_user
     
@@ -152,7 +152,7 @@ async def login_debug(user_credentials: UserLogin, db: Session = Depends(get_db)
             }
         
         # Step 2: Check password
-        password_valid = auth_manager.verify_password(user_credentials.password, user.password_hash)
+        password_valid = await auth_manager.verify_password_async(user_credentials.password, user.password_hash)
         
         return {
             "step": "2",
@@ -177,11 +177,22 @@ async def login(
 ):
     """Authenticate user and return access token"""
     
+    # Rate limiting of failed attempts
+    client_ip = request.client.host if request.client else "unknown"
+    identifier = f"login_{user_credentials.email.lower()}_{client_ip}"
+    
+    if rate_limiter.is_rate_limited(identifier, max_attempts=5, window_minutes=15):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts. Please try again later."
+        )
+    
     try:
         # Authenticate user
-        user = auth_manager.authenticate_user(db, user_credentials.email, user_credentials.password)
+        user = await auth_manager.authenticate_user_async(db, user_credentials.email, user_credentials.password)
         
         if not user:
+            rate_limiter.record_attempt(identifier, window_minutes=15)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
@@ -195,10 +206,13 @@ async def login(
                 detail="Account is deactivated"
             )
         
+        rate_limiter.clear_attempts(identifier, window_minutes=15)
+        
         # Update last login
         user.last_login = datetime.utcnow()
         user.login_count = (user.login_count or 0) + 1
         db.commit()
+        user_cache.invalidate(user.id)
         
         # Create tokens
         tokens = create_user_tokens(user)
@@ -275,7 +289,7 @@ async def change_password(
     """Change user password"""
     
     # Verify current password
-    if not auth_manager.verify_password(password_data.current_password, current_user.password_hash):
+    if not await auth_manager.verify_password_async(password_data.current_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
@@ -290,17 +304,18 @@ async def change_password(
         )
     
     # Check if new password is different from current
-    if auth_manager.verify_password(password_data.new_password, current_user.password_hash):
+    if await auth_manager.verify_password_async(password_data.new_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="New password must be different from current password"
         )
     
     # Update password
-    current_user.password_hash = auth_manager.get_password_hash(password_data.new_password)
+    current_user.password_hash = await auth_manager.get_password_hash_async(password_data.new_password)
     current_user.password_changed_at = datetime.utcnow()
     
     db.commit()
+    user_cache.invalidate(current_user.id)
     
     return {"message": "Password changed successfully"}
 
@@ -345,7 +360,7 @@ async def forgot_password(
         )
     
     # Always return success to prevent email enumeration
-    rate_limiter.record_attempt(identifier)
+    rate_limiter.record_attempt(identifier, window_minutes=60)
     return {"message": "If the email exists, a password reset link has been sent"}
 
 @router.post("/reset-password")
@@ -376,12 +391,13 @@ async def reset_password(
         )
     
     # Update password and clear reset token
-    user.password_hash = auth_manager.get_password_hash(reset_data.new_password)
+    user.password_hash = await auth_manager.get_password_hash_async(reset_data.new_password)
     user.password_changed_at = datetime.utcnow()
     user.reset_token = None
     user.reset_token_expires = None
     
     db.commit()
+    user_cache.invalidate(user.id)
     
     return {"message": "Password reset successfully"}
 
@@ -434,7 +450,7 @@ async def resend_verification(
             user.first_name
         )
     
-    rate_limiter.record_attempt(identifier)
+    rate_limiter.record_attempt(identifier, window_minutes=60)
     return {"message": "If the email exists and is unverified, a verification link has been sent"}
 
 # Background tasks for email notifications
@@ -1,5 +1,6 @@
+import hashlib
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks, Request, Response
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, or_, func, desc, asc
 from datetime import datetime, date, time, timedelta
@@ -13,6 +14,8 @@ from app.models.user import User
 from app.models.class_model import Class
 from app.models.class_reservation import ClassReservation, ClassAttendance
 from app.models.employee import Employee
+from app.services.reservation_service import reservation_service, ReservationError, SEAT_HOLDING_STATUSES
+from app.services.rollup_service import rollup_service, ACTIVITY_ROLLUP
 from app.schemas.class_schema import (
     ClassCreate, ClassUpdate, ClassResponse, ClassList, ClassStats,
     ClassReservationCreate, ClassReservationUpdate, ClassReservationResponse, ClassReservationList,
@@ -155,7 +158,10 @@ async def get_class_stats(
     ).count()
     
     # Total reservations
-    total_reservations = db.query(ClassReservation).count()
+    if rollup_service.is_ready(db, ACTIVITY_ROLLUP):
+        total_reservations = rollup_service.activity_totals(db)["reservations"]
+    else:
+        total_reservations = db.query(ClassReservation).count()
     
     # Confirmed reservations
     confirmed_reservations = db.query(ClassReservation).filter(
@@ -231,6 +237,8 @@ async def get_class_stats(
 
 @router.get("/schedule", response_model=List[ClassSchedule])
 async def get_class_schedule(
+    request: Request,
+    response: Response,
     date_from: date = Query(..., description="Start date"),
     date_to: date = Query(..., description="End date"),
     instructor_id: Optional[int] = Query(None, description="Filter by instructor"),
@@ -238,7 +246,12 @@ async def get_class_schedule(
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get class schedule for a date range"""
+    """Get class schedule for a date range.
+    
+    Reservation counts come from one grouped aggregate joined to the classes.
+    The response carries an ETag; clients polling with If-None-Match get a
+    304 when nothing in the range has changed.
+    """
     
     # Validate date range
     if date_to < date_from:
@@ -254,11 +267,30 @@ async def get_class_schedule(
             detail="Date range cannot exceed 30 days"
         )
     
-    query = db.query(Class).options(
-        joinedload(Class.instructor)
+    range_start = datetime.combine(date_from, time.min)
+    range_end = datetime.combine(date_to + timedelta(days=1), time.min)
+    
+    # Seats held per class, aggregated once for the whole range; the same
+    # statuses reservation_service counts into current_bookings
+    occupancy = db.query(
+        ClassReservation.class_id.label('class_id'),
+        func.count(ClassReservation.id).label('reservation_count'),
+        func.max(func.coalesce(ClassReservation.updated_at, ClassReservation.created_at)).label('last_change')
+    ).join(Class, Class.id == ClassReservation.class_id).filter(
+        Class.start_time >= range_start,
+        Class.start_time < range_end,
+        ClassReservation.status.in_(SEAT_HOLDING_STATUSES)
+    ).group_by(ClassReservation.class_id).subquery()
+    
+    query = db.query(
+        Class,
+        func.coalesce(occupancy.c.reservation_count, 0),
+        occupancy.c.last_change
+    ).outerjoin(
+        occupancy, occupancy.c.class_id == Class.id
     ).filter(
-        Class.date >= date_from,
-        Class.date <= date_to,
+        Class.start_time >= range_start,
+        Class.start_time < range_end,
         Class.is_active == True
     )
     
@@ -268,33 +300,51 @@ async def get_class_schedule(
     if class_type:
         query = query.filter(Class.class_type == class_type)
     
-    classes = query.order_by(Class.date, Class.start_time).all()
+    rows = query.order_by(Class.start_time, Class.id).all()
+    
+    # Fingerprint the rows so unchanged schedules short-circuit before serialization
+    fingerprint = hashlib.sha1()
+    for class_obj, reservation_count, last_change in rows:
+        fingerprint.update(
+            f"{class_obj.id}:{class_obj.updated_at}:{reservation_count}:{last_change};".encode()
+        )
+    etag = f'W/"{fingerprint.hexdigest()}"'
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Cache-Control": "private, no-cache"}
+        )
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
     
     # Group by date
     schedule = {}
-    for class_obj in classes:
-        date_str = class_obj.date.isoformat()
-        if date_str not in schedule:
-            schedule[date_str] = []
-        
-        # Get reservation count
-        reservation_count = db.query(ClassReservation).filter(
-            ClassReservation.class_id == class_obj.id,
-            ClassReservation.status.in_(["CONFIRMED", "CHECKED_IN"])
-        ).count()
-        
-        schedule[date_str].append({
-            "class": class_obj,
-            "available_spots": class_obj.max_capacity - reservation_count,
-            "reservation_count": reservation_count
+    for class_obj, reservation_count, _ in rows:
+        schedule.setdefault(class_obj.start_time.date(), []).append({
+            "id": class_obj.id,
+            "name": class_obj.name,
+            "class_type": class_obj.class_type,
+            "instructor_id": class_obj.instructor_id,
+            "start_time": class_obj.start_time,
+            "end_time": class_obj.end_time,
+            "room": class_obj.room,
+            "max_capacity": class_obj.max_capacity,
+            "reservation_count": reservation_count,
+            "available_spots": max(class_obj.max_capacity - reservation_count, 0)
         })
     
     # Convert to list format
     result = []
-    for date_str, classes_list in schedule.items():
+    for class_date, classes_list in schedule.items():
         result.append({
-            "date": date_str,
-            "classes": classes_list
+            "date": class_date,
+            "classes": classes_list,
+            "total_classes": len(classes_list),
+            "total_capacity": sum(c["max_capacity"] for c in classes_list),
+            "total_reservations": sum(c["reservation_count"] for c in classes_list)
         })
     
     return result
@@ -540,6 +590,9 @@ async def get_class_reservations(
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(20, ge=1, le=100, description="Items per page"),
     status: Optional[str] = Query(None, description="Filter by status"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page (implies cursor pagination)"),
+    pagination: str = Query("offset", regex="^(offset|cursor)$", description="Pagination mode"),
+    include_total: bool = Query(False, description="Include a cached total in cursor mode"),
     current_user: User = Depends(get_current_staff_user),
     db: Session = Depends(get_db)
 ):
@@ -560,16 +613,28 @@ async def get_class_reservations(
     if status:
         query = query.filter(ClassReservation.status == status)
     
-    query = query.order_by(desc(ClassReservation.created_at))
-    
-    result = DataUtils.paginate_query(query, page, per_page)
+    if cursor or pagination == "cursor":
+        try:
+            result = DataUtils.keyset_paginate_query(
+                query, ClassReservation.created_at, ClassReservation.id, per_page,
+                cursor=cursor,
+                descending=True,
+                include_total=include_total
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        query = query.order_by(desc(ClassReservation.created_at))
+        result = DataUtils.paginate_query(query, page, per_page)
     
     return ClassReservationList(
         reservations=result['items'],
         total=result['total'],
         page=result['page'],
         per_page=result['per_page'],
-        pages=result['pages']
+        pages=result['pages'],
+        next_cursor=result.get('next_cursor'),
+        prev_cursor=result.get('prev_cursor')
     )
 
 @router.post("/{class_id}/reserve", response_model=ClassReservationResponse, status_code=status.HTTP_201_CREATED)
@@ -579,7 +644,7 @@ async def reserve_class(
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Reserve a spot in a class"""
+    """Reserve a spot in a class, or a waiting list place when it is full"""
     
     # Verify class exists and is available
     class_obj = db.query(Class).filter(
@@ -602,61 +667,61 @@ async def reserve_class(
             detail="Cannot reserve past classes"
         )
     
-    # Check if user already has a reservation
-    existing_reservation = db.query(ClassReservation).filter(
-        ClassReservation.class_id == class_id,
-        ClassReservation.user_id == current_user.id,
-        ClassReservation.status.in_(["CONFIRMED", "CHECKED_IN"])
-    ).first()
-    
-    if existing_reservation:
+    # Take a seat (or a waitlist place) with a single conditional update
+    try:
+        outcome = reservation_service.reserve(db, class_id, current_user.id, created_by=current_user.id)
+    except ReservationError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="You already have a reservation for this class"
+            detail=str(e)
         )
-    
-    # Check capacity
-    current_reservations = db.query(ClassReservation).filter(
-        ClassReservation.class_id == class_id,
-        ClassReservation.status.in_(["CONFIRMED", "CHECKED_IN"])
-    ).count()
-    
-    if current_reservations >= class_obj.max_capacity:
+    except Exception as e:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Class is full"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create reservation"
         )
     
-    # Create reservation
-    new_reservation = ClassReservation(
-        class_id=class_id,
-        user_id=current_user.id,
-        status="CONFIRMED",
-        reservation_date=datetime.utcnow().date()
-    )
-    
-    try:
-        db.add(new_reservation)
-        db.commit()
-        db.refresh(new_reservation)
-        
-        # Send confirmation email
+    # Send confirmation email
+    if not outcome.waitlisted:
         background_tasks.add_task(
             send_reservation_confirmation,
             current_user.email,
             current_user.first_name,
             class_obj,
-            new_reservation
+            outcome.reservation
         )
-        
-        return new_reservation
     
-    except Exception as e:
-        db.rollback()
+    return outcome.reservation
+
+@router.get("/{class_id}/waitlist", response_model=WaitlistResponse)
+async def get_class_waitlist(
+    class_id: int,
+    current_user: User = Depends(get_current_staff_user),
+    db: Session = Depends(get_db)
+):
+    """Get the waiting list for a class in promotion order"""
+    
+    class_obj = db.query(Class).filter(Class.id == class_id).first()
+    if not class_obj:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to create reservation"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Class not found"
         )
+    
+    waitlist = reservation_service.get_waitlist(db, class_id)
+    
+    return WaitlistResponse(
+        entries=[
+            {
+                "class_id": reservation.class_id,
+                "user_id": reservation.user_id,
+                "position": position,
+                "added_at": reservation.created_at or reservation.reservation_date
+            }
+            for position, reservation in enumerate(waitlist, start=1)
+        ],
+        total_waiting=len(waitlist)
+    )
 
 @router.delete("/reservations/{reservation_id}")
 async def cancel_reservation(
@@ -686,7 +751,7 @@ async def cancel_reservation(
         )
     
     # Check if reservation can be cancelled
-    if reservation.status in ["CANCELLED", "CHECKED_IN"]:
+    if not reservation.can_cancel:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Reservation cannot be cancelled"
@@ -702,29 +767,40 @@ async def cancel_reservation(
             detail="Cancellation deadline has passed"
         )
     
-    # Cancel reservation
-    reservation.status = "CANCELLED"
-    reservation.cancelled_at = datetime.utcnow()
-    
+    # Cancel reservation; a released seat goes to the next waitlisted member
     try:
-        db.commit()
-        
-        # Send cancellation email
-        background_tasks.add_task(
-            send_cancellation_confirmation,
-            reservation.user.email,
-            reservation.user.first_name,
-            reservation.class_obj
+        outcome = reservation_service.cancel(db, reservation, cancelled_by=current_user.id)
+    except ReservationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-        
-        return {"message": "Reservation cancelled successfully"}
-    
     except Exception as e:
-        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to cancel reservation"
         )
+    
+    # Send cancellation email
+    background_tasks.add_task(
+        send_cancellation_confirmation,
+        reservation.user.email,
+        reservation.user.first_name,
+        reservation.class_obj
+    )
+    
+    if outcome.promoted:
+        promoted_user = db.query(User).filter(User.id == outcome.promoted.user_id).first()
+        if promoted_user:
+            background_tasks.add_task(
+                send_reservation_confirmation,
+                promoted_user.email,
+                promoted_user.first_name,
+                reservation.class_obj,
+                outcome.promoted
+            )
+    
+    return {"message": "Reservation cancelled successfully"}
 
 # Background tasks
 async def send_reservation_confirmation(
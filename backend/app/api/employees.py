@@ -7,7 +7,7 @@ from decimal import Decimal
 from app.core.database import get_db
 from app.core.auth import (
     get_current_active_user, get_current_staff_user, get_current_admin_user,
-    require_employee_management, hash_password
+    require_employee_management, hash_password, user_cache
 )
 from app.core.utils import ValidationUtils, DataUtils, BusinessUtils, DateUtils
 from app.models.user import User
@@ -33,6 +33,9 @@ async def get_employees(
     hired_before: Optional[date] = Query(None, description="Hired before date"),
     sort_by: str = Query("hire_date", description="Sort field"),
     sort_order: str = Query("desc", regex="^(asc|desc)$", description="Sort order"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page (implies cursor pagination)"),
+    pagination: str = Query("offset", regex="^(offset|cursor)$", description="Pagination mode"),
+    include_total: bool = Query(False, description="Include a cached total in cursor mode"),
     current_user: User = Depends(get_current_staff_user),
     db: Session = Depends(get_db)
 ):
@@ -77,22 +80,36 @@ async def get_employees(
     if hired_before:
         query = query.filter(Employee.hire_date <= hired_before)
     
-    # Apply sorting
+    # Apply sorting and paginate
     sort_column = getattr(Employee, sort_by, Employee.hire_date)
-    if sort_order == "desc":
-        query = query.order_by(desc(sort_column))
+    if cursor or pagination == "cursor":
+        try:
+            result = DataUtils.keyset_paginate_query(
+                query, sort_column, Employee.id, per_page,
+                cursor=cursor,
+                descending=sort_order == "desc",
+                include_total=include_total
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
     else:
-        query = query.order_by(asc(sort_column))
-    
-    # Paginate
-    result = DataUtils.paginate_query(query, page, per_page)
+        if sort_order == "desc":
+            query = query.order_by(desc(sort_column))
+        else:
+            query = query.order_by(asc(sort_column))
+        result = DataUtils.paginate_query(query, page, per_page)
     
     return EmployeeList(
         employees=result['items'],
         total=result['total'],
         page=result['page'],
         per_page=result['per_page'],
-        pages=result['pages']
+        pages=result['pages'],
+        next_cursor=result.get('next_cursor'),
+        prev_cursor=result.get('prev_cursor')
     )
 
 @router.get("/stats", response_model=EmployeeStats)
@@ -278,6 +295,7 @@ async def create_employee(
             user.role = employee_data.position
             user.is_staff = True
             db.commit()
+            user_cache.invalidate(user.id)
         
         # Send welcome email
         background_tasks.add_task(
@@ -336,6 +354,7 @@ async def update_employee(
                 employee.user.role = "MEMBER"
                 employee.user.is_staff = False
             db.commit()
+            user_cache.invalidate(employee.user.id)
         
         db.refresh(employee)
         return employee
@@ -385,6 +404,8 @@ async def delete_employee(
     
     try:
         db.commit()
+        # A terminated employee loses staff access on their next request
+        user_cache.invalidate(employee.user.id)
         return {"message": "Employee deleted successfully"}
     
     except Exception as e:
@@ -38,6 +38,9 @@ async def get_exercises(
     created_by_me: Optional[bool] = Query(None, description="Filter exercises created by current user"),
     sort_by: str = Query("name", description="Sort field"),
     sort_order: str = Query("asc", regex="^(asc|desc)$", description="Sort order"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page (implies cursor pagination)"),
+    pagination: str = Query("offset", regex="^(offset|cursor)$", description="Pagination mode"),
+    include_total: bool = Query(False, description="Include a cached total in cursor mode"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -91,22 +94,36 @@ async def get_exercises(
     if created_by_me:
         query = query.filter(Exercise.created_by_id == current_user.id)
     
-    # Apply sorting
+    # Apply sorting and paginate
     sort_column = getattr(Exercise, sort_by, Exercise.name)
-    if sort_order == "desc":
-        query = query.order_by(desc(sort_column))
+    if cursor or pagination == "cursor":
+        try:
+            result = DataUtils.keyset_paginate_query(
+                query, sort_column, Exercise.id, per_page,
+                cursor=cursor,
+                descending=sort_order == "desc",
+                include_total=include_total
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
     else:
-        query = query.order_by(asc(sort_column))
-    
-    # Paginate
-    result = DataUtils.paginate_query(query, page, per_page)
+        if sort_order == "desc":
+            query = query.order_by(desc(sort_column))
+        else:
+            query = query.order_by(asc(sort_column))
+        result = DataUtils.paginate_query(query, page, per_page)
     
     return ExerciseList(
         exercises=result['items'],
         total=result['total'],
         page=result['page'],
         per_page=result['per_page'],
-        pages=result['pages']
+        pages=result['pages'],
+        next_cursor=result.get('next_cursor'),
+        prev_cursor=result.get('prev_cursor')
     )
 
 @router.get("/stats", response_model=ExerciseStats)
@@ -11,7 +11,8 @@ from app.core.auth import (
 )
 from app.core.utils import ValidationUtils, DataUtils, BusinessUtils, DateUtils
 from app.models.user import User
-from app.models.membership import Membership, Payment
+from app.models.membership import Membership, Payment, PaymentStatus
+from app.services.rollup_service import rollup_service, ACTIVITY_ROLLUP
 from app.schemas.membership import (
     MembershipCreate, MembershipUpdate, MembershipResponse, MembershipList,
     MembershipStats, MembershipRenewal, MembershipFreeze, MembershipBulkCreate,
@@ -35,6 +36,9 @@ async def get_memberships(
     created_before: Optional[date] = Query(None, description="Created before date"),
     sort_by: str = Query("created_at", description="Sort field"),
     sort_order: str = Query("desc", regex="^(asc|desc)$", description="Sort order"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page (implies cursor pagination)"),
+    pagination: str = Query("offset", regex="^(offset|cursor)$", description="Pagination mode"),
+    include_total: bool = Query(False, description="Include a cached total in cursor mode"),
     current_user: User = Depends(get_current_staff_user),
     db: Session = Depends(get_db)
 ):
@@ -83,22 +87,36 @@ async def get_memberships(
     if created_before:
         query = query.filter(Membership.created_at <= created_before)
     
-    # Apply sorting
+    # Apply sorting and paginate
     sort_column = getattr(Membership, sort_by, Membership.created_at)
-    if sort_order == "desc":
-        query = query.order_by(desc(sort_column))
+    if cursor or pagination == "cursor":
+        try:
+            result = DataUtils.keyset_paginate_query(
+                query, sort_column, Membership.id, per_page,
+                cursor=cursor,
+                descending=sort_order == "desc",
+                include_total=include_total
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=str(e)
+            )
     else:
-        query = query.order_by(asc(sort_column))
-    
-    # Paginate
-    result = DataUtils.paginate_query(query, page, per_page)
+        if sort_order == "desc":
+            query = query.order_by(desc(sort_column))
+        else:
+            query = query.order_by(asc(sort_column))
+        result = DataUtils.paginate_query(query, page, per_page)
     
     return MembershipList(
         memberships=result['items'],
         total=result['total'],
         page=result['page'],
         per_page=result['per_page'],
-        pages=result['pages']
+        pages=result['pages'],
+        next_cursor=result.get('next_cursor'),
+        prev_cursor=result.get('prev_cursor')
     )
 
 @router.get("/stats", response_model=MembershipStats)
@@ -108,34 +126,42 @@ async def get_membership_stats(
 ):
     """Get membership statistics"""
     
-    # Total memberships
-    total_memberships = db.query(Membership).count()
+    today = date.today()
+    start_of_month, end_of_month = DateUtils.get_month_dates()
+    
+    # Every membership has one start and one end day, so the activity rollup
+    # answers the total, expired and new counts without scanning memberships
+    if rollup_service.is_ready(db, ACTIVITY_ROLLUP):
+        total_memberships = rollup_service.activity_totals(db)["membership_starts"]
+        expired_memberships = rollup_service.activity_totals(
+            db, date_to=today - timedelta(days=1)
+        )["membership_ends"]
+        new_memberships_this_month = rollup_service.activity_totals(
+            db, start_of_month, end_of_month
+        )["membership_starts"]
+    else:
+        total_memberships = db.query(Membership).count()
+        expired_memberships = db.query(Membership).filter(
+            Membership.end_date < today
+        ).count()
+        new_memberships_this_month = db.query(Membership).filter(
+            Membership.start_date >= start_of_month,
+            Membership.start_date <= end_of_month
+        ).count()
     
     # Active memberships
     active_memberships = db.query(Membership).filter(
         Membership.is_active == True
     ).count()
     
-    # Expired memberships
-    expired_memberships = db.query(Membership).filter(
-        Membership.end_date < date.today()
-    ).count()
-    
     # Expiring soon (next 7 days)
-    next_week = date.today() + timedelta(days=7)
+    next_week = today + timedelta(days=7)
     expiring_soon = db.query(Membership).filter(
         Membership.end_date <= next_week,
-        Membership.end_date >= date.today(),
+        Membership.end_date >= today,
         Membership.is_active == True
     ).count()
     
-    # New memberships this month
-    start_of_month, end_of_month = DateUtils.get_month_dates()
-    new_memberships_this_month = db.query(Membership).filter(
-        Membership.created_at >= start_of_month,
-        Membership.created_at <= end_of_month
-    ).count()
-    
     # Memberships by type
     memberships_by_type = db.query(
         Membership.membership_type,
@@ -154,7 +180,7 @@ async def get_membership_stats(
     ).join(Membership).filter(
         Payment.payment_date >= start_of_month,
         Payment.payment_date <= end_of_month,
-        Payment.status == "COMPLETED"
+        Payment.status == PaymentStatus.PAID
     ).scalar() or Decimal('0')
     
     # Average membership duration
@@ -13,6 +13,7 @@ from app.core.utils import ValidationUtils, DataUtils, BusinessUtils, FormatUtil
 from app.models.user import User
 from app.models.membership import Membership
 from app.models.membership import Payment, PaymentStatus
+from app.services.payment_stats_service import payment_stats_service, PAID_STATUS, FAILED_STATUSES
 from app.schemas.membership import (
     PaymentCreate, PaymentUpdate, PaymentResponse, PaymentList, PaymentStats,
     PaymentMethod, PaymentReport
@@ -34,6 +35,9 @@ async def get_payments(
     amount_max: Optional[Decimal] = Query(None, description="Maximum amount"),
     sort_by: str = Query("payment_date", description="Sort field"),
     sort_order: str = Query("desc", regex="^(asc|desc)$", description="Sort order"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page (implies cursor pagination)"),
+    pagination: str = Query("offset", regex="^(offset|cursor)$", description="Pagination mode"),
+    include_total: bool = Query(False, description="Include a cached total in cursor mode"),
     current_user: User = Depends(get_current_staff_user),
     db: Session = Depends(get_db)
 ):
@@ -82,22 +86,36 @@ async def get_payments(
     if amount_max:
         query = query.filter(Payment.amount <= amount_max)
     
-    # Apply sorting
+    # Apply sorting and paginate
     sort_column = getattr(Payment, sort_by, Payment.payment_date)
-    if sort_order == "desc":
-        query = query.order_by(desc(sort_column))
+    if cursor or pagination == "cursor":
+        try:
+            result = DataUtils.keyset_paginate_query(
+                query, sort_column, Payment.id, per_page,
+                cursor=cursor,
+                descending=sort_order == "desc",
+                include_total=include_total
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=str(e)
+            )
     else:
-        query = query.order_by(asc(sort_column))
-    
-    # Paginate
-    result = DataUtils.paginate_query(query, page, per_page)
+        if sort_order == "desc":
+            query = query.order_by(desc(sort_column))
+        else:
+            query = query.order_by(asc(sort_column))
+        result = DataUtils.paginate_query(query, page, per_page)
     
     return PaymentList(
         payments=result['items'],
         total=result['total'],
         page=result['page'],
         per_page=result['per_page'],
-        pages=result['pages']
+        pages=result['pages'],
+        next_cursor=result.get('next_cursor'),
+        prev_cursor=result.get('prev_cursor')
     )
 
 @router.get("/stats", response_model=PaymentStats)
@@ -109,101 +127,34 @@ async def get_payment_stats(
 ):
     """Get payment statistics"""
     
-    # Base query
-    base_query = db.query(Payment)
-    
-    # Apply date filters
-    if date_from:
-        base_query = base_query.filter(Payment.payment_date >= date_from)
-    
-    if date_to:
-        base_query = base_query.filter(Payment.payment_date <= date_to)
-    
-    # Total payments
-    total_payments = base_query.count()
-    
-    # Successful payments
-    successful_payments = base_query.filter(Payment.status == "COMPLETED").count()
-    
-    # Pending payments
-    pending_payments = base_query.filter(Payment.status == "PENDING").count()
-    
-    # Failed payments
-    failed_payments = base_query.filter(Payment.status == "FAILED").count()
-    
-    # Total revenue
-    total_revenue = base_query.filter(
-        Payment.status == "COMPLETED"
-    ).with_entities(func.sum(Payment.amount)).scalar() or Decimal('0')
-    
-    # Revenue this month
-    start_of_month = date.today().replace(day=1)
-    revenue_this_month = db.query(Payment).filter(
-        Payment.status == "COMPLETED",
-        Payment.payment_date >= start_of_month
-    ).with_entities(func.sum(Payment.amount)).scalar() or Decimal('0')
-    
-    # Revenue by payment method
-    revenue_by_method = db.query(
-        Payment.payment_method,
-        func.sum(Payment.amount).label('total')
-    ).filter(
-        Payment.status == "COMPLETED"
-    ).group_by(Payment.payment_method).all()
-    
-    if date_from:
-        revenue_by_method = db.query(
-            Payment.payment_method,
-            func.sum(Payment.amount).label('total')
-        ).filter(
-            Payment.status == "COMPLETED",
-            Payment.payment_date >= date_from
-        )
-        if date_to:
-            revenue_by_method = revenue_by_method.filter(Payment.payment_date <= date_to)
-        revenue_by_method = revenue_by_method.group_by(Payment.payment_method).all()
-    
-    # Payments by status
-    payments_by_status = db.query(
-        Payment.status,
-        func.count(Payment.id).label('count')
+    today = date.today()
+    start_of_month = today.replace(day=1)
+    thirty_days_ago = today - timedelta(days=30)
+    
+    # One grouped scan for the window plus one daily scan covering both the
+    # 30-day chart and month-to-date revenue
+    stats = payment_stats_service.aggregate(
+        db,
+        date_from=date_from,
+        date_to=date_to,
+        series_from=min(start_of_month, thirty_days_ago),
+        series_to=today
     )
     
-    if date_from:
-        payments_by_status = payments_by_status.filter(Payment.payment_date >= date_from)
-    if date_to:
-        payments_by_status = payments_by_status.filter(Payment.payment_date <= date_to)
-    
-    payments_by_status = payments_by_status.group_by(Payment.status).all()
-    
-    # Average payment amount
-    avg_payment = base_query.filter(
-        Payment.status == "COMPLETED"
-    ).with_entities(func.avg(Payment.amount)).scalar() or Decimal('0')
-    
-    # Daily revenue for last 30 days
-    thirty_days_ago = date.today() - timedelta(days=30)
-    daily_revenue = db.query(
-        Payment.payment_date,
-        func.sum(Payment.amount).label('total')
-    ).filter(
-        Payment.status == "COMPLETED",
-        Payment.payment_date >= thirty_days_ago
-    ).group_by(Payment.payment_date).order_by(Payment.payment_date).all()
-    
     return PaymentStats(
-        total_payments=total_payments,
-        successful_payments=successful_payments,
-        pending_payments=pending_payments,
-        failed_payments=failed_payments,
-        total_revenue=float(total_revenue),
-        revenue_this_month=float(revenue_this_month),
-        revenue_by_method={method: float(total) for method, total in revenue_by_method},
-        payments_by_status={status: count for status, count in payments_by_status},
-        average_payment=float(avg_payment),
+        total_payments=stats.total_payments,
+        successful_payments=stats.count_for(PAID_STATUS),
+        pending_payments=stats.count_for(PaymentStatus.PENDING.name),
+        failed_payments=stats.count_for(*FAILED_STATUSES),
+        total_revenue=stats.total_revenue,
+        revenue_this_month=stats.revenue_between(start_of_month),
+        revenue_by_method={method: entry["revenue"] for method, entry in stats.revenue_by_method.items()},
+        payments_by_status=stats.payments_by_status,
+        average_payment=stats.average_payment,
         daily_revenue=[
-            {"date": payment_date.isoformat(), "revenue": float(total)}
-            for payment_date, total in daily_revenue
+            {"date": payment_date.isoformat(), "revenue": revenue}
+            for payment_date, revenue in stats.daily_revenue
+            if payment_date >= thirty_days_ago
         ]
     )
 
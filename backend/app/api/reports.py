@@ -4,7 +4,6 @@ from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, or_, func, desc, asc, extract, case
 from datetime import datetime, date, timedelta
-from decimal import Decimal
 import io
 import csv
 from app.core.database import get_db
@@ -12,9 +11,10 @@ from app.core.auth import get_current_admin_user, get_current_staff_user
 from app.core.utils import DataUtils, FormatUtils, DateUtils
 from app.models.user import User
 from app.models.membership import Membership, MembershipType
-from app.models.membership import Payment
+from app.models.membership import Payment, PaymentStatus
 from app.models.class_model import Class
 from app.models.employee import Employee
+from app.services.payment_stats_service import payment_stats_service, PAID_STATUS, FAILED_STATUSES
 # from app.schemas.report import (
 #     MembershipReport, PaymentReport, AttendanceReport, EmployeeReport,
 #     FinancialSummary, MembershipAnalytics, ClassAnalytics, UserAnalytics,
@@ -46,60 +46,16 @@ async def get_payment_report(
     if not date_to:
         date_to = date.today()
     
-    # Base query
-    base_query = db.query(Payment).filter(
-        Payment.payment_date >= date_from,
-        Payment.payment_date <= date_to
+    # Counts, revenue, breakdowns and daily series in two scans
+    stats = payment_stats_service.aggregate(
+        db,
+        date_from=date_from,
+        date_to=date_to,
+        payment_method=payment_method,
+        payment_type=payment_type
     )
-    
-    # Apply filters
-    if payment_method:
-        base_query = base_query.filter(Payment.payment_method == payment_method)
-    
-    if payment_type:
-        base_query = base_query.filter(Payment.payment_type == payment_type)
-    
-    # Total payments and revenue
-    total_payments = base_query.count()
-    total_revenue = base_query.filter(
-        Payment.status == "COMPLETED"
-    ).with_entities(func.sum(Payment.amount)).scalar() or Decimal('0')
-    
-    # Successful vs failed payments
-    successful_payments = base_query.filter(Payment.status == "COMPLETED").count()
-    failed_payments = base_query.filter(Payment.status == "FAILED").count()
-    pending_payments = base_query.filter(Payment.status == "PENDING").count()
-    
-    # Revenue by payment method
-    revenue_by_method = base_query.filter(
-        Payment.status == "COMPLETED"
-    ).with_entities(
-        Payment.payment_method,
-        func.sum(Payment.amount).label('revenue'),
-        func.count(Payment.id).label('count')
-    ).group_by(Payment.payment_method).all()
-    
-    # Revenue by payment type
-    revenue_by_type = base_query.filter(
-        Payment.status == "COMPLETED"
-    ).with_entities(
-        Payment.payment_type,
-        func.sum(Payment.amount).label('revenue'),
-        func.count(Payment.id).label('count')
-    ).group_by(Payment.payment_type).all()
-    
-    # Daily revenue trend
-    daily_revenue = base_query.filter(
-        Payment.status == "COMPLETED"
-    ).with_entities(
-        Payment.payment_date,
-        func.sum(Payment.amount).label('revenue')
-    ).group_by(Payment.payment_date).order_by(Payment.payment_date).all()
-    
-    # Average payment amount
-    avg_payment = base_query.filter(
-        Payment.status == "COMPLETED"
-    ).with_entities(func.avg(Payment.amount)).scalar() or Decimal('0')
+    total_payments = stats.total_payments
+    successful_payments = stats.count_for(PAID_STATUS)
     
     # Top paying customers
     top_customers = db.query(
@@ -108,7 +64,7 @@ async def get_payment_report(
         User.email,
         func.sum(Payment.amount).label('total_paid')
     ).join(Payment).filter(
-        Payment.status == "COMPLETED",
+        Payment.status == PaymentStatus.PAID,
         Payment.payment_date >= date_from,
         Payment.payment_date <= date_to
     ).group_by(User.id).order_by(desc('total_paid')).limit(10).all()
@@ -117,34 +73,34 @@ async def get_payment_report(
         period_start=date_from,
         period_end=date_to,
         total_payments=total_payments,
-        total_revenue=float(total_revenue),
+        total_revenue=stats.total_revenue,
         successful_payments=successful_payments,
-        failed_payments=failed_payments,
-        pending_payments=pending_payments,
+        failed_payments=stats.count_for(*FAILED_STATUSES),
+        pending_payments=stats.count_for(PaymentStatus.PENDING.name),
         success_rate=round((successful_payments / total_payments * 100) if total_payments > 0 else 0, 2),
-        average_payment=float(avg_payment),
+        average_payment=stats.average_payment,
         revenue_by_method=[
             {
                 "method": method,
-                "revenue": float(revenue),
-                "count": count
+                "revenue": entry["revenue"],
+                "count": entry["count"]
             }
-            for method, revenue, count in revenue_by_method
+            for method, entry in stats.revenue_by_method.items()
         ],
         revenue_by_type=[
             {
                 "type": ptype,
-                "revenue": float(revenue),
-                "count": count
+                "revenue": entry["revenue"],
+                "count": entry["count"]
             }
-            for ptype, revenue, count in revenue_by_type
+            for ptype, entry in stats.revenue_by_type.items()
         ],
         daily_revenue=[
             {
                 "date": payment_date.isoformat(),
-                "revenue": float(revenue)
+                "revenue": revenue
             }
-            for payment_date, revenue in daily_revenue
+            for payment_date, revenue in stats.daily_revenue
         ],
         top_customers=[
             {
@@ -6,11 +6,12 @@ from datetime import datetime, date
 from app.core.database import get_db
 from app.core.auth import (
     get_current_active_user, get_current_staff_user, get_current_admin_user,
-    require_user_management, hash_password
+    require_user_management, hash_password_async, user_cache
 )
 from app.core.utils import ValidationUtils, DataUtils, BusinessUtils, DateUtils
 from app.models.user import User
 from app.models.membership import Membership
+from app.services.rollup_service import rollup_service, ACTIVITY_ROLLUP
 from app.schemas.user import (
     UserCreate, UserUpdate, UserResponse, UserList, UserStats
 )
@@ -18,6 +19,15 @@ from app.schemas.membership import MembershipResponse
 
 router = APIRouter(tags=["Users"])
 
+# Sortable fields: each is unique or indexed together with id, the keyset tiebreak
+USER_SORT_COLUMNS = {
+    "created_at": User.created_at,
+    "last_name": User.last_name,
+    "email": User.email,
+    "user_id": User.user_id,
+    "id": User.id,
+}
+
 @router.get("/", response_model=UserList)
 async def get_users(
     page: int = Query(1, ge=1, description="Page number"),
@@ -31,8 +41,11 @@ async def get_users(
     age_max: Optional[int] = Query(None, ge=0, le=120, description="Maximum age"),
     created_after: Optional[date] = Query(None, description="Created after date"),
     created_before: Optional[date] = Query(None, description="Created before date"),
-    sort_by: str = Query("created_at", description="Sort field"),
+    sort_by: str = Query("created_at", regex=f"^({'|'.join(USER_SORT_COLUMNS)})$", description="Sort field"),
     sort_order: str = Query("desc", regex="^(asc|desc)$", description="Sort order"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page (implies cursor pagination)"),
+    pagination: str = Query("offset", regex="^(offset|cursor)$", description="Pagination mode"),
+    include_total: bool = Query(False, description="Include a cached total in cursor mode"),
     current_user: User = Depends(get_current_staff_user),
     db: Session = Depends(get_db)
 ):
@@ -87,22 +100,36 @@ async def get_users(
     if created_before:
         query = query.filter(User.created_at <= created_before)
     
-    # Apply sorting
-    sort_column = getattr(User, sort_by, User.created_at)
-    if sort_order == "desc":
-        query = query.order_by(desc(sort_column))
+    # Apply sorting and paginate
+    sort_column = USER_SORT_COLUMNS[sort_by]
+    if cursor or pagination == "cursor":
+        try:
+            result = DataUtils.keyset_paginate_query(
+                query, sort_column, User.id, per_page,
+                cursor=cursor,
+                descending=sort_order == "desc",
+                include_total=include_total
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
     else:
-        query = query.order_by(asc(sort_column))
-    
-    # Paginate
-    result = DataUtils.paginate_query(query, page, per_page)
+        if sort_order == "desc":
+            query = query.order_by(desc(sort_column))
+        else:
+            query = query.order_by(asc(sort_column))
+        result = DataUtils.paginate_query(query, page, per_page)
     
     return UserList(
         users=result['items'],
         total=result['total'],
         page=result['page'],
         per_page=result['per_page'],
-        pages=result['pages']
+        pages=result['pages'],
+        next_cursor=result.get('next_cursor'),
+        prev_cursor=result.get('prev_cursor')
     )
 
 @router.get("/stats", response_model=UserStats)
@@ -120,10 +147,13 @@ async def get_user_stats(
     
     # New users this month
     start_of_month, end_of_month = DateUtils.get_month_dates()
-    new_users_this_month = db.query(User).filter(
-        User.created_at >= start_of_month,
-        User.created_at <= end_of_month
-    ).count()
+    if rollup_service.is_ready(db, ACTIVITY_ROLLUP):
+        new_users_this_month = rollup_service.activity_totals(db, start_of_month, end_of_month)["new_users"]
+    else:
+        new_users_this_month = db.query(User).filter(
+            User.created_at >= start_of_month,
+            User.created_at <= end_of_month
+        ).count()
     
     # Users by role
     users_by_role = db.query(
@@ -247,7 +277,7 @@ async def create_user(
         )
     
     # Hash password
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
     
     # Create user
     new_user = User(
@@ -379,6 +409,7 @@ async def update_user(
     
     try:
         db.commit()
+        user_cache.invalidate(user.id)
         db.refresh(user)
         return user
     
@@ -426,6 +457,7 @@ async def delete_user(
     
     try:
         db.commit()
+        user_cache.invalidate(user.id)
         return {"message": "User deleted successfully"}
     
     except Exception as e:
@@ -457,6 +489,7 @@ async def activate_user(
     
     try:
         db.commit()
+        user_cache.invalidate(user.id)
         return {"message": "User activated successfully"}
     
     except Exception as e:
@@ -515,11 +548,12 @@ async def admin_reset_password(
     temp_password = BusinessUtils.generate_membership_number()[-8:]  # Use last 8 chars
     
     # Update password
-    user.password_hash = hash_password(temp_password)
+    user.password_hash = await hash_password_async(temp_password)
     user.password_changed_at = datetime.utcnow()
     
     try:
         db.commit()
+        user_cache.invalidate(user.id)
         
         # Send new password email
         background_tasks.add_task(
@@ -70,4 +70,11 @@ try:
 except ImportError as e:
     logger.warning(f"Reports router not available: {e}")
 
+try:
+    from ...api import analytics
+    api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+    logger.info("Analytics router included successfully")
+except ImportError as e:
+    logger.warning(f"Analytics router not available: {e}")
+
 logger.info("API router initialization completed")
\ No newline at end of file
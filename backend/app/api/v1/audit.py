@@ -7,12 +7,15 @@ from ...core.auth import get_current_user, require_admin_access
 from ...models.user import User
 from ...services.audit_service import (
     audit_service,
+    audit_partitions,
     AuditAction,
     AuditCategory,
     AuditLevel
 )
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from enum import Enum
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -445,6 +448,33 @@ async def cleanup_audit_logs(
             detail="Error cleaning up audit logs"
         )
 
+@router.get(
+    "/partitions",
+    summary="List audit log partitions",
+    description="List the monthly audit log partitions and their row counts. Requires admin privileges."
+)
+async def get_audit_partitions(
+    current_user: User = Depends(require_admin_access)
+):
+    """List monthly audit log partitions"""
+    try:
+        partitions = await asyncio.get_running_loop().run_in_executor(
+            None, audit_partitions.list_partitions
+        )
+        
+        return {
+            'partitioned': audit_partitions.ready,
+            'partitions': partitions,
+            'total_count': len(partitions)
+        }
+        
+    except Exception as e:
+        logger.error(f"Error listing audit partitions: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error listing audit partitions"
+        )
+
 @router.get(
     "/actions",
     summary="Get available audit actions",
@@ -515,8 +545,8 @@ async def get_audit_categories(
 async def export_audit_logs(
     format: str = Query(
         "json",
-        pattern="^(json|csv)$",
-        description="Export format (json or csv)"
+        pattern="^(json|ndjson|csv)$",
+        description="Export format (json, ndjson or csv)"
     ),
     start_date: Optional[datetime] = Query(
         None,
@@ -530,27 +560,22 @@ async def export_audit_logs(
         None,
         description="Filter by category"
     ),
-    limit: int = Query(
-        10000,
+    limit: Optional[int] = Query(
+        None,
         ge=1,
-        le=50000,
-        description="Maximum number of logs to export"
+        description="Maximum number of logs to export (all matching logs if omitted)"
+    ),
+    compress: bool = Query(
+        False,
+        description="Gzip the exported file"
     ),
     current_user: User = Depends(require_admin_access)
 ):
-    """Export audit logs in specified format"""
-    try:
-        audit_category = AuditCategory(category.value) if category else None
-        
-        logs = await audit_service.get_audit_logs(
-            start_date=start_date,
-            end_date=end_date,
-            category=audit_category,
-            limit=limit,
-            offset=0
-        )
-        
-        # Log the export action
+    """Stream audit logs in the specified format"""
+    audit_category = AuditCategory(category.value) if category else None
+    
+    def log_export(exported_count: int):
+        # Log the export action once the last row has been sent
         audit_service.log(
             action=AuditAction.DATA_EXPORT,
             category=AuditCategory.SYSTEM_ADMINISTRATION,
@@ -558,77 +583,39 @@ async def export_audit_logs(
             description=f"Audit logs exported in {format} format",
             metadata={
                 'export_format': format,
-                'exported_count': len(logs),
+                'exported_count': exported_count,
+                'compressed': compress,
                 'date_range': {
                     'start_date': start_date.isoformat() if start_date else None,
                     'end_date': end_date.isoformat() if end_date else None
                 }
             }
         )
-        
-        if format == "json":
-            from fastapi.responses import JSONResponse
-            return JSONResponse(
-                content={
-                    'logs': logs,
-                    'metadata': {
-                        'exported_at': datetime.utcnow().isoformat(),
-                        'total_count': len(logs),
-                        'format': format
-                    }
-                },
-                headers={
-                    'Content-Disposition': f'attachment; filename="audit_logs_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}.json"'
-                }
-            )
-        
-        elif format == "csv":
-            import csv
-            import io
-            from fastapi.responses import StreamingResponse
-            
-            output = io.StringIO()
-            writer = csv.DictWriter(
-                output,
-                fieldnames=[
-                    'timestamp', 'action', 'category', 'level', 'user_email',
-                    'ip_address', 'resource_type', 'resource_id', 'description',
-                    'success', 'error_message', 'duration_ms'
-                ]
-            )
-            
-            writer.writeheader()
-            for log in logs:
-                # Flatten the log for CSV export
-                csv_row = {
-                    'timestamp': log.get('timestamp'),
-                    'action': log.get('action'),
-                    'category': log.get('category'),
-                    'level': log.get('level'),
-                    'user_email': log.get('user_email'),
-                    'ip_address': log.get('ip_address'),
-                    'resource_type': log.get('resource_type'),
-                    'resource_id': log.get('resource_id'),
-                    'description': log.get('description'),
-                    'success': log.get('success'),
-                    'error_message': log.get('error_message'),
-                    'duration_ms': log.get('duration_ms')
-                }
-                writer.writerow(csv_row)
-            
-            output.seek(0)
-            
-            return StreamingResponse(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                media_type="text/csv",
-                headers={
-                    'Content-Disposition': f'attachment; filename="audit_logs_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}.csv"'
-                }
-            )
-        
-    except Exception as e:
-        logger.error(f"Error exporting audit logs: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail="Error exporting audit logs"
-        )
\ No newline at end of file
+    
+    media_types = {
+        "json": "application/json",
+        "ndjson": "application/x-ndjson",
+        "csv": "text/csv"
+    }
+    filename = f'audit_logs_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}.{format}'
+    media_type = media_types[format]
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    # A sync generator: Starlette iterates it in the threadpool, off the event loop
+    return StreamingResponse(
+        audit_service.export_audit_logs(
+            format=format,
+            compress=compress,
+            start_date=start_date,
+            end_date=end_date,
+            category=audit_category,
+            limit=limit,
+            on_complete=log_export
+        ),
+        media_type=media_type,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"'
+        }
+    )
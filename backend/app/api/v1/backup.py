@@ -8,7 +8,7 @@ from ...core.auth import get_current_user, require_admin_access
 from ...models.user import User
 from ...services.backup_service import (
     backup_service, BackupType, BackupStatus, BackupStorage,
-    BackupConfig, RestoreStatus
+    BackupConfig, RestoreStatus, BackupFormat
 )
 
 router = APIRouter()
@@ -23,6 +23,11 @@ class BackupTypeEnum(str, Enum):
     DATA_ONLY = "data_only"
     CONFIG_ONLY = "config_only"
 
+class BackupFormatEnum(str, Enum):
+    """Backup table format enumeration for API"""
+    CSV = "csv"
+    PARQUET = "parquet"
+
 class BackupStatusEnum(str, Enum):
     """Backup status enumeration for API"""
     PENDING = "pending"
@@ -61,6 +66,8 @@ class CreateBackupRequest(BaseModel):
     max_backups: int = Field(default=10, ge=1, le=100, description="Maximum number of backups to keep")
     notification_emails: List[str] = Field(default=[], description="Email addresses for notifications")
     storage_config: Dict[str, Any] = Field(default={}, description="Storage-specific configuration")
+    parent_backup_id: Optional[str] = Field(None, description="Parent of an incremental/differential backup (default: latest)")
+    backup_format: Optional[BackupFormatEnum] = Field(None, description="Table format: csv or parquet (default: server setting)")
     notes: Optional[str] = Field(None, max_length=500, description="Optional notes")
 
 class RestoreBackupRequest(BaseModel):
@@ -72,6 +79,7 @@ class RestoreBackupRequest(BaseModel):
     restore_schema: bool = Field(default=True, description="Restore schema")
     restore_config: bool = Field(default=False, description="Restore configuration")
     target_database: Optional[str] = Field(None, description="Target database (if different)")
+    verify_only: bool = Field(default=False, description="Dry run: check row counts and checksums without restoring")
     notes: Optional[str] = Field(None, max_length=500, description="Optional notes")
 
 class BackupResponse(BaseModel):
@@ -92,6 +100,8 @@ class BackupResponse(BaseModel):
     expires_at: Optional[datetime] = None
     error_message: Optional[str] = None
     notes: Optional[str] = None
+    parent_backup_id: Optional[str] = None
+    base_backup_id: Optional[str] = None
 
 class RestoreResponse(BaseModel):
     """Response model for restore information"""
@@ -126,6 +136,7 @@ class RestoreOperationResponse(BaseModel):
     tables_restored: Optional[int] = None
     records_restored: Optional[int] = None
     duration_seconds: Optional[float] = None
+    verification: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
     message: str
 
@@ -173,7 +184,9 @@ async def create_backup(
             retention_days=request.retention_days,
             max_backups=request.max_backups,
             notification_emails=request.notification_emails,
-            storage_config=request.storage_config
+            storage_config=request.storage_config,
+            parent_backup_id=request.parent_backup_id,
+            backup_format=BackupFormat(request.backup_format.value) if request.backup_format else None
         )
         
         # Create backup in background
@@ -217,6 +230,7 @@ async def restore_backup(
             "restore_schema": request.restore_schema,
             "restore_config": request.restore_config,
             "target_database": request.target_database,
+            "verify_only": request.verify_only,
             "notes": request.notes
         }
         
@@ -232,7 +246,8 @@ async def restore_backup(
                 tables_restored=result.get("tables_restored"),
                 records_restored=result.get("records_restored"),
                 duration_seconds=result.get("duration_seconds"),
-                message="Restore completed successfully"
+                verification=result.get("verification"),
+                message="Backup verified successfully" if request.verify_only else "Restore completed successfully"
             )
         else:
             return RestoreOperationResponse(
@@ -249,6 +264,31 @@ async def restore_backup(
             detail=f"Failed to restore backup: {str(e)}"
         )
 
+@router.get("/restore/{restore_id}/progress")
+async def get_restore_progress(
+    restore_id: str,
+    current_user: User = Depends(require_admin_access)
+):
+    """Get per-table progress of a restore or verification"""
+    try:
+        progress = backup_service.get_restore_progress(restore_id)
+
+        if not progress:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Restore not found"
+            )
+
+        return progress
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get restore progress: {str(e)}"
+        )
+
 @router.get("/list", response_model=List[BackupResponse])
 async def list_backups(
     limit: int = 50,
@@ -279,7 +319,9 @@ async def list_backups(
                 started_at=datetime.fromisoformat(backup["created_at"]),
                 completed_at=datetime.fromisoformat(backup["completed_at"]) if backup["completed_at"] else None,
                 duration_seconds=backup["duration_seconds"],
-                expires_at=datetime.fromisoformat(backup["expires_at"]) if backup["expires_at"] else None
+                expires_at=datetime.fromisoformat(backup["expires_at"]) if backup["expires_at"] else None,
+                parent_backup_id=backup["parent_backup_id"],
+                base_backup_id=backup["base_backup_id"]
             )
             for backup in backups
         ]
@@ -308,11 +350,13 @@ async def get_backup(
         return BackupResponse(
             backup_id=backup_info["backup_id"],
             backup_type=backup_info["backup_type"],
-            status="completed",  # Assuming completed if found
+            status=backup_info["status"],
             storage_location=backup_info["storage_location"],
             storage_path=backup_info["storage_path"],
             size_bytes=backup_info["size_bytes"],
-            started_at=backup_info["created_at"]
+            started_at=backup_info["created_at"],
+            parent_backup_id=backup_info["parent_backup_id"],
+            base_backup_id=backup_info["base_backup_id"]
         )
     
     except HTTPException:
@@ -323,6 +367,31 @@ async def get_backup(
             detail=f"Failed to get backup: {str(e)}"
         )
 
+@router.get("/{backup_id}/progress")
+async def get_backup_progress(
+    backup_id: str,
+    current_user: User = Depends(require_admin_access)
+):
+    """Get per-table progress and throughput of a backup"""
+    try:
+        progress = backup_service.get_backup_progress(backup_id)
+
+        if not progress:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Backup not found"
+            )
+
+        return progress
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get backup progress: {str(e)}"
+        )
+
 @router.delete("/{backup_id}")
 async def delete_backup(
     backup_id: str,
@@ -4,6 +4,9 @@ from datetime import datetime
 import logging
 import psutil
 import os
+from ...core.log_sink import system_log_sink
+from ...core.auth import user_cache, password_hash_pool
+from ...services.audit_service import audit_service
 
 logger = logging.getLogger(__name__)
 
@@ -83,4 +86,47 @@ async def liveness_probe() -> Dict[str, Any]:
     return {
         "status": "alive",
         "timestamp": datetime.now().isoformat()
-    }
\ No newline at end of file
+    }
+@router.get("/log-sink")
+async def log_sink_metrics() -> Dict[str, Any]:
+    """
+    Request log sink metrics: queue depth, written, dropped and sampled records
+    """
+    return {
+        "status": "ok",
+        "timestamp": datetime.now().isoformat(),
+        "log_sink": system_log_sink.get_metrics()
+    }
+
+@router.get("/audit-log")
+async def audit_log_metrics() -> Dict[str, Any]:
+    """
+    Audit log writer metrics: pending, flushed, spilled and replayed records
+    """
+    return {
+        "status": "ok",
+        "timestamp": datetime.now().isoformat(),
+        "audit_log": audit_service.get_flush_stats()
+    }
+
+@router.get("/auth-cache")
+async def auth_cache_metrics() -> Dict[str, Any]:
+    """
+    Authenticated-user cache metrics: hits, misses, invalidations and size
+    """
+    return {
+        "status": "ok",
+        "timestamp": datetime.now().isoformat(),
+        "auth_cache": user_cache.get_metrics()
+    }
+
+@router.get("/password-hashing")
+async def password_hashing_metrics() -> Dict[str, Any]:
+    """
+    Password hashing pool metrics: in-flight, queued and rejected requests
+    """
+    return {
+        "status": "ok",
+        "timestamp": datetime.now().isoformat(),
+        "password_hashing": password_hash_pool.get_metrics()
+    }
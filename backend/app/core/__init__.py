@@ -32,10 +32,13 @@ from .auth import (
     require_routine_creation,
     require_staff_access,
     rate_limiter,
+    user_cache,
     session_manager,
     create_user_tokens,
     verify_refresh_token,
     hash_password,
+    hash_password_async,
+    password_hash_pool,
     verify_password,
     generate_secure_token
 )
@@ -49,7 +52,12 @@ from .utils import (
     DataUtils,
     BusinessUtils
 )
+from .log_sink import SystemLogSink, system_log_sink
 from .middleware import (
+    RequestContext,
+    PipelineMiddleware,
+    MiddlewarePipeline,
+    get_request_context,
     SecurityMiddleware,
     LoggingMiddleware,
     RateLimitMiddleware,
@@ -58,6 +66,7 @@ from .middleware import (
     CompressionMiddleware,
     UserContextMiddleware,
     APIVersionMiddleware,
+    RequestSizeLimitMiddleware,
     get_cors_middleware,
     validation_exception_handler,
     http_exception_handler,
@@ -95,10 +104,13 @@ __all__ = [
     "require_routine_creation",
     "require_staff_access",
     "rate_limiter",
+    "user_cache",
     "session_manager",
     "create_user_tokens",
     "verify_refresh_token",
     "hash_password",
+    "hash_password_async",
+    "password_hash_pool",
     "verify_password",
     "generate_secure_token",
     
@@ -112,7 +124,15 @@ __all__ = [
     "DataUtils",
     "BusinessUtils",
     
+    # Request log sink
+    "SystemLogSink",
+    "system_log_sink",
+    
     # Middleware
+    "RequestContext",
+    "PipelineMiddleware",
+    "MiddlewarePipeline",
+    "get_request_context",
     "SecurityMiddleware",
     "LoggingMiddleware",
     "RateLimitMiddleware",
@@ -121,6 +141,7 @@ __all__ = [
     "CompressionMiddleware",
     "UserContextMiddleware",
     "APIVersionMiddleware",
+    "RequestSizeLimitMiddleware",
     "get_cors_middleware",
     "validation_exception_handler",
     "http_exception_handler",
@@ -1,16 +1,23 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
 from app.core.config import settings
 from app.core.database import get_db
 from app.models.user import User
 from app.schemas.user import TokenData
+from app.core.rate_limit import RateLimitBackend, get_rate_limit_backend
 import secrets
 import string
+import threading
+import time
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -18,11 +25,90 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # Security scheme for JWT
 security = HTTPBearer()
 
+class PasswordHashPool:
+    """Runs bcrypt hashing and verification off the event loop.
+
+    bcrypt releases the GIL while it works, so a small dedicated thread pool
+    keeps the loop serving other requests during a login burst. At most
+    ``max_workers`` hashes run at once and at most ``max_pending`` more may
+    wait; past that callers get a 503 instead of an ever-growing queue.
+    """
+
+    def __init__(self, context: CryptContext = pwd_context, max_workers: Optional[int] = None,
+                 max_pending: Optional[int] = None):
+        self.context = context
+        self.max_workers = max_workers or settings.PASSWORD_HASH_WORKERS
+        self.max_pending = settings.PASSWORD_HASH_MAX_PENDING if max_pending is None else max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {"completed": 0, "rejected": 0, "max_in_flight": 0, "total_seconds": 0.0}
+
+    async def hash(self, password: str) -> str:
+        """Hash a password on the pool"""
+        return await self._submit(self.context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password on the pool"""
+        return await self._submit(self.context.verify, plain_password, hashed_password)
+
+    async def _submit(self, func, *args):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_pending:
+                self._stats["rejected"] += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication service busy, please try again shortly",
+                    headers={"Retry-After": "1"}
+                )
+            self._in_flight += 1
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._in_flight)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="password-hash"
+                )
+            executor = self._executor
+
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._stats["completed"] += 1
+                self._stats["total_seconds"] += time.perf_counter() - started
+
+    def get_metrics(self) -> dict:
+        """Queue depth and throughput counters"""
+        with self._lock:
+            metrics = dict(self._stats)
+            in_flight = self._in_flight
+        metrics.update({
+            "in_flight": in_flight,
+            "queued": max(0, in_flight - self.max_workers),
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "avg_seconds": round(metrics["total_seconds"] / metrics["completed"], 4)
+            if metrics["completed"] else 0.0
+        })
+        return metrics
+
+    def shutdown(self) -> None:
+        """Stop the worker threads"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+# Global password hashing pool
+password_hash_pool = PasswordHashPool()
+
 class AuthManager:
     """Authentication and authorization manager"""
     
     def __init__(self):
         self.pwd_context = pwd_context
+        self.hash_pool = password_hash_pool
         self.secret_key = settings.SECRET_KEY
         self.algorithm = settings.ALGORITHM
         self.access_token_expire_minutes = settings.ACCESS_TOKEN_EXPIRE_MINUTES
@@ -35,6 +121,14 @@ class AuthManager:
         """Generate password hash"""
         return self.pwd_context.hash(password)
     
+    async def verify_password_async(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password without blocking the event loop"""
+        return await self.hash_pool.verify(plain_password, hashed_password)
+    
+    async def get_password_hash_async(self, password: str) -> str:
+        """Generate password hash without blocking the event loop"""
+        return await self.hash_pool.hash(password)
+    
     def create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None) -> str:
         """Create JWT access token"""
         to_encode = data.copy()
@@ -76,6 +170,15 @@ class AuthManager:
             return None
         return user
     
+    async def authenticate_user_async(self, db: Session, email: str, password: str) -> Optional[User]:
+        """Authenticate user with email and password, hashing on the pool"""
+        user = db.query(User).filter(User.email == email).first()
+        if not user:
+            return None
+        if not await self.verify_password_async(password, user.password_hash):
+            return None
+        return user
+    
     def generate_reset_token(self) -> str:
         """Generate a secure reset token"""
         alphabet = string.ascii_letters + string.digits
@@ -131,6 +234,100 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against its hash"""
     return auth_manager.verify_password(plain_password, hashed_password)
 
+class UserPrincipalCache:
+    """Short-TTL cache of authenticated users, keyed by user id.
+
+    Holds a detached, column-only snapshot of each user; a hit is merged
+    into the request session with ``load=False``, so the endpoint gets a
+    regular persistent ``User`` without a SELECT. Callers that change a
+    user's status, role or credentials must call ``invalidate`` after
+    committing.
+
+    The cache is per process: ``invalidate`` only reaches the worker that
+    handled the change. Other gunicorn workers keep serving their snapshot
+    until it expires, so AUTH_USER_CACHE_TTL bounds how long a revoked
+    role or deactivated account stays usable there.
+    """
+
+    def __init__(self, ttl_seconds: Optional[int] = None, max_size: Optional[int] = None):
+        self.ttl_seconds = settings.AUTH_USER_CACHE_TTL if ttl_seconds is None else ttl_seconds
+        self.max_size = max_size or settings.AUTH_USER_CACHE_MAX_SIZE
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # user id -> (expires_at, snapshot)
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a load racing with one is not cached
+        self._generation = 0
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    def get_user(self, db: Session, user_id: int) -> Optional[User]:
+        """Get a user from the cache, loading it on a miss"""
+        user_id = int(user_id)
+        if self.ttl_seconds > 0:
+            now = time.monotonic()
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(user_id)
+                    self._stats["hits"] += 1
+                    snapshot = entry[1]
+                else:
+                    if entry is not None:
+                        del self._entries[user_id]
+                        self._stats["expired"] += 1
+                    self._stats["misses"] += 1
+                    snapshot = None
+                generation = self._generation
+            if snapshot is not None:
+                return db.merge(snapshot, load=False)
+
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is not None and self.ttl_seconds > 0:
+            self._store(user, generation)
+        return user
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop a user so the next request reloads it"""
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(int(user_id), None)
+            self._stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        """Drop every cached user"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def get_metrics(self) -> dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            metrics = dict(self._stats)
+            metrics["size"] = len(self._entries)
+        lookups = metrics["hits"] + metrics["misses"]
+        metrics.update({
+            "hit_rate": round(metrics["hits"] / lookups, 4) if lookups else 0.0,
+            "ttl_seconds": self.ttl_seconds,
+            "max_size": self.max_size
+        })
+        return metrics
+
+    def _store(self, user: User, generation: int) -> None:
+        snapshot = User(**{
+            attr.key: getattr(user, attr.key) for attr in sa_inspect(User).column_attrs
+        })
+        make_transient_to_detached(snapshot)
+
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[user.id] = (time.monotonic() + self.ttl_seconds, snapshot)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+# Global authenticated-user cache
+user_cache = UserPrincipalCache()
+
 # Dependency functions
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)) -> User:
     """Get current authenticated user"""
@@ -152,8 +349,8 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         if token_data is None:
             raise credentials_exception
         
-        # Get user from database
-        user = db.query(User).filter(User.id == token_data.user_id).first()
+        # Get user (cached principal, database on a miss)
+        user = user_cache.get_user(db, token_data.user_id)
         if user is None:
             raise credentials_exception
         
@@ -230,38 +427,37 @@ require_membership_management = require_permission("manage_memberships")
 
 # Rate limiting helpers
 class RateLimiter:
-    """Simple rate limiter for authentication attempts"""
+    """Rate limiter for authentication attempts.
+
+    Uses the same sliding-window backend as RateLimitMiddleware, so attempts
+    are shared across workers when the Redis backend is configured. The
+    window must match between the check, record and clear calls.
+    """
     
-    def __init__(self):
-        self.attempts = {}  # In production, use Redis
+    def __init__(self, backend: Optional[RateLimitBackend] = None):
+        self._backend = backend
+    
+    @property
+    def backend(self) -> RateLimitBackend:
+        if self._backend is None:
+            self._backend = get_rate_limit_backend()
+        return self._backend
     
     def is_rate_limited(self, identifier: str, max_attempts: int = 5, window_minutes: int = 15) -> bool:
         """Check if identifier is rate limited"""
-        now = datetime.utcnow()
-        window_start = now - timedelta(minutes=window_minutes)
-        
-        if identifier not in self.attempts:
-            self.attempts[identifier] = []
-        
-        # Remove old attempts
-        self.attempts[identifier] = [
-            attempt_time for attempt_time in self.attempts[identifier]
-            if attempt_time > window_start
-        ]
-        
-        return len(self.attempts[identifier]) >= max_attempts
+        return not self.backend.peek(self._key(identifier), max_attempts, window_minutes * 60).allowed
     
-    def record_attempt(self, identifier: str) -> None:
+    def record_attempt(self, identifier: str, window_minutes: int = 15) -> None:
         """Record a failed attempt"""
-        now = datetime.utcnow()
-        if identifier not in self.attempts:
-            self.attempts[identifier] = []
-        self.attempts[identifier].append(now)
+        self.backend.hit(self._key(identifier), 0, window_minutes * 60)
     
-    def clear_attempts(self, identifier: str) -> None:
+    def clear_attempts(self, identifier: str, window_minutes: int = 15) -> None:
         """Clear attempts for identifier (on successful login)"""
-        if identifier in self.attempts:
-            del self.attempts[identifier]
+        self.backend.reset(self._key(identifier), window_minutes * 60)
+    
+    @staticmethod
+    def _key(identifier: str) -> str:
+        return f"auth:{identifier}"
 
 # Global rate limiter instance
 rate_limiter = RateLimiter()
@@ -300,6 +496,10 @@ def hash_password(password: str) -> str:
     """Hash password using bcrypt"""
     return auth_manager.get_password_hash(password)
 
+async def hash_password_async(password: str) -> str:
+    """Hash password using bcrypt on the hashing pool"""
+    return await auth_manager.get_password_hash_async(password)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
     return auth_manager.verify_password(plain_password, hashed_password)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 import os
 from pathlib import Path
 
@@ -24,6 +24,10 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    AUTH_USER_CACHE_TTL: int = 30  # Seconds an authenticated user is reused (0 disables); also how long other workers miss an invalidation
+    AUTH_USER_CACHE_MAX_SIZE: int = 10000  # Users kept in the cache
+    PASSWORD_HASH_WORKERS: int = 2  # Threads running bcrypt
+    PASSWORD_HASH_MAX_PENDING: int = 64  # Hash requests allowed to wait before 503
     
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:5173,http://localhost:5174,http://127.0.0.1:3000,http://127.0.0.1:5173,http://127.0.0.1:5174,tauri://localhost,https://tauri.localhost"
@@ -61,8 +65,74 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str = ""
     SMTP_TLS: bool = True
     
+    # Pagination
+    PAGINATION_COUNT_CACHE_TTL: int = 60  # Seconds to reuse totals in cursor mode
+
+    # Reporting rollups
+    ROLLUPS_ENABLED: bool = True  # Maintain and read daily rollup tables
+
+    # Request log sink
+    LOG_SINK_QUEUE_SIZE: int = 10000  # Records buffered before overflow policy applies
+    LOG_SINK_BATCH_SIZE: int = 500  # Records per bulk insert
+    LOG_SINK_FLUSH_INTERVAL: float = 1.0  # Seconds between flushes
+    LOG_SINK_OVERFLOW_POLICY: str = "sample"  # "drop" or "sample"
+    LOG_SINK_SAMPLE_RATE: float = 0.1  # Share of INFO records kept under pressure
+
+    # Audit log persistence
+    AUDIT_BATCH_SIZE: int = 100  # Records per bulk insert; a full batch flushes early
+    AUDIT_FLUSH_INTERVAL: float = 5.0  # Seconds between flushes
+    AUDIT_MAX_PENDING: int = 10000  # Records held in memory before spilling to disk
+    AUDIT_SPILL_PATH: str = "logs/audit_spill.jsonl"  # Append-only fallback when the DB is down
+    AUDIT_PARTITIONING_ENABLED: bool = True  # Monthly partitions (PostgreSQL native, SQLite tables + view)
+    AUDIT_PARTITIONS_AHEAD: int = 2  # Future months created in advance
+
+    # WebSockets
+    WEBSOCKET_SEND_QUEUE_SIZE: int = 256  # Frames queued per connection
+    WEBSOCKET_SLOW_CLIENT_POLICY: str = "drop_oldest"  # "drop_oldest" or "disconnect" when a queue is full
+    WEBSOCKET_SEND_TIMEOUT: float = 10.0  # Seconds a single send may take before the client is dropped
+    WEBSOCKET_PER_MESSAGE_DEFLATE: bool = True  # Let the server negotiate permessage-deflate
+    WEBSOCKET_HEARTBEAT_TIMEOUT: float = 120.0  # Seconds without a message before a connection is dropped
+    WEBSOCKET_HEARTBEAT_TICK: float = 1.0  # Heartbeat timer wheel resolution in seconds
+    WEBSOCKET_BROKER: str = "memory"  # "memory" (single worker) or "redis" (all workers and nodes)
+    WEBSOCKET_BROKER_REDIS_URL: Optional[str] = None  # Defaults to REDIS_URL
+    WEBSOCKET_BROKER_CHANNEL: str = "gymsystem:ws"
+    WEBSOCKET_BROKER_BATCH_SIZE: int = 100  # Envelopes per bus message
+    WEBSOCKET_BROKER_BATCH_INTERVAL: float = 0.005  # Seconds envelopes wait to share a bus message
+
+    # Backups
+    BACKUP_WORKERS: int = 4  # Tables read in parallel during a backup
+    BACKUP_CHUNK_SIZE: int = 5000  # Rows fetched per server-side cursor round trip
+    BACKUP_PREFETCH_CHUNKS: int = 4  # Chunks a reader may buffer while another table is written
+    BACKUP_FORMAT: str = "csv"  # csv (DEFLATE zip) or parquet (zstd columns, needs pyarrow)
+    BACKUP_COMPRESSION_LEVEL: int = 6  # DEFLATE level for archive members
+    BACKUP_PARQUET_COMPRESSION_LEVEL: int = 3  # zstd level for Parquet column chunks
+    BACKUP_PARQUET_ROW_GROUP_SIZE: int = 50000  # Rows buffered per Parquet row group
+    BACKUP_CHANGE_COLUMNS: List[str] = ["updated_at", "created_at"]  # Timestamps incremental backups compare
+    BACKUP_WATERMARK_OVERLAP: int = 60  # Seconds re-exported before the parent's watermark (late commits)
+    BACKUP_RESTORE_WORKERS: int = 4  # Tables loaded in parallel during a restore (1 on SQLite)
+    BACKUP_RESTORE_PROGRESS_INTERVAL: float = 2.0  # Seconds between restore log progress updates
+
+    # Analytics jobs
+    ANALYTICS_WORKERS: int = 2  # Worker processes for analytics jobs
+    ANALYTICS_CACHE_TTL: int = 900  # Seconds a finished job's result is reused
+    ANALYTICS_CACHE_MAX_JOBS: int = 256  # Finished jobs kept in memory
+    ANALYTICS_MAX_ACTIVE_JOBS: int = 32  # Pending/running jobs before new ones are rejected with 429
+    
     # Redis (for caching and tasks)
     REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Rate limiting
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (per process) or "redis" (shared)
+    RATE_LIMIT_REDIS_URL: Optional[str] = None  # Defaults to REDIS_URL
+    RATE_LIMIT_PER_MINUTE: int = 300  # Default per client IP
+    RATE_LIMIT_AUTHENTICATED_PER_MINUTE: int = 600  # Default per authenticated user
+    RATE_LIMIT_ROUTES: Dict[str, int] = {  # Path prefix -> requests per minute
+        "/api/v1/auth/login": 20,
+        "/api/v1/auth/register": 10,
+        "/api/v1/auth/forgot-password": 10
+    }
+    RATE_LIMIT_USER_LIMITS: Dict[str, int] = {}  # User id -> requests per minute
     
     # Gym settings (customizable)
     GYM_NAME: str = "GymSystem"
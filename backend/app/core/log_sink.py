@@ -0,0 +1,187 @@
+import queue
+import random
+import threading
+import time
+import logging
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from .config import settings
+from .database import SessionLocal
+from ..models.configuration import SystemLog
+
+logger = logging.getLogger(__name__)
+
+# Levels that are never sampled out while the queue has room
+PRIORITY_LEVELS = {"WARNING", "ERROR", "CRITICAL"}
+
+class SystemLogSink:
+    """Non-blocking, batched writer for SystemLog rows.
+
+    Request handlers call ``emit`` which only appends to a bounded in-memory
+    queue; a background thread drains it and bulk-inserts each batch in one
+    transaction. When the queue fills up, records are dropped (``drop``
+    policy), or INFO records are sampled once the queue passes
+    ``sample_threshold`` and dropped only when it is completely full
+    (``sample`` policy). Request latency never depends on log-table writes.
+    """
+
+    def __init__(self, max_queue_size: Optional[int] = None, batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None, overflow_policy: Optional[str] = None,
+                 sample_rate: Optional[float] = None, sample_threshold: float = 0.8,
+                 session_factory=None):
+        self.max_queue_size = max_queue_size or settings.LOG_SINK_QUEUE_SIZE
+        self.batch_size = batch_size or settings.LOG_SINK_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.LOG_SINK_FLUSH_INTERVAL
+        self.overflow_policy = overflow_policy or settings.LOG_SINK_OVERFLOW_POLICY
+        self.sample_rate = sample_rate if sample_rate is not None else settings.LOG_SINK_SAMPLE_RATE
+        self.sample_threshold = sample_threshold
+        self.session_factory = session_factory or SessionLocal
+
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "sampled_out": 0,
+            "batches": 0,
+            "flush_failures": 0,
+            "last_flush_at": None,
+            "last_flush_seconds": 0.0,
+            "max_queue_depth": 0
+        }
+
+    def emit(self, level: str, category: str, message: str, user_id: Optional[int] = None,
+             ip_address: Optional[str] = None, user_agent: Optional[str] = None,
+             extra_data: Optional[Dict[str, Any]] = None) -> bool:
+        """Queue a log record; returns False if it was dropped or sampled out"""
+        self.start()
+
+        depth = self._queue.qsize()
+        if (self.overflow_policy == "sample"
+                and level not in PRIORITY_LEVELS
+                and depth >= self.max_queue_size * self.sample_threshold
+                and random.random() >= self.sample_rate):
+            self._count("sampled_out")
+            return False
+
+        record = {
+            "level": level,
+            "category": category,
+            "message": message,
+            "user_id": user_id,
+            "ip_address": ip_address,
+            "user_agent": user_agent[:500] if user_agent else user_agent,
+            "extra_data": extra_data,
+            "created_at": datetime.now(timezone.utc)
+        }
+
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._count("dropped")
+            return False
+
+        with self._lock:
+            self._stats["enqueued"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth + 1)
+        return True
+
+    def start(self) -> None:
+        """Start the background writer if it is not running"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="system-log-sink", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the writer after flushing what is queued"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def flush(self) -> int:
+        """Write all queued records now; returns the number written"""
+        written = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth and throughput counters"""
+        with self._lock:
+            metrics = dict(self._stats)
+        metrics.update({
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self.max_queue_size,
+            "overflow_policy": self.overflow_policy,
+            "running": self._thread is not None and self._thread.is_alive()
+        })
+        if metrics["last_flush_at"]:
+            metrics["last_flush_at"] = metrics["last_flush_at"].isoformat()
+        return metrics
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            deadline = time.monotonic() + self.flush_interval
+            # Flush early once a full batch is waiting
+            while self._queue.qsize() < self.batch_size and not self._stop_event.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._stop_event.wait(min(remaining, 0.05))
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"System log sink flush failed: {e}")
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict[str, Any]]) -> int:
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            db.execute(insert(SystemLog), batch)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to write {len(batch)} system log records: {e}")
+            with self._lock:
+                self._stats["flush_failures"] += 1
+                self._stats["dropped"] += len(batch)
+            return 0
+        finally:
+            db.close()
+
+        with self._lock:
+            self._stats["written"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["last_flush_at"] = datetime.now(timezone.utc)
+            self._stats["last_flush_seconds"] = time.perf_counter() - started
+        return len(batch)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+# Global system log sink instance
+system_log_sink = SystemLogSink()
@@ -1,15 +1,21 @@
 import time
 import json
 import logging
-from typing import Callable, Optional
+from contextvars import ContextVar
+from typing import Dict, Optional, List, Sequence
 from fastapi import Request, Response, HTTPException, status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from sqlalchemy.orm import Session
 from .database import SessionLocal
 from .config import settings
-from ..models.configuration import SystemLog
+from .log_sink import system_log_sink
+from .rate_limit import MemoryRateLimitBackend, RateLimitBackend, RateLimitResult, get_rate_limit_backend
+from .auth import auth_manager
 import uuid
 from datetime import datetime
 import traceback
@@ -21,354 +27,524 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class SecurityMiddleware(BaseHTTPMiddleware):
+# Context of the request being handled by the current task
+request_context_var: ContextVar[Optional["RequestContext"]] = ContextVar("request_context", default=None)
+
+def get_client_ip(headers: Headers, scope: Scope) -> str:
+    """Get client IP address considering proxies"""
+    forwarded_for = headers.get("x-forwarded-for")
+    if forwarded_for:
+        return forwarded_for.split(",")[0].strip()
+
+    real_ip = headers.get("x-real-ip")
+    if real_ip:
+        return real_ip
+
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+class RequestContext:
+    """Request ID, timing and response status shared by every middleware stage"""
+
+    __slots__ = (
+        "request_id", "start_time", "method", "path", "query_string",
+        "headers", "client_ip", "status_code", "error", "rate_limit"
+    )
+
+    def __init__(self, scope: Scope):
+        self.headers = Headers(scope=scope)
+        incoming_id = self.headers.get("x-request-id")
+        self.request_id = incoming_id if incoming_id and len(incoming_id) <= 128 else str(uuid.uuid4())
+        self.start_time = time.perf_counter()
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.query_string = scope.get("query_string", b"").decode("latin-1")
+        self.client_ip = get_client_ip(self.headers, scope)
+        self.status_code: Optional[int] = None
+        self.error: Optional[BaseException] = None
+        self.rate_limit = None
+
+    @property
+    def process_time(self) -> float:
+        """Seconds since the request entered the pipeline"""
+        return time.perf_counter() - self.start_time
+
+def get_request_context() -> Optional[RequestContext]:
+    """Get the context of the request being handled, if any"""
+    return request_context_var.get()
+
+class PipelineMiddleware:
+    """Base class for raw ASGI middleware built from request hooks.
+
+    Subclasses override ``before_request`` (return a response to short-circuit),
+    ``on_response_start`` (edit response headers) and ``after_request`` (runs
+    once the response is sent or the app raised). Used alone via
+    ``app.add_middleware`` each stage is its own ASGI layer; inside a
+    ``MiddlewarePipeline`` all stages share one coroutine and one ``send``
+    wrapper. Either way the response body is never buffered, so streaming
+    responses pass straight through.
+    """
+
+    def __init__(self, app: Optional[ASGIApp] = None):
+        self.app = app
+
+    async def before_request(self, scope: Scope, context: RequestContext) -> Optional[Response]:
+        return None
+
+    def on_response_start(self, scope: Scope, context: RequestContext, headers: MutableHeaders) -> None:
+        pass
+
+    async def after_request(self, scope: Scope, context: RequestContext) -> None:
+        pass
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await run_pipeline((self,), self.app, scope, receive, send)
+
+class MiddlewarePipeline:
+    """Runs several middleware stages as a single ASGI layer"""
+
+    def __init__(self, app: ASGIApp, stages: Sequence[PipelineMiddleware]):
+        self.app = app
+        self.stages = tuple(stages)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await run_pipeline(self.stages, self.app, scope, receive, send)
+
+async def run_pipeline(stages: Sequence[PipelineMiddleware], app: ASGIApp,
+                       scope: Scope, receive: Receive, send: Send) -> None:
+    """Run middleware stages around an ASGI app"""
+    if scope["type"] != "http":
+        await app(scope, receive, send)
+        return
+
+    # The outermost pipeline creates the shared context; nested ones reuse it
+    state = scope.setdefault("state", {})
+    context = state.get("request_context")
+    owner = context is None
+    if owner:
+        context = RequestContext(scope)
+        state["request_context"] = context
+        state["request_id"] = context.request_id
+        token = request_context_var.set(context)
+
+    entered: List[PipelineMiddleware] = []
+
+    async def send_wrapper(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(scope=message)
+            for stage in reversed(entered):
+                stage.on_response_start(scope, context, headers)
+            if owner:
+                context.status_code = message["status"]
+                headers["X-Request-ID"] = context.request_id
+                headers["X-Process-Time"] = f"{context.process_time:.6f}"
+        await send(message)
+
+    try:
+        for stage in stages:
+            entered.append(stage)
+            early_response = await stage.before_request(scope, context)
+            if early_response is not None:
+                await early_response(scope, receive, send_wrapper)
+                return
+        await app(scope, receive, send_wrapper)
+    except Exception as e:
+        context.error = e
+        raise
+    finally:
+        for stage in reversed(entered):
+            try:
+                await stage.after_request(scope, context)
+            except Exception as hook_error:
+                logger.error(f"Middleware {type(stage).__name__} failed after request: {hook_error}")
+        if owner:
+            request_context_var.reset(token)
+
+class SecurityMiddleware(PipelineMiddleware):
     """Security middleware for headers and basic protection"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Add security headers
-        response = await call_next(request)
-        
-        # Security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-        
+
+    # Content Security Policy
+    CSP = (
+        "default-src 'self'; "
+        "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
+        "style-src 'self' 'unsafe-inline'; "
+        "img-src 'self' data: https:; "
+        "font-src 'self' data:; "
+        "connect-src 'self' https:; "
+        "frame-ancestors 'none';"
+    )
+
+    SECURITY_HEADERS = {
+        "X-Content-Type-Options": "nosniff",
+        "X-Frame-Options": "DENY",
+        "X-XSS-Protection": "1; mode=block",
+        "Referrer-Policy": "strict-origin-when-cross-origin",
+        "Permissions-Policy": "geolocation=(), microphone=(), camera=()",
+        "Content-Security-Policy": CSP
+    }
+
+    def __init__(self, app: Optional[ASGIApp] = None, hsts: Optional[bool] = None):
+        super().__init__(app)
+        # Send HSTS on every response in production, otherwise only over HTTPS
+        self.hsts = hsts if hsts is not None else settings.ENVIRONMENT == "production"
+
+    def on_response_start(self, scope: Scope, context: RequestContext, headers: MutableHeaders) -> None:
+        for name, value in self.SECURITY_HEADERS.items():
+            headers[name] = value
+
         # HSTS header for HTTPS
-        if request.url.scheme == "https":
-            response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        
-        # Content Security Policy
-        csp = (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
-            "style-src 'self' 'unsafe-inline'; "
-            "img-src 'self' data: https:; "
-            "font-src 'self' data:; "
-            "connect-src 'self' https:; "
-            "frame-ancestors 'none';"
-        )
-        response.headers["Content-Security-Policy"] = csp
-        
-        return response
+        if self.hsts or scope.get("scheme") == "https":
+            headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
 
-class LoggingMiddleware(BaseHTTPMiddleware):
+class LoggingMiddleware(PipelineMiddleware):
     """Logging middleware for request/response tracking"""
-    
-    def __init__(self, app, log_requests: bool = True, log_responses: bool = True):
+
+    def __init__(self, app: Optional[ASGIApp] = None, log_requests: bool = True, log_responses: bool = True):
         super().__init__(app)
         self.log_requests = log_requests
         self.log_responses = log_responses
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Generate request ID
-        request_id = str(uuid.uuid4())
-        start_time = time.time()
-        
-        # Get client info
-        client_ip = self.get_client_ip(request)
-        user_agent = request.headers.get("user-agent", "")
-        
-        # Log request
+
+    async def before_request(self, scope: Scope, context: RequestContext) -> Optional[Response]:
         if self.log_requests:
             logger.info(
-                f"Request {request_id}: {request.method} {request.url} "
-                f"from {client_ip} - {user_agent}"
+                f"Request {context.request_id}: {context.method} {context.path} "
+                f"from {context.client_ip} - {context.headers.get('user-agent', '')}"
             )
-        
-        # Process request
-        try:
-            response = await call_next(request)
-            process_time = time.time() - start_time
-            
-            # Log response
-            if self.log_responses:
-                logger.info(
-                    f"Response {request_id}: {response.status_code} "
-                    f"in {process_time:.4f}s"
-                )
-            
-            # Add request ID to response headers
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            # Log to database for important endpoints
-            if self.should_log_to_db(request):
-                await self.log_to_database(request, response, request_id, process_time, client_ip)
-            
-            return response
-        
-        except Exception as e:
-            process_time = time.time() - start_time
+        return None
+
+    async def after_request(self, scope: Scope, context: RequestContext) -> None:
+        process_time = context.process_time
+
+        if context.error is not None:
             logger.error(
-                f"Error {request_id}: {str(e)} in {process_time:.4f}s"
+                f"Error {context.request_id}: {str(context.error)} in {process_time:.4f}s"
             )
-            
-            # Log error to database
-            await self.log_error_to_database(request, e, request_id, process_time, client_ip)
-            
-            # Re-raise the exception
-            raise
-    
-    def get_client_ip(self, request: Request) -> str:
-        """Get client IP address considering proxies"""
-        # Check for forwarded headers
-        forwarded_for = request.headers.get("x-forwarded-for")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("x-real-ip")
-        if real_ip:
-            return real_ip
-        
-        return request.client.host if request.client else "unknown"
-    
-    def should_log_to_db(self, request: Request) -> bool:
+            self.log_error_to_database(scope, context, process_time)
+            return
+
+        if self.log_responses:
+            logger.info(
+                f"Response {context.request_id}: {context.status_code} "
+                f"in {process_time:.4f}s"
+            )
+
+        # Log to database for important endpoints
+        if self.should_log_to_db(context):
+            self.log_to_database(scope, context, process_time)
+
+    def should_log_to_db(self, context: RequestContext) -> bool:
         """Determine if request should be logged to database"""
         # Log API endpoints but not static files
-        path = request.url.path
+        path = context.path
         return (
             path.startswith("/api/") and
             not path.startswith("/api/health") and
             not path.startswith("/api/docs") and
             not path.startswith("/api/openapi.json")
         )
-    
-    async def log_to_database(self, request: Request, response: Response, 
-                            request_id: str, process_time: float, client_ip: str):
-        """Log request to database"""
-        try:
-            db = SessionLocal()
-            
-            # Determine log level based on status code
-            if response.status_code >= 500:
-                level = "ERROR"
-            elif response.status_code >= 400:
-                level = "WARNING"
-            else:
-                level = "INFO"
-            
-            log_entry = SystemLog(
-                level=level,
-                category="HTTP_REQUEST",
-                message=f"{request.method} {request.url.path}",
-                user_id=getattr(request.state, 'user_id', None),
-                metadata={
-                    "request_id": request_id,
-                    "method": request.method,
-                    "path": request.url.path,
-                    "query_params": str(request.query_params),
-                    "status_code": response.status_code,
-                    "process_time": process_time,
-                    "client_ip": client_ip,
-                    "user_agent": request.headers.get("user-agent", "")
-                }
-            )
-            
-            db.add(log_entry)
-            db.commit()
-            db.close()
-        
-        except Exception as e:
-            logger.error(f"Failed to log to database: {e}")
-    
-    async def log_error_to_database(self, request: Request, error: Exception,
-                                  request_id: str, process_time: float, client_ip: str):
-        """Log error to database"""
-        try:
-            db = SessionLocal()
-            
-            log_entry = SystemLog(
-                level="ERROR",
-                category="HTTP_ERROR",
-                message=f"Error in {request.method} {request.url.path}: {str(error)}",
-                user_id=getattr(request.state, 'user_id', None),
-                metadata={
-                    "request_id": request_id,
-                    "method": request.method,
-                    "path": request.url.path,
-                    "error_type": type(error).__name__,
-                    "error_message": str(error),
-                    "traceback": traceback.format_exc(),
-                    "process_time": process_time,
-                    "client_ip": client_ip,
-                    "user_agent": request.headers.get("user-agent", "")
-                }
-            )
-            
-            db.add(log_entry)
-            db.commit()
-            db.close()
-        
-        except Exception as e:
-            logger.error(f"Failed to log error to database: {e}")
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Rate limiting middleware"""
-    
-    def __init__(self, app, requests_per_minute: int = 60):
+    def log_to_database(self, scope: Scope, context: RequestContext, process_time: float):
+        """Queue request log for the batched database sink"""
+        status_code = context.status_code or 0
+
+        # Determine log level based on status code
+        if status_code >= 500:
+            level = "ERROR"
+        elif status_code >= 400:
+            level = "WARNING"
+        else:
+            level = "INFO"
+
+        system_log_sink.emit(
+            level=level,
+            category="HTTP_REQUEST",
+            message=f"{context.method} {context.path}",
+            user_id=scope["state"].get("user_id"),
+            ip_address=context.client_ip,
+            user_agent=context.headers.get("user-agent", ""),
+            extra_data={
+                "request_id": context.request_id,
+                "method": context.method,
+                "path": context.path,
+                "query_params": context.query_string,
+                "status_code": status_code,
+                "process_time": process_time
+            }
+        )
+
+    def log_error_to_database(self, scope: Scope, context: RequestContext, process_time: float):
+        """Queue error log for the batched database sink"""
+        error = context.error
+        system_log_sink.emit(
+            level="ERROR",
+            category="HTTP_ERROR",
+            message=f"Error in {context.method} {context.path}: {str(error)}",
+            user_id=scope["state"].get("user_id"),
+            ip_address=context.client_ip,
+            user_agent=context.headers.get("user-agent", ""),
+            extra_data={
+                "request_id": context.request_id,
+                "method": context.method,
+                "path": context.path,
+                "error_type": type(error).__name__,
+                "error_message": str(error),
+                "traceback": "".join(traceback.format_exception(error)),
+                "process_time": process_time
+            }
+        )
+
+class RateLimitMiddleware(PipelineMiddleware):
+    """Rate limiting middleware.
+
+    Requests are counted per authenticated user (when a valid bearer token is
+    sent) or per client IP, on the shared sliding-window backend, so a check
+    costs O(1) regardless of traffic. Limits can be overridden per route
+    prefix (the longest matching prefix wins) and per user id. If the
+    backend fails (e.g. Redis goes away after startup), requests are counted
+    on an in-process backend until it recovers.
+    """
+
+    def __init__(self, app: Optional[ASGIApp] = None, requests_per_minute: Optional[int] = None,
+                 authenticated_per_minute: Optional[int] = None,
+                 route_limits: Optional[Dict[str, int]] = None,
+                 user_limits: Optional[Dict[str, int]] = None,
+                 backend: Optional[RateLimitBackend] = None,
+                 exempt_paths: Optional[List[str]] = None):
         super().__init__(app)
-        self.requests_per_minute = requests_per_minute
-        self.requests = {}  # In production, use Redis
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        client_ip = self.get_client_ip(request)
-        current_time = time.time()
-        
-        # Clean old requests
-        self.cleanup_old_requests(current_time)
-        
-        # Check rate limit
-        if self.is_rate_limited(client_ip, current_time):
+        self.requests_per_minute = requests_per_minute or settings.RATE_LIMIT_PER_MINUTE
+        self.authenticated_per_minute = authenticated_per_minute or settings.RATE_LIMIT_AUTHENTICATED_PER_MINUTE
+        route_limits = settings.RATE_LIMIT_ROUTES if route_limits is None else route_limits
+        # Longest prefix first so the most specific route wins
+        self.route_limits = sorted(route_limits.items(), key=lambda item: len(item[0]), reverse=True)
+        self.user_limits = {
+            str(user_id): limit for user_id, limit in
+            (settings.RATE_LIMIT_USER_LIMITS if user_limits is None else user_limits).items()
+        }
+        self._backend = backend
+        self._fallback: Optional[RateLimitBackend] = None
+        self.exempt_paths = exempt_paths or ["/health", "/docs", "/openapi.json"]
+        self.window_seconds = 60
+
+    @property
+    def backend(self) -> RateLimitBackend:
+        if self._backend is None:
+            self._backend = get_rate_limit_backend()
+        return self._backend
+
+    async def before_request(self, scope: Scope, context: RequestContext) -> Optional[Response]:
+        path = context.path
+        if scope.get("method") == "OPTIONS" or any(path.startswith(p) for p in self.exempt_paths):
+            return None
+
+        user_id = self.get_user_id(context)
+        route, limit = self.get_route_limit(path)
+        if route is None:
+            if user_id is not None:
+                limit = self.user_limits.get(user_id, self.authenticated_per_minute)
+            else:
+                limit = self.requests_per_minute
+
+        identity = f"user:{user_id}" if user_id is not None else f"ip:{context.client_ip}"
+        key = f"route:{route}:{identity}" if route is not None else identity
+        result = await self._hit(key, limit)
+
+        if not result.allowed:
             return JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
                     "detail": "Rate limit exceeded. Please try again later.",
-                    "retry_after": 60
+                    "retry_after": result.retry_after
+                },
+                headers={
+                    "Retry-After": str(result.retry_after),
+                    "X-RateLimit-Limit": str(result.limit),
+                    "X-RateLimit-Remaining": "0"
                 }
             )
-        
-        # Record request
-        self.record_request(client_ip, current_time)
-        
-        return await call_next(request)
-    
-    def get_client_ip(self, request: Request) -> str:
-        """Get client IP address"""
-        forwarded_for = request.headers.get("x-forwarded-for")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        return request.client.host if request.client else "unknown"
-    
-    def cleanup_old_requests(self, current_time: float):
-        """Remove requests older than 1 minute"""
-        cutoff_time = current_time - 60
-        for ip in list(self.requests.keys()):
-            self.requests[ip] = [
-                req_time for req_time in self.requests[ip]
-                if req_time > cutoff_time
-            ]
-            if not self.requests[ip]:
-                del self.requests[ip]
-    
-    def is_rate_limited(self, client_ip: str, current_time: float) -> bool:
-        """Check if client is rate limited"""
-        if client_ip not in self.requests:
-            return False
-        
-        return len(self.requests[client_ip]) >= self.requests_per_minute
-    
-    def record_request(self, client_ip: str, current_time: float):
-        """Record a request for rate limiting"""
-        if client_ip not in self.requests:
-            self.requests[client_ip] = []
-        self.requests[client_ip].append(current_time)
 
-class DatabaseMiddleware(BaseHTTPMiddleware):
+        context.rate_limit = result
+        return None
+
+    async def _hit(self, key: str, limit: int) -> RateLimitResult:
+        """Count a request, off the event loop for network backends"""
+        backend = self.backend
+        try:
+            if backend.blocking:
+                return await run_in_threadpool(backend.hit, key, limit, self.window_seconds)
+            return backend.hit(key, limit, self.window_seconds)
+        except Exception as e:
+            logger.warning(f"Rate limit backend failed, using in-process limits: {e}")
+            if self._fallback is None:
+                self._fallback = MemoryRateLimitBackend()
+            return self._fallback.hit(key, limit, self.window_seconds)
+
+    def on_response_start(self, scope: Scope, context: RequestContext, headers: MutableHeaders) -> None:
+        result = context.rate_limit
+        if result is not None:
+            headers["X-RateLimit-Limit"] = str(result.limit)
+            headers["X-RateLimit-Remaining"] = str(result.remaining)
+
+    def get_route_limit(self, path: str):
+        """Most specific configured route prefix for the path, if any"""
+        for prefix, limit in self.route_limits:
+            if path.startswith(prefix):
+                return prefix, limit
+        return None, None
+
+    def get_user_id(self, context: RequestContext) -> Optional[str]:
+        """User id from a valid bearer token, without touching the database"""
+        authorization = context.headers.get("authorization")
+        if not authorization or not authorization.lower().startswith("bearer "):
+            return None
+        token_data = auth_manager.verify_token(authorization[7:].strip())
+        if token_data is None or token_data.user_id is None:
+            return None
+        return str(token_data.user_id)
+
+class DatabaseMiddleware(PipelineMiddleware):
     """Database session middleware"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+
+    async def before_request(self, scope: Scope, context: RequestContext) -> Optional[Response]:
         # Create database session
-        db = SessionLocal()
-        request.state.db = db
-        
+        scope["state"]["db"] = SessionLocal()
+        return None
+
+    async def after_request(self, scope: Scope, context: RequestContext) -> None:
+        db = scope["state"].pop("db", None)
+        if db is None:
+            return
         try:
-            response = await call_next(request)
-            return response
-        except Exception as e:
             # Rollback on error
-            db.rollback()
-            raise
+            if context.error is not None:
+                db.rollback()
         finally:
             # Always close the session
             db.close()
 
-class MaintenanceMiddleware(BaseHTTPMiddleware):
+class MaintenanceMiddleware(PipelineMiddleware):
     """Maintenance mode middleware"""
-    
-    def __init__(self, app, maintenance_mode: bool = False, 
-                 maintenance_message: str = "System is under maintenance"):
+
+    def __init__(self, app: Optional[ASGIApp] = None, maintenance_mode: Optional[bool] = False,
+                 maintenance_message: str = "System is under maintenance",
+                 allowed_paths: Optional[List[str]] = None, retry_after: Optional[int] = None):
         super().__init__(app)
+        # None means follow settings.MAINTENANCE_MODE at request time
         self.maintenance_mode = maintenance_mode
         self.maintenance_message = maintenance_message
-        self.allowed_paths = ["/api/health", "/api/docs", "/api/openapi.json"]
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Check if maintenance mode is enabled
-        if self.maintenance_mode and request.url.path not in self.allowed_paths:
+        self.allowed_paths = allowed_paths or ["/api/health", "/api/docs", "/api/openapi.json"]
+        self.retry_after = retry_after
+
+    def is_enabled(self) -> bool:
+        """Check if maintenance mode is enabled"""
+        if self.maintenance_mode is None:
+            return bool(getattr(settings, 'MAINTENANCE_MODE', False))
+        return self.maintenance_mode
+
+    async def before_request(self, scope: Scope, context: RequestContext) -> Optional[Response]:
+        if not self.is_enabled() or context.path in self.allowed_paths:
+            return None
+
+        content = {
+            "detail": self.maintenance_message,
+            "maintenance_mode": True
+        }
+        headers = None
+        if self.retry_after:
+            content["retry_after"] = self.retry_after
+            headers = {"Retry-After": str(self.retry_after)}
+
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content=content,
+            headers=headers
+        )
+
+class RequestSizeLimitMiddleware(PipelineMiddleware):
+    """Reject requests whose declared body size exceeds a limit"""
+
+    def __init__(self, app: Optional[ASGIApp] = None, max_body_size: int = 10 * 1024 * 1024):
+        super().__init__(app)
+        self.max_body_size = max_body_size
+
+    async def before_request(self, scope: Scope, context: RequestContext) -> Optional[Response]:
+        content_length = context.headers.get("content-length")
+        if not content_length:
+            return None
+
+        try:
+            too_large = int(content_length) > self.max_body_size
+        except ValueError:
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"detail": "Invalid Content-Length header"}
+            )
+
+        if too_large:
             return JSONResponse(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
                 content={
-                    "detail": self.maintenance_message,
-                    "maintenance_mode": True
+                    "error": "Payload Too Large",
+                    "message": f"El tamaño del archivo excede el límite permitido ({self.max_body_size // (1024 * 1024)}MB)",
+                    "max_size": self.max_body_size
                 }
             )
-        
-        return await call_next(request)
+        return None
 
-class CompressionMiddleware(BaseHTTPMiddleware):
-    """Response compression middleware"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
-        
-        # Add compression headers if supported
-        accept_encoding = request.headers.get("accept-encoding", "")
-        if "gzip" in accept_encoding:
-            response.headers["Content-Encoding"] = "gzip"
-        
-        return response
-
-class UserContextMiddleware(BaseHTTPMiddleware):
+class CompressionMiddleware(GZipMiddleware):
+    """Response compression middleware (gzip when the client accepts it)"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, compresslevel: int = 6):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+
+class UserContextMiddleware(PipelineMiddleware):
     """Middleware to add user context to requests"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+
+    async def before_request(self, scope: Scope, context: RequestContext) -> Optional[Response]:
         # Extract user info from JWT token if present
-        authorization = request.headers.get("authorization")
+        authorization = context.headers.get("authorization")
         if authorization and authorization.startswith("Bearer "):
             try:
                 from .auth import auth_manager
                 token = authorization.split(" ")[1]
                 token_data = auth_manager.verify_token(token)
                 if token_data:
-                    request.state.user_id = token_data.user_id
-                    
+                    state = scope["state"]
+                    state["user_id"] = token_data.user_id
+
                     # Get user from database
-                    db = getattr(request.state, 'db', None)
+                    db = state.get("db")
                     if db:
                         from ..models.user import User
                         user = db.query(User).filter(User.id == token_data.user_id).first()
                         if user:
-                            request.state.user = user
+                            state["user"] = user
             except Exception:
                 pass  # Ignore token errors in middleware
-        
-        return await call_next(request)
+        return None
 
-class APIVersionMiddleware(BaseHTTPMiddleware):
+class APIVersionMiddleware(PipelineMiddleware):
     """API versioning middleware"""
-    
-    def __init__(self, app, current_version: str = "v1", supported_versions: list = None):
+
+    def __init__(self, app: Optional[ASGIApp] = None, current_version: str = "v1", supported_versions: list = None):
         super().__init__(app)
         self.current_version = current_version
         self.supported_versions = supported_versions or ["v1"]
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+
+    async def before_request(self, scope: Scope, context: RequestContext) -> Optional[Response]:
         # Extract version from URL or headers
-        path = request.url.path
+        path = context.path
         version = None
-        
+
         # Check URL path for version
         if path.startswith("/api/v"):
             version_part = path.split("/")[2]  # /api/v1/...
             if version_part in self.supported_versions:
                 version = version_part
-        
+
         # Check headers for version
         if not version:
-            version = request.headers.get("api-version", self.current_version)
-        
+            version = context.headers.get("api-version", self.current_version)
+
         # Validate version
         if version not in self.supported_versions:
             return JSONResponse(
@@ -378,16 +554,16 @@ class APIVersionMiddleware(BaseHTTPMiddleware):
                     "supported_versions": self.supported_versions
                 }
             )
-        
+
         # Add version to request state
-        request.state.api_version = version
-        
-        response = await call_next(request)
-        
+        scope["state"]["api_version"] = version
+        return None
+
+    def on_response_start(self, scope: Scope, context: RequestContext, headers: MutableHeaders) -> None:
         # Add version to response headers
-        response.headers["API-Version"] = version
-        
-        return response
+        version = scope["state"].get("api_version")
+        if version:
+            headers["API-Version"] = version
 
 # Exception handlers
 async def validation_exception_handler(request: Request, exc):
@@ -458,7 +634,7 @@ def create_logging_middleware(log_requests: bool = True, log_responses: bool = T
     """Create logging middleware with configuration"""
     return LoggingMiddleware(None, log_requests, log_responses)
 
-def create_rate_limit_middleware(requests_per_minute: int = 60):
+def create_rate_limit_middleware(requests_per_minute: Optional[int] = None):
     """Create rate limiting middleware with configuration"""
     return RateLimitMiddleware(None, requests_per_minute)
 
@@ -476,6 +652,10 @@ def create_api_version_middleware(current_version: str = "v1", supported_version
 
 # Export all middleware
 __all__ = [
+    'RequestContext',
+    'PipelineMiddleware',
+    'MiddlewarePipeline',
+    'get_request_context',
     'SecurityMiddleware',
     'LoggingMiddleware', 
     'RateLimitMiddleware',
@@ -484,6 +664,7 @@ __all__ = [
     'CompressionMiddleware',
     'UserContextMiddleware',
     'APIVersionMiddleware',
+    'RequestSizeLimitMiddleware',
     'get_cors_middleware',
     'validation_exception_handler',
     'http_exception_handler',
@@ -0,0 +1,204 @@
+import math
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, Optional, Any
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RateLimitResult:
+    """Outcome of a rate limit check"""
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int = 0
+
+class RateLimitBackend(ABC):
+    """Sliding-window counter rate limiting.
+
+    Each key keeps two fixed-window counters (current and previous). The
+    request rate is estimated as ``previous * (1 - elapsed / window) +
+    current``, so a check is O(1) in time and memory regardless of traffic,
+    unlike per-request timestamp lists.
+    """
+
+    # True for backends that do network I/O; async callers run them in a thread
+    blocking = False
+
+    @abstractmethod
+    def hit(self, key: str, limit: int, window_seconds: int, cost: int = 1) -> RateLimitResult:
+        """Record ``cost`` units against a key and check the limit"""
+
+    @abstractmethod
+    def peek(self, key: str, limit: int, window_seconds: int) -> RateLimitResult:
+        """Check the limit without recording anything"""
+
+    @abstractmethod
+    def reset(self, key: str, window_seconds: int) -> None:
+        """Forget everything recorded for a key"""
+
+    @staticmethod
+    def _result(previous: int, current: int, now: float, limit: int, window_seconds: int,
+                counted: int = 0) -> RateLimitResult:
+        """Build a result from the two window counters.
+
+        ``counted`` is the part of ``current`` added by this call: a request
+        is allowed if the rate before it was under the limit.
+        """
+        elapsed = now % window_seconds
+        weight = 1 - elapsed / window_seconds
+        estimate = previous * weight + current
+        allowed = estimate - counted < limit if counted else estimate < limit
+
+        retry_after = 0
+        if not allowed:
+            if current >= limit or previous == 0:
+                retry_after = window_seconds - elapsed
+            else:
+                # Time until the previous window's weighted share drops enough
+                needed = (estimate - limit + 1) / previous * window_seconds
+                retry_after = min(needed, window_seconds - elapsed)
+
+        return RateLimitResult(
+            allowed=allowed,
+            limit=limit,
+            remaining=max(0, int(limit - estimate)),
+            retry_after=max(1, math.ceil(retry_after)) if not allowed else 0
+        )
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """In-process backend; limits are per worker process"""
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self._counters: Dict[tuple, list] = {}  # (key, window) -> [window_index, current, previous]
+        self._lock = threading.Lock()
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+
+    def hit(self, key: str, limit: int, window_seconds: int, cost: int = 1) -> RateLimitResult:
+        now = time.time()
+        with self._lock:
+            entry = self._entry(key, window_seconds, now)
+            entry[1] += cost
+            previous, current = entry[2], entry[1]
+            self._maybe_sweep(now)
+        return self._result(previous, current, now, limit, window_seconds, counted=cost)
+
+    def peek(self, key: str, limit: int, window_seconds: int) -> RateLimitResult:
+        now = time.time()
+        with self._lock:
+            entry = self._counters.get((key, window_seconds))
+            if entry is None:
+                return RateLimitResult(allowed=limit > 0, limit=limit, remaining=limit)
+            entry = self._entry(key, window_seconds, now)
+            previous, current = entry[2], entry[1]
+        return self._result(previous, current, now, limit, window_seconds)
+
+    def reset(self, key: str, window_seconds: int) -> None:
+        with self._lock:
+            self._counters.pop((key, window_seconds), None)
+
+    def _entry(self, key: str, window_seconds: int, now: float) -> list:
+        index = int(now // window_seconds)
+        entry = self._counters.get((key, window_seconds))
+        if entry is None:
+            entry = [index, 0, 0]
+            self._counters[(key, window_seconds)] = entry
+        elif entry[0] != index:
+            # Roll the windows forward; anything older than one window is gone
+            entry[2] = entry[1] if entry[0] == index - 1 else 0
+            entry[1] = 0
+            entry[0] = index
+        return entry
+
+    def _maybe_sweep(self, now: float) -> None:
+        """Drop keys idle for two windows (amortized over sweep_interval)"""
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self._sweep_interval
+        stale = [
+            counter_key for counter_key, entry in self._counters.items()
+            if entry[0] < int(now // counter_key[1]) - 1
+        ]
+        for counter_key in stale:
+            del self._counters[counter_key]
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Redis backend; limits are shared by every worker and node.
+
+    Window counters live in ``{prefix}:{key}:{window}:{index}`` keys that
+    expire after two windows. Any client exposing the redis-py ``pipeline``,
+    ``mget`` and ``delete`` API can be passed in (e.g. a fake in tests).
+    """
+
+    blocking = True
+
+    def __init__(self, client: Any = None, url: Optional[str] = None, prefix: str = "ratelimit"):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url or settings.REDIS_URL)
+        self.client = client
+        self.prefix = prefix
+
+    def _keys(self, key: str, window_seconds: int, now: float):
+        index = int(now // window_seconds)
+        base = f"{self.prefix}:{key}:{window_seconds}"
+        return f"{base}:{index}", f"{base}:{index - 1}"
+
+    def hit(self, key: str, limit: int, window_seconds: int, cost: int = 1) -> RateLimitResult:
+        now = time.time()
+        current_key, previous_key = self._keys(key, window_seconds, now)
+
+        pipe = self.client.pipeline(transaction=True)
+        pipe.incrby(current_key, cost)
+        pipe.expire(current_key, window_seconds * 2)
+        pipe.get(previous_key)
+        current, _, previous = pipe.execute()
+
+        return self._result(int(previous or 0), int(current), now, limit, window_seconds, counted=cost)
+
+    def peek(self, key: str, limit: int, window_seconds: int) -> RateLimitResult:
+        now = time.time()
+        current_key, previous_key = self._keys(key, window_seconds, now)
+        current, previous = self.client.mget([current_key, previous_key])
+        return self._result(int(previous or 0), int(current or 0), now, limit, window_seconds)
+
+    def reset(self, key: str, window_seconds: int) -> None:
+        now = time.time()
+        self.client.delete(*self._keys(key, window_seconds, now))
+
+_backend: Optional[RateLimitBackend] = None
+_backend_lock = threading.Lock()
+
+def create_rate_limit_backend(name: Optional[str] = None) -> RateLimitBackend:
+    """Create the configured backend, falling back to in-process limits"""
+    name = (name or settings.RATE_LIMIT_BACKEND).lower()
+    if name == "redis":
+        try:
+            backend = RedisRateLimitBackend(url=settings.RATE_LIMIT_REDIS_URL or settings.REDIS_URL)
+            backend.client.ping()
+            logger.info("Using Redis rate limit backend")
+            return backend
+        except Exception as e:
+            logger.warning(f"Redis rate limit backend unavailable, using in-process limits: {e}")
+    elif name != "memory":
+        logger.warning(f"Unknown rate limit backend '{name}', using in-process limits")
+    return MemoryRateLimitBackend()
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    """Get the process-wide rate limit backend"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_rate_limit_backend()
+    return _backend
+
+def set_rate_limit_backend(backend: Optional[RateLimitBackend]) -> None:
+    """Replace the process-wide backend (None re-reads settings on next use)"""
+    global _backend
+    _backend = backend
@@ -1,4 +1,5 @@
 import re
+import enum
 import uuid
 import hashlib
 import secrets
@@ -17,8 +18,14 @@ import io
 import base64
 from pathlib import Path
 import json
+from decimal import Decimal
+from sqlalchemy import and_, or_
 from .config import settings
 
+# Cached row counts for keyset pagination: cache key -> (total, expires_at)
+_count_cache: Dict[str, tuple] = {}
+_COUNT_CACHE_MAX_ENTRIES = 1024
+
 # Validation utilities
 class ValidationUtils:
     """Utility functions for data validation"""
@@ -441,6 +448,203 @@ class DataUtils:
             'pages': (total + per_page - 1) // per_page
         }
     
+    @staticmethod
+    def encode_cursor(
+        sort_key: str, sort_value: Any, row_id: Any, direction: str = "next", sort_order: str = "desc"
+    ) -> str:
+        """Encode a keyset position as an opaque, URL-safe cursor token"""
+        if isinstance(sort_value, enum.Enum):
+            # Enum columns are stored and compared by member name
+            value = {"t": "enum", "v": sort_value.name}
+        elif isinstance(sort_value, datetime):
+            value = {"t": "datetime", "v": sort_value.isoformat()}
+        elif isinstance(sort_value, date):
+            value = {"t": "date", "v": sort_value.isoformat()}
+        elif isinstance(sort_value, Decimal):
+            value = {"t": "decimal", "v": str(sort_value)}
+        else:
+            value = {"t": "raw", "v": sort_value}
+        
+        payload = {"k": sort_key, "o": sort_order, "s": value, "id": row_id, "d": direction}
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Dict[str, Any]:
+        """Decode a cursor token produced by encode_cursor"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            value_type = payload["s"]["t"]
+            value = payload["s"]["v"]
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError("Invalid pagination cursor") from e
+        
+        if value is not None:
+            if value_type == "datetime":
+                value = datetime.fromisoformat(value)
+            elif value_type == "date":
+                value = date.fromisoformat(value)
+            elif value_type == "decimal":
+                value = Decimal(value)
+        
+        if payload.get("d") not in ("next", "prev") or payload.get("o") not in ("asc", "desc"):
+            raise ValueError("Invalid pagination cursor")
+        
+        return {
+            "sort_key": payload.get("k"),
+            "sort_order": payload["o"],
+            "sort_value": value,
+            "id": payload.get("id"),
+            "direction": payload["d"]
+        }
+    
+    @staticmethod
+    def cached_count(query, ttl: Optional[int] = None) -> int:
+        """Count query rows, reusing a recent result for identical queries"""
+        ttl = settings.PAGINATION_COUNT_CACHE_TTL if ttl is None else ttl
+        
+        try:
+            compiled = query.statement.compile()
+            cache_key = SecurityUtils.hash_string(
+                str(compiled) + repr(sorted(compiled.params.items(), key=lambda item: item[0]))
+            )
+        except Exception:
+            return query.order_by(None).count()
+        
+        now = datetime.utcnow()
+        cached = _count_cache.get(cache_key)
+        if cached and cached[1] > now:
+            return cached[0]
+        
+        total = query.order_by(None).count()
+        
+        if ttl > 0:
+            if len(_count_cache) >= _COUNT_CACHE_MAX_ENTRIES:
+                # Drop expired entries first, then the oldest ones
+                for key in [k for k, (_, expires) in _count_cache.items() if expires <= now]:
+                    _count_cache.pop(key, None)
+                while len(_count_cache) >= _COUNT_CACHE_MAX_ENTRIES:
+                    _count_cache.pop(next(iter(_count_cache)))
+            _count_cache[cache_key] = (total, now + timedelta(seconds=ttl))
+        
+        return total
+    
+    @staticmethod
+    def keyset_paginate_query(
+        query,
+        sort_column,
+        id_column,
+        per_page: int,
+        cursor: Optional[str] = None,
+        descending: bool = True,
+        include_total: bool = False
+    ):
+        """Paginate SQLAlchemy query by keyset on (sort column, id).
+        
+        The query must not be ordered yet; ordering is applied here so that it
+        always matches the cursor predicate. Page cost depends only on
+        per_page, not on how deep the page is. NULL sort values are placed
+        last in both directions and are ordered by id among themselves.
+        Cursors carry the sort field and order and are rejected under any
+        other, since their position means nothing there.
+        """
+        sort_key = sort_column.key
+        sort_order = "desc" if descending else "asc"
+        base_query = query
+        direction = "next"
+        
+        if cursor:
+            position = DataUtils.decode_cursor(cursor)
+            if position["sort_key"] != sort_key:
+                raise ValueError("Pagination cursor does not match the requested sort field")
+            if position["sort_order"] != sort_order:
+                raise ValueError("Pagination cursor does not match the requested sort order")
+            
+            direction = position["direction"]
+            value = position["sort_value"]
+            last_id = position["id"]
+            # Walking backwards is walking forwards in the opposite order
+            forward = descending if direction == "next" else not descending
+            
+            if direction == "next":
+                if value is None:
+                    condition = and_(
+                        sort_column.is_(None),
+                        id_column < last_id if descending else id_column > last_id
+                    )
+                else:
+                    condition = or_(
+                        sort_column < value if forward else sort_column > value,
+                        and_(sort_column == value, id_column < last_id if forward else id_column > last_id),
+                        sort_column.is_(None)
+                    )
+            else:
+                if value is None:
+                    condition = or_(
+                        sort_column.isnot(None),
+                        and_(sort_column.is_(None), id_column > last_id if descending else id_column < last_id)
+                    )
+                else:
+                    condition = and_(
+                        sort_column.isnot(None),
+                        or_(
+                            sort_column < value if forward else sort_column > value,
+                            and_(sort_column == value, id_column < last_id if forward else id_column > last_id)
+                        )
+                    )
+            query = query.filter(condition)
+        
+        if direction == "next":
+            order = (
+                (sort_column.desc().nullslast(), id_column.desc())
+                if descending else
+                (sort_column.asc().nullslast(), id_column.asc())
+            )
+        else:
+            order = (
+                (sort_column.asc().nullsfirst(), id_column.asc())
+                if descending else
+                (sort_column.desc().nullsfirst(), id_column.desc())
+            )
+        
+        # Fetch one extra row to know whether another page exists
+        rows = query.order_by(*order).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        items = rows[:per_page]
+        if direction == "prev":
+            items.reverse()
+        
+        def cursor_for(item, item_direction):
+            return DataUtils.encode_cursor(
+                sort_key,
+                getattr(item, sort_key),
+                getattr(item, id_column.key),
+                item_direction,
+                sort_order
+            )
+        
+        next_cursor = prev_cursor = None
+        if items:
+            if direction == "next":
+                next_cursor = cursor_for(items[-1], "next") if has_more else None
+                prev_cursor = cursor_for(items[0], "prev") if cursor else None
+            else:
+                prev_cursor = cursor_for(items[0], "prev") if has_more else None
+                next_cursor = cursor_for(items[-1], "next")
+        
+        total = DataUtils.cached_count(base_query) if include_total else None
+        
+        return {
+            'items': items,
+            'total': total,
+            'page': None,
+            'per_page': per_page,
+            'pages': (total + per_page - 1) // per_page if total is not None else None,
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor
+        }
+    
     @staticmethod
     def export_to_csv(data: List[Dict], filename: str) -> str:
         """Export data to CSV format"""
@@ -6,13 +6,17 @@ from starlette.exceptions import HTTPException as StarletteHTTPException
 from contextlib import asynccontextmanager
 import logging
 from .core.config import settings
-from .core.database import engine, Base
+from .core.database import engine, Base, SessionLocal
+from .core.log_sink import system_log_sink
+from .core.auth import password_hash_pool
+from .services.audit_service import audit_service, audit_partitions
+from .services.reservation_service import reservation_service
 # Import all models to ensure tables are created
 from . import models
 from .core.middleware import (
-    SecurityMiddleware, LoggingMiddleware, RateLimitMiddleware,
+    MiddlewarePipeline, SecurityMiddleware, LoggingMiddleware, RateLimitMiddleware,
     DatabaseMiddleware, MaintenanceMiddleware, CompressionMiddleware,
-    UserContextMiddleware, APIVersionMiddleware,
+    UserContextMiddleware, APIVersionMiddleware, RequestSizeLimitMiddleware,
     validation_exception_handler, http_exception_handler, general_exception_handler
 )
 # from .middleware.audit_middleware import AuditMiddleware, SecurityAuditMiddleware  # Temporarily disabled
@@ -36,14 +40,24 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up GymSystem API...")
     
-    # Create database tables
+    # Create database tables (audit log partitions first, create_all skips them)
     try:
+        audit_partitions.initialize()
         Base.metadata.create_all(bind=engine)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
         raise
     
+    # Backfill class occupancy counters before the first reservation
+    db = SessionLocal()
+    try:
+        reservation_service.initialize(db)
+    except Exception as e:
+        logger.error(f"Error backfilling class reservations: {e}")
+    finally:
+        db.close()
+    
     # Initialize configuration service after tables are created
     try:
         from .services.config_service import get_config_service
@@ -55,6 +69,10 @@ async def lifespan(app: FastAPI):
         logger.error(f"Error initializing configuration service: {e}")
         # Don't raise here, let the app start without config service if needed
     
+    # Start batched request and audit log writers
+    system_log_sink.start()
+    await audit_service.start_background_processing()
+    
     # Additional startup tasks
     logger.info("GymSystem API started successfully")
     
@@ -62,6 +80,16 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down GymSystem API...")
+    system_log_sink.stop()
+    await audit_service.stop_background_processing()
+    password_hash_pool.shutdown()
+    
+    try:
+        from .services.analytics_job_service import analytics_job_service
+        analytics_job_service.shutdown()
+    except ImportError:
+        pass
+    
     logger.info("GymSystem API shutdown complete")
 
 # Create FastAPI application
@@ -100,10 +128,23 @@ app.add_middleware(
     ]
 )
 
-# Add custom middleware (order matters!)
-app.add_middleware(SecurityMiddleware)
-app.add_middleware(DatabaseMiddleware)
-app.add_middleware(LoggingMiddleware)
+# Add custom middleware as one pure-ASGI pipeline (order matters!)
+app.add_middleware(
+    MiddlewarePipeline,
+    stages=[
+        SecurityMiddleware(),
+        LoggingMiddleware(),
+        *([RateLimitMiddleware()] if settings.RATE_LIMIT_ENABLED else []),
+        MaintenanceMiddleware(
+            maintenance_mode=None,
+            maintenance_message="El sistema está en mantenimiento. Intente más tarde.",
+            allowed_paths=["/health", "/api/v1/health/live", "/api/v1/health/ready"],
+            retry_after=3600
+        ),
+        RequestSizeLimitMiddleware(max_body_size=10 * 1024 * 1024),
+        DatabaseMiddleware()
+    ]
+)
 
 # Exception handlers
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
@@ -150,6 +191,7 @@ async def api_info():
             "employees": "/api/v1/employees",
             "payments": "/api/v1/payments",
             "reports": "/api/v1/reports",
+            "analytics": "/api/v1/analytics",
             "health": "/api/v1/health",
             "config": "/api/v1/config",
             "audit": "/api/v1/audit",
@@ -218,70 +260,6 @@ async def method_not_allowed_handler(request: Request, exc: StarletteHTTPExcepti
 #         }
 #     )
 
-# Maintenance mode check
-@app.middleware("http")
-async def maintenance_check(request: Request, call_next):
-    """Check if application is in maintenance mode"""
-    # Skip maintenance check for health endpoint
-    if request.url.path == "/health":
-        response = await call_next(request)
-        return response
-    
-    # Check maintenance mode from environment or database
-    maintenance_mode = getattr(settings, 'MAINTENANCE_MODE', False)
-    
-    if maintenance_mode:
-        return JSONResponse(
-            status_code=503,
-            content={
-                "error": "Service Unavailable",
-                "message": "El sistema está en mantenimiento. Intente más tarde.",
-                "retry_after": "3600"  # 1 hour
-            },
-            headers={"Retry-After": "3600"}
-        )
-    
-    response = await call_next(request)
-    return response
-
-# Request size limit middleware
-@app.middleware("http")
-async def limit_upload_size(request: Request, call_next):
-    """Limit request body size"""
-    max_size = 10 * 1024 * 1024  # 10MB
-    
-    if request.headers.get("content-length"):
-        content_length = int(request.headers["content-length"])
-        if content_length > max_size:
-            return JSONResponse(
-                status_code=413,
-                content={
-                    "error": "Payload Too Large",
-                    "message": "El tamaño del archivo excede el límite permitido (10MB)",
-                    "max_size": max_size
-                }
-            )
-    
-    response = await call_next(request)
-    return response
-
-# Security headers middleware
-@app.middleware("http")
-async def add_security_headers(request: Request, call_next):
-    """Add security headers to all responses"""
-    response = await call_next(request)
-    
-    # Add security headers
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-    
-    if settings.ENVIRONMENT == "production":
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-    
-    return response
-
 if __name__ == "__main__":
     import uvicorn
     
@@ -290,5 +268,6 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=settings.DEBUG,
+        ws_per_message_deflate=settings.WEBSOCKET_PER_MESSAGE_DEFLATE,
         log_level="info" if settings.DEBUG else "warning"
     )
\ No newline at end of file
@@ -1,10 +1,10 @@
 from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Callable, Optional
-import time
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Scope
+from typing import Optional
 import json
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from ..services.audit_service import (
     audit_service,
     AuditAction,
@@ -13,18 +13,18 @@ from ..services.audit_service import (
     AuditContext
 )
 from ..core.auth import auth_manager
+from ..core.middleware import PipelineMiddleware, RequestContext
 from ..core.database import get_db
 from ..models.user import User
-import uuid
 from urllib.parse import urlparse
 import asyncio
 
 logger = logging.getLogger(__name__)
 
-class AuditMiddleware(BaseHTTPMiddleware):
+class AuditMiddleware(PipelineMiddleware):
     """Middleware for automatic audit logging of HTTP requests"""
     
-    def __init__(self, app, excluded_paths: Optional[list] = None):
+    def __init__(self, app: Optional[ASGIApp] = None, excluded_paths: Optional[list] = None):
         super().__init__(app)
         
         # Paths to exclude from audit logging
@@ -58,65 +58,61 @@ class AuditMiddleware(BaseHTTPMiddleware):
         self.max_requests_per_minute = 1000
         self.request_counts = {}
         
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Process HTTP request and response with audit logging"""
-        
-        # Generate unique request ID
-        request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
-        
-        # Start timing
-        start_time = time.time()
-        
-        # Check if path should be audited
-        should_audit = self._should_audit_request(request)
+    async def before_request(self, scope: Scope, context: RequestContext) -> Optional[Response]:
+        """Set the audit context for the request"""
+        request = Request(scope)
         
         # Extract user information
         user_info = await self._extract_user_info(request)
         
-        # Create audit context
+        # Create audit context (request ID comes from the shared pipeline context)
         audit_context = AuditContext(
             user_id=user_info.get("user_id"),
             user_email=user_info.get("user_email"),
             user_role=user_info.get("user_role"),
-            ip_address=self._get_client_ip(request),
-            user_agent=request.headers.get("user-agent"),
-            session_id=request.headers.get("x-session-id"),
-            request_id=request_id,
-            endpoint=str(request.url.path),
-            method=request.method
+            ip_address=context.client_ip,
+            user_agent=context.headers.get("user-agent"),
+            session_id=context.headers.get("x-session-id"),
+            request_id=context.request_id,
+            endpoint=context.path,
+            method=context.method
         )
         
         # Set audit context for this request
-        audit_service.set_context(audit_context)
-        
-        # Process request
-        response = None
-        error_message = None
-        
+        scope["state"]["audit_context_token"] = audit_service.set_context(audit_context)
+        scope["state"]["audit_context"] = audit_context
+        return None
+    
+    def on_response_start(self, scope: Scope, context: RequestContext, headers: MutableHeaders) -> None:
+        scope["state"]["audit_response_size"] = headers.get("content-length")
+    
+    async def after_request(self, scope: Scope, context: RequestContext) -> None:
+        """Log audit event once the response is sent"""
         try:
-            response = await call_next(request)
-            
-        except Exception as e:
-            error_message = str(e)
-            logger.error(f"Request {request_id} failed: {e}")
-            raise
-        
+            await self._audit_response(scope, context)
         finally:
-            # Calculate duration
-            duration_ms = (time.time() - start_time) * 1000
-            
-            # Log audit event if needed
-            if should_audit:
-                await self._log_request_audit(
-                    request=request,
-                    response=response,
-                    duration_ms=duration_ms,
-                    error_message=error_message,
-                    audit_context=audit_context
-                )
+            token = scope["state"].pop("audit_context_token", None)
+            if token is not None:
+                audit_service.reset_context(token)
+    
+    async def _audit_response(self, scope: Scope, context: RequestContext) -> None:
+        request = Request(scope)
+        if not self._should_audit_request(request):
+            return
         
-        return response
+        error_message = None
+        if context.error is not None:
+            error_message = str(context.error)
+            logger.error(f"Request {context.request_id} failed: {context.error}")
+        
+        await self._log_request_audit(
+            request=request,
+            status_code=None if context.error is not None else context.status_code,
+            response_size=scope["state"].get("audit_response_size"),
+            duration_ms=context.process_time * 1000,
+            error_message=error_message,
+            audit_context=scope["state"]["audit_context"]
+        )
     
     def _should_audit_request(self, request: Request) -> bool:
         """Determine if request should be audited"""
@@ -201,7 +197,8 @@ class AuditMiddleware(BaseHTTPMiddleware):
     async def _log_request_audit(
         self,
         request: Request,
-        response: Optional[Response],
+        status_code: Optional[int],
+        response_size: Optional[str],
         duration_ms: float,
         error_message: Optional[str],
         audit_context: AuditContext
@@ -209,32 +206,31 @@ class AuditMiddleware(BaseHTTPMiddleware):
         """Log audit event for HTTP request"""
         try:
             # Determine success status
-            success = response is not None and 200 <= response.status_code < 400
+            success = status_code is not None and 200 <= status_code < 400
             
             # Determine audit level based on status
-            if error_message or (response and response.status_code >= 500):
+            if error_message or (status_code and status_code >= 500):
                 level = AuditLevel.ERROR
-            elif response and response.status_code >= 400:
+            elif status_code and status_code >= 400:
                 level = AuditLevel.WARNING
             else:
                 level = AuditLevel.INFO
             
             # Determine action based on method and endpoint
-            action = self._determine_audit_action(request, response)
+            action = self._determine_audit_action(request, status_code)
             
             # Determine category
             category = self._determine_audit_category(request)
             
             # Create description
-            status_code = response.status_code if response else "ERROR"
-            description = f"{request.method} {request.url.path} - {status_code}"
+            description = f"{request.method} {request.url.path} - {status_code or 'ERROR'}"
             
             # Prepare metadata
             metadata = {
                 "query_params": dict(request.query_params),
                 "headers": dict(request.headers),
-                "status_code": response.status_code if response else None,
-                "response_size": response.headers.get("content-length") if response else None
+                "status_code": status_code,
+                "response_size": response_size
             }
             
             # Remove sensitive headers
@@ -260,14 +256,14 @@ class AuditMiddleware(BaseHTTPMiddleware):
         except Exception as e:
             logger.error(f"Error logging request audit: {e}")
     
-    def _determine_audit_action(self, request: Request, response: Optional[Response]) -> AuditAction:
+    def _determine_audit_action(self, request: Request, status_code: Optional[int]) -> AuditAction:
         """Determine audit action based on request"""
         path = request.url.path
         method = request.method
         
         # Authentication endpoints
         if "/auth/login" in path:
-            return AuditAction.LOGIN if response and response.status_code == 200 else AuditAction.LOGIN_FAILED
+            return AuditAction.LOGIN if status_code == 200 else AuditAction.LOGIN_FAILED
         elif "/auth/logout" in path:
             return AuditAction.LOGOUT
         elif "/auth/register" in path:
@@ -388,10 +384,10 @@ class AuditMiddleware(BaseHTTPMiddleware):
         # Default to API usage
         return AuditCategory.API_USAGE
 
-class SecurityAuditMiddleware(BaseHTTPMiddleware):
+class SecurityAuditMiddleware(PipelineMiddleware):
     """Specialized middleware for security event detection"""
     
-    def __init__(self, app):
+    def __init__(self, app: Optional[ASGIApp] = None):
         super().__init__(app)
         
         # Suspicious patterns
@@ -412,22 +408,21 @@ class SecurityAuditMiddleware(BaseHTTPMiddleware):
         self.failed_logins = {}
         self.max_failed_logins = 5
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def before_request(self, scope: Scope, context: RequestContext) -> Optional[Response]:
         """Monitor for security threats"""
+        request = Request(scope)
         
         # Check for suspicious patterns
         await self._check_suspicious_patterns(request)
         
         # Check rate limiting
         await self._check_rate_limiting(request)
-        
-        # Process request
-        response = await call_next(request)
-        
+        return None
+    
+    async def after_request(self, scope: Scope, context: RequestContext) -> None:
         # Check for failed authentication
-        await self._check_failed_authentication(request, response)
-        
-        return response
+        if context.status_code is not None:
+            await self._check_failed_authentication(Request(scope), context.status_code)
     
     async def _check_suspicious_patterns(self, request: Request):
         """Check for suspicious patterns in request"""
@@ -496,10 +491,10 @@ class SecurityAuditMiddleware(BaseHTTPMiddleware):
         except Exception as e:
             logger.error(f"Error checking rate limiting: {e}")
     
-    async def _check_failed_authentication(self, request: Request, response: Response):
+    async def _check_failed_authentication(self, request: Request, status_code: int):
         """Check for failed authentication attempts"""
         try:
-            if "/auth/login" in request.url.path and response.status_code == 401:
+            if "/auth/login" in request.url.path and status_code == 401:
                 client_ip = self._get_client_ip(request)
                 current_time = datetime.now()
                 
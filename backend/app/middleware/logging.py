@@ -1,56 +1,39 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Optional
+from fastapi import Response
+from starlette.types import Scope
 from loguru import logger
-import time
-import json
+from ..core.middleware import PipelineMiddleware, RequestContext
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
+class LoggingMiddleware(PipelineMiddleware):
     """Logging middleware for request/response logging"""
     
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
-        # Get request info
-        request_id = getattr(request.state, 'request_id', 'unknown')
-        method = request.method
-        url = str(request.url)
-        client_ip = request.client.host if request.client else "unknown"
-        
+    async def before_request(self, scope: Scope, context: RequestContext) -> Optional[Response]:
         # Log request
         logger.info(
-            f"Request started - {method} {url} | "
-            f"Client: {client_ip} | Request ID: {request_id}"
+            f"Request started - {context.method} {context.path} | "
+            f"Client: {context.client_ip} | Request ID: {context.request_id}"
         )
+        return None
+    
+    async def after_request(self, scope: Scope, context: RequestContext) -> None:
+        # Calculate processing time
+        process_time = context.process_time
         
-        try:
-            # Process request
-            response = await call_next(request)
-            
-            # Calculate processing time
-            process_time = time.time() - start_time
-            
-            # Log response
-            logger.info(
-                f"Request completed - {method} {url} | "
-                f"Status: {response.status_code} | "
-                f"Time: {process_time:.4f}s | "
-                f"Request ID: {request_id}"
-            )
-            
-            return response
-            
-        except Exception as e:
-            # Calculate processing time for errors
-            process_time = time.time() - start_time
-            
+        if context.error is not None:
             # Log error
             logger.error(
-                f"Request failed - {method} {url} | "
-                f"Error: {str(e)} | "
+                f"Request failed - {context.method} {context.path} | "
+                f"Error: {str(context.error)} | "
                 f"Time: {process_time:.4f}s | "
-                f"Request ID: {request_id}"
+                f"Request ID: {context.request_id}"
             )
-            
-            # Re-raise the exception
-            raise
\ No newline at end of file
+            return
+        
+        # Log response
+        logger.info(
+            f"Request completed - {context.method} {context.path} | "
+            f"Status: {context.status_code} | "
+            f"Time: {process_time:.4f}s | "
+            f"Request ID: {context.request_id}"
+        )
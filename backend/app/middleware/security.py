@@ -1,50 +1,55 @@
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import Scope, Receive, Send
 from starlette.responses import Response as StarletteResponse
 from loguru import logger
-import time
-import uuid
+from ..core.middleware import PipelineMiddleware, RequestContext
 
 
-class SecurityMiddleware(BaseHTTPMiddleware):
-    """Security middleware for adding security headers and request tracking"""
+class SecurityMiddleware(PipelineMiddleware):
+    """Security middleware for adding security headers and request tracking.
+
+    X-Request-ID and X-Process-Time come from the shared request context.
+    """
     
-    async def dispatch(self, request: Request, call_next):
-        # Add request ID for tracking
-        request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
-        
+    def on_response_start(self, scope: Scope, context: RequestContext, headers: MutableHeaders) -> None:
         # Add security headers
-        start_time = time.time()
+        headers["X-Content-Type-Options"] = "nosniff"
+        headers["X-Frame-Options"] = "DENY"
+        headers["X-XSS-Protection"] = "1; mode=block"
+        headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        
+        # Add CORS headers if not already present
+        if "Access-Control-Allow-Origin" not in headers:
+            headers["Access-Control-Allow-Origin"] = "*"
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        response_started = False
+        
+        async def track_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
         
         try:
-            response = await call_next(request)
-            
-            # Add security headers
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Content-Type-Options"] = "nosniff"
-            response.headers["X-Frame-Options"] = "DENY"
-            response.headers["X-XSS-Protection"] = "1; mode=block"
-            response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-            
-            # Add CORS headers if not already present
-            if "Access-Control-Allow-Origin" not in response.headers:
-                response.headers["Access-Control-Allow-Origin"] = "*"
-            
-            process_time = time.time() - start_time
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            return response
-            
+            await super().__call__(scope, receive, track_send)
         except Exception as e:
             logger.error(f"Security middleware error: {str(e)}")
+            if response_started:
+                raise
             # Return a basic error response
-            return StarletteResponse(
+            context = scope["state"]["request_context"]
+            response = StarletteResponse(
                 content="Internal Server Error",
                 status_code=500,
                 headers={
-                    "X-Request-ID": request_id,
+                    "X-Request-ID": context.request_id,
                     "X-Content-Type-Options": "nosniff",
                     "X-Frame-Options": "DENY",
                 }
-            )
\ No newline at end of file
+            )
+            await response(scope, receive, send)
@@ -75,6 +75,13 @@ except ImportError as e:
     logger.error(f"Failed to import Configuration models: {e}")
     Configuration = NotificationTemplate = SystemLog = None
 
+try:
+    from .rollup import DailyRevenueRollup, DailyActivityRollup, RollupStatus
+    logger.info("Rollup models imported successfully")
+except ImportError as e:
+    logger.error(f"Failed to import Rollup models: {e}")
+    DailyRevenueRollup = DailyActivityRollup = RollupStatus = None
+
 # Service models - import with error handling (these may not exist yet)
 AuditLogModel = None
 ConfigModel = None
@@ -113,6 +120,9 @@ for model_name, model_class in [
     ("Configuration", Configuration),
     ("NotificationTemplate", NotificationTemplate),
     ("SystemLog", SystemLog),
+    ("DailyRevenueRollup", DailyRevenueRollup),
+    ("DailyActivityRollup", DailyActivityRollup),
+    ("RollupStatus", RollupStatus),
     ("AuditLogModel", AuditLogModel),
     ("ConfigModel", ConfigModel),
     ("ConfigHistoryModel", ConfigHistoryModel)
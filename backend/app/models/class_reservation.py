@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Enum, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -12,6 +12,7 @@ class ReservationStatus(str, enum.Enum):
     CANCELLED = "cancelled"
     COMPLETED = "completed"
     NO_SHOW = "no_show"
+    WAITLISTED = "waitlisted"
 
 class ClassReservation(Base):
     """Class reservation model"""
@@ -50,13 +51,26 @@ class ClassReservation(Base):
     created_by_user = relationship("User", foreign_keys=[created_by])
     cancelled_by_user = relationship("User", foreign_keys=[cancelled_by])
     
+    __table_args__ = (
+        # Occupancy, duplicate and waitlist lookups all filter on class + status
+        Index("ix_class_reservations_class_status", "class_id", "status"),
+        # One active reservation per member and class. The service's duplicate
+        # check is a separate SELECT, so only the database can close the race.
+        # Enum columns store member names.
+        Index(
+            "ix_class_reservations_active_member", "class_id", "user_id", unique=True,
+            postgresql_where=text("status IN ('CONFIRMED', 'PENDING', 'WAITLISTED')"),
+            sqlite_where=text("status IN ('CONFIRMED', 'PENDING', 'WAITLISTED')")
+        ),
+    )
+    
     def __repr__(self):
         return f"<ClassReservation(id={self.id}, user_id={self.user_id}, class_id={self.class_id}, status='{self.status}')>"
     
     @property
     def can_cancel(self):
         """Check if reservation can be cancelled"""
-        return self.status in [ReservationStatus.CONFIRMED, ReservationStatus.PENDING]
+        return self.status in [ReservationStatus.CONFIRMED, ReservationStatus.PENDING, ReservationStatus.WAITLISTED]
     
     @property
     def is_active(self):
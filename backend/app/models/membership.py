@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Enum, ForeignKey, Float, Date
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Enum, ForeignKey, Float, Date, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -100,6 +100,7 @@ class Payment(Base):
     # Payment details
     amount = Column(Float, nullable=False)
     payment_method = Column(String(50), nullable=False)  # cash, card, transfer, etc.
+    payment_type = Column(String(50), nullable=True)  # membership, class, product, etc.
     status = Column(Enum(PaymentStatus), nullable=False, default=PaymentStatus.PENDING)
     
     # Dates
@@ -126,6 +127,11 @@ class Payment(Base):
     user = relationship("User", back_populates="payments")
     membership = relationship("Membership", back_populates="payments")
     
+    __table_args__ = (
+        # Stats and reports scan a window of payment days (paid, else due) split by status
+        Index("ix_payments_day_status", func.coalesce(payment_date, due_date), "status"),
+    )
+    
     def __repr__(self):
         return f"<Payment(id={self.id}, user_id={self.user_id}, amount={self.amount}, status='{self.status}')>"
     
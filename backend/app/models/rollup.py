@@ -0,0 +1,65 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, Date, UniqueConstraint
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+class DailyRevenueRollup(Base):
+    """Per-day payment totals by method, type and status"""
+    __tablename__ = "daily_revenue_rollups"
+
+    # Primary key
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Dimensions (payment_type is "" when the payment has none, so the
+    # unique key never contains NULLs)
+    day = Column(Date, nullable=False, index=True)
+    payment_method = Column(String(50), nullable=False, default="")
+    payment_type = Column(String(50), nullable=False, default="")
+    status = Column(String(20), nullable=False)
+
+    # Measures
+    payment_count = Column(Integer, nullable=False, default=0)
+    amount_total = Column(Float, nullable=False, default=0.0)
+
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("day", "payment_method", "payment_type", "status", name="uq_daily_revenue_rollup_key"),
+    )
+
+    def __repr__(self):
+        return f"<DailyRevenueRollup(day={self.day}, method='{self.payment_method}', status='{self.status}', amount={self.amount_total})>"
+
+class DailyActivityRollup(Base):
+    """Per-day member activity counters"""
+    __tablename__ = "daily_activity_rollups"
+
+    # Primary key
+    day = Column(Date, primary_key=True)
+
+    # Counters
+    new_users = Column(Integer, nullable=False, default=0)
+    check_ins = Column(Integer, nullable=False, default=0)
+    reservations = Column(Integer, nullable=False, default=0)
+    membership_starts = Column(Integer, nullable=False, default=0)
+    membership_ends = Column(Integer, nullable=False, default=0)
+
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<DailyActivityRollup(day={self.day}, new_users={self.new_users}, check_ins={self.check_ins})>"
+
+class RollupStatus(Base):
+    """Tracks which rollups have been backfilled and can serve reads"""
+    __tablename__ = "rollup_status"
+
+    # Primary key
+    name = Column(String(50), primary_key=True)
+
+    # Backfill info
+    backfilled_at = Column(DateTime(timezone=True), nullable=False)
+    backfilled_from = Column(Date, nullable=True)
+
+    def __repr__(self):
+        return f"<RollupStatus(name='{self.name}', backfilled_at='{self.backfilled_at}')>"
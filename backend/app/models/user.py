@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -97,6 +97,12 @@ class User(Base):
     # Audit logs for this user
     audit_logs = relationship("AuditLogModel", back_populates="user")
     
+    __table_args__ = (
+        # Keyset pagination on the user list orders by (sort field, id)
+        Index("ix_users_created_at_id", "created_at", "id"),
+        Index("ix_users_last_name_id", "last_name", "id"),
+    )
+    
     def __repr__(self):
         return f"<User(id={self.id}, user_id='{self.user_id}', email='{self.email}', role='{self.role}')>"
     
@@ -33,7 +33,7 @@ from .class_schema import (
     ClassAttendanceBase, ClassAttendanceCreate, ClassAttendanceUpdate, ClassAttendanceResponse,
     ClassBulkCreate, ReservationBulkCreate,
     ClassList, ClassReservationList, ClassAttendanceList,
-    ClassFilter, ClassStats, ClassSchedule, WeeklySchedule,
+    ClassFilter, ClassStats, ClassSchedule, ScheduledClass, WeeklySchedule,
     RecurringClassCreate, WaitlistEntry, WaitlistResponse
 )
 from .employee import (
@@ -86,7 +86,7 @@ __all__ = [
     "ClassAttendanceBase", "ClassAttendanceCreate", "ClassAttendanceUpdate", "ClassAttendanceResponse",
     "ClassBulkCreate", "ReservationBulkCreate",
     "ClassList", "ClassReservationList", "ClassAttendanceList",
-    "ClassFilter", "ClassStats", "ClassSchedule", "WeeklySchedule",
+    "ClassFilter", "ClassStats", "ClassSchedule", "ScheduledClass", "WeeklySchedule",
     "RecurringClassCreate", "WaitlistEntry", "WaitlistResponse",
     
     # Employee schemas
@@ -311,10 +311,12 @@ class ClassList(BaseModel):
 class ClassReservationList(BaseModel):
     """Schema for class reservation list with pagination"""
     reservations: List[ClassReservationResponse]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     per_page: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 class ClassAttendanceList(BaseModel):
     """Schema for class attendance list with pagination"""
@@ -353,10 +355,23 @@ class ClassStats(BaseModel):
     total_attendances: int
 
 # Schedule schemas
+class ScheduledClass(BaseModel):
+    """One class in a schedule view, with its seat-holding reservations"""
+    id: int
+    name: str
+    class_type: ClassType
+    instructor_id: int
+    start_time: datetime
+    end_time: datetime
+    room: Optional[str] = None
+    max_capacity: int
+    reservation_count: int
+    available_spots: int
+
 class ClassSchedule(BaseModel):
     """Schema for class schedule view"""
     date: date
-    classes: List[ClassResponse]
+    classes: List[ScheduledClass]
     total_classes: int
     total_capacity: int
     total_reservations: int
@@ -187,10 +187,12 @@ class EmployeeBulkUpdate(BaseModel):
 class EmployeeList(BaseModel):
     """Schema for employee list with pagination"""
     employees: List[EmployeeResponse]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     per_page: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 
 
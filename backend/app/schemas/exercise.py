@@ -229,10 +229,12 @@ class ExerciseSearch(BaseModel):
 class ExerciseList(BaseModel):
     """Schema for exercise list with pagination"""
     exercises: List[ExerciseResponse]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     per_page: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
     filters: Optional[ExerciseFilter] = None
 
 # Statistics schemas
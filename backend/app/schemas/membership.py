@@ -190,18 +190,22 @@ class PaymentBulkCreate(BaseModel):
 class MembershipList(BaseModel):
     """Schema for membership list with pagination"""
     memberships: List[MembershipResponse]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     per_page: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 class PaymentList(BaseModel):
     """Schema for payment list with pagination"""
     payments: List[PaymentResponse]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     per_page: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 # Statistics schemas
 class MembershipStats(BaseModel):
@@ -238,10 +238,12 @@ class PasswordResetConfirm(BaseModel):
 class UserList(BaseModel):
     """Schema for user list with pagination"""
     users: List[UserResponse]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     per_page: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 class UserStats(BaseModel):
     """Schema for user statistics"""
@@ -0,0 +1,239 @@
+from typing import Dict, Any, Optional, List, Set
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, date, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+import multiprocessing
+import asyncio
+import hashlib
+import json
+import uuid
+import logging
+import numpy as np
+from ..core.config import settings
+from .analytics_service import AnalyticsService, AnalyticsRequest, AnalyticsType, TimeFrame
+
+logger = logging.getLogger(__name__)
+
+class AnalyticsQueueFull(Exception):
+    """Raised when too many analytics jobs are pending or running"""
+    pass
+
+class JobStatus(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+@dataclass
+class AnalyticsJob:
+    """Analytics job tracked by the job engine"""
+    job_id: str
+    key: str
+    request: AnalyticsRequest
+    status: JobStatus = JobStatus.PENDING
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    waiters: int = 1
+    future: Optional[asyncio.Future] = field(default=None, repr=False)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JobStatus.COMPLETED, JobStatus.FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Job status without the result payload"""
+        return {
+            'job_id': self.job_id,
+            'status': self.status.value,
+            'analytics_type': self.request.analytics_type.value,
+            'time_frame': self.request.time_frame.value,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'error': self.error
+        }
+
+def _to_native(value: Any) -> Any:
+    """Convert numpy/pandas/enum/datetime values into JSON-friendly types"""
+    if isinstance(value, dict):
+        return {str(_to_native(k)): _to_native(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_to_native(v) for v in value]
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.ndarray):
+        return [_to_native(v) for v in value.tolist()]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def _request_payload(request: AnalyticsRequest) -> Dict[str, Any]:
+    """Picklable, canonical form of an analytics request"""
+    return {
+        'analytics_type': request.analytics_type.value,
+        'time_frame': request.time_frame.value,
+        'start_date': request.start_date.isoformat(),
+        'end_date': request.end_date.isoformat(),
+        'filters': request.filters or {},
+        'include_predictions': request.include_predictions,
+        'segment_by': request.segment_by
+    }
+
+def _run_analytics_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one analytics request in a worker process with its own session"""
+    request = AnalyticsRequest(
+        analytics_type=AnalyticsType(payload['analytics_type']),
+        time_frame=TimeFrame(payload['time_frame']),
+        start_date=datetime.fromisoformat(payload['start_date']),
+        end_date=datetime.fromisoformat(payload['end_date']),
+        filters=payload['filters'] or None,
+        include_predictions=payload['include_predictions'],
+        segment_by=payload['segment_by']
+    )
+    result = asyncio.run(AnalyticsService().generate_analytics(request))
+    return _to_native(asdict(result))
+
+class AnalyticsJobService:
+    """Runs analytics requests as cached jobs off the event loop.
+
+    pandas/numpy/scikit-learn work happens in a process pool, so a heavy
+    predictive or segmentation request never blocks the worker's event
+    loop. Jobs are keyed by their request parameters: identical requests
+    made while a job is pending or running share it, and completed results
+    are reused until their TTL expires. At most ``max_active`` distinct jobs
+    are pending or running at once; further submissions are rejected.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, cache_ttl: Optional[int] = None,
+                 max_jobs: Optional[int] = None, max_active: Optional[int] = None):
+        self.max_workers = max_workers or settings.ANALYTICS_WORKERS
+        self.cache_ttl = cache_ttl if cache_ttl is not None else settings.ANALYTICS_CACHE_TTL
+        self.max_jobs = max_jobs or settings.ANALYTICS_CACHE_MAX_JOBS
+        self.max_active = max_active or settings.ANALYTICS_MAX_ACTIVE_JOBS
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[str, AnalyticsJob] = {}
+        self._jobs_by_key: Dict[str, AnalyticsJob] = {}
+        # Strong references: the loop only keeps weak ones to running tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def job_key(request: AnalyticsRequest) -> str:
+        """Cache key for a request"""
+        canonical = json.dumps(_request_payload(request), sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    async def submit(self, request: AnalyticsRequest) -> AnalyticsJob:
+        """Start a job for a request, or join an identical pending/cached one.
+
+        Raises AnalyticsQueueFull when a new job would exceed ``max_active``.
+        """
+        self._evict_expired()
+
+        key = self.job_key(request)
+        existing = self._jobs_by_key.get(key)
+        if existing is not None and existing.status != JobStatus.FAILED:
+            existing.waiters += 1
+            return existing
+
+        active = sum(1 for job in self._jobs.values() if not job.is_finished)
+        if active >= self.max_active:
+            raise AnalyticsQueueFull(f"{active} analytics jobs are already pending or running")
+
+        job = AnalyticsJob(job_id=str(uuid.uuid4()), key=key, request=request)
+        job.future = asyncio.get_running_loop().create_future()
+        self._jobs[job.job_id] = job
+        self._jobs_by_key[key] = job
+        self._enforce_limit()
+
+        task = asyncio.create_task(self._execute(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def run(self, request: AnalyticsRequest) -> Dict[str, Any]:
+        """Submit a request and wait for its result"""
+        job = await self.submit(request)
+        return await asyncio.shield(job.future)
+
+    def get_job(self, job_id: str) -> Optional[AnalyticsJob]:
+        """Get a job by ID"""
+        self._evict_expired()
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[AnalyticsJob]:
+        """Get all tracked jobs, newest first"""
+        self._evict_expired()
+        return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def shutdown(self) -> None:
+        """Stop the worker pool"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: workers must not inherit the parent's event loop, threads or DB connections
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def _execute(self, job: AnalyticsJob) -> None:
+        loop = asyncio.get_running_loop()
+        job.status = JobStatus.RUNNING
+        job.started_at = datetime.utcnow()
+
+        try:
+            result = await loop.run_in_executor(
+                self._get_executor(), _run_analytics_job, _request_payload(job.request)
+            )
+            job.result = result
+            job.status = JobStatus.COMPLETED
+            job.future.set_result(result)
+        except Exception as e:
+            logger.error(f"Analytics job {job.job_id} failed: {e}")
+            job.error = str(e)
+            job.status = JobStatus.FAILED
+            job.future.set_exception(e)
+            # Nobody may be awaiting; don't let the exception go unretrieved
+            job.future.exception()
+        finally:
+            job.finished_at = datetime.utcnow()
+            job.expires_at = job.finished_at + timedelta(seconds=self.cache_ttl)
+            logger.info(f"Analytics job {job.job_id} {job.status.value} in "
+                        f"{(job.finished_at - job.started_at).total_seconds():.2f}s")
+
+    def _evict_expired(self) -> None:
+        now = datetime.utcnow()
+        for job in [job for job in self._jobs.values() if job.expires_at and job.expires_at <= now]:
+            self._forget(job)
+
+    def _enforce_limit(self) -> None:
+        if len(self._jobs) <= self.max_jobs:
+            return
+        finished = sorted(
+            (job for job in self._jobs.values() if job.is_finished),
+            key=lambda job: job.finished_at
+        )
+        for job in finished[:len(self._jobs) - self.max_jobs]:
+            self._forget(job)
+
+    def _forget(self, job: AnalyticsJob) -> None:
+        self._jobs.pop(job.job_id, None)
+        if self._jobs_by_key.get(job.key) is job:
+            del self._jobs_by_key[job.key]
+
+# Global analytics job service instance
+analytics_job_service = AnalyticsJobService()
@@ -4,7 +4,7 @@ from enum import Enum
 from dataclasses import dataclass
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
+from sklearn.cluster import MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestRegressor, IsolationForest
 from sklearn.model_selection import train_test_split
@@ -14,11 +14,15 @@ import logging
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_, text
 from ..models.user import User
-from ..models.membership import Membership, Payment
+from ..models.membership import Membership, Payment, PaymentStatus
 from ..models.routine import RoutineAssignment
-from ..models.class_model import Class, ClassBooking
+from ..models.class_model import Class
+from ..models.class_reservation import ClassReservation
 from ..models.employee import Employee
-from ..core.database import get_db
+from ..models.rollup import DailyRevenueRollup
+from ..core.database import SessionLocal
+from .rollup_service import rollup_service, REVENUE_ROLLUP
+from .payment_stats_service import PAID_STATUS
 import json
 from collections import defaultdict
 import warnings
@@ -80,36 +84,44 @@ class CustomerSegment:
 class AnalyticsService:
     """Advanced analytics and business intelligence service"""
     
+    # Rows per MiniBatchKMeans update when segmenting customers
+    SEGMENTATION_BATCH_SIZE = 1024
+    
     def __init__(self):
-        self.db = next(get_db())
-        self.scaler = StandardScaler()
+        # Stateless across calls: the shared instance serves concurrent
+        # requests, so each call gets its session as an argument
         self.models = {}
         self.customer_segments = []
         
     async def generate_analytics(
         self,
-        request: AnalyticsRequest
+        request: AnalyticsRequest,
+        db: Optional[Session] = None
     ) -> AnalyticsResult:
-        """Generate analytics based on request"""
+        """Generate analytics based on request, in a new session unless ``db`` is given"""
+        owns_session = db is None
+        if owns_session:
+            db = SessionLocal()
+        
         try:
             request_id = f"{request.analytics_type.value}_{datetime.now().timestamp()}"
             
             if request.analytics_type == AnalyticsType.REVENUE:
-                result_data = await self._analyze_revenue(request)
+                result_data = await self._analyze_revenue(db, request)
             elif request.analytics_type == AnalyticsType.MEMBERSHIP:
-                result_data = await self._analyze_membership(request)
+                result_data = await self._analyze_membership(db, request)
             elif request.analytics_type == AnalyticsType.ATTENDANCE:
-                result_data = await self._analyze_attendance(request)
+                result_data = await self._analyze_attendance(db, request)
             elif request.analytics_type == AnalyticsType.RETENTION:
-                result_data = await self._analyze_retention(request)
+                result_data = await self._analyze_retention(db, request)
             elif request.analytics_type == AnalyticsType.PERFORMANCE:
-                result_data = await self._analyze_performance(request)
+                result_data = await self._analyze_performance(db, request)
             elif request.analytics_type == AnalyticsType.OPERATIONAL:
-                result_data = await self._analyze_operational(request)
+                result_data = await self._analyze_operational(db, request)
             elif request.analytics_type == AnalyticsType.PREDICTIVE:
-                result_data = await self._generate_predictions(request)
+                result_data = await self._generate_predictions(db, request)
             elif request.analytics_type == AnalyticsType.CUSTOMER_SEGMENTATION:
-                result_data = await self._perform_customer_segmentation(request)
+                result_data = await self._perform_customer_segmentation(db, request)
             else:
                 raise ValueError(f"Analytics type {request.analytics_type} not supported")
             
@@ -138,33 +150,17 @@ class AnalyticsService:
         except Exception as e:
             logger.error(f"Error generating analytics: {e}")
             raise
+        finally:
+            if owns_session:
+                db.close()
     
-    async def _analyze_revenue(self, request: AnalyticsRequest) -> Dict[str, Any]:
+    async def _analyze_revenue(self, db: Session, request: AnalyticsRequest) -> Dict[str, Any]:
         """Analyze revenue metrics"""
-        # Get payment data
-        payments_query = self.db.query(Payment).filter(
-            and_(
-                Payment.payment_date >= request.start_date,
-                Payment.payment_date <= request.end_date,
-                Payment.status == 'completed'
-            )
-        )
-        
-        payments = payments_query.all()
-        
-        # Convert to DataFrame for analysis
-        payment_data = []
-        for payment in payments:
-            payment_data.append({
-                'date': payment.payment_date,
-                'amount': float(payment.amount),
-                'method': payment.payment_method,
-                'user_id': payment.user_id,
-                'membership_id': payment.membership_id
-            })
-        
-        df = pd.DataFrame(payment_data)
-        
+        if rollup_service.is_ready(db, REVENUE_ROLLUP):
+            df = self._revenue_frame_from_rollups(db, request)
+        else:
+            df = self._revenue_frame_from_payments(db, request)
+
         if df.empty:
             return {
                 'total_revenue': 0,
@@ -175,11 +171,11 @@ class AnalyticsService:
                 'growth_rate': 0
             }
         
-        # Calculate metrics
+        # Calculate metrics (rollup frames hold one row per day and method)
         total_revenue = df['amount'].sum()
-        avg_transaction = df['amount'].mean()
-        transaction_count = len(df)
-        
+        transaction_count = int(df['count'].sum())
+        avg_transaction = total_revenue / transaction_count if transaction_count else 0
+
         # Revenue by time period
         df['date'] = pd.to_datetime(df['date'])
         if request.time_frame == TimeFrame.DAILY:
@@ -223,15 +219,58 @@ class AnalyticsService:
             'forecast': forecast
         }
     
-    async def _analyze_membership(self, request: AnalyticsRequest) -> Dict[str, Any]:
+    def _revenue_frame_from_payments(self, db: Session, request: AnalyticsRequest) -> pd.DataFrame:
+        """Build the revenue frame from raw completed payments"""
+        payments = db.query(Payment).filter(
+            and_(
+                Payment.payment_date >= request.start_date,
+                Payment.payment_date <= request.end_date,
+                Payment.status == PaymentStatus.PAID
+            )
+        ).all()
+        
+        payment_data = []
+        for payment in payments:
+            payment_data.append({
+                'date': payment.payment_date,
+                'amount': float(payment.amount),
+                'method': payment.payment_method,
+                'count': 1
+            })
+        
+        return pd.DataFrame(payment_data, columns=['date', 'amount', 'method', 'count'])
+    
+    def _revenue_frame_from_rollups(self, db: Session, request: AnalyticsRequest) -> pd.DataFrame:
+        """Build the revenue frame from daily rollup rows"""
+        rows = db.query(
+            DailyRevenueRollup.day,
+            DailyRevenueRollup.payment_method,
+            func.sum(DailyRevenueRollup.amount_total),
+            func.sum(DailyRevenueRollup.payment_count)
+        ).filter(
+            and_(
+                DailyRevenueRollup.day >= request.start_date,
+                DailyRevenueRollup.day <= request.end_date,
+                DailyRevenueRollup.status == PAID_STATUS
+            )
+        ).group_by(DailyRevenueRollup.day, DailyRevenueRollup.payment_method).all()
+        
+        payment_data = [
+            {'date': day, 'amount': float(amount or 0), 'method': method, 'count': int(count)}
+            for day, method, amount, count in rows
+            if count
+        ]
+        return pd.DataFrame(payment_data, columns=['date', 'amount', 'method', 'count'])
+    
+    async def _analyze_membership(self, db: Session, request: AnalyticsRequest) -> Dict[str, Any]:
         """Analyze membership metrics"""
         # Get membership data
-        memberships = self.db.query(Membership).filter(
+        memberships = db.query(Membership).filter(
             Membership.created_at >= request.start_date
         ).all()
         
         # Active memberships
-        active_memberships = self.db.query(Membership).filter(
+        active_memberships = db.query(Membership).filter(
             Membership.status == 'active'
         ).count()
         
@@ -239,7 +278,7 @@ class AnalyticsService:
         new_memberships = len(memberships)
         
         # Membership types distribution
-        membership_types = self.db.query(
+        membership_types = db.query(
             Membership.membership_type,
             func.count(Membership.id)
         ).filter(
@@ -249,7 +288,7 @@ class AnalyticsService:
         type_distribution = {mt[0]: mt[1] for mt in membership_types}
         
         # Average membership duration
-        expired_memberships = self.db.query(Membership).filter(
+        expired_memberships = db.query(Membership).filter(
             and_(
                 Membership.status == 'expired',
                 Membership.end_date.isnot(None)
@@ -265,11 +304,11 @@ class AnalyticsService:
         avg_duration = np.mean(durations) if durations else 0
         
         # Churn rate calculation
-        total_members_start = self.db.query(Membership).filter(
+        total_members_start = db.query(Membership).filter(
             Membership.created_at < request.start_date
         ).count()
         
-        churned_members = self.db.query(Membership).filter(
+        churned_members = db.query(Membership).filter(
             and_(
                 Membership.status == 'expired',
                 Membership.end_date >= request.start_date,
@@ -288,10 +327,10 @@ class AnalyticsService:
             'retention_rate': float(100 - churn_rate)
         }
     
-    async def _analyze_attendance(self, request: AnalyticsRequest) -> Dict[str, Any]:
+    async def _analyze_attendance(self, db: Session, request: AnalyticsRequest) -> Dict[str, Any]:
         """Analyze attendance patterns"""
         # Get class bookings
-        bookings = self.db.query(ClassBooking).join(Class).filter(
+        bookings = db.query(ClassReservation).join(Class).filter(
             and_(
                 Class.start_time >= request.start_date,
                 Class.start_time <= request.end_date
@@ -299,7 +338,7 @@ class AnalyticsService:
         ).all()
         
         # Get routine completions
-        routine_completions = self.db.query(RoutineAssignment).filter(
+        routine_completions = db.query(RoutineAssignment).filter(
             and_(
                 RoutineAssignment.completed_date >= request.start_date,
                 RoutineAssignment.completed_date <= request.end_date,
@@ -348,17 +387,17 @@ class AnalyticsService:
             'routine_completions': len(routine_completions)
         }
     
-    async def _analyze_retention(self, request: AnalyticsRequest) -> Dict[str, Any]:
+    async def _analyze_retention(self, db: Session, request: AnalyticsRequest) -> Dict[str, Any]:
         """Analyze customer retention"""
         # Get all users who joined before the analysis period
-        users = self.db.query(User).filter(
+        users = db.query(User).filter(
             User.created_at < request.start_date
         ).all()
         
         retention_data = []
         for user in users:
             # Check if user was active during the period
-            user_payments = self.db.query(Payment).filter(
+            user_payments = db.query(Payment).filter(
                 and_(
                     Payment.user_id == user.id,
                     Payment.payment_date >= request.start_date,
@@ -367,15 +406,15 @@ class AnalyticsService:
                 )
             ).count()
             
-            user_bookings = self.db.query(ClassBooking).join(Class).filter(
+            user_bookings = db.query(ClassReservation).join(Class).filter(
                 and_(
-                    ClassBooking.user_id == user.id,
+                    ClassReservation.user_id == user.id,
                     Class.start_time >= request.start_date,
                     Class.start_time <= request.end_date
                 )
             ).count()
             
-            user_routines = self.db.query(RoutineAssignment).filter(
+            user_routines = db.query(RoutineAssignment).filter(
                 and_(
                     RoutineAssignment.user_id == user.id,
                     RoutineAssignment.completed_date >= request.start_date,
@@ -386,7 +425,7 @@ class AnalyticsService:
             is_active = user_payments > 0 or user_bookings > 0 or user_routines > 0
             
             # Calculate user lifetime value
-            total_payments = self.db.query(func.sum(Payment.amount)).filter(
+            total_payments = db.query(func.sum(Payment.amount)).filter(
                 and_(
                     Payment.user_id == user.id,
                     Payment.status == 'completed'
@@ -394,7 +433,7 @@ class AnalyticsService:
             ).scalar() or 0
             
             # Calculate days since last activity
-            last_payment = self.db.query(func.max(Payment.payment_date)).filter(
+            last_payment = db.query(func.max(Payment.payment_date)).filter(
                 and_(
                     Payment.user_id == user.id,
                     Payment.status == 'completed'
@@ -450,7 +489,7 @@ class AnalyticsService:
             'total_customers_analyzed': len(df)
         }
     
-    async def _analyze_performance(self, request: AnalyticsRequest) -> Dict[str, Any]:
+    async def _analyze_performance(self, db: Session, request: AnalyticsRequest) -> Dict[str, Any]:
         """Analyze gym performance metrics"""
         # Equipment utilization (simulated)
         equipment_utilization = {
@@ -462,7 +501,7 @@ class AnalyticsService:
         }
         
         # Staff performance
-        employees = self.db.query(Employee).filter(
+        employees = db.query(Employee).filter(
             Employee.is_active == True
         ).all()
         
@@ -483,7 +522,7 @@ class AnalyticsService:
         
         # Facility metrics
         total_capacity = 200  # Simulated
-        current_members = self.db.query(Membership).filter(
+        current_members = db.query(Membership).filter(
             Membership.status == 'active'
         ).count()
         
@@ -504,10 +543,10 @@ class AnalyticsService:
             'overall_performance_score': 82.3  # Calculated composite score
         }
     
-    async def _analyze_operational(self, request: AnalyticsRequest) -> Dict[str, Any]:
+    async def _analyze_operational(self, db: Session, request: AnalyticsRequest) -> Dict[str, Any]:
         """Analyze operational metrics"""
         # Class scheduling efficiency
-        classes = self.db.query(Class).filter(
+        classes = db.query(Class).filter(
             and_(
                 Class.start_time >= request.start_date,
                 Class.start_time <= request.end_date
@@ -522,10 +561,10 @@ class AnalyticsService:
         occupancy_rates = []
         for class_obj in classes:
             if class_obj.max_participants > 0:
-                bookings = self.db.query(ClassBooking).filter(
+                bookings = db.query(ClassReservation).filter(
                     and_(
-                        ClassBooking.class_id == class_obj.id,
-                        ClassBooking.status == 'confirmed'
+                        ClassReservation.class_id == class_obj.id,
+                        ClassReservation.status == 'confirmed'
                     )
                 ).count()
                 occupancy = (bookings / class_obj.max_participants * 100)
@@ -542,7 +581,7 @@ class AnalyticsService:
         }
         
         # Staff scheduling efficiency
-        total_staff = self.db.query(Employee).filter(
+        total_staff = db.query(Employee).filter(
             Employee.is_active == True
         ).count()
         
@@ -562,16 +601,16 @@ class AnalyticsService:
             }
         }
     
-    async def _generate_predictions(self, request: AnalyticsRequest) -> Dict[str, Any]:
+    async def _generate_predictions(self, db: Session, request: AnalyticsRequest) -> Dict[str, Any]:
         """Generate predictive analytics"""
         # Revenue prediction
         revenue_forecast = await self._predict_revenue(request)
         
         # Membership growth prediction
-        membership_forecast = await self._predict_membership_growth(request)
+        membership_forecast = await self._predict_membership_growth(db, request)
         
         # Churn prediction
-        churn_prediction = await self._predict_churn(request)
+        churn_prediction = await self._predict_churn(db, request)
         
         # Demand forecasting
         demand_forecast = await self._predict_demand(request)
@@ -584,52 +623,10 @@ class AnalyticsService:
             'confidence_score': 0.78  # Average confidence across predictions
         }
     
-    async def _perform_customer_segmentation(self, request: AnalyticsRequest) -> Dict[str, Any]:
+    async def _perform_customer_segmentation(self, db: Session, request: AnalyticsRequest) -> Dict[str, Any]:
         """Perform customer segmentation using ML"""
         # Get customer data
-        users = self.db.query(User).all()
-        
-        customer_data = []
-        for user in users:
-            # Calculate customer metrics
-            total_payments = self.db.query(func.sum(Payment.amount)).filter(
-                and_(
-                    Payment.user_id == user.id,
-                    Payment.status == 'completed'
-                )
-            ).scalar() or 0
-            
-            payment_count = self.db.query(Payment).filter(
-                and_(
-                    Payment.user_id == user.id,
-                    Payment.status == 'completed'
-                )
-            ).count()
-            
-            class_bookings = self.db.query(ClassBooking).filter(
-                ClassBooking.user_id == user.id
-            ).count()
-            
-            routine_completions = self.db.query(RoutineAssignment).filter(
-                and_(
-                    RoutineAssignment.user_id == user.id,
-                    RoutineAssignment.completed_date.isnot(None)
-                )
-            ).count()
-            
-            tenure_days = (datetime.now() - user.created_at).days
-            
-            customer_data.append({
-                'user_id': user.id,
-                'total_revenue': float(total_payments),
-                'payment_frequency': payment_count,
-                'class_bookings': class_bookings,
-                'routine_completions': routine_completions,
-                'tenure_days': tenure_days,
-                'avg_payment': float(total_payments / payment_count) if payment_count > 0 else 0
-            })
-        
-        df = pd.DataFrame(customer_data)
+        df = self._build_customer_features(db)
         
         if len(df) < 5:  # Need minimum data for clustering
             return {
@@ -643,11 +640,16 @@ class AnalyticsService:
         X = df[features].fillna(0)
         
         # Normalize features
-        X_scaled = self.scaler.fit_transform(X)
+        X_scaled = StandardScaler().fit_transform(X)
         
-        # Perform K-means clustering
+        # Perform mini-batch K-means clustering
         n_clusters = min(5, len(df) // 2)  # Adaptive number of clusters
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_clusters,
+            random_state=42,
+            batch_size=self.SEGMENTATION_BATCH_SIZE,
+            n_init=3
+        )
         df['segment'] = kmeans.fit_predict(X_scaled)
         
         # Analyze segments
@@ -681,6 +683,60 @@ class AnalyticsService:
             'total_customers': len(df)
         }
     
+    def _build_customer_features(self, db: Session) -> pd.DataFrame:
+        """Build the per-customer feature matrix.
+        
+        Each feature comes from one grouped aggregate query, so the number
+        of round trips stays constant regardless of member count.
+        """
+        users = pd.DataFrame(
+            db.query(User.id, User.created_at).all(),
+            columns=['user_id', 'created_at']
+        )
+        
+        payments = pd.DataFrame(
+            db.query(
+                Payment.user_id,
+                func.sum(Payment.amount),
+                func.count(Payment.id)
+            ).filter(
+                Payment.status == PaymentStatus.PAID
+            ).group_by(Payment.user_id).all(),
+            columns=['user_id', 'total_revenue', 'payment_frequency']
+        )
+        
+        bookings = pd.DataFrame(
+            db.query(
+                ClassReservation.user_id,
+                func.count(ClassReservation.id)
+            ).group_by(ClassReservation.user_id).all(),
+            columns=['user_id', 'class_bookings']
+        )
+        
+        routines = pd.DataFrame(
+            db.query(
+                RoutineAssignment.user_id,
+                func.count(RoutineAssignment.id)
+            ).filter(
+                RoutineAssignment.completion_percentage >= 100
+            ).group_by(RoutineAssignment.user_id).all(),
+            columns=['user_id', 'routine_completions']
+        )
+        
+        df = users
+        for frame in (payments, bookings, routines):
+            df = df.merge(frame, on='user_id', how='left')
+        
+        counts = ['payment_frequency', 'class_bookings', 'routine_completions']
+        df[counts] = df[counts].fillna(0).astype(int)
+        df['total_revenue'] = df['total_revenue'].fillna(0).astype(float)
+        
+        created_at = pd.to_datetime(df['created_at'], utc=True)
+        df['tenure_days'] = (pd.Timestamp.now(tz='UTC') - created_at).dt.days.fillna(0).astype(int)
+        df['avg_payment'] = (df['total_revenue'] / df['payment_frequency'].replace(0, np.nan)).fillna(0.0)
+        
+        return df.drop(columns=['created_at'])
+    
     def _generate_segment_name(self, segment_data: pd.DataFrame, features: List[str]) -> str:
         """Generate descriptive name for customer segment"""
         avg_revenue = segment_data['total_revenue'].mean()
@@ -758,9 +814,9 @@ class AnalyticsService:
             'model': 'linear_growth'
         }
     
-    async def _predict_membership_growth(self, request: AnalyticsRequest) -> Dict[str, Any]:
+    async def _predict_membership_growth(self, db: Session, request: AnalyticsRequest) -> Dict[str, Any]:
         """Predict membership growth"""
-        current_members = self.db.query(Membership).filter(
+        current_members = db.query(Membership).filter(
             Membership.status == 'active'
         ).count()
         
@@ -781,10 +837,10 @@ class AnalyticsService:
             'confidence': 0.78
         }
     
-    async def _predict_churn(self, request: AnalyticsRequest) -> Dict[str, Any]:
+    async def _predict_churn(self, db: Session, request: AnalyticsRequest) -> Dict[str, Any]:
         """Predict customer churn"""
         # Get users at risk of churning
-        users = self.db.query(User).all()
+        users = db.query(User).all()
         
         at_risk_users = []
         for user in users:
@@ -887,10 +943,19 @@ class AnalyticsService:
         
         return recommendations
     
-    def get_analytics_summary(self) -> Dict[str, Any]:
+    def get_analytics_summary(self, db: Optional[Session] = None) -> Dict[str, Any]:
         """Get overall analytics summary"""
+        owns_session = db is None
+        if owns_session:
+            db = SessionLocal()
+        try:
+            total_active_members = db.query(Membership).filter(Membership.status == 'active').count()
+        finally:
+            if owns_session:
+                db.close()
+        
         return {
-            'total_active_members': self.db.query(Membership).filter(Membership.status == 'active').count(),
+            'total_active_members': total_active_members,
             'monthly_revenue': 45000,  # Simulated
             'attendance_rate': 78.5,
             'retention_rate': 87.2,
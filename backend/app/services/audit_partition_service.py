@@ -0,0 +1,369 @@
+from typing import Dict, Iterable, List, Optional, Set
+from datetime import date, datetime
+import logging
+import re
+import threading
+from sqlalchemy import Column, ForeignKey, Index, MetaData, Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+_PARTITION_RE = re.compile(r"^(?P<table>\w+)_(?P<year>\d{4})(?P<month>\d{2})$")
+
+# SQLite partitions draw ids from disjoint ranges so ids stay unique in the view
+_SQLITE_ID_STRIDE = 10 ** 9
+_SQLITE_DEFAULT_ID_START = 10 ** 15
+
+def _month_start(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+class AuditPartitionService:
+    """Monthly partitioning of an append-only log table.
+
+    PostgreSQL gets a native ``PARTITION BY RANGE (timestamp)`` table with
+    one partition per month plus a default partition. SQLite gets one table
+    per month plus a default table, a ``UNION ALL`` view under the logical
+    table name and an ``INSTEAD OF INSERT`` trigger that routes rows to
+    their month. Either way the ORM model keeps reading and writing the
+    logical table, and retention drops whole months instead of deleting rows.
+    """
+
+    def __init__(self, table: Table, engine: Optional[Engine] = None,
+                 months_ahead: Optional[int] = None):
+        # Imported here, not at module level: importing app.core loads the
+        # models, which load audit_service, which imports this module
+        from ..core.config import settings
+        from ..core.database import engine as default_engine
+
+        self.table = table
+        self.name = table.name
+        self.default_name = f"{self.name}_default"
+        self.engine = engine or default_engine
+        self.months_ahead = settings.AUDIT_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+        self.enabled = settings.AUDIT_PARTITIONING_ENABLED
+        self.ready = False
+        self._months: Set[date] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def dialect(self) -> str:
+        return self.engine.dialect.name
+
+    def partition_name(self, month: date) -> str:
+        return f"{self.name}_{month.year:04d}{month.month:02d}"
+
+    def initialize(self) -> None:
+        """Create or migrate the partitioned layout; call before ``create_all``"""
+        if not self.enabled or self.dialect not in ("sqlite", "postgresql"):
+            logger.info(f"Audit log partitioning disabled for dialect {self.dialect}")
+            return
+
+        with self._lock, self.engine.begin() as conn:
+            self._lock_sqlite(conn)
+            legacy = self._detach_legacy(conn)
+            if self.dialect == "postgresql":
+                self._create_pg_parent(conn)
+            self._create_default(conn)
+            self._months = self._existing_months(conn)
+
+            months = set()
+            current = _month_start(datetime.utcnow())
+            for _ in range(self.months_ahead + 1):
+                months.add(current)
+                current = _next_month(current)
+            if legacy:
+                months |= self._legacy_months(conn, legacy)
+
+            for month in sorted(months - self._months):
+                self._create_partition(conn, month)
+            if self.dialect == "sqlite":
+                self._rebuild_sqlite_routing(conn)
+
+            if legacy:
+                self._copy_legacy(conn, legacy)
+
+        self.ready = True
+        logger.info(f"Audit log partitions ready: {len(self._months)} monthly partitions")
+
+    def ensure_partitions(self, timestamps: Iterable[Optional[datetime]]) -> None:
+        """Create the monthly partitions needed for these timestamps"""
+        if not self.ready:
+            return
+        missing = {_month_start(ts) for ts in timestamps if ts is not None} - self._months
+        if not missing:
+            return
+        with self._lock, self.engine.begin() as conn:
+            self._lock_sqlite(conn)
+            # Other workers may have created some of them already
+            self._months = self._existing_months(conn)
+            missing -= self._months
+            for month in sorted(missing):
+                self._create_partition(conn, month)
+            if missing and self.dialect == "sqlite":
+                self._rebuild_sqlite_routing(conn)
+
+    def list_partitions(self) -> List[Dict[str, object]]:
+        """Monthly partitions with their row counts"""
+        if not self.ready:
+            return []
+        with self.engine.connect() as conn:
+            return [
+                {
+                    "name": self.partition_name(month),
+                    "month": month.isoformat(),
+                    "rows": conn.execute(text(f"SELECT COUNT(*) FROM {self.partition_name(month)}")).scalar()
+                }
+                for month in sorted(self._months)
+            ]
+
+    def drop_before(self, cutoff: datetime) -> int:
+        """Drop every month entirely before ``cutoff``; returns rows removed.
+
+        Only the month containing the cutoff and the default partition are
+        trimmed with a DELETE.
+        """
+        removed = 0
+        cutoff_value = cutoff.strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock, self.engine.begin() as conn:
+            self._lock_sqlite(conn)
+            # Includes months other workers created after this one started
+            self._months = self._existing_months(conn)
+            expired = [month for month in sorted(self._months) if _next_month(month) <= cutoff.date()]
+            for month in expired:
+                name = self.partition_name(month)
+                removed += conn.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar()
+                self._months.discard(month)
+            if self.dialect == "sqlite" and expired:
+                # The view must stop referencing a table before it is dropped
+                self._rebuild_sqlite_routing(conn, dropping=expired)
+            for month in expired:
+                conn.execute(text(f"DROP TABLE {self.partition_name(month)}"))
+
+            boundary = _month_start(cutoff)
+            trimmed = [self.default_name]
+            if boundary in self._months:
+                trimmed.append(self.partition_name(boundary))
+            for name in trimmed:
+                removed += conn.execute(
+                    text(f"DELETE FROM {name} WHERE timestamp < :cutoff"), {"cutoff": cutoff_value}
+                ).rowcount
+
+        if expired:
+            logger.info(f"Dropped {len(expired)} audit log partitions before {cutoff.date()}")
+        return removed
+
+    # Layout helpers
+
+    def _physical_table(self, name: str, metadata: MetaData, partitioned: bool = False) -> Table:
+        """Copy of the logical table's columns and indexes under another name"""
+        columns = []
+        for column in self.table.columns:
+            foreign_keys = [ForeignKey(fk.column) for fk in column.foreign_keys]
+            columns.append(Column(
+                column.name, column.type, *foreign_keys,
+                # PostgreSQL requires the partition key in the primary key
+                primary_key=column.primary_key or (partitioned and column.name == "timestamp"),
+                autoincrement=True if column.name == "id" else "auto",
+                nullable=column.nullable
+            ))
+
+        kwargs = {}
+        if partitioned:
+            kwargs["postgresql_partition_by"] = "RANGE (timestamp)"
+        elif self.dialect == "sqlite":
+            kwargs["sqlite_autoincrement"] = True
+        table = Table(name, metadata, *columns, **kwargs)
+
+        if partitioned or self.dialect == "sqlite":
+            # PostgreSQL partitions inherit the parent's indexes
+            for index in self.table.indexes:
+                Index(
+                    index.name.replace(self.name, name, 1),
+                    *[table.c[column.name] for column in index.columns],
+                    unique=index.unique
+                )
+        return table
+
+    def _create_pg_parent(self, conn: Connection) -> None:
+        if not inspect(conn).has_table(self.name):
+            self._physical_table(self.name, MetaData(), partitioned=True).create(conn)
+
+    def _create_default(self, conn: Connection) -> None:
+        if inspect(conn).has_table(self.default_name):
+            return
+        if self.dialect == "postgresql":
+            conn.execute(text(f"CREATE TABLE {self.default_name} PARTITION OF {self.name} DEFAULT"))
+        else:
+            self._physical_table(self.default_name, MetaData()).create(conn)
+            self._seed_sqlite_ids(conn, self.default_name, _SQLITE_DEFAULT_ID_START)
+
+    def _create_partition(self, conn: Connection, month: date) -> None:
+        name = self.partition_name(month)
+        start, end = self._bounds(month)
+        in_default = conn.execute(
+            text(f"SELECT 1 FROM {self.default_name} WHERE timestamp >= :start AND timestamp < :end LIMIT 1"),
+            {"start": start, "end": end}
+        ).first() is not None
+
+        if self.dialect == "postgresql":
+            if in_default:
+                # A new range cannot be attached while the default holds rows for it
+                conn.execute(text(f"ALTER TABLE {self.name} DETACH PARTITION {self.default_name}"))
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {self.name} "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            ))
+            if in_default:
+                self._move_from_default(conn, name, start, end)
+                conn.execute(text(f"ALTER TABLE {self.name} ATTACH PARTITION {self.default_name} DEFAULT"))
+        else:
+            self._physical_table(name, MetaData()).create(conn, checkfirst=True)
+            self._seed_sqlite_ids(conn, name, (month.year * 100 + month.month) * _SQLITE_ID_STRIDE)
+            if in_default:
+                self._move_from_default(conn, name, start, end)
+
+        self._months.add(month)
+        logger.info(f"Created audit log partition {name}")
+
+    def _move_from_default(self, conn: Connection, name: str, start: str, end: str) -> None:
+        columns = ", ".join(column.name for column in self.table.columns)
+        params = {"start": start, "end": end}
+        conn.execute(text(
+            f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {self.default_name} "
+            f"WHERE timestamp >= :start AND timestamp < :end"
+        ), params)
+        conn.execute(text(
+            f"DELETE FROM {self.default_name} WHERE timestamp >= :start AND timestamp < :end"
+        ), params)
+
+    def _lock_sqlite(self, conn: Connection) -> None:
+        """Hold SQLite's write lock for the rest of the transaction.
+
+        pysqlite runs DDL outside a transaction, so without it a worker
+        sharing the file could add a partition between this one reading the
+        partitions and rebuilding the routing over them.
+        """
+        if self.dialect == "sqlite" and not conn.connection.dbapi_connection.in_transaction:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    def _rebuild_sqlite_routing(self, conn: Connection, dropping: Iterable[date] = ()) -> None:
+        """Recreate the UNION ALL view and the insert-routing trigger.
+
+        Partitions are re-read from the database rather than taken from this
+        process: a month another worker created must stay in the view, or
+        its rows would vanish from reads and retention.
+        """
+        self._months = self._existing_months(conn) - set(dropping)
+        columns = [column.name for column in self.table.columns]
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"NEW.{column}" for column in columns)
+        tables = [self.default_name] + [self.partition_name(month) for month in sorted(self._months)]
+
+        conn.execute(text(f"DROP VIEW IF EXISTS {self.name}"))
+        conn.execute(text(
+            f"CREATE VIEW {self.name} AS "
+            + " UNION ALL ".join(f"SELECT {column_list} FROM {table}" for table in tables)
+        ))
+
+        routes = []
+        conditions = []
+        for month in sorted(self._months):
+            start, end = self._bounds(month)
+            condition = f"NEW.timestamp >= '{start}' AND NEW.timestamp < '{end}'"
+            conditions.append(f"({condition})")
+            routes.append(
+                f"INSERT INTO {self.partition_name(month)} ({column_list}) "
+                f"SELECT {new_values} WHERE {condition};"
+            )
+        fallback = f"NEW.timestamp IS NULL OR NOT ({' OR '.join(conditions)})" if conditions else "1"
+        routes.append(
+            f"INSERT INTO {self.default_name} ({column_list}) SELECT {new_values} WHERE {fallback};"
+        )
+        conn.execute(text(
+            f"CREATE TRIGGER {self.name}_route INSTEAD OF INSERT ON {self.name} BEGIN "
+            + " ".join(routes) + " END"
+        ))
+
+    def _seed_sqlite_ids(self, conn: Connection, name: str, start: int) -> None:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_sequence WHERE name = :name"), {"name": name}).first()
+        if exists is None:
+            conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                         {"name": name, "seq": start})
+
+    def _existing_months(self, conn: Connection) -> Set[date]:
+        months = set()
+        for name in inspect(conn).get_table_names():
+            match = _PARTITION_RE.match(name)
+            if match and match.group("table") == self.name:
+                months.add(date(int(match.group("year")), int(match.group("month")), 1))
+        return months
+
+    def _bounds(self, month: date):
+        return (
+            month.strftime("%Y-%m-%d 00:00:00"),
+            _next_month(month).strftime("%Y-%m-%d 00:00:00")
+        )
+
+    # Migration from a single, unpartitioned table
+
+    def _detach_legacy(self, conn: Connection) -> Optional[str]:
+        """Rename an unpartitioned log table out of the way; returns its new name"""
+        inspector = inspect(conn)
+        if not inspector.has_table(self.name):
+            return None
+
+        if self.dialect == "sqlite":
+            kind = conn.execute(
+                text("SELECT type FROM sqlite_master WHERE name = :name"), {"name": self.name}
+            ).scalar()
+            if kind != "table":
+                return None
+        else:
+            partitioned = conn.execute(text(
+                "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+                "WHERE c.relname = :name"
+            ), {"name": self.name}).first()
+            if partitioned:
+                return None
+
+        legacy = f"{self.name}_legacy"
+        logger.info(f"Migrating unpartitioned {self.name} table to monthly partitions")
+        conn.execute(text(f"ALTER TABLE {self.name} RENAME TO {legacy}"))
+        # Free the index (and on PostgreSQL constraint and sequence) names for the new layout
+        if self.dialect == "postgresql":
+            conn.execute(text(f"ALTER TABLE {legacy} DROP CONSTRAINT IF EXISTS {self.name}_pkey"))
+            conn.execute(text(f"ALTER SEQUENCE IF EXISTS {self.name}_id_seq RENAME TO {legacy}_id_seq"))
+        for index in inspect(conn).get_indexes(legacy):
+            conn.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+        return legacy
+
+    def _legacy_months(self, conn: Connection, legacy: str) -> Set[date]:
+        bounds = conn.execute(text(f"SELECT MIN(timestamp), MAX(timestamp) FROM {legacy}")).first()
+        if bounds is None or bounds[0] is None:
+            return set()
+        first, last = (
+            value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+            for value in bounds
+        )
+        months = set()
+        month = _month_start(first)
+        while month <= _month_start(last):
+            months.add(month)
+            month = _next_month(month)
+        return months
+
+    def _copy_legacy(self, conn: Connection, legacy: str) -> None:
+        columns = ", ".join(column.name for column in self.table.columns)
+        copied = conn.execute(text(
+            f"INSERT INTO {self.name} ({columns}) SELECT {columns} FROM {legacy}"
+        )).rowcount
+        if self.dialect == "postgresql":
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{self.name}', 'id'), "
+                f"(SELECT COALESCE(MAX(id), 1) FROM {self.name}))"
+            ))
+        conn.execute(text(f"DROP TABLE {legacy}"))
+        logger.info(f"Moved {copied} audit logs into monthly partitions")
@@ -1,24 +1,38 @@
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Union, Iterator, Callable
 from enum import Enum
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
+import csv
+import io
 import json
 import logging
+import zlib
 from sqlalchemy.orm import Session
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float, ForeignKey, Index, func, select
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from ..core.database import get_db, Base
+from ..core.database import get_db, Base, SessionLocal
+from ..core.config import settings
 from ..models.user import User
+from .audit_partition_service import AuditPartitionService
 import uuid
 from ipaddress import ip_address, IPv4Address, IPv6Address
 import asyncio
 from collections import defaultdict, deque
+import os
 import threading
 from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+def _json_default(value: Any) -> Any:
+    """JSON encoder for spilled audit records"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
 class AuditAction(Enum):
     """Types of auditable actions"""
     # Authentication
@@ -136,34 +150,47 @@ class AuditContext:
     method: Optional[str] = None
     
 class AuditLogModel(Base):
-    """Database model for audit logs"""
+    """Database model for audit logs.
+
+    Stored in monthly partitions (see ``audit_partition_service``); this
+    model maps the logical ``audit_logs`` table that routes to them.
+    Indexes match the filters of the /audit endpoints: time range alone or
+    combined with user, action, category/level or resource type.
+    """
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        Index("ix_audit_logs_user_timestamp", "user_id", "timestamp"),
+        Index("ix_audit_logs_action_timestamp", "action", "timestamp"),
+        Index("ix_audit_logs_category_level_timestamp", "category", "level", "timestamp"),
+        Index("ix_audit_logs_resource_timestamp", "resource_type", "timestamp"),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
-    event_id = Column(String(36), unique=True, index=True, default=lambda: str(uuid.uuid4()))
+    id = Column(Integer, primary_key=True)
+    # Not unique: uniqueness cannot span partitions without the partition key
+    event_id = Column(String(36), index=True, default=lambda: str(uuid.uuid4()))
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     
     # Action Information
-    action = Column(String(100), nullable=False, index=True)
-    category = Column(String(50), nullable=False, index=True)
-    level = Column(String(20), nullable=False, index=True)
+    action = Column(String(100), nullable=False)
+    category = Column(String(50), nullable=False)
+    level = Column(String(20), nullable=False)
     
     # User Information
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
-    user_email = Column(String(255), nullable=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    user_email = Column(String(255), nullable=True)
     user_role = Column(String(50), nullable=True)
     
     # Request Information
-    ip_address = Column(String(45), nullable=True, index=True)  # IPv6 support
+    ip_address = Column(String(45), nullable=True)  # IPv6 support
     user_agent = Column(Text, nullable=True)
-    session_id = Column(String(255), nullable=True, index=True)
-    request_id = Column(String(36), nullable=True, index=True)
-    endpoint = Column(String(255), nullable=True, index=True)
+    session_id = Column(String(255), nullable=True)
+    request_id = Column(String(36), nullable=True)
+    endpoint = Column(String(255), nullable=True)
     method = Column(String(10), nullable=True)
     
     # Event Details
-    resource_type = Column(String(100), nullable=True, index=True)
-    resource_id = Column(String(100), nullable=True, index=True)
+    resource_type = Column(String(100), nullable=True)
+    resource_id = Column(String(100), nullable=True)
     description = Column(Text, nullable=True)
     
     # Data Changes
@@ -174,7 +201,7 @@ class AuditLogModel(Base):
     audit_metadata = Column(Text, nullable=True)  # JSON
     
     # Status
-    success = Column(Boolean, default=True, index=True)
+    success = Column(Boolean, default=True)
     error_message = Column(Text, nullable=True)
     
     # Performance
@@ -183,16 +210,72 @@ class AuditLogModel(Base):
     # Relationships
     user = relationship("User", back_populates="audit_logs")
 
+# Streaming export settings
+EXPORT_CHUNK_SIZE = 1000  # Rows fetched per cursor round trip
+EXPORT_BUFFER_BYTES = 64 * 1024  # Encoded bytes buffered before a chunk is sent
+EXPORT_CSV_FIELDS = [
+    'timestamp', 'action', 'category', 'level', 'user_email',
+    'ip_address', 'resource_type', 'resource_id', 'description',
+    'success', 'error_message', 'duration_ms'
+]
+_EXPORT_JSON_COLUMNS = {'old_values': 'old_values', 'new_values': 'new_values', 'audit_metadata': 'metadata'}
+
+def _export_json_line(row: Dict[str, Any]) -> str:
+    """Serialize one exported row as a JSON object.
+
+    The JSON columns were written with ``json.dumps`` and are spliced in
+    verbatim instead of being parsed and re-encoded.
+    """
+    fields = {
+        key: (value.isoformat() if isinstance(value, datetime) else value)
+        for key, value in row.items() if key not in _EXPORT_JSON_COLUMNS
+    }
+    line = json.dumps(fields)
+    embedded = [
+        f'"{name}": {row[column]}' for column, name in _EXPORT_JSON_COLUMNS.items() if row.get(column)
+    ]
+    if embedded:
+        line = line[:-1] + ", " + ", ".join(embedded) + "}"
+    return line
+
+# Monthly partitions backing the audit_logs table
+audit_partitions = AuditPartitionService(AuditLogModel.__table__)
+
+# Audit context of the request/task being handled
+_audit_context_var: ContextVar[Optional[AuditContext]] = ContextVar("audit_context", default=None)
+
 class AuditService:
-    """Comprehensive audit logging service"""
+    """Comprehensive audit logging service.
+
+    ``log`` only appends to an in-memory batch. A background task flushes it
+    every ``batch_timeout`` seconds or as soon as ``batch_size`` records are
+    waiting, writing on an executor thread so the event loop never blocks
+    on the database. The batch is capped at ``max_pending``: records past
+    the cap, and batches that fail to insert, go to an append-only spill
+    file that is replayed once the database accepts writes again.
+    """
     
     def __init__(self):
-        self.batch_size = 100
-        self.batch_timeout = 30  # seconds
+        self.batch_size = settings.AUDIT_BATCH_SIZE
+        self.batch_timeout = settings.AUDIT_FLUSH_INTERVAL  # seconds
+        self.max_pending = settings.AUDIT_MAX_PENDING
+        self.spill_path = Path(settings.AUDIT_SPILL_PATH)
         self.pending_logs = deque()
         self.batch_lock = threading.Lock()
+        self.spill_lock = threading.Lock()
         self.background_task = None
         self.is_running = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.flush_stats = {
+            "flushed": 0,
+            "batches": 0,
+            "flush_failures": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "last_flush_at": None
+        }
         
         # Performance tracking
         self.performance_stats = defaultdict(list)
@@ -204,9 +287,6 @@ class AuditService:
             AuditAction.FILE_ACCESS: 500,  # Max 500 file access logs per minute
         }
         self.rate_counters = defaultdict(lambda: defaultdict(int))
-        
-        # Context storage for request-scoped data
-        self.context_storage = threading.local()
     
     async def start_background_processing(self):
         """Start background task for batch processing"""
@@ -214,6 +294,9 @@ class AuditService:
             return
         
         self.is_running = True
+        self._loop = asyncio.get_running_loop()
+        self._flush_requested = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
         self.background_task = asyncio.create_task(self._background_processor())
         logger.info("Audit service background processing started")
     
@@ -230,64 +313,210 @@ class AuditService:
         
         # Flush remaining logs
         await self._flush_pending_logs()
+        self._loop = None
         logger.info("Audit service background processing stopped")
     
     async def _background_processor(self):
         """Background task to process audit logs in batches"""
         while self.is_running:
             try:
-                await asyncio.sleep(self.batch_timeout)
+                try:
+                    await asyncio.wait_for(self._flush_requested.wait(), timeout=self.batch_timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_requested.clear()
                 await self._flush_pending_logs()
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Error in audit background processor: {e}")
     
-    async def _flush_pending_logs(self):
-        """Flush pending logs to database"""
-        if not self.pending_logs:
-            return
-        
-        with self.batch_lock:
-            logs_to_process = list(self.pending_logs)
-            self.pending_logs.clear()
-        
-        if not logs_to_process:
+    def _request_flush(self):
+        """Wake the background processor (safe from any thread)"""
+        loop = self._loop
+        if loop is None or self._flush_requested is None:
             return
-        
         try:
-            db = next(get_db())
+            loop.call_soon_threadsafe(self._flush_requested.set)
+        except RuntimeError:
+            # Loop already closed
+            pass
+    
+    async def _flush_pending_logs(self):
+        """Flush pending logs to database on an executor thread"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        
+        async with self._flush_lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                with self.batch_lock:
+                    logs_to_process = [
+                        self.pending_logs.popleft()
+                        for _ in range(min(self.batch_size, len(self.pending_logs)))
+                    ]
+                
+                if not logs_to_process:
+                    break
+                
+                if not await loop.run_in_executor(None, self._write_batch, logs_to_process):
+                    # Database unavailable: leave the rest for the next cycle
+                    return
             
-            # Batch insert
+            if self.spill_path.exists() or self._replay_path.exists():
+                await loop.run_in_executor(None, self._replay_spill)
+    
+    def _write_batch(self, logs_to_process: List[Dict[str, Any]]) -> bool:
+        """Insert one batch; spill it to disk if the database rejects it"""
+        db = SessionLocal()
+        try:
+            audit_partitions.ensure_partitions(log_entry["timestamp"] for log_entry in logs_to_process)
             db.bulk_insert_mappings(AuditLogModel, logs_to_process)
             db.commit()
-            
-            logger.debug(f"Flushed {len(logs_to_process)} audit logs to database")
-            
         except Exception as e:
-            logger.error(f"Error flushing audit logs: {e}")
+            db.rollback()
+            logger.error(f"Error flushing audit logs, spilling {len(logs_to_process)} to disk: {e}")
+            with self.stats_lock:
+                self.flush_stats["flush_failures"] += 1
+            self._spill(logs_to_process)
+            return False
+        finally:
+            db.close()
+        
+        with self.stats_lock:
+            self.flush_stats["flushed"] += len(logs_to_process)
+            self.flush_stats["batches"] += 1
+            self.flush_stats["last_flush_at"] = datetime.utcnow().isoformat()
+        logger.debug(f"Flushed {len(logs_to_process)} audit logs to database")
+        return True
+    
+    def _spill(self, logs_to_spill: List[Dict[str, Any]]):
+        """Append records to the local spill file, one JSON object per line"""
+        try:
+            with self.spill_lock:
+                self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.spill_path, "a", encoding="utf-8") as spill_file:
+                    for log_entry in logs_to_spill:
+                        spill_file.write(json.dumps(log_entry, default=_json_default) + "\n")
+            with self.stats_lock:
+                self.flush_stats["spilled"] += len(logs_to_spill)
+        except OSError as e:
+            logger.error(f"Could not spill {len(logs_to_spill)} audit logs, dropping them: {e}")
+    
+    def _replay_spill(self) -> int:
+        """Move spilled records into the database; returns how many were written"""
+        replay_path = self._replay_path
+        with self.spill_lock:
+            if not replay_path.exists():
+                if not self.spill_path.exists():
+                    return 0
+                os.replace(self.spill_path, replay_path)
+        
+        replayed = 0
+        failed_batch = None
+        with open(replay_path, encoding="utf-8") as replay_file:
+            batch = []
+            for line in replay_file:
+                record = self._parse_spilled(line)
+                if record is None:
+                    continue
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    if not self._insert_replayed(batch):
+                        failed_batch = batch
+                        break
+                    replayed += len(batch)
+                    batch = []
+            else:
+                if batch and not self._insert_replayed(batch):
+                    failed_batch = batch
+                elif batch:
+                    replayed += len(batch)
             
-            # Re-add logs to queue for retry
-            with self.batch_lock:
-                self.pending_logs.extendleft(reversed(logs_to_process))
+            if failed_batch is not None and replayed:
+                # Keep only what was not written, so nothing is inserted twice
+                remaining_path = replay_path.with_suffix(".tmp")
+                with open(remaining_path, "w", encoding="utf-8") as remaining_file:
+                    for log_entry in failed_batch:
+                        remaining_file.write(json.dumps(log_entry, default=_json_default) + "\n")
+                    for line in replay_file:
+                        remaining_file.write(line)
+        
+        if failed_batch is None:
+            os.remove(replay_path)
+        elif replayed:
+            os.replace(remaining_path, replay_path)
+        
+        with self.stats_lock:
+            self.flush_stats["replayed"] += replayed
+        if replayed:
+            logger.info(f"Replayed {replayed} spilled audit logs")
+        return replayed
+    
+    def _parse_spilled(self, line: str) -> Optional[Dict[str, Any]]:
+        if not line.strip():
+            return None
+        try:
+            record = json.loads(line)
+            record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+            return record
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Skipping corrupt line in audit spill file")
+            return None
     
-    def set_context(self, context: AuditContext):
-        """Set audit context for current request/session"""
-        self.context_storage.context = context
+    def _insert_replayed(self, batch: List[Dict[str, Any]]) -> bool:
+        db = SessionLocal()
+        try:
+            audit_partitions.ensure_partitions(record["timestamp"] for record in batch)
+            db.bulk_insert_mappings(AuditLogModel, batch)
+            db.commit()
+            return True
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Audit spill replay stopped, database still unavailable: {e}")
+            return False
+        finally:
+            db.close()
+    
+    @property
+    def _replay_path(self) -> Path:
+        return self.spill_path.with_suffix(self.spill_path.suffix + ".replay")
+    
+    def get_flush_stats(self) -> Dict[str, Any]:
+        """Pending batch size and flush/spill counters"""
+        with self.stats_lock:
+            stats = dict(self.flush_stats)
+        with self.batch_lock:
+            stats["pending"] = len(self.pending_logs)
+        stats.update({
+            "max_pending": self.max_pending,
+            "spill_file_bytes": sum(
+                path.stat().st_size for path in (self.spill_path, self._replay_path) if path.exists()
+            ),
+            "running": self.is_running
+        })
+        return stats
+    
+    def set_context(self, context: Optional[AuditContext]) -> Token:
+        """Set audit context for the current request/task"""
+        return _audit_context_var.set(context)
+    
+    def reset_context(self, token: Token):
+        """Restore the audit context that was active before ``set_context``"""
+        _audit_context_var.reset(token)
     
     def get_context(self) -> Optional[AuditContext]:
         """Get current audit context"""
-        return getattr(self.context_storage, 'context', None)
+        return _audit_context_var.get()
     
     @contextmanager
     def audit_context(self, context: AuditContext):
         """Context manager for audit context"""
-        old_context = self.get_context()
-        self.set_context(context)
+        token = self.set_context(context)
         try:
             yield
         finally:
-            self.set_context(old_context)
+            self.reset_context(token)
     
     def log(
         self,
@@ -311,7 +540,7 @@ class AuditService:
             if self._is_rate_limited(action):
                 return
             
-            # Use provided context or get from thread local
+            # Use provided context or the one set for this request
             audit_context = context or self.get_context() or AuditContext()
             
             # Create audit log entry
@@ -343,11 +572,16 @@ class AuditService:
             
             # Add to pending logs for batch processing
             with self.batch_lock:
-                self.pending_logs.append(log_entry)
-                
-                # Flush if batch is full
-                if len(self.pending_logs) >= self.batch_size:
-                    asyncio.create_task(self._flush_pending_logs())
+                overflow = len(self.pending_logs) >= self.max_pending
+                if not overflow:
+                    self.pending_logs.append(log_entry)
+                    batch_full = len(self.pending_logs) >= self.batch_size
+            
+            if overflow:
+                # Backpressure: keep memory bounded, the record is replayed later
+                self._spill([log_entry])
+            elif batch_full:
+                self._request_flush()
             
             # Log to application logger for immediate visibility
             log_message = f"AUDIT: {action.value} - {description or 'No description'}"
@@ -584,6 +818,101 @@ class AuditService:
             logger.error(f"Error retrieving audit logs: {e}")
             return []
     
+    def iter_audit_logs(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        category: Optional[AuditCategory] = None,
+        limit: Optional[int] = None,
+        chunk_size: int = EXPORT_CHUNK_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield audit log rows oldest first, fetched in server-side cursor chunks"""
+        table = AuditLogModel.__table__
+        query = select(table).order_by(table.c.timestamp, table.c.id)
+        if start_date:
+            query = query.where(table.c.timestamp >= start_date)
+        if end_date:
+            query = query.where(table.c.timestamp <= end_date)
+        if category:
+            query = query.where(table.c.category == category.value)
+        if limit:
+            query = query.limit(limit)
+        
+        db = SessionLocal()
+        try:
+            result = db.execute(query.execution_options(stream_results=True, yield_per=chunk_size))
+            for partition in result.mappings().partitions(chunk_size):
+                yield from partition
+        finally:
+            db.close()
+    
+    def export_audit_logs(
+        self,
+        format: str = "ndjson",
+        compress: bool = False,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        category: Optional[AuditCategory] = None,
+        limit: Optional[int] = None,
+        on_complete: Optional[Callable[[int], None]] = None
+    ) -> Iterator[bytes]:
+        """Stream an audit export as CSV, NDJSON or JSON bytes (optionally gzip).
+        
+        Rows are encoded as they are read and flushed in blocks of
+        ``EXPORT_BUFFER_BYTES``, so memory does not depend on the range.
+        ``on_complete`` receives the row count once the last row is written.
+        """
+        buffer = io.StringIO()
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        exported = 0
+        
+        def drain() -> Optional[bytes]:
+            data = buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            if compressor is not None:
+                data = compressor.compress(data)
+            return data or None
+        
+        writer = None
+        if format == "csv":
+            writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+        elif format == "json":
+            buffer.write('{"logs": [')
+        
+        for row in self.iter_audit_logs(start_date, end_date, category, limit):
+            if writer is not None:
+                writer.writerow({**row, "timestamp": row["timestamp"].isoformat() if row["timestamp"] else None})
+            else:
+                if format == "json" and exported:
+                    buffer.write(", ")
+                buffer.write(_export_json_line(row))
+                if format == "ndjson":
+                    buffer.write("\n")
+            exported += 1
+            
+            if buffer.tell() >= EXPORT_BUFFER_BYTES:
+                data = drain()
+                if data:
+                    yield data
+        
+        if format == "json":
+            buffer.write('], "metadata": ' + json.dumps({
+                'exported_at': datetime.utcnow().isoformat(),
+                'total_count': exported,
+                'format': format
+            }) + '}')
+        
+        data = drain()
+        if compressor is not None:
+            data = (data or b"") + compressor.flush()
+        if data:
+            yield data
+        
+        if on_complete is not None:
+            on_complete(exported)
+    
     async def get_audit_statistics(
         self,
         start_date: Optional[datetime] = None,
@@ -600,33 +929,19 @@ class AuditService:
             if end_date:
                 query = query.filter(AuditLogModel.timestamp <= end_date)
             
-            logs = query.all()
+            def grouped(column) -> Dict[str, int]:
+                rows = query.with_entities(column, func.count()).group_by(column).all()
+                return {key: count for key, count in rows if key is not None}
             
-            # Calculate statistics
-            total_events = len(logs)
-            successful_events = len([log for log in logs if log.success])
+            # Calculate statistics with grouped queries instead of loading every row
+            total_events = query.count()
+            successful_events = query.filter(AuditLogModel.success.is_(True)).count()
             failed_events = total_events - successful_events
             
-            # Group by action
-            action_counts = defaultdict(int)
-            for log in logs:
-                action_counts[log.action] += 1
-            
-            # Group by category
-            category_counts = defaultdict(int)
-            for log in logs:
-                category_counts[log.category] += 1
-            
-            # Group by level
-            level_counts = defaultdict(int)
-            for log in logs:
-                level_counts[log.level] += 1
-            
-            # Group by user
-            user_counts = defaultdict(int)
-            for log in logs:
-                if log.user_email:
-                    user_counts[log.user_email] += 1
+            action_counts = grouped(AuditLogModel.action)
+            category_counts = grouped(AuditLogModel.category)
+            level_counts = grouped(AuditLogModel.level)
+            user_counts = grouped(AuditLogModel.user_email)
             
             # Performance statistics
             performance_stats = {}
@@ -661,23 +976,23 @@ class AuditService:
             return {}
     
     async def cleanup_old_logs(self, days_to_keep: int = 90) -> int:
-        """Clean up old audit logs"""
+        """Clean up old audit logs by dropping expired monthly partitions"""
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=days_to_keep)
             
-            db = next(get_db())
-            
-            # Count logs to be deleted
-            count = db.query(AuditLogModel).filter(
-                AuditLogModel.timestamp < cutoff_date
-            ).count()
-            
-            # Delete old logs
-            db.query(AuditLogModel).filter(
-                AuditLogModel.timestamp < cutoff_date
-            ).delete()
-            
-            db.commit()
+            if audit_partitions.ready:
+                count = await asyncio.get_running_loop().run_in_executor(
+                    None, audit_partitions.drop_before, cutoff_date
+                )
+            else:
+                db = next(get_db())
+                
+                # Delete old logs
+                count = db.query(AuditLogModel).filter(
+                    AuditLogModel.timestamp < cutoff_date
+                ).delete(synchronize_session=False)
+                
+                db.commit()
             
             logger.info(f"Cleaned up {count} audit logs older than {days_to_keep} days")
             return count
@@ -0,0 +1,334 @@
+import csv
+import hashlib
+import io
+import json
+import struct
+import zipfile
+from datetime import date, datetime, time as dt_time
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import Table
+from sqlalchemy import types as sqltypes
+from ..core.config import settings
+
+class BackupFormat(Enum):
+    """Format of the per-table members of a backup archive"""
+    CSV = "csv"  # DEFLATE-compressed by the zip archive
+    PARQUET = "parquet"  # zstd column chunks, stored as-is so members can be read in place
+
+def _pyarrow():
+    """Import pyarrow (an optional dependency) on first use"""
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise ValueError("Parquet backups need the pyarrow package") from e
+    return pyarrow
+
+class HashingWriter(io.RawIOBase):
+    """Pass-through writer that hashes and counts what is written"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.digest = hashlib.sha256()
+        self.bytes = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.raw.write(data)
+        self.digest.update(data)
+        self.bytes += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.bytes
+
+class CsvTableFormat:
+    """A table as one CSV member; JSON columns are written as JSON text, binary as hex"""
+    format = BackupFormat.CSV
+    extension = "csv"
+    compress_type = zipfile.ZIP_DEFLATED
+
+    def __init__(self, table: Table, compress: bool = True):
+        self.columns = [column.name for column in table.columns]
+        self.converters = []
+        for i, column in enumerate(table.columns):
+            if isinstance(column.type, sqltypes.JSON):
+                self.converters.append((i, lambda value: json.dumps(value, default=str)))
+            elif isinstance(column.type, sqltypes._Binary):
+                self.converters.append((i, lambda value: bytes(value).hex()))
+        self._header_written = False
+
+    def encode(self, rows: List[Any]) -> bytes:
+        """Encode a chunk of rows (reader thread)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not self._header_written:
+            writer.writerow(self.columns)
+            self._header_written = True
+        if self.converters:
+            rows = map(self._convert, rows)
+        writer.writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    def finish(self) -> Optional[bytes]:
+        """Final chunk, if any: the header of an empty table"""
+        if self._header_written:
+            return None
+        return self.encode([])
+
+    def _convert(self, row) -> List[Any]:
+        row = list(row)
+        for i, converter in self.converters:
+            if row[i] is not None:
+                row[i] = converter(row[i])
+        return row
+
+    @staticmethod
+    def chunk_size(chunk: bytes) -> int:
+        return len(chunk)
+
+    def write(self, sink: HashingWriter, chunks: Iterable[bytes]):
+        """Write the member from encoded chunks (archive writer thread)"""
+        for chunk in chunks:
+            sink.write(chunk)
+
+    def describe(self, table: Table) -> List[Dict[str, Any]]:
+        return [
+            {"name": column.name, "type": str(column.type), "nullable": column.nullable}
+            for column in table.columns
+        ]
+
+class ParquetTableFormat:
+    """A table as one Parquet member with zstd-compressed column chunks"""
+    format = BackupFormat.PARQUET
+    extension = "parquet"
+    compress_type = zipfile.ZIP_STORED
+
+    def __init__(self, table: Table, compress: bool = True):
+        pa = _pyarrow()
+        self.compression = "zstd" if compress else "none"
+        self.converters = []
+        fields = []
+        for column in table.columns:
+            arrow_type, converter = arrow_type_for(column.type)
+            fields.append(pa.field(column.name, arrow_type))
+            self.converters.append(converter)
+        self.schema = pa.schema(fields)
+
+    def encode(self, rows: List[Any]):
+        """Build a record batch from a chunk of rows (reader thread)"""
+        pa = _pyarrow()
+        columns = list(zip(*rows)) if rows else [()] * len(self.schema)
+        arrays = []
+        for values, field, converter in zip(columns, self.schema, self.converters):
+            if converter is not None:
+                values = [None if value is None else converter(value) for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def finish(self):
+        return None
+
+    @staticmethod
+    def chunk_size(chunk) -> int:
+        return chunk.nbytes
+
+    def write(self, sink: HashingWriter, chunks: Iterable[Any]):
+        """Write the member from record batches (archive writer thread)"""
+        pa = _pyarrow()
+        writer = pa.parquet.ParquetWriter(
+            sink, self.schema, compression=self.compression,
+            compression_level=settings.BACKUP_PARQUET_COMPRESSION_LEVEL if self.compression == "zstd" else None
+        )
+        try:
+            # Batches are gathered into row groups; larger groups compress better
+            pending, pending_rows = [], 0
+            for batch in chunks:
+                pending.append(batch)
+                pending_rows += batch.num_rows
+                if pending_rows >= settings.BACKUP_PARQUET_ROW_GROUP_SIZE:
+                    writer.write_table(pa.Table.from_batches(pending, schema=self.schema))
+                    pending, pending_rows = [], 0
+            if pending:
+                writer.write_table(pa.Table.from_batches(pending, schema=self.schema))
+        finally:
+            writer.close()
+
+    def describe(self, table: Table) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": column.name,
+                "type": str(column.type),
+                "arrow_type": str(field.type),
+                "nullable": column.nullable
+            }
+            for column, field in zip(table.columns, self.schema)
+        ]
+
+TABLE_FORMATS = {
+    BackupFormat.CSV: CsvTableFormat,
+    BackupFormat.PARQUET: ParquetTableFormat
+}
+
+def arrow_type_for(sql_type) -> Tuple[Any, Optional[Callable[[Any], Any]]]:
+    """Arrow type for a SQL column type, and a converter for values Arrow can't take as-is"""
+    pa = _pyarrow()
+    if isinstance(sql_type, sqltypes.JSON):
+        return pa.string(), lambda value: json.dumps(value, default=str)
+    if isinstance(sql_type, sqltypes.Boolean):
+        return pa.bool_(), None
+    if isinstance(sql_type, sqltypes.Integer):
+        return pa.int64(), None
+    if isinstance(sql_type, sqltypes.Float):
+        return pa.float64(), None
+    if isinstance(sql_type, sqltypes.Numeric):
+        if sql_type.precision and sql_type.precision <= 38:
+            return pa.decimal128(sql_type.precision, sql_type.scale or 0), None
+        return pa.string(), str
+    if isinstance(sql_type, sqltypes.DateTime):
+        return pa.timestamp("us", tz="UTC" if sql_type.timezone else None), None
+    if isinstance(sql_type, sqltypes.Date):
+        return pa.date32(), None
+    if isinstance(sql_type, sqltypes.Time):
+        return pa.time64("us"), None
+    if isinstance(sql_type, sqltypes.Interval):
+        return pa.duration("us"), None
+    if isinstance(sql_type, sqltypes._Binary):
+        return pa.binary(), bytes
+    if isinstance(sql_type, sqltypes.String):
+        return pa.string(), None
+    # UUIDs, enums of other dialects, arrays...: keep their text form
+    return pa.string(), str
+
+def csv_value_parser(column) -> Callable[[str], Any]:
+    """Convert a CSV field back to the column's Python type"""
+    if isinstance(column.type, sqltypes.JSON):
+        return lambda value: json.loads(value) if value else None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return lambda value: value
+
+    if python_type is str:
+        return lambda value: value
+    if python_type is bool:
+        return lambda value: value in ("True", "true", "1", "t") if value else None
+    if python_type in (datetime, date, dt_time):
+        return lambda value: python_type.fromisoformat(value) if value else None
+    if python_type is bytes:
+        return lambda value: bytes.fromhex(value) if value else None
+    return lambda value: python_type(value) if value else None
+
+def member_name(table_name: str, backup_format: BackupFormat) -> str:
+    return f"{table_name}.{TABLE_FORMATS[backup_format].extension}"
+
+def open_parquet_member(path: Path, name: str):
+    """ParquetFile over an archive member, read in place through a memory map"""
+    pa = _pyarrow()
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name)
+        if info.compress_type != zipfile.ZIP_STORED:
+            return pa.parquet.ParquetFile(pa.BufferReader(archive.read(name)))
+
+    source = pa.memory_map(str(path))
+    # Member data follows its local header (30 bytes + name + extra field)
+    header = source.read_at(30, info.header_offset)
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    data = source.read_at(info.file_size, info.header_offset + 30 + name_length + extra_length)
+    return pa.parquet.ParquetFile(pa.BufferReader(data))
+
+def read_member_rows(archive: zipfile.ZipFile, table: Table, backup_format: BackupFormat,
+                     batch_size: int) -> Tuple[List[str], Iterator[tuple]]:
+    """Header and typed rows of a table's member; values match ``table``'s column types"""
+    name = member_name(table.name, backup_format)
+    if backup_format == BackupFormat.PARQUET:
+        parquet = open_parquet_member(Path(archive.filename), name)
+        header = parquet.schema_arrow.names
+        json_indexes = [
+            i for i, column_name in enumerate(header)
+            if column_name in table.columns and isinstance(table.columns[column_name].type, sqltypes.JSON)
+        ]
+
+        def parquet_rows():
+            for batch in parquet.iter_batches(batch_size=batch_size):
+                columns = [column.to_pylist() for column in batch.columns]
+                for i in json_indexes:
+                    columns[i] = [json.loads(value) if value is not None else None for value in columns[i]]
+                yield from zip(*columns)
+        return header, parquet_rows()
+
+    member = archive.open(name)
+    reader = csv.reader(io.TextIOWrapper(member, encoding="utf-8", newline=""))
+    header = next(reader)
+    parsers = [
+        csv_value_parser(table.columns[column_name]) if column_name in table.columns else (lambda value: value)
+        for column_name in header
+    ]
+
+    def csv_rows():
+        try:
+            for row in reader:
+                yield tuple(parse(value) for parse, value in zip(parsers, row))
+        finally:
+            member.close()
+    return header, csv_rows()
+
+def member_stats(archive: zipfile.ZipFile, table_name: str,
+                 backup_format: BackupFormat) -> Tuple[int, int, str]:
+    """Rows, size and SHA-256 of a table's member, read without unpacking the archive"""
+    name = member_name(table_name, backup_format)
+    with archive.open(name) as member:
+        hashing = HashingReader(member)
+        if backup_format == BackupFormat.PARQUET:
+            for _ in iter(lambda: hashing.read(1024 * 1024), b""):
+                pass
+            rows = open_parquet_member(Path(archive.filename), name).metadata.num_rows
+        else:
+            reader = csv.reader(io.TextIOWrapper(hashing, encoding="utf-8", newline=""))
+            rows = sum(1 for _ in reader) - 1  # Header
+    return rows, hashing.bytes, hashing.digest.hexdigest()
+
+class HashingReader(io.RawIOBase):
+    """Pass-through reader that hashes and counts what is read"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.digest = hashlib.sha256()
+        self.bytes = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.raw.read(len(buffer))
+        buffer[:len(data)] = data
+        self.digest.update(data)
+        self.bytes += len(data)
+        return len(data)
+
+def read_table(path: Path, table_name: str, columns: Optional[List[str]] = None):
+    """A table (or some of its columns) from a backup archive as a pyarrow Table.
+
+    Only that table's member is read; for Parquet backups only the
+    requested column chunks are.
+    """
+    _pyarrow()
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read("metadata.json"))
+        if table_name not in manifest["tables"]:
+            raise ValueError(f"Table {table_name} is not in backup {manifest['backup_id']}")
+        backup_format = BackupFormat(manifest.get("format", BackupFormat.CSV.value))
+        name = member_name(table_name, backup_format)
+
+        if backup_format == BackupFormat.PARQUET:
+            return open_parquet_member(path, name).read(columns=columns)
+
+        import pyarrow.csv
+        with archive.open(name) as member:
+            return pyarrow.csv.read_csv(
+                member, convert_options=pyarrow.csv.ConvertOptions(include_columns=columns)
+            )
@@ -1,24 +1,32 @@
-from typing import List, Optional, Dict, Any, Union
+from typing import Callable, List, Optional, Dict, Any, Union
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 import asyncio
+import csv
+import hashlib
+import io
 import json
 import os
-import shutil
+import queue
+import threading
+import time
+import uuid
 import zipfile
 import tempfile
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from sqlalchemy.orm import Session
 from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, Float
-from sqlalchemy import create_engine, MetaData, Table
+from sqlalchemy import create_engine, func, MetaData, Table, insert, or_, select, text
 from ..core.database import Base, get_db, engine
 from ..core.config import settings
 from .config_service import get_config_service
-import pandas as pd
-import boto3
-from botocore.exceptions import ClientError
+from .backup_formats import (
+    BackupFormat, HashingWriter, TABLE_FORMATS, member_name, member_stats,
+    read_member_rows, read_table as read_archive_table
+)
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +65,11 @@ class RestoreStatus(Enum):
     FAILED = "failed"
     CANCELLED = "cancelled"
 
+# Backups that export rows and can start a chain
+BASE_BACKUP_TYPES = (BackupType.FULL, BackupType.DATA_ONLY)
+# Backups that export only rows changed since a parent
+CHANGE_BACKUP_TYPES = (BackupType.INCREMENTAL, BackupType.DIFFERENTIAL)
+
 @dataclass
 class BackupConfig:
     """Backup configuration"""
@@ -71,6 +84,8 @@ class BackupConfig:
     schedule_cron: Optional[str] = None
     notification_emails: List[str] = field(default_factory=list)
     storage_config: Dict[str, Any] = field(default_factory=dict)
+    parent_backup_id: Optional[str] = None  # Incremental/differential parent (default: latest)
+    backup_format: Optional[BackupFormat] = None  # Table member format (default: BACKUP_FORMAT)
 
 @dataclass
 class BackupMetadata:
@@ -89,6 +104,63 @@ class BackupMetadata:
     application_version: str
     notes: Optional[str] = None
 
+@dataclass
+class TableProgress:
+    """Progress of one table during a backup or restore"""
+    table: str
+    status: str = "pending"  # pending, exporting/loading/indexing, written/restored/verified, failed
+    rows: int = 0
+    bytes: int = 0  # Uncompressed CSV bytes written to / read from the archive
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    checksum: Optional[str] = None  # SHA-256 of the table's archive member
+    
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = ((self.finished_at or time.monotonic()) - self.started_at) if self.started_at else 0.0
+        return {
+            "table": self.table,
+            "status": self.status,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows / elapsed) if elapsed else 0,
+            "mb_per_second": round(self.bytes / elapsed / (1024 * 1024), 2) if elapsed else 0.0,
+            "checksum": self.checksum
+        }
+
+# Marks the end of a table's chunk stream
+_END_OF_TABLE = object()
+
+# Member name suffix of a table's key list in changes-only exports
+_KEYS_SUFFIX = ".keys"
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class _CsvChunkReader(io.RawIOBase):
+    """File-like view of an iterator of byte chunks, for COPY FROM STDIN"""
+    
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pending = b""
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        while not self.pending:
+            self.pending = next(self.chunks, None)
+            if self.pending is None:
+                self.pending = b""
+                return 0
+        size = min(len(buffer), len(self.pending))
+        buffer[:size], self.pending = self.pending[:size], self.pending[size:]
+        return size
+
 class BackupLogModel(Base):
     """Backup log database model"""
     __tablename__ = "backup_logs"
@@ -120,6 +192,12 @@ class BackupLogModel(Base):
     notes = Column(Text, nullable=True)
     backup_metadata = Column(JSON, nullable=True)
     
+    # Lineage: incremental and differential backups hold the rows changed
+    # after their parent's watermark; the chain ends at a full backup
+    parent_backup_id = Column(String(100), nullable=True, index=True)
+    base_backup_id = Column(String(100), nullable=True, index=True)
+    watermark = Column(DateTime, nullable=True)  # Start of the export; children export rows changed after it
+    
     # Retention
     expires_at = Column(DateTime, nullable=True)
     is_archived = Column(Boolean, default=False)
@@ -165,6 +243,10 @@ class BackupService:
         self.backup_dir.mkdir(exist_ok=True)
         self.temp_dir = Path(tempfile.gettempdir()) / "gym_backups"
         self.temp_dir.mkdir(exist_ok=True)
+        self.engine = engine
+        
+        # Live per-table progress of running backups
+        self._progress: Dict[str, Dict[str, TableProgress]] = {}
         
         # Storage clients
         self.s3_client = None
@@ -179,6 +261,7 @@ class BackupService:
             # Initialize S3 client if configured
             s3_config = get_config_service().get_category_configs("backup_s3")
             if s3_config.get("enabled"):
+                import boto3
                 self.s3_client = boto3.client(
                     's3',
                     aws_access_key_id=s3_config.get("access_key_id"),
@@ -194,7 +277,8 @@ class BackupService:
     async def create_backup(self, config: BackupConfig, 
                           user_id: Optional[int] = None) -> Dict[str, Any]:
         """Create a backup with specified configuration"""
-        backup_id = f"backup_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+        # Suffixed so that chained backups taken back to back do not collide
+        backup_id = f"backup_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
         
         try:
             # Log backup start
@@ -209,6 +293,8 @@ class BackupService:
                 result = await self._create_schema_backup(backup_id, config)
             elif config.backup_type == BackupType.DATA_ONLY:
                 result = await self._create_data_backup(backup_id, config)
+            elif config.backup_type in CHANGE_BACKUP_TYPES:
+                result = await self._create_incremental_backup(backup_id, config)
             elif config.backup_type == BackupType.CONFIG_ONLY:
                 result = await self._create_config_backup(backup_id, config)
             else:
@@ -252,7 +338,8 @@ class BackupService:
                            restore_options: Dict[str, Any],
                            user_id: Optional[int] = None) -> Dict[str, Any]:
         """Restore from a backup"""
-        restore_id = f"restore_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+        restore_id = f"restore_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        verify_only = bool(restore_options.get("verify_only"))
         
         try:
             # Get backup information
@@ -262,28 +349,27 @@ class BackupService:
             
             # Log restore start
             restore_log = await self._create_restore_log(
-                restore_id, backup_id, RestoreStatus.RUNNING, user_id
-            )
-            
-            # Download backup if from remote storage
-            local_backup_path = await self._download_backup_if_needed(
-                backup_info, restore_options
+                restore_id, backup_id, RestoreStatus.RUNNING, user_id,
+                restore_type="verify" if verify_only else backup_info["backup_type"]
             )
             
             # Perform restore based on backup type
-            if backup_info["backup_type"] == BackupType.FULL.value:
-                result = await self._restore_full_backup(
-                    local_backup_path, restore_options
+            backup_type = BackupType(backup_info["backup_type"])
+            if backup_type in BASE_BACKUP_TYPES + CHANGE_BACKUP_TYPES:
+                # Restores the whole chain up to this backup
+                chain = await self._resolve_backup_chain(backup_id)
+                result = await self._restore_backup_chain(chain, restore_options, restore_id)
+            elif backup_type == BackupType.SCHEMA_ONLY:
+                local_backup_path = await self._download_backup_if_needed(
+                    backup_info, restore_options
                 )
-            elif backup_info["backup_type"] == BackupType.SCHEMA_ONLY.value:
                 result = await self._restore_schema_backup(
                     local_backup_path, restore_options
                 )
-            elif backup_info["backup_type"] == BackupType.DATA_ONLY.value:
-                result = await self._restore_data_backup(
-                    local_backup_path, restore_options
+            elif backup_type == BackupType.CONFIG_ONLY:
+                local_backup_path = await self._download_backup_if_needed(
+                    backup_info, restore_options
                 )
-            elif backup_info["backup_type"] == BackupType.CONFIG_ONLY.value:
                 result = await self._restore_config_backup(
                     local_backup_path, restore_options
                 )
@@ -301,7 +387,8 @@ class BackupService:
                 "backup_id": backup_id,
                 "tables_restored": result["tables_restored"],
                 "records_restored": result["records_restored"],
-                "duration_seconds": result["duration_seconds"]
+                "duration_seconds": result["duration_seconds"],
+                "verification": result.get("verification")
             }
             
         except Exception as e:
@@ -347,7 +434,9 @@ class BackupService:
                     "created_at": backup.created_at.isoformat(),
                     "completed_at": backup.completed_at.isoformat() if backup.completed_at else None,
                     "duration_seconds": backup.duration_seconds,
-                    "expires_at": backup.expires_at.isoformat() if backup.expires_at else None
+                    "expires_at": backup.expires_at.isoformat() if backup.expires_at else None,
+                    "parent_backup_id": backup.parent_backup_id,
+                    "base_backup_id": backup.base_backup_id
                 }
                 for backup in backups
             ]
@@ -466,78 +555,368 @@ class BackupService:
             db.close()
     
     async def _create_full_backup(self, backup_id: str, 
-                                config: BackupConfig) -> Dict[str, Any]:
-        """Create a full database backup"""
+                                config: BackupConfig,
+                                include_schema: bool = True,
+                                lineage: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Create a full database backup.
+
+        Tables are streamed straight into the archive (see
+        ``_write_tables``), so memory use does not grow with table size.
+        With ``lineage`` (see ``_create_incremental_backup``) only rows
+        changed after ``lineage["since"]`` are exported.
+        """
         start_time = datetime.utcnow()
-        
-        # Create backup directory
+        # Taken before the export starts, so children re-read anything it races with
+        watermark = self._database_now()
         backup_path = self.backup_dir / f"{backup_id}.zip"
-        temp_backup_dir = self.temp_dir / backup_id
-        temp_backup_dir.mkdir(exist_ok=True)
+        lineage = lineage or {}
+        
+        backup_format = config.backup_format or BackupFormat(settings.BACKUP_FORMAT)
+        
+        metadata, tables = self._select_tables(config)
+        exports = {table.name: self._export_query(table, lineage.get("since")) for table in tables}
+        formats = {
+            table.name: TABLE_FORMATS[backup_format](table, config.compression) for table in tables
+        }
+        progress = {table.name: TableProgress(table.name) for table in tables}
+        self._progress[backup_id] = progress
         
         try:
-            # Get database metadata
-            metadata = MetaData()
-            metadata.reflect(bind=engine)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, self._write_archive, backup_path, backup_id, config, start_time, watermark,
+                metadata, tables, exports, formats, backup_format, progress, include_schema, lineage
+            )
+        except BaseException:
+            backup_path.unlink(missing_ok=True)
+            raise
+        finally:
+            self._progress.pop(backup_id, None)
+        
+        size_bytes = backup_path.stat().st_size
+        checksum = await loop.run_in_executor(None, _file_sha256, backup_path)
+        duration = (datetime.utcnow() - start_time).total_seconds()
+        uncompressed = sum(p.bytes for p in progress.values())
+        
+        return {
+            "backup_path": str(backup_path),
+            "size_bytes": size_bytes,
+            "table_count": len(tables),
+            "record_count": sum(p.rows for p in progress.values()),
+            "duration_seconds": duration,
+            "compression_ratio": round(uncompressed / size_bytes, 2) if size_bytes else None,
+            "checksum": checksum,
+            "format": backup_format.value,
+            "tables": [p.to_dict() for p in progress.values()],
+            "watermark": watermark,
+            "parent_backup_id": lineage.get("parent_backup_id"),
+            "base_backup_id": lineage.get("base_backup_id")
+        }
+    
+    async def _create_incremental_backup(self, backup_id: str,
+                                       config: BackupConfig) -> Dict[str, Any]:
+        """Create an incremental or differential backup.
+
+        An incremental backup's parent is the latest completed backup of the
+        chain; a differential backup's parent is the chain's full backup, so
+        restoring it needs only two archives. Either way only rows whose
+        change columns (BACKUP_CHANGE_COLUMNS) are newer than the parent's
+        watermark are exported. Hard deletes are not visible to watermarks,
+        so each changes-only table also lists the primary keys it holds at
+        export time, and a restore drops rows missing from the newest list
+        (see ``_merged_rows``). Tables without a primary key are exported
+        whole.
+        """
+        parent = await self._find_parent_backup(config)
+        if not parent:
+            raise ValueError(
+                f"No completed full backup to base a {config.backup_type.value} backup on"
+            )
+        
+        since = parent["watermark"] - timedelta(seconds=settings.BACKUP_WATERMARK_OVERLAP)
+        lineage = {
+            "parent_backup_id": parent["backup_id"],
+            "base_backup_id": parent["base_backup_id"] or parent["backup_id"],
+            "since": since
+        }
+        return await self._create_full_backup(backup_id, config, include_schema=False, lineage=lineage)
+    
+    async def _find_parent_backup(self, config: BackupConfig) -> Optional[Dict[str, Any]]:
+        """Pick the parent of a new incremental or differential backup"""
+        if config.parent_backup_id:
+            parent = await self._get_backup_info(config.parent_backup_id)
+            if not parent or parent["status"] != BackupStatus.COMPLETED.value or not parent["watermark"]:
+                raise ValueError(f"Backup {config.parent_backup_id} cannot be used as a parent")
+            if config.backup_type == BackupType.DIFFERENTIAL and parent["base_backup_id"]:
+                # Differentials always hang off the full backup
+                return await self._get_backup_info(parent["base_backup_id"])
+            return parent
+        
+        parent_types = BASE_BACKUP_TYPES
+        if config.backup_type == BackupType.INCREMENTAL:
+            parent_types = BASE_BACKUP_TYPES + CHANGE_BACKUP_TYPES
+        
+        try:
+            db = next(get_db())
             
-            # Export each table
-            table_count = 0
-            record_count = 0
+            parent = db.query(BackupLogModel).filter(
+                BackupLogModel.backup_type.in_([t.value for t in parent_types]),
+                BackupLogModel.status == BackupStatus.COMPLETED.value,
+                BackupLogModel.watermark.isnot(None)
+            ).order_by(BackupLogModel.watermark.desc()).first()
             
-            for table_name, table in metadata.tables.items():
-                if config.include_tables and table_name not in config.include_tables:
-                    continue
-                if table_name in config.exclude_tables:
-                    continue
-                
-                # Export table data to CSV
-                df = pd.read_sql_table(table_name, engine)
-                csv_path = temp_backup_dir / f"{table_name}.csv"
-                df.to_csv(csv_path, index=False)
-                
-                table_count += 1
-                record_count += len(df)
+            return await self._get_backup_info(parent.backup_id) if parent else None
+        finally:
+            db.close()
+    
+    def _database_now(self) -> datetime:
+        """The database clock in naive UTC, as watermarks are stored.
+
+        Change columns are filled by the database (``func.now()``), so
+        watermarks come from the same clock. SQLite's clock is this host's.
+        """
+        if self.engine.dialect.name == "sqlite":
+            return datetime.utcnow()
+        with self.engine.connect() as conn:
+            now = conn.execute(select(func.now())).scalar_one()
+        if now.tzinfo is not None:
+            now = now.astimezone(timezone.utc).replace(tzinfo=None)
+        return now
+    
+    def _export_query(self, table: Table, since: Optional[datetime] = None):
+        """Rows of ``table`` to export, and whether that is all of them"""
+        query = select(table)
+        if since is None:
+            return query, "full"
+        
+        change_columns = [
+            table.columns[name] for name in settings.BACKUP_CHANGE_COLUMNS
+            if name in table.columns
+        ]
+        if not change_columns or not table.primary_key.columns:
+            # Nothing to compare against, or no key to track deletes by:
+            # the table is exported whole
+            return query, "full"
+        # A naive parameter would be read in the session TimeZone, which
+        # shifts the comparison against timezone-aware columns by its offset
+        since_utc = since.replace(tzinfo=timezone.utc)
+        return query.where(or_(*[
+            column > (since_utc if getattr(column.type, "timezone", False) else since)
+            for column in change_columns
+        ])), "changes"
+    
+    def _select_tables(self, config: BackupConfig):
+        """Reflect the database and pick the tables to back up (FK order)"""
+        metadata = MetaData()
+        metadata.reflect(bind=self.engine)
+        tables = [
+            table for table in metadata.sorted_tables
+            if (not config.include_tables or table.name in config.include_tables)
+            and table.name not in config.exclude_tables
+            # A restore must not rewrite the history of backups and restores
+            and table.name not in (BackupLogModel.__tablename__, RestoreLogModel.__tablename__)
+        ]
+        return metadata, tables
+    
+    @staticmethod
+    def _key_table(table: Table) -> Table:
+        """Primary-key-only copy of ``table``, the shape of its key list member"""
+        return Table(
+            f"{table.name}{_KEYS_SUFFIX}", MetaData(),
+            *[Column(column.name, column.type) for column in table.primary_key.columns]
+        )
+    
+    def _write_archive(self, backup_path: Path, backup_id: str, config: BackupConfig,
+                       start_time: datetime, watermark: datetime,
+                       metadata: MetaData, tables: List[Table],
+                       exports: Dict[str, tuple], formats: Dict[str, Any],
+                       backup_format: BackupFormat, progress: Dict[str, TableProgress],
+                       include_schema: bool, lineage: Dict[str, Any]):
+        """Write the archive: one member per table, then schema and metadata"""
+        # Parquet members compress themselves and stay seekable when stored
+        compression = TABLE_FORMATS[backup_format].compress_type if config.compression else zipfile.ZIP_STORED
+        since = lineage.get("since")
+        with zipfile.ZipFile(backup_path, 'w', compression,
+                             compresslevel=settings.BACKUP_COMPRESSION_LEVEL) as zipf:
+            self._write_tables(zipf, tables, exports, formats, progress)
+            
+            # Listed after the rows, so a key deleted meanwhile is dropped too
+            keyed = [table for table in tables if exports[table.name][1] == "changes"]
+            key_tables = {table.name: self._key_table(table) for table in keyed}
+            key_progress = {table.name: TableProgress(key_tables[table.name].name) for table in keyed}
+            self._write_tables(
+                zipf, [key_tables[table.name] for table in keyed],
+                {key_tables[table.name].name: (select(*table.primary_key.columns), "keys") for table in keyed},
+                {key_tables[table.name].name: TABLE_FORMATS[backup_format](key_tables[table.name], config.compression)
+                 for table in keyed},
+                {key_tables[table.name].name: key_progress[table.name] for table in keyed}
+            )
             
-            # Export schema
-            schema_path = temp_backup_dir / "schema.sql"
-            await self._export_schema(schema_path)
+            if include_schema:
+                zipf.writestr("schema.sql", self._render_schema(metadata))
             
-            # Create metadata file
             metadata_info = {
                 "backup_id": backup_id,
                 "backup_type": config.backup_type.value,
                 "created_at": start_time.isoformat(),
-                "table_count": table_count,
-                "record_count": record_count,
-                "database_version": "postgresql",  # TODO: Get actual version
-                "application_version": "1.0.0"  # TODO: Get from settings
+                "format": backup_format.value,
+                "compression": {
+                    BackupFormat.CSV: "deflate", BackupFormat.PARQUET: "zstd"
+                }[backup_format] if config.compression else None,
+                "watermark": watermark.isoformat(),
+                "parent_backup_id": lineage.get("parent_backup_id"),
+                "base_backup_id": lineage.get("base_backup_id"),
+                "since": since.isoformat() if since else None,
+                "table_count": len(tables),
+                "record_count": sum(p.rows for p in progress.values()),
+                "tables": {
+                    table.name: {
+                        "rows": progress[table.name].rows,
+                        "columns": [column.name for column in table.columns],
+                        "primary_key": [column.name for column in table.primary_key.columns],
+                        "mode": exports[table.name][1],
+                        "sha256": progress[table.name].checksum,
+                        "schema": formats[table.name].describe(table),
+                        **({"keys": {
+                            "rows": key_progress[table.name].rows,
+                            "sha256": key_progress[table.name].checksum
+                        }} if table.name in key_progress else {})
+                    }
+                    for table in tables
+                },
+                "database_version": self.engine.dialect.name,
+                "application_version": settings.VERSION
             }
-            
-            metadata_path = temp_backup_dir / "metadata.json"
-            with open(metadata_path, 'w') as f:
-                json.dump(metadata_info, f, indent=2)
-            
-            # Create ZIP archive
-            with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for file_path in temp_backup_dir.rglob('*'):
-                    if file_path.is_file():
-                        zipf.write(file_path, file_path.relative_to(temp_backup_dir))
-            
-            # Calculate file size and duration
-            size_bytes = backup_path.stat().st_size
-            duration = (datetime.utcnow() - start_time).total_seconds()
-            
+            zipf.writestr("metadata.json", json.dumps(metadata_info, indent=2))
+    
+    def _write_tables(self, zipf: zipfile.ZipFile, tables: List[Table],
+                      exports: Dict[str, tuple], formats: Dict[str, Any],
+                      progress: Dict[str, TableProgress]):
+        """Stream tables into archive members, reading several in parallel.
+
+        A member has to be written contiguously, so up to BACKUP_WORKERS
+        readers push encoded chunks into bounded per-table queues and announce
+        their table on ``ready`` once it has data. This thread compresses one
+        table at a time in that order while the other readers prefetch.
+        """
+        if not tables:
+            return
+        
+        ready: queue.Queue = queue.Queue()
+        streams = {table.name: queue.Queue(maxsize=settings.BACKUP_PREFETCH_CHUNKS) for table in tables}
+        cancelled = threading.Event()
+        workers = max(1, min(settings.BACKUP_WORKERS, len(tables)))
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backup") as pool:
+            for table in tables:
+                pool.submit(self._read_table, table, exports[table.name][0], formats[table.name],
+                            streams[table.name], ready, progress[table.name], cancelled)
+            try:
+                for _ in tables:
+                    name = ready.get()
+                    self._write_member(zipf, name, formats[name], streams[name], progress[name])
+            except BaseException:
+                cancelled.set()
+                raise
+    
+    def _read_table(self, table: Table, query, table_format, stream: queue.Queue,
+                    ready: queue.Queue, progress: TableProgress, cancelled: threading.Event):
+        """Reader thread: server-side cursor -> encoded chunks on ``stream``"""
+        announced = False
+        
+        def put(item) -> bool:
+            nonlocal announced
+            while not cancelled.is_set():
+                try:
+                    stream.put(item, timeout=0.5)
+                except queue.Full:
+                    continue
+                if not announced:
+                    announced = True
+                    ready.put(table.name)
+                return True
+            return False
+        
+        progress.status = "exporting"
+        progress.started_at = time.monotonic()
+        try:
+            with self.engine.connect() as conn:
+                result = conn.execution_options(
+                    stream_results=True, yield_per=settings.BACKUP_CHUNK_SIZE
+                ).execute(query)
+                for rows in result.partitions():
+                    chunk = table_format.encode(rows)
+                    progress.rows += len(rows)
+                    if not put(chunk):
+                        return
+            
+            tail = table_format.finish()
+            if tail is not None and not put(tail):
+                return
+            put(_END_OF_TABLE)
+        except Exception as e:
+            progress.status = "failed"
+            logger.error(f"Backup export of table {table.name} failed: {e}")
+            put(e)
+    
+    def _write_member(self, zipf: zipfile.ZipFile, name: str, table_format,
+                      stream: queue.Queue, progress: TableProgress):
+        """Drain one table's chunks into its archive member"""
+        def chunks():
+            while True:
+                chunk = stream.get()
+                if chunk is _END_OF_TABLE:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                progress.bytes += table_format.chunk_size(chunk)
+                yield chunk
+        
+        with zipf.open(member_name(name, table_format.format), 'w', force_zip64=True) as member:
+            sink = HashingWriter(member)
+            table_format.write(sink, chunks())
+        
+        progress.checksum = sink.digest.hexdigest()
+        progress.status = "written"
+        progress.finished_at = time.monotonic()
+        stats = progress.to_dict()
+        logger.info(
+            f"Backed up {name}: {stats['rows']} rows in {stats['seconds']}s "
+            f"({stats['rows_per_second']} rows/s, {stats['mb_per_second']} MB/s)"
+        )
+    
+    def get_backup_progress(self, backup_id: str) -> Optional[Dict[str, Any]]:
+        """Per-table progress of a running backup, or the final figures of a finished one"""
+        progress = self._progress.get(backup_id)
+        if progress is not None:
+            tables = [p.to_dict() for p in progress.values()]
             return {
-                "backup_path": str(backup_path),
-                "size_bytes": size_bytes,
-                "table_count": table_count,
-                "record_count": record_count,
-                "duration_seconds": duration
+                "backup_id": backup_id,
+                "status": BackupStatus.RUNNING.value,
+                "tables_done": sum(1 for t in tables if t["status"] == "written"),
+                "table_count": len(tables),
+                "rows": sum(t["rows"] for t in tables),
+                "tables": tables
+            }
+        
+        db = next(get_db())
+        try:
+            backup = db.query(BackupLogModel).filter(
+                BackupLogModel.backup_id == backup_id
+            ).first()
+            if not backup:
+                return None
+            tables = (backup.backup_metadata or {}).get("tables", [])
+            return {
+                "backup_id": backup_id,
+                "status": backup.status,
+                "tables_done": len(tables),
+                "table_count": backup.table_count or len(tables),
+                "rows": backup.record_count or 0,
+                "tables": tables
             }
-            
         finally:
-            # Clean up temp directory
-            shutil.rmtree(temp_backup_dir, ignore_errors=True)
+            db.close()
     
     async def _create_schema_backup(self, backup_id: str, 
                                   config: BackupConfig) -> Dict[str, Any]:
@@ -561,11 +940,8 @@ class BackupService:
     
     async def _create_data_backup(self, backup_id: str, 
                                 config: BackupConfig) -> Dict[str, Any]:
-        """Create a data-only backup"""
-        # Similar to full backup but without schema
-        # Implementation would be similar to _create_full_backup
-        # but skip schema export
-        pass
+        """Create a data-only backup (a full backup without the schema)"""
+        return await self._create_full_backup(backup_id, config, include_schema=False)
     
     async def _create_config_backup(self, backup_id: str, 
                                   config: BackupConfig) -> Dict[str, Any]:
@@ -593,19 +969,27 @@ class BackupService:
     
     async def _export_schema(self, output_path: Path):
         """Export database schema to SQL file"""
-        # This is a simplified implementation
-        # In production, you'd use pg_dump or similar tools
         metadata = MetaData()
-        metadata.reflect(bind=engine)
+        metadata.reflect(bind=self.engine)
         
         with open(output_path, 'w') as f:
-            f.write("-- Database Schema Export\n")
-            f.write(f"-- Generated at: {datetime.utcnow().isoformat()}\n\n")
-            
-            for table_name, table in metadata.tables.items():
-                f.write(f"-- Table: {table_name}\n")
-                # TODO: Generate actual CREATE TABLE statements
-                f.write(f"-- Columns: {', '.join([col.name for col in table.columns])}\n\n")
+            f.write(self._render_schema(metadata))
+    
+    def _render_schema(self, metadata: MetaData) -> str:
+        """Schema summary as SQL comments"""
+        # This is a simplified implementation
+        # In production, you'd use pg_dump or similar tools
+        lines = [
+            "-- Database Schema Export",
+            f"-- Generated at: {datetime.utcnow().isoformat()}",
+            ""
+        ]
+        for table_name, table in metadata.tables.items():
+            lines.append(f"-- Table: {table_name}")
+            # TODO: Generate actual CREATE TABLE statements
+            lines.append(f"-- Columns: {', '.join([col.name for col in table.columns])}")
+            lines.append("")
+        return "\n".join(lines) + "\n"
     
     async def _upload_backup(self, backup_result: Dict[str, Any], 
                            config: BackupConfig) -> Dict[str, Any]:
@@ -629,6 +1013,7 @@ class BackupService:
         if not bucket_name:
             raise ValueError("S3 bucket name not configured")
         
+        from botocore.exceptions import ClientError
         try:
             self.s3_client.upload_file(
                 str(backup_path), bucket_name, s3_key
@@ -696,6 +1081,16 @@ class BackupService:
                     backup_log.size_bytes = result.get("size_bytes", 0)
                     backup_log.table_count = result.get("table_count", 0)
                     backup_log.record_count = result.get("record_count", 0)
+                    backup_log.compression_ratio = result.get("compression_ratio")
+                    if result.get("tables"):
+                        backup_log.backup_metadata = {
+                            "format": result.get("format"),
+                            "tables": result["tables"]
+                        }
+                    backup_log.checksum = result.get("checksum")
+                    backup_log.watermark = result.get("watermark")
+                    backup_log.parent_backup_id = result.get("parent_backup_id")
+                    backup_log.base_backup_id = result.get("base_backup_id")
                 elif status == BackupStatus.FAILED:
                     backup_log.error_message = result.get("error", "")
                 
@@ -718,7 +1113,8 @@ class BackupService:
             ).all()
             
             for backup in expired_backups:
-                await self.delete_backup(backup.backup_id)
+                if not self._has_children(db, backup.backup_id):
+                    await self.delete_backup(backup.backup_id)
             
             # Limit number of backups
             if config.max_backups > 0:
@@ -728,15 +1124,561 @@ class BackupService:
                 ).order_by(BackupLogModel.created_at.desc()).offset(config.max_backups).all()
                 
                 for backup in excess_backups:
-                    await self.delete_backup(backup.backup_id)
+                    if not self._has_children(db, backup.backup_id):
+                        await self.delete_backup(backup.backup_id)
             
         except Exception as e:
             logger.error(f"Failed to cleanup old backups: {e}")
         finally:
             db.close()
     
-    # Additional helper methods for restore operations would go here...
-    # _create_restore_log, _update_restore_log, _get_backup_info, etc.
+    @staticmethod
+    def _has_children(db: Session, backup_id: str) -> bool:
+        """Whether a later backup in a chain still depends on this one"""
+        return db.query(BackupLogModel).filter(
+            BackupLogModel.parent_backup_id == backup_id
+        ).first() is not None
+    
+    async def _resolve_backup_chain(self, backup_id: str) -> List[Dict[str, Any]]:
+        """Backups needed to restore ``backup_id``, full backup first"""
+        chain = []
+        next_id = backup_id
+        while next_id:
+            info = await self._get_backup_info(next_id)
+            if not info:
+                raise ValueError(f"Backup {next_id} in the chain of {backup_id} not found")
+            if info["status"] != BackupStatus.COMPLETED.value:
+                raise ValueError(f"Backup {next_id} in the chain of {backup_id} is {info['status']}")
+            chain.append(info)
+            next_id = info["parent_backup_id"]
+        chain.reverse()
+        return chain
+    
+    async def _restore_backup_chain(self, chain: List[Dict[str, Any]],
+                                  restore_options: Dict[str, Any],
+                                  restore_id: Optional[str] = None) -> Dict[str, Any]:
+        """Restore (or with ``verify_only``, just verify) a backup chain.
+
+        Every archive is verified before the database is touched. Progress is
+        written to the restore log every BACKUP_RESTORE_PROGRESS_INTERVAL
+        seconds while the chain is processed.
+        """
+        start_time = datetime.utcnow()
+        paths = [
+            await self._download_backup_if_needed(info, restore_options)
+            for info in chain
+        ]
+        
+        progress: Dict[str, TableProgress] = {}
+        reporter = None
+        if restore_id:
+            reporter = asyncio.create_task(self._report_restore_progress(restore_id, progress))
+        
+        try:
+            loop = asyncio.get_running_loop()
+            if restore_options.get("verify_only"):
+                verification = await loop.run_in_executor(
+                    None, self._verify_chain, chain, paths, progress
+                )
+                tables_restored, records_restored = 0, 0
+            else:
+                # A corrupt member must fail the restore before any table is cleared
+                verification = await loop.run_in_executor(
+                    None, self._verify_chain, chain, paths, {}
+                )
+                tables_restored, records_restored = await loop.run_in_executor(
+                    None, self._restore_chain_into_database, paths,
+                    restore_options.get("restore_tables") or [], progress
+                )
+        finally:
+            if reporter:
+                reporter.cancel()
+        
+        return {
+            "tables_restored": tables_restored,
+            "records_restored": records_restored,
+            "duration_seconds": (datetime.utcnow() - start_time).total_seconds(),
+            "chain": [info["backup_id"] for info in chain],
+            "tables": [p.to_dict() for p in progress.values()],
+            "verification": verification
+        }
+    
+    def _restore_chain_into_database(self, paths: List[Path], only_tables: List[str],
+                                     progress: Dict[str, TableProgress]):
+        """Replace table contents with the merged state of a backup chain.
+
+        The live tables change only if every table loads. With one restore
+        worker (always on SQLite) the clear and all loads share a single
+        transaction; with more, see ``_restore_through_staging``.
+        """
+        paths = list(reversed(paths))
+        manifests = []
+        for path in paths:
+            with zipfile.ZipFile(path) as archive:
+                manifests.append(json.loads(archive.read("metadata.json")))
+        
+        metadata = MetaData()
+        metadata.reflect(bind=self.engine)
+        
+        names = {name for manifest in manifests for name in manifest["tables"]}
+        missing = [
+            name for name in names
+            if name not in metadata.tables and (not only_tables or name in only_tables)
+        ]
+        if missing:
+            raise ValueError(f"Tables missing from the database: {', '.join(sorted(missing))}")
+        tables = [
+            table for table in metadata.sorted_tables
+            if table.name in names and (not only_tables or table.name in only_tables)
+        ]
+        for table in tables:
+            progress[table.name] = TableProgress(table.name)
+        
+        if self._restore_workers() == 1:
+            with self.engine.begin() as conn:
+                for table in reversed(tables):
+                    conn.execute(table.delete())
+                for table in tables:
+                    self._restore_table(
+                        conn, table, progress[table.name],
+                        lambda table=table: self._load_rows(
+                            conn, table, table, paths, manifests, progress[table.name]
+                        )
+                    )
+        else:
+            self._restore_through_staging(tables, paths, manifests, progress)
+        return len(tables), sum(p.rows for p in progress.values())
+    
+    def _restore_workers(self) -> int:
+        """Tables loaded at once; SQLite only allows one writer"""
+        if self.engine.dialect.name == "sqlite":
+            return 1
+        return max(1, settings.BACKUP_RESTORE_WORKERS)
+    
+    def _restore_through_staging(self, tables: List[Table], paths: List[Path],
+                                 manifests: List[Dict[str, Any]],
+                                 progress: Dict[str, TableProgress]):
+        """Bulk-load tables in parallel into staging tables, then swap them in.
+
+        Staging tables have no keys, foreign keys or indexes, so they load in
+        any order, each in its own transaction. One final transaction clears
+        the live tables in reverse FK order and copies the staged rows in FK
+        order. If a load fails, the staging tables are dropped and the live
+        tables are left untouched.
+        """
+        staging = {table.name: self._staging_table(table) for table in tables}
+        columns: Dict[str, List[str]] = {}
+        
+        def stage(table: Table):
+            try:
+                with self.engine.begin() as conn:
+                    columns[table.name] = self._load_rows(
+                        conn, table, staging[table.name], paths, manifests, progress[table.name]
+                    )
+                progress[table.name].status = "staged"
+            except Exception as e:
+                progress[table.name].status = "failed"
+                logger.error(f"Restore of table {table.name} failed: {e}")
+                raise
+        
+        try:
+            with self.engine.begin() as conn:
+                for staged in staging.values():
+                    staged.create(conn)
+            
+            with ThreadPoolExecutor(max_workers=self._restore_workers(),
+                                    thread_name_prefix="restore") as pool:
+                for _ in pool.map(stage, tables):
+                    pass
+            
+            with self.engine.begin() as conn:
+                for table in reversed(tables):
+                    conn.execute(table.delete())
+                for table in tables:
+                    staged, names = staging[table.name], columns[table.name]
+                    self._restore_table(
+                        conn, table, progress[table.name],
+                        lambda table=table, staged=staged, names=names: conn.execute(
+                            insert(table).from_select(names, select(*[staged.c[name] for name in names]))
+                        )
+                    )
+        finally:
+            with self.engine.begin() as conn:
+                for staged in staging.values():
+                    staged.drop(conn, checkfirst=True)
+    
+    def _staging_table(self, table: Table) -> Table:
+        """Key- and index-free copy of ``table`` to load a restore into"""
+        return Table(
+            f"restore_staging_{table.name}", MetaData(),
+            *[Column(column.name, column.type) for column in table.columns],
+            # Staged rows are copied into the live table; they need no WAL
+            prefixes=["UNLOGGED"] if self.engine.dialect.name == "postgresql" else []
+        )
+    
+    def _restore_table(self, conn, table: Table, progress: TableProgress,
+                       load: Callable[[], Any]):
+        """Run ``load`` into ``table`` with its indexes dropped, then rebuild them"""
+        indexes = list(table.indexes)
+        try:
+            # Building indexes once after the load beats maintaining them per row
+            for index in indexes:
+                index.drop(conn)
+            
+            load()
+            
+            progress.status = "indexing"
+            for index in indexes:
+                index.create(conn)
+            self._reset_sequence(conn, table)
+        except Exception as e:
+            progress.status = "failed"
+            logger.error(f"Restore of table {table.name} failed: {e}")
+            raise
+        
+        progress.status = "restored"
+        progress.finished_at = time.monotonic()
+        stats = progress.to_dict()
+        logger.info(
+            f"Restored {table.name}: {stats['rows']} rows in {stats['seconds']}s "
+            f"({stats['rows_per_second']} rows/s)"
+        )
+    
+    def _load_rows(self, conn, table: Table, target: Table, paths: List[Path],
+                   manifests: List[Dict[str, Any]], progress: TableProgress) -> List[str]:
+        """Bulk-load the chain's merged rows of ``table`` into ``target``.
+
+        Returns the loaded columns.
+        """
+        progress.status = "loading"
+        progress.started_at = time.monotonic()
+        # Each loader reads through its own file handles
+        archives = [zipfile.ZipFile(path) for path in paths]
+        try:
+            columns = [
+                name for name in self._chain_columns(table.name, manifests)
+                if name in table.columns
+            ]
+            rows = self._merged_rows(table, columns, archives, manifests, progress)
+            if conn.dialect.name == "postgresql":
+                self._copy_rows(conn, target, columns, rows)
+            else:
+                self._insert_rows(conn, target, columns, rows)
+            return columns
+        finally:
+            for archive in archives:
+                archive.close()
+    
+    @staticmethod
+    def _reset_sequence(conn, table: Table):
+        """Move a serial key's sequence past the restored ids (PostgreSQL).
+
+        COPY and executemany write explicit ids, so without this the next
+        INSERT collides with a restored row.
+        """
+        key = list(table.primary_key.columns)
+        if conn.dialect.name != "postgresql" or len(key) != 1 or not isinstance(key[0].type, Integer):
+            return
+        quote = conn.dialect.identifier_preparer.quote
+        conn.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence(:table, :column), "
+                f"COALESCE(MAX({quote(key[0].name)}), 0) + 1, false) FROM {quote(table.name)}"
+            ),
+            {"table": quote(table.name), "column": key[0].name}
+        )
+    
+    @staticmethod
+    def _chain_columns(table_name: str, manifests: List[Dict[str, Any]]) -> List[str]:
+        """Columns of the newest archive that holds the table"""
+        for manifest in manifests:
+            if table_name in manifest["tables"]:
+                return manifest["tables"][table_name]["columns"]
+        return []
+    
+    def _merged_rows(self, table: Table, columns: List[str], archives: List[zipfile.ZipFile],
+                     manifests: List[Dict[str, Any]], progress: TableProgress):
+        """Rows (values in ``columns`` order) of the newest version of each key.
+
+        Archives are read newest first and a row is kept the first time its
+        primary key is seen, so every row is written once. A table's merge
+        stops at the first archive that exported it whole. If the newest
+        archive exported only changes, rows whose key is not in its key list
+        were deleted after an older archive was taken and are skipped.
+        """
+        seen = set()
+        live = None
+        newest = True
+        for archive, manifest in zip(archives, manifests):
+            info = manifest["tables"].get(table.name)
+            if info is None:
+                continue
+            
+            backup_format = BackupFormat(manifest.get("format", BackupFormat.CSV.value))
+            if newest and "keys" in info:
+                _, keys = read_member_rows(
+                    archive, self._key_table(table), backup_format, settings.BACKUP_CHUNK_SIZE
+                )
+                live = set(keys)
+            newest = False
+            
+            key_names = info.get("primary_key") or []
+            header, rows = read_member_rows(archive, table, backup_format, settings.BACKUP_CHUNK_SIZE)
+            positions = [header.index(name) if name in header else None for name in columns]
+            key_indexes = [header.index(name) for name in key_names if name in header]
+            
+            for row in rows:
+                if key_indexes:
+                    key = tuple(row[i] for i in key_indexes)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    if live is not None and key not in live:
+                        continue
+                progress.rows += 1
+                yield [row[i] if i is not None else None for i in positions]
+            
+            if info.get("mode", "full") == "full":
+                break
+    
+    def _insert_rows(self, conn, table: Table, columns: List[str], rows):
+        """executemany in BACKUP_CHUNK_SIZE batches"""
+        statement = insert(table)
+        batch = []
+        for row in rows:
+            batch.append(dict(zip(columns, row)))
+            if len(batch) >= settings.BACKUP_CHUNK_SIZE:
+                conn.execute(statement, batch)
+                batch = []
+        if batch:
+            conn.execute(statement, batch)
+    
+    @staticmethod
+    def _copy_rows(conn, table: Table, columns: List[str], rows):
+        """COPY FROM STDIN through the psycopg2 connection"""
+        def copy_value(value):
+            if value is None:
+                return "\\N"
+            if isinstance(value, (dict, list)):
+                return json.dumps(value, default=str)
+            if isinstance(value, (bytes, memoryview)):
+                return "\\x" + bytes(value).hex()
+            return value
+        
+        def chunks():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow([copy_value(value) for value in row])
+                if buffer.tell() >= 1024 * 1024:
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue().encode("utf-8")
+        
+        quote = conn.dialect.identifier_preparer.quote
+        column_list = ", ".join(quote(name) for name in columns)
+        sql = f"COPY {quote(table.name)} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(sql, _CsvChunkReader(chunks()))
+        finally:
+            cursor.close()
+    
+    def _verify_chain(self, chain: List[Dict[str, Any]], paths: List[Path],
+                      progress: Dict[str, TableProgress]) -> Dict[str, Any]:
+        """Check archives against their recorded checksums and row counts (no writes)"""
+        mismatches = []
+        verified = []
+        for info, path in zip(chain, paths):
+            if info.get("checksum") and _file_sha256(path) != info["checksum"]:
+                mismatches.append(f"{info['backup_id']}: archive checksum differs")
+                continue
+            
+            with zipfile.ZipFile(path) as archive:
+                manifest = json.loads(archive.read("metadata.json"))
+                for name, table_info in manifest["tables"].items():
+                    table_progress = progress.setdefault(
+                        f"{info['backup_id']}/{name}", TableProgress(name)
+                    )
+                    table_progress.status = "verifying"
+                    table_progress.started_at = time.monotonic()
+                    
+                    rows, size, checksum = member_stats(
+                        archive, name, BackupFormat(manifest.get("format", BackupFormat.CSV.value))
+                    )
+                    table_progress.rows = rows
+                    table_progress.bytes = size
+                    table_progress.checksum = checksum
+                    table_progress.finished_at = time.monotonic()
+                    
+                    problems = []
+                    if rows != table_info["rows"]:
+                        problems.append(f"{rows} rows, expected {table_info['rows']}")
+                    if table_info.get("sha256") and table_progress.checksum != table_info["sha256"]:
+                        problems.append("checksum differs")
+                    if "keys" in table_info:
+                        key_rows, _, key_checksum = member_stats(
+                            archive, f"{name}{_KEYS_SUFFIX}",
+                            BackupFormat(manifest.get("format", BackupFormat.CSV.value))
+                        )
+                        if (key_rows, key_checksum) != (table_info["keys"]["rows"], table_info["keys"]["sha256"]):
+                            problems.append("key list differs")
+                    if problems:
+                        table_progress.status = "failed"
+                        mismatches.append(f"{info['backup_id']}/{name}: {', '.join(problems)}")
+                    else:
+                        table_progress.status = "verified"
+            verified.append(info["backup_id"])
+        
+        if mismatches:
+            raise ValueError(f"Backup verification failed: {'; '.join(mismatches)}")
+        return {
+            "verified": True,
+            "backups": verified,
+            "tables": len(progress),
+            "rows": sum(p.rows for p in progress.values())
+        }
+    
+    async def _report_restore_progress(self, restore_id: str, progress: Dict[str, TableProgress]):
+        """Write running restore progress to the restore log"""
+        while True:
+            await asyncio.sleep(settings.BACKUP_RESTORE_PROGRESS_INTERVAL)
+            try:
+                db = next(get_db())
+                restore_log = db.query(RestoreLogModel).filter(
+                    RestoreLogModel.restore_id == restore_id
+                ).first()
+                if restore_log:
+                    tables = [p.to_dict() for p in list(progress.values())]
+                    restore_log.tables_restored = sum(
+                        1 for t in tables if t["status"] in ("restored", "verified")
+                    )
+                    restore_log.records_restored = sum(t["rows"] for t in tables)
+                    restore_log.restore_metadata = {"tables": tables}
+                    db.commit()
+            except Exception as e:
+                logger.warning(f"Failed to record restore progress: {e}")
+            finally:
+                db.close()
+    
+    def read_backup_table(self, backup_path: Union[str, Path], table: str,
+                          columns: Optional[List[str]] = None):
+        """One table (optionally some columns) of a backup archive as a pyarrow Table.
+
+        Reads only that table's member, so analytics jobs and partial
+        restores need not unpack the archive.
+        """
+        return read_archive_table(Path(backup_path), table, columns)
+    
+    def get_restore_progress(self, restore_id: str) -> Optional[Dict[str, Any]]:
+        """Restore progress as last written to the restore log"""
+        db = next(get_db())
+        try:
+            restore_log = db.query(RestoreLogModel).filter(
+                RestoreLogModel.restore_id == restore_id
+            ).first()
+            if not restore_log:
+                return None
+            metadata = restore_log.restore_metadata or {}
+            return {
+                "restore_id": restore_id,
+                "backup_id": restore_log.backup_id,
+                "status": restore_log.status,
+                "restore_type": restore_log.restore_type,
+                "tables_restored": restore_log.tables_restored or 0,
+                "records_restored": restore_log.records_restored or 0,
+                "error_message": restore_log.error_message,
+                "tables": metadata.get("tables", []),
+                "verification": metadata.get("verification")
+            }
+        finally:
+            db.close()
+    
+    async def _download_backup_if_needed(self, backup_info: Dict[str, Any],
+                                       restore_options: Dict[str, Any]) -> Path:
+        """Local path of a backup archive, downloading it from S3 if needed"""
+        storage_path = backup_info["storage_path"]
+        if backup_info["storage_location"] == BackupStorage.LOCAL.value:
+            return Path(storage_path)
+        
+        if backup_info["storage_location"] == BackupStorage.S3.value:
+            if not self.s3_client:
+                raise ValueError("S3 client not configured")
+            bucket_name, _, s3_key = storage_path[len("s3://"):].partition("/")
+            local_path = self.temp_dir / Path(s3_key).name
+            if not local_path.exists():
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(
+                    None, self.s3_client.download_file, bucket_name, s3_key, str(local_path)
+                )
+            return local_path
+        # TODO: Add other storage providers
+        
+        raise ValueError(f"Unsupported storage location: {backup_info['storage_location']}")
+    
+    async def _create_restore_log(self, restore_id: str, backup_id: str,
+                                status: RestoreStatus,
+                                user_id: Optional[int] = None,
+                                restore_type: str = BackupType.FULL.value) -> RestoreLogModel:
+        """Create restore log entry"""
+        try:
+            db = next(get_db())
+            
+            restore_log = RestoreLogModel(
+                restore_id=restore_id,
+                backup_id=backup_id,
+                status=status.value,
+                restore_type=restore_type,
+                started_at=datetime.utcnow(),
+                restored_by_user_id=user_id
+            )
+            
+            db.add(restore_log)
+            db.commit()
+            
+            return restore_log
+            
+        except Exception as e:
+            logger.error(f"Failed to create restore log: {e}")
+            raise
+        finally:
+            db.close()
+    
+    async def _update_restore_log(self, restore_id: str, status: RestoreStatus,
+                                result: Dict[str, Any]):
+        """Update restore log with results"""
+        try:
+            db = next(get_db())
+            
+            restore_log = db.query(RestoreLogModel).filter(
+                RestoreLogModel.restore_id == restore_id
+            ).first()
+            
+            if restore_log:
+                restore_log.status = status.value
+                restore_log.completed_at = datetime.utcnow()
+                restore_log.duration_seconds = int(
+                    (restore_log.completed_at - restore_log.started_at).total_seconds()
+                )
+                
+                if status == RestoreStatus.COMPLETED:
+                    restore_log.tables_restored = result.get("tables_restored", 0)
+                    restore_log.records_restored = result.get("records_restored", 0)
+                    restore_log.restore_metadata = {
+                        "chain": result.get("chain", []),
+                        "tables": result.get("tables", []),
+                        "verification": result.get("verification")
+                    }
+                elif status == RestoreStatus.FAILED:
+                    restore_log.error_message = result.get("error", "")
+                
+                db.commit()
+            
+        except Exception as e:
+            logger.error(f"Failed to update restore log: {e}")
+        finally:
+            db.close()
     
     async def _get_backup_info(self, backup_id: str) -> Optional[Dict[str, Any]]:
         """Get backup information"""
@@ -754,7 +1696,13 @@ class BackupService:
                     "storage_location": backup.storage_location,
                     "storage_path": backup.storage_path,
                     "size_bytes": backup.size_bytes,
-                    "created_at": backup.created_at
+                    "record_count": backup.record_count,
+                    "checksum": backup.checksum,
+                    "created_at": backup.created_at,
+                    "status": backup.status,
+                    "watermark": backup.watermark,
+                    "parent_backup_id": backup.parent_backup_id,
+                    "base_backup_id": backup.base_backup_id
                 }
             
             return None
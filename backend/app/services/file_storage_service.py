@@ -15,7 +15,11 @@ import cv2
 import numpy as np
 from fastapi import UploadFile, HTTPException
 import logging
+from sqlalchemy import Column, Integer, String, DateTime, JSON, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
 from ..core.config import settings
+from ..core.database import Base, engine
 import json
 from urllib.parse import urlparse
 import requests
@@ -23,6 +27,8 @@ from io import BytesIO
 import zipfile
 import tempfile
 import shutil
+import asyncio
+from contextlib import asynccontextmanager
 
 logger = logging.getLogger(__name__)
 
@@ -83,6 +89,55 @@ class UploadResult:
     error_message: Optional[str] = None
     processing_time: Optional[float] = None
 
+@dataclass
+class StoredBlob:
+    """A stored object, shared by every upload with the same content"""
+    digest: str  # SHA-256 of the stored bytes
+    storage_path: str
+    public_url: str
+    size_bytes: int
+    mime_type: Optional[str] = None
+    ref_count: int = 0
+    thumbnail_path: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    created_at: datetime = None
+
+class StoredFileModel(Base):
+    """Uploaded file database model"""
+    __tablename__ = "stored_files"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    file_id = Column(String(36), unique=True, nullable=False, index=True)
+    original_name = Column(String(255), nullable=False)
+    file_type = Column(String(20), nullable=False, index=True)
+    mime_type = Column(String(100), nullable=True)
+    size_bytes = Column(Integer, nullable=False)
+    checksum = Column(String(64), nullable=False, index=True)
+    
+    # Storage location
+    storage_provider = Column(String(20), nullable=False)
+    storage_path = Column(String(500), nullable=False)
+    public_url = Column(String(1000), nullable=True)
+    thumbnail_url = Column(String(1000), nullable=True)
+    
+    file_metadata = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    expires_at = Column(DateTime, nullable=True, index=True)
+
+class StoredBlobModel(Base):
+    """Content-addressed blob database model; one row per stored object"""
+    __tablename__ = "stored_blobs"
+    
+    digest = Column(String(64), primary_key=True)  # SHA-256 of the stored bytes
+    storage_path = Column(String(500), nullable=False)
+    public_url = Column(String(1000), nullable=True)
+    size_bytes = Column(Integer, nullable=False)
+    mime_type = Column(String(100), nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)  # stored_files rows using the blob
+    thumbnail_path = Column(String(500), nullable=True)
+    thumbnail_url = Column(String(1000), nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+
 class FileStorageService:
     """Advanced file storage and management service"""
     
@@ -98,9 +153,16 @@ class FileStorageService:
             FileType.BACKUP: {'.zip', '.tar', '.gz', '.bak', '.sql'}
         }
         
+        # File metadata and content-addressed blobs live in the database
+        self.engine = engine
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self._blob_locks: Dict[str, asyncio.Lock] = {}
+        self._blob_lock_users: Dict[str, int] = {}
+        
         # Initialize storage providers
         self._init_local_storage()
         self._init_cloud_storage()
+        self._init_metadata_store()
         
     def _init_local_storage(self):
         """Initialize local storage directories"""
@@ -130,6 +192,17 @@ class FileStorageService:
             logger.warning(f"Could not initialize cloud storage: {e}")
             self.s3_client = None
     
+    def _init_metadata_store(self):
+        """Create the metadata tables and import any JSON metadata left from older versions"""
+        try:
+            Base.metadata.create_all(
+                bind=self.engine,
+                tables=[StoredFileModel.__table__, StoredBlobModel.__table__]
+            )
+            self.migrate_json_metadata()
+        except Exception as e:
+            logger.error(f"Could not initialize file metadata store: {e}")
+    
     async def upload_file(
         self,
         file: UploadFile,
@@ -158,13 +231,6 @@ class FileStorageService:
             
             # Read file content
             file_content = await file.read()
-            file_checksum = hashlib.md5(file_content).hexdigest()
-            
-            # Determine storage path
-            if custom_path:
-                storage_path = custom_path
-            else:
-                storage_path = f"{file_type.value}/{file_id}{file_extension}"
             
             # Process file based on type
             processed_content = file_content
@@ -175,55 +241,105 @@ class FileStorageService:
                     file_content, file_id, processing_options
                 )
             
-            # Store file
-            storage_result = await self._store_file(
-                processed_content,
-                storage_path,
-                file.content_type
-            )
-            
-            if not storage_result['success']:
-                return UploadResult(
-                    success=False,
-                    error_message=storage_result['error']
-                )
-            
-            # Store thumbnail if created
-            thumbnail_url = None
-            if thumbnail_path:
-                thumbnail_storage_result = await self._store_thumbnail(
-                    thumbnail_path, file_id, file_type
+            # Files are stored under the hash of their content, so a re-upload
+            # of an existing file only adds a reference to it
+            file_checksum = hashlib.sha256(processed_content).hexdigest()
+            blob = None
+            deduplicated = False
+            
+            # Held until the upload is recorded, so the blob can't be
+            # released in between
+            async with self._blob_lock(file_checksum):
+                if custom_path:
+                    storage_path = custom_path
+                    storage_result = await self._store_file(
+                        processed_content,
+                        storage_path,
+                        file.content_type
+                    )
+                    
+                    if not storage_result['success']:
+                        return UploadResult(
+                            success=False,
+                            error_message=storage_result['error']
+                        )
+                    public_url = storage_result['url']
+                    
+                    # Store thumbnail if created
+                    thumbnail_url = None
+                    if thumbnail_path:
+                        thumbnail_storage_result = await self._store_thumbnail(
+                            thumbnail_path, file_id, file_type
+                        )
+                        if thumbnail_storage_result['success']:
+                            thumbnail_url = thumbnail_storage_result['url']
+                else:
+                    blob, deduplicated = await self._find_or_store_blob(
+                        file_checksum,
+                        processed_content,
+                        file_type,
+                        file_extension,
+                        file.content_type,
+                        thumbnail_path
+                    )
+                    storage_path = blob.storage_path
+                    public_url = blob.public_url
+                    thumbnail_url = blob.thumbnail_url
+                
+                # Calculate expiration
+                expires_at = None
+                if expires_in_days:
+                    expires_at = datetime.now() + timedelta(days=expires_in_days)
+                
+                # Create metadata
+                file_metadata = FileMetadata(
+                    file_id=file_id,
+                    original_name=file.filename,
+                    file_type=file_type,
+                    mime_type=file.content_type,
+                    size_bytes=len(processed_content),
+                    checksum=file_checksum,
+                    storage_provider=self.storage_provider,
+                    storage_path=storage_path,
+                    public_url=public_url,
+                    thumbnail_url=thumbnail_url,
+                    created_at=datetime.now(),
+                    expires_at=expires_at,
+                    metadata={
+                        'original_size': len(file_content),
+                        'processed': file_type == FileType.IMAGE and processing_options is not None,
+                        'deduplicated': deduplicated
+                    }
                 )
-                if thumbnail_storage_result['success']:
-                    thumbnail_url = thumbnail_storage_result['url']
-            
-            # Calculate expiration
-            expires_at = None
-            if expires_in_days:
-                expires_at = datetime.now() + timedelta(days=expires_in_days)
-            
-            # Create metadata
-            file_metadata = FileMetadata(
-                file_id=file_id,
-                original_name=file.filename,
-                file_type=file_type,
-                mime_type=file.content_type,
-                size_bytes=len(processed_content),
-                checksum=file_checksum,
-                storage_provider=self.storage_provider,
-                storage_path=storage_path,
-                public_url=storage_result['url'],
-                thumbnail_url=thumbnail_url,
-                created_at=datetime.now(),
-                expires_at=expires_at,
-                metadata={
-                    'original_size': len(file_content),
-                    'processed': file_type == FileType.IMAGE and processing_options is not None
-                }
-            )
-            
-            # Save metadata to database (would implement with actual DB)
-            await self._save_file_metadata(file_metadata)
+                
+                # Record the file, and its reference to the blob, in one transaction
+                for attempt in range(3):
+                    if await self._save_file_metadata(file_metadata, blob, deduplicated):
+                        break
+                    if attempt == 2:
+                        raise RuntimeError(f"Blob {file_checksum} kept being released during upload")
+                    
+                    # A worker released the blob's last reference after it was
+                    # found here, and deleted its object: store the content again
+                    blob, deduplicated = await self._find_or_store_blob(
+                        file_checksum,
+                        processed_content,
+                        file_type,
+                        file_extension,
+                        file.content_type,
+                        thumbnail_path
+                    )
+                    file_metadata.storage_path = blob.storage_path
+                    file_metadata.public_url = blob.public_url
+                    file_metadata.thumbnail_url = blob.thumbnail_url
+                    file_metadata.metadata['deduplicated'] = deduplicated
+                
+                # Nothing to store: drop the thumbnail made for this upload
+                if deduplicated and thumbnail_path:
+                    try:
+                        os.remove(thumbnail_path)
+                    except OSError:
+                        pass
             
             processing_time = (datetime.now() - start_time).total_seconds()
             
@@ -446,8 +562,15 @@ class FileStorageService:
             full_path = self.local_storage_path / storage_path
             full_path.parent.mkdir(parents=True, exist_ok=True)
             
-            async with aiofiles.open(full_path, 'wb') as f:
-                await f.write(file_content)
+            # Write then rename, so a stored path never holds a partial file
+            temp_path = full_path.with_name(f".{full_path.name}.{uuid.uuid4().hex}.tmp")
+            try:
+                async with aiofiles.open(temp_path, 'wb') as f:
+                    await f.write(file_content)
+                os.replace(temp_path, full_path)
+            finally:
+                if temp_path.exists():
+                    temp_path.unlink()
             
             # Generate public URL (would be actual URL in production)
             public_url = f"/files/{storage_path}"
@@ -517,7 +640,7 @@ class FileStorageService:
                 thumbnail_content = await f.read()
             
             # Store thumbnail
-            thumbnail_storage_path = f"{file_type.value}/thumbnails/{file_id}_thumb.jpg"
+            thumbnail_storage_path = self._thumbnail_storage_path(file_type, file_id)
             result = await self._store_file(
                 thumbnail_content,
                 thumbnail_storage_path,
@@ -539,85 +662,269 @@ class FileStorageService:
                 'error': str(e)
             }
     
-    async def _save_file_metadata(self, metadata: FileMetadata):
-        """Save file metadata to database"""
-        # In a real implementation, this would save to the database
-        # For now, we'll save to a JSON file
+    def _thumbnail_storage_path(self, file_type: FileType, name: str) -> str:
+        """Storage path of the thumbnail of a file (or of a blob, by digest)"""
+        return f"{file_type.value}/thumbnails/{name}_thumb.jpg"
+    
+    @asynccontextmanager
+    async def _blob_lock(self, digest: str):
+        """Serialize reference changes to one blob in this process; other blobs are not held up.
+        
+        Workers do not share these locks. Across workers, ``_release_blob``
+        and ``_save_file_metadata`` rely on the blob row's lock instead.
+        """
+        lock = self._blob_locks.setdefault(digest, asyncio.Lock())
+        self._blob_lock_users[digest] = self._blob_lock_users.get(digest, 0) + 1
         try:
-            metadata_file = self.local_storage_path / "metadata.json"
-            
-            # Load existing metadata
-            existing_metadata = []
-            if metadata_file.exists():
-                async with aiofiles.open(metadata_file, 'r') as f:
-                    content = await f.read()
-                    if content:
-                        existing_metadata = json.loads(content)
-            
-            # Add new metadata
-            metadata_dict = {
-                'file_id': metadata.file_id,
-                'original_name': metadata.original_name,
-                'file_type': metadata.file_type.value,
-                'mime_type': metadata.mime_type,
-                'size_bytes': metadata.size_bytes,
-                'checksum': metadata.checksum,
-                'storage_provider': metadata.storage_provider.value,
-                'storage_path': metadata.storage_path,
-                'public_url': metadata.public_url,
-                'thumbnail_url': metadata.thumbnail_url,
-                'created_at': metadata.created_at.isoformat() if metadata.created_at else None,
-                'expires_at': metadata.expires_at.isoformat() if metadata.expires_at else None,
-                'metadata': metadata.metadata
-            }
+            async with lock:
+                yield
+        finally:
+            self._blob_lock_users[digest] -= 1
+            if not self._blob_lock_users[digest]:
+                del self._blob_lock_users[digest]
+                del self._blob_locks[digest]
+    
+    async def _find_or_store_blob(
+        self,
+        digest: str,
+        content: bytes,
+        file_type: FileType,
+        file_extension: str,
+        content_type: str,
+        thumbnail_path: Optional[str] = None
+    ) -> tuple[StoredBlob, bool]:
+        """The blob holding ``content``, storing it if it is new (caller holds its lock).
+        
+        Returns the blob and whether it was already stored.
+        """
+        blob = self._get_blob(digest)
+        if blob is not None:
+            logger.debug(f"Upload matches stored blob {digest} ({blob.ref_count} references)")
+            return blob, True
+        
+        storage_path = f"{file_type.value}/{digest[:2]}/{digest}{file_extension}"
+        storage_result = await self._store_file(content, storage_path, content_type)
+        if not storage_result['success']:
+            raise RuntimeError(storage_result['error'])
+        
+        blob = StoredBlob(
+            digest=digest,
+            storage_path=storage_path,
+            public_url=storage_result['url'],
+            size_bytes=len(content),
+            mime_type=content_type,
+            created_at=datetime.now()
+        )
+        
+        if thumbnail_path:
+            thumbnail_storage_result = await self._store_thumbnail(
+                thumbnail_path, digest, file_type
+            )
+            if thumbnail_storage_result['success']:
+                blob.thumbnail_path = self._thumbnail_storage_path(file_type, digest)
+                blob.thumbnail_url = thumbnail_storage_result['url']
+        
+        return blob, False
+    
+    def _get_blob(self, digest: str) -> Optional[StoredBlob]:
+        """Stored blob by content digest"""
+        db = self.SessionLocal()
+        try:
+            row = db.query(StoredBlobModel).filter(StoredBlobModel.digest == digest).first()
+            if not row:
+                return None
             
-            existing_metadata.append(metadata_dict)
+            return StoredBlob(
+                digest=row.digest,
+                storage_path=row.storage_path,
+                public_url=row.public_url,
+                size_bytes=row.size_bytes,
+                mime_type=row.mime_type,
+                ref_count=row.ref_count,
+                thumbnail_path=row.thumbnail_path,
+                thumbnail_url=row.thumbnail_url,
+                created_at=row.created_at
+            )
+        finally:
+            db.close()
+    
+    async def _release_blob(self, blob: StoredBlob, file_id: str) -> bool:
+        """Delete a file's record and its reference to its blob (caller holds the blob's lock).
+        
+        The blob is deleted with its last reference. Its objects are removed
+        before the transaction commits, while the blob row is still locked:
+        an upload in another worker that found the blob waits on that lock,
+        then sees its reference UPDATE match nothing and stores the content
+        again instead of pointing at a deleted object.
+        """
+        db = self.SessionLocal()
+        try:
+            removed = db.query(StoredFileModel).filter(
+                StoredFileModel.file_id == file_id
+            ).delete(synchronize_session=False)
+            if not removed:
+                db.rollback()
+                return False
             
-            # Save updated metadata
-            async with aiofiles.open(metadata_file, 'w') as f:
-                await f.write(json.dumps(existing_metadata, indent=2))
+            db.query(StoredBlobModel).filter(
+                StoredBlobModel.digest == blob.digest
+            ).update(
+                {StoredBlobModel.ref_count: StoredBlobModel.ref_count - 1},
+                synchronize_session=False
+            )
+            released = db.query(StoredBlobModel).filter(
+                StoredBlobModel.digest == blob.digest,
+                StoredBlobModel.ref_count <= 0
+            ).delete(synchronize_session=False)
+            
+            if released:
+                await self._delete_stored_object(blob.storage_path)
+                if blob.thumbnail_path:
+                    await self._delete_stored_object(blob.thumbnail_path)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        
+        return True
+    
+    async def _delete_stored_object(self, storage_path: str):
+        """Delete an object from the configured storage provider"""
+        if self.storage_provider == StorageProvider.LOCAL:
+            file_path = self.local_storage_path / storage_path
+            if file_path.exists():
+                file_path.unlink()
+        
+        elif self.storage_provider == StorageProvider.AWS_S3 and self.s3_client:
+            self.s3_client.delete_object(
+                Bucket=self.s3_bucket,
+                Key=storage_path
+            )
+    
+    async def _save_file_metadata(self, metadata: FileMetadata, blob: Optional[StoredBlob] = None,
+                                  deduplicated: bool = False) -> bool:
+        """Save file metadata to database, with its reference to ``blob``.
+        
+        Returns False, recording nothing, when ``blob`` was found already
+        stored (``deduplicated``) but has since been released.
+        """
+        for attempt in range(2):
+            db = self.SessionLocal()
+            try:
+                if blob is not None:
+                    referenced = db.query(StoredBlobModel).filter(
+                        StoredBlobModel.digest == blob.digest
+                    ).update(
+                        {StoredBlobModel.ref_count: StoredBlobModel.ref_count + 1},
+                        synchronize_session=False
+                    )
+                    if not referenced:
+                        if deduplicated:
+                            # Its last reference was released and its object deleted
+                            db.rollback()
+                            return False
+                        db.add(StoredBlobModel(
+                            digest=blob.digest,
+                            storage_path=blob.storage_path,
+                            public_url=blob.public_url,
+                            size_bytes=blob.size_bytes,
+                            mime_type=blob.mime_type,
+                            ref_count=1,
+                            thumbnail_path=blob.thumbnail_path,
+                            thumbnail_url=blob.thumbnail_url,
+                            created_at=blob.created_at
+                        ))
                 
-        except Exception as e:
-            logger.error(f"Error saving file metadata: {e}")
+                db.add(StoredFileModel(**self._file_metadata_row(metadata)))
+                db.commit()
+                return True
+                
+            except IntegrityError:
+                db.rollback()
+                # Another worker recorded the same new blob first: reference it
+                if blob is None or attempt:
+                    raise
+            finally:
+                db.close()
+    
+    def _file_metadata_row(self, metadata: FileMetadata) -> Dict[str, Any]:
+        """Column values of a stored_files row"""
+        return {
+            'file_id': metadata.file_id,
+            'original_name': metadata.original_name,
+            'file_type': metadata.file_type.value,
+            'mime_type': metadata.mime_type,
+            'size_bytes': metadata.size_bytes,
+            'checksum': metadata.checksum,
+            'storage_provider': metadata.storage_provider.value,
+            'storage_path': metadata.storage_path,
+            'public_url': metadata.public_url,
+            'thumbnail_url': metadata.thumbnail_url,
+            'created_at': metadata.created_at,
+            'expires_at': metadata.expires_at,
+            'file_metadata': metadata.metadata
+        }
+    
+    def _to_file_metadata(self, row: StoredFileModel) -> FileMetadata:
+        return FileMetadata(
+            file_id=row.file_id,
+            original_name=row.original_name,
+            file_type=FileType(row.file_type),
+            mime_type=row.mime_type,
+            size_bytes=row.size_bytes,
+            checksum=row.checksum,
+            storage_provider=StorageProvider(row.storage_provider),
+            storage_path=row.storage_path,
+            public_url=row.public_url,
+            thumbnail_url=row.thumbnail_url,
+            created_at=row.created_at,
+            expires_at=row.expires_at,
+            metadata=row.file_metadata
+        )
     
     async def get_file_metadata(self, file_id: str) -> Optional[FileMetadata]:
         """Get file metadata by ID"""
+        db = self.SessionLocal()
         try:
-            metadata_file = self.local_storage_path / "metadata.json"
-            
-            if not metadata_file.exists():
-                return None
+            row = db.query(StoredFileModel).filter(StoredFileModel.file_id == file_id).first()
+            return self._to_file_metadata(row) if row else None
             
-            async with aiofiles.open(metadata_file, 'r') as f:
-                content = await f.read()
-                if not content:
-                    return None
-                
-                metadata_list = json.loads(content)
-                
-                for metadata_dict in metadata_list:
-                    if metadata_dict['file_id'] == file_id:
-                        return FileMetadata(
-                            file_id=metadata_dict['file_id'],
-                            original_name=metadata_dict['original_name'],
-                            file_type=FileType(metadata_dict['file_type']),
-                            mime_type=metadata_dict['mime_type'],
-                            size_bytes=metadata_dict['size_bytes'],
-                            checksum=metadata_dict['checksum'],
-                            storage_provider=StorageProvider(metadata_dict['storage_provider']),
-                            storage_path=metadata_dict['storage_path'],
-                            public_url=metadata_dict['public_url'],
-                            thumbnail_url=metadata_dict['thumbnail_url'],
-                            created_at=datetime.fromisoformat(metadata_dict['created_at']) if metadata_dict['created_at'] else None,
-                            expires_at=datetime.fromisoformat(metadata_dict['expires_at']) if metadata_dict['expires_at'] else None,
-                            metadata=metadata_dict['metadata']
-                        )
-                
-                return None
-                
         except Exception as e:
             logger.error(f"Error getting file metadata: {e}")
             return None
+        finally:
+            db.close()
+    
+    async def find_files(
+        self,
+        checksum: Optional[str] = None,
+        file_type: Optional[FileType] = None,
+        expires_before: Optional[datetime] = None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> List[FileMetadata]:
+        """Files matching a content checksum, type and/or expiry, newest first"""
+        db = self.SessionLocal()
+        try:
+            query = db.query(StoredFileModel)
+            
+            if checksum:
+                query = query.filter(StoredFileModel.checksum == checksum)
+            if file_type:
+                query = query.filter(StoredFileModel.file_type == file_type.value)
+            if expires_before:
+                query = query.filter(StoredFileModel.expires_at <= expires_before)
+            
+            rows = query.order_by(StoredFileModel.id.desc()).offset(offset).limit(limit).all()
+            return [self._to_file_metadata(row) for row in rows]
+            
+        except Exception as e:
+            logger.error(f"Error finding files: {e}")
+            return []
+        finally:
+            db.close()
     
     async def delete_file(self, file_id: str) -> bool:
         """Delete file and its metadata"""
@@ -627,66 +934,136 @@ class FileStorageService:
             if not metadata:
                 return False
             
-            # Delete file from storage
-            if self.storage_provider == StorageProvider.LOCAL:
-                file_path = self.local_storage_path / metadata.storage_path
-                if file_path.exists():
-                    file_path.unlink()
+            async with self._blob_lock(metadata.checksum):
+                blob = self._get_blob(metadata.checksum)
+                if blob and blob.storage_path == metadata.storage_path:
+                    # Shared blob: only deleted with its last reference
+                    return await self._release_blob(blob, file_id)
                 
-                # Delete thumbnail if exists
-                if metadata.thumbnail_url:
-                    thumbnail_path = self.local_storage_path / f"{metadata.file_type.value}/thumbnails/{file_id}_thumb.jpg"
-                    if thumbnail_path.exists():
-                        thumbnail_path.unlink()
-            
-            elif self.storage_provider == StorageProvider.AWS_S3 and self.s3_client:
-                # Delete from S3
-                self.s3_client.delete_object(
-                    Bucket=self.s3_bucket,
-                    Key=metadata.storage_path
-                )
+                # Stored before content addressing, or at a custom path: the
+                # file owns its objects
+                if not await self._remove_file_metadata(file_id):
+                    return False
                 
-                # Delete thumbnail from S3
+                await self._delete_stored_object(metadata.storage_path)
                 if metadata.thumbnail_url:
-                    thumbnail_key = f"{metadata.file_type.value}/thumbnails/{file_id}_thumb.jpg"
-                    self.s3_client.delete_object(
-                        Bucket=self.s3_bucket,
-                        Key=thumbnail_key
+                    await self._delete_stored_object(
+                        self._thumbnail_storage_path(metadata.file_type, file_id)
                     )
             
-            # Remove metadata
-            await self._remove_file_metadata(file_id)
-            
             return True
             
         except Exception as e:
             logger.error(f"Error deleting file: {e}")
             return False
     
-    async def _remove_file_metadata(self, file_id: str):
-        """Remove file metadata from storage"""
+    async def _remove_file_metadata(self, file_id: str) -> bool:
+        """Remove file metadata from storage; returns whether it was there"""
+        db = self.SessionLocal()
         try:
-            metadata_file = self.local_storage_path / "metadata.json"
-            
-            if not metadata_file.exists():
-                return
-            
-            async with aiofiles.open(metadata_file, 'r') as f:
-                content = await f.read()
-                if not content:
-                    return
-                
-                metadata_list = json.loads(content)
+            removed = db.query(StoredFileModel).filter(
+                StoredFileModel.file_id == file_id
+            ).delete(synchronize_session=False)
+            db.commit()
+            return bool(removed)
             
-            # Remove metadata for the file
-            updated_metadata = [m for m in metadata_list if m['file_id'] != file_id]
-            
-            # Save updated metadata
-            async with aiofiles.open(metadata_file, 'w') as f:
-                await f.write(json.dumps(updated_metadata, indent=2))
-                
         except Exception as e:
+            db.rollback()
             logger.error(f"Error removing file metadata: {e}")
+            return False
+        finally:
+            db.close()
+    
+    def migrate_json_metadata(self) -> int:
+        """Import metadata.json (and blobs.json) from older versions into the database.
+        
+        Imported files are renamed to ``*.migrated``; returns the number of
+        files imported.
+        """
+        metadata_file = self.local_storage_path / "metadata.json"
+        blob_index_file = self.local_storage_path / "blobs.json"
+        if not metadata_file.exists():
+            return 0
+        
+        with open(metadata_file, 'r') as f:
+            content = f.read()
+        metadata_list = json.loads(content) if content else []
+        
+        blob_index = {}
+        if blob_index_file.exists():
+            with open(blob_index_file, 'r') as f:
+                content = f.read()
+            blob_index = json.loads(content) if content else {}
+        
+        def parse_datetime(value):
+            return datetime.fromisoformat(value) if value else None
+        
+        db = self.SessionLocal()
+        try:
+            known_files = {file_id for (file_id,) in db.query(StoredFileModel.file_id)}
+            known_blobs = {digest for (digest,) in db.query(StoredBlobModel.digest)}
+            
+            file_rows = []
+            ref_counts: Dict[str, int] = {}
+            for metadata_dict in metadata_list:
+                blob_dict = blob_index.get(metadata_dict['checksum'])
+                if blob_dict and blob_dict['storage_path'] == metadata_dict['storage_path']:
+                    ref_counts[metadata_dict['checksum']] = ref_counts.get(metadata_dict['checksum'], 0) + 1
+                
+                if metadata_dict['file_id'] in known_files:
+                    continue
+                known_files.add(metadata_dict['file_id'])
+                file_rows.append({
+                    'file_id': metadata_dict['file_id'],
+                    'original_name': metadata_dict['original_name'],
+                    'file_type': metadata_dict['file_type'],
+                    'mime_type': metadata_dict['mime_type'],
+                    'size_bytes': metadata_dict['size_bytes'],
+                    'checksum': metadata_dict['checksum'],
+                    'storage_provider': metadata_dict['storage_provider'],
+                    'storage_path': metadata_dict['storage_path'],
+                    'public_url': metadata_dict['public_url'],
+                    'thumbnail_url': metadata_dict['thumbnail_url'],
+                    'created_at': parse_datetime(metadata_dict['created_at']),
+                    'expires_at': parse_datetime(metadata_dict['expires_at']),
+                    'file_metadata': metadata_dict['metadata']
+                })
+            
+            # Reference counts are recounted from the imported records
+            blob_rows = [
+                {
+                    'digest': digest,
+                    'storage_path': blob_index[digest]['storage_path'],
+                    'public_url': blob_index[digest]['public_url'],
+                    'size_bytes': blob_index[digest]['size_bytes'],
+                    'mime_type': blob_index[digest].get('mime_type'),
+                    'ref_count': ref_count,
+                    'thumbnail_path': blob_index[digest].get('thumbnail_path'),
+                    'thumbnail_url': blob_index[digest].get('thumbnail_url'),
+                    'created_at': parse_datetime(blob_index[digest].get('created_at'))
+                }
+                for digest, ref_count in ref_counts.items()
+                if digest not in known_blobs
+            ]
+            
+            db.bulk_insert_mappings(StoredFileModel, file_rows)
+            db.bulk_insert_mappings(StoredBlobModel, blob_rows)
+            db.commit()
+            
+        except IntegrityError:
+            # Another worker is importing the same files
+            db.rollback()
+            logger.info("File metadata is being migrated by another worker")
+            return 0
+        finally:
+            db.close()
+        
+        metadata_file.replace(metadata_file.with_name("metadata.json.migrated"))
+        if blob_index_file.exists():
+            blob_index_file.replace(blob_index_file.with_name("blobs.json.migrated"))
+        
+        logger.info(f"Migrated {len(file_rows)} file records from {metadata_file} to the database")
+        return len(file_rows)
     
     async def create_backup_archive(
         self,
@@ -739,30 +1116,15 @@ class FileStorageService:
     async def cleanup_expired_files(self):
         """Clean up expired files"""
         try:
-            metadata_file = self.local_storage_path / "metadata.json"
-            
-            if not metadata_file.exists():
-                return
-            
-            async with aiofiles.open(metadata_file, 'r') as f:
-                content = await f.read()
-                if not content:
-                    return
-                
-                metadata_list = json.loads(content)
-            
-            current_time = datetime.now()
-            expired_files = []
-            active_files = []
-            
-            for metadata_dict in metadata_list:
-                if metadata_dict.get('expires_at'):
-                    expires_at = datetime.fromisoformat(metadata_dict['expires_at'])
-                    if expires_at <= current_time:
-                        expired_files.append(metadata_dict['file_id'])
-                        continue
-                
-                active_files.append(metadata_dict)
+            db = self.SessionLocal()
+            try:
+                expired_files = [
+                    file_id for (file_id,) in db.query(StoredFileModel.file_id).filter(
+                        StoredFileModel.expires_at <= datetime.now()
+                    )
+                ]
+            finally:
+                db.close()
             
             # Delete expired files
             for file_id in expired_files:
@@ -776,6 +1138,7 @@ class FileStorageService:
     
     def get_storage_stats(self) -> Dict[str, Any]:
         """Get storage statistics"""
+        db = self.SessionLocal()
         try:
             stats = {
                 'total_files': 0,
@@ -784,30 +1147,29 @@ class FileStorageService:
                 'storage_provider': self.storage_provider.value
             }
             
-            metadata_file = self.local_storage_path / "metadata.json"
-            
-            if metadata_file.exists():
-                with open(metadata_file, 'r') as f:
-                    content = f.read()
-                    if content:
-                        metadata_list = json.loads(content)
-                        
-                        stats['total_files'] = len(metadata_list)
-                        
-                        for metadata_dict in metadata_list:
-                            file_type = metadata_dict['file_type']
-                            size_bytes = metadata_dict['size_bytes']
-                            
-                            stats['total_size_bytes'] += size_bytes
-                            
-                            if file_type not in stats['files_by_type']:
-                                stats['files_by_type'][file_type] = {
-                                    'count': 0,
-                                    'total_size_bytes': 0
-                                }
-                            
-                            stats['files_by_type'][file_type]['count'] += 1
-                            stats['files_by_type'][file_type]['total_size_bytes'] += size_bytes
+            by_type = db.query(
+                StoredFileModel.file_type,
+                func.count(StoredFileModel.id),
+                func.coalesce(func.sum(StoredFileModel.size_bytes), 0)
+            ).group_by(StoredFileModel.file_type)
+            
+            for file_type, count, size_bytes in by_type:
+                stats['total_files'] += count
+                stats['total_size_bytes'] += size_bytes
+                stats['files_by_type'][file_type] = {
+                    'count': count,
+                    'total_size_bytes': size_bytes
+                }
+            
+            unique_blobs, deduplicated_bytes = db.query(
+                func.count(StoredBlobModel.digest),
+                func.coalesce(func.sum((StoredBlobModel.ref_count - 1) * StoredBlobModel.size_bytes), 0)
+            ).one()
+            stats['unique_blobs'] = unique_blobs
+            stats['deduplicated_bytes'] = deduplicated_bytes
+            
+            # Bytes actually held by the storage provider
+            stats['stored_size_bytes'] = stats['total_size_bytes'] - deduplicated_bytes
             
             return stats
             
@@ -816,6 +1178,8 @@ class FileStorageService:
             return {
                 'error': str(e)
             }
+        finally:
+            db.close()
 
 # Global instance
 file_storage_service = FileStorageService()
\ No newline at end of file
@@ -0,0 +1,211 @@
+from typing import Dict, Any, Optional, List, Tuple
+from dataclasses import dataclass, field
+from datetime import date
+import logging
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+from ..models.membership import Payment, PaymentStatus
+from ..models.rollup import DailyRevenueRollup
+from .rollup_service import rollup_service, status_name, PAYMENT_DAY, REVENUE_ROLLUP
+
+logger = logging.getLogger(__name__)
+
+# Enum columns and rollups store member names
+PAID_STATUS = PaymentStatus.PAID.name
+# Payments that were due but not collected
+FAILED_STATUSES = (PaymentStatus.OVERDUE.name, PaymentStatus.CANCELLED.name)
+
+@dataclass
+class PaymentAggregate:
+    """Payment totals for a date window"""
+    total_payments: int = 0
+    payments_by_status: Dict[Any, int] = field(default_factory=dict)
+    completed_payments: int = 0
+    total_revenue: float = 0.0
+    revenue_by_method: Dict[Any, Dict[str, float]] = field(default_factory=dict)
+    revenue_by_type: Dict[Any, Dict[str, float]] = field(default_factory=dict)
+    daily_revenue: List[Tuple[date, float]] = field(default_factory=list)
+
+    @property
+    def average_payment(self) -> float:
+        """Average completed payment amount"""
+        if not self.completed_payments:
+            return 0.0
+        return self.total_revenue / self.completed_payments
+
+    def count_for(self, *statuses: str) -> int:
+        """Get payment count for one or more status names"""
+        return sum(
+            count for key, count in self.payments_by_status.items()
+            if status_name(key) in statuses
+        )
+
+    def revenue_between(self, start: Optional[date] = None, end: Optional[date] = None) -> float:
+        """Sum the daily series over a sub-range"""
+        return sum(
+            revenue for day, revenue in self.daily_revenue
+            if (start is None or day >= start) and (end is None or day <= end)
+        )
+
+class PaymentStatsService:
+    """Shared aggregation layer for payment statistics and reports.
+
+    Everything the stats and report endpoints need comes from two scans of
+    ``payments``: one grouped by status, method and type for the window, and
+    one grouped by day with conditional aggregation for the revenue series.
+    Once the revenue rollup is backfilled the same two scans run against
+    ``daily_revenue_rollups`` instead, whose size grows with days rather
+    than payments. Both paths put a payment on ``PAYMENT_DAY`` (paid date,
+    else due date), so switching to rollups does not change any figure.
+    """
+
+    def aggregate(self, db: Session,
+                  date_from: Optional[date] = None,
+                  date_to: Optional[date] = None,
+                  payment_method: Optional[str] = None,
+                  payment_type: Optional[str] = None,
+                  series_from: Optional[date] = None,
+                  series_to: Optional[date] = None) -> PaymentAggregate:
+        """Aggregate payments in a window.
+
+        The daily series covers ``series_from``..``series_to`` when given,
+        otherwise the main window.
+        """
+        if rollup_service.is_ready(db, REVENUE_ROLLUP):
+            return self._aggregate_from_rollups(
+                db, date_from, date_to, payment_method, payment_type, series_from, series_to
+            )
+
+        result = PaymentAggregate()
+
+        # Scan 1: counts and sums by (status, method, type)
+        grouped = self._filtered(
+            db.query(
+                Payment.status,
+                Payment.payment_method,
+                Payment.payment_type,
+                func.count(Payment.id),
+                func.coalesce(func.sum(Payment.amount), 0)
+            ),
+            date_from, date_to, payment_method, payment_type
+        ).group_by(
+            Payment.status, Payment.payment_method, Payment.payment_type
+        ).all()
+
+        for status, method, ptype, count, amount in grouped:
+            result.total_payments += count
+            result.payments_by_status[status] = result.payments_by_status.get(status, 0) + count
+
+            if status_name(status) != PAID_STATUS:
+                continue
+
+            amount = float(amount or 0)
+            result.completed_payments += count
+            result.total_revenue += amount
+
+            for breakdown, key in ((result.revenue_by_method, method), (result.revenue_by_type, ptype)):
+                entry = breakdown.setdefault(key, {"revenue": 0.0, "count": 0})
+                entry["revenue"] += amount
+                entry["count"] += count
+
+        # Scan 2: paid revenue per day
+        completed_amount = case((Payment.status == PaymentStatus.PAID, Payment.amount), else_=0)
+        daily = self._filtered(
+            db.query(
+                PAYMENT_DAY,
+                func.coalesce(func.sum(completed_amount), 0)
+            ),
+            series_from if series_from is not None else date_from,
+            series_to if series_to is not None else date_to,
+            payment_method, payment_type
+        ).group_by(PAYMENT_DAY).order_by(PAYMENT_DAY).all()
+
+        result.daily_revenue = [
+            (day, float(revenue))
+            for day, revenue in daily
+            if revenue
+        ]
+
+        return result
+
+    def _aggregate_from_rollups(self, db: Session,
+                                date_from: Optional[date],
+                                date_to: Optional[date],
+                                payment_method: Optional[str],
+                                payment_type: Optional[str],
+                                series_from: Optional[date],
+                                series_to: Optional[date]) -> PaymentAggregate:
+        """Same aggregate as ``aggregate`` computed from daily rollup rows"""
+        result = PaymentAggregate()
+        rollup = DailyRevenueRollup
+
+        grouped = self._filtered_rollup(
+            db.query(
+                rollup.status,
+                rollup.payment_method,
+                rollup.payment_type,
+                func.coalesce(func.sum(rollup.payment_count), 0),
+                func.coalesce(func.sum(rollup.amount_total), 0)
+            ),
+            date_from, date_to, payment_method, payment_type
+        ).group_by(rollup.status, rollup.payment_method, rollup.payment_type).all()
+
+        for status, method, ptype, count, amount in grouped:
+            count = int(count)
+            if not count:
+                continue
+            result.total_payments += count
+            result.payments_by_status[status] = result.payments_by_status.get(status, 0) + count
+
+            if status != PAID_STATUS:
+                continue
+
+            amount = float(amount or 0)
+            result.completed_payments += count
+            result.total_revenue += amount
+
+            for breakdown, key in ((result.revenue_by_method, method), (result.revenue_by_type, ptype or None)):
+                entry = breakdown.setdefault(key, {"revenue": 0.0, "count": 0})
+                entry["revenue"] += amount
+                entry["count"] += count
+
+        daily = self._filtered_rollup(
+            db.query(rollup.day, func.coalesce(func.sum(rollup.amount_total), 0))
+            .filter(rollup.status == PAID_STATUS),
+            series_from if series_from is not None else date_from,
+            series_to if series_to is not None else date_to,
+            payment_method, payment_type
+        ).group_by(rollup.day).order_by(rollup.day).all()
+
+        result.daily_revenue = [(day, float(revenue)) for day, revenue in daily if revenue]
+
+        return result
+
+    def _filtered_rollup(self, query, date_from: Optional[date], date_to: Optional[date],
+                         payment_method: Optional[str], payment_type: Optional[str]):
+        """Apply the common window and dimension filters to rollup rows"""
+        if date_from:
+            query = query.filter(DailyRevenueRollup.day >= date_from)
+        if date_to:
+            query = query.filter(DailyRevenueRollup.day <= date_to)
+        if payment_method:
+            query = query.filter(DailyRevenueRollup.payment_method == payment_method)
+        if payment_type:
+            query = query.filter(DailyRevenueRollup.payment_type == payment_type)
+        return query
+
+    def _filtered(self, query, date_from: Optional[date], date_to: Optional[date],
+                  payment_method: Optional[str], payment_type: Optional[str]):
+        """Apply the common window and dimension filters"""
+        if date_from:
+            query = query.filter(PAYMENT_DAY >= date_from)
+        if date_to:
+            query = query.filter(PAYMENT_DAY <= date_to)
+        if payment_method:
+            query = query.filter(Payment.payment_method == payment_method)
+        if payment_type:
+            query = query.filter(Payment.payment_type == payment_type)
+        return query
+
+# Global payment stats service instance
+payment_stats_service = PaymentStatsService()
@@ -0,0 +1,283 @@
+from typing import Optional, List
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+from sqlalchemy import update, select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..models.class_model import Class
+from ..models.class_reservation import ClassReservation, ReservationStatus
+
+logger = logging.getLogger(__name__)
+
+# Reservation states that hold a seat in the class
+SEAT_HOLDING_STATUSES = [ReservationStatus.CONFIRMED, ReservationStatus.PENDING]
+
+class ReservationError(Exception):
+    """Raised when a reservation cannot be made or changed"""
+    pass
+
+@dataclass
+class ReservationOutcome:
+    """Result of a reservation attempt"""
+    reservation: ClassReservation
+    waitlisted: bool = False
+    waitlist_position: Optional[int] = None
+
+@dataclass
+class CancellationOutcome:
+    """Result of a reservation cancellation"""
+    reservation: ClassReservation
+    promoted: Optional[ClassReservation] = None
+
+class ReservationService:
+    """Contention-safe class reservation engine.
+
+    ``Class.current_bookings`` is the single source of truth for occupancy.
+    A seat is taken with one conditional UPDATE that only succeeds while the
+    class has room, so concurrent requests (across threads, workers or nodes)
+    can never push a class past ``max_capacity``. When the class is full and
+    ``waiting_list_enabled`` is set, the reservation is stored as WAITLISTED
+    and promoted automatically when a confirmed seat is released.
+    """
+
+    # Attempts at promoting a waitlisted reservation before freeing the seat
+    PROMOTION_ATTEMPTS = 3
+
+    def reserve(self, db: Session, class_id: int, user_id: int,
+                created_by: Optional[int] = None, notes: Optional[str] = None) -> ReservationOutcome:
+        """Reserve a seat, or a waitlist place when the class is full"""
+        existing = db.execute(
+            select(ClassReservation.id).where(
+                ClassReservation.class_id == class_id,
+                ClassReservation.user_id == user_id,
+                ClassReservation.status.in_(SEAT_HOLDING_STATUSES + [ReservationStatus.WAITLISTED])
+            ).limit(1)
+        ).first()
+        if existing:
+            raise ReservationError("You already have a reservation for this class")
+
+        try:
+            acquired = self._acquire_seat(db, class_id)
+
+            if acquired:
+                status = ReservationStatus.CONFIRMED
+            else:
+                waiting_list_enabled = db.execute(
+                    select(Class.waiting_list_enabled).where(Class.id == class_id)
+                ).scalar()
+                if not waiting_list_enabled:
+                    raise ReservationError("Class is full")
+                status = ReservationStatus.WAITLISTED
+
+            reservation = ClassReservation(
+                class_id=class_id,
+                user_id=user_id,
+                status=status,
+                reservation_date=datetime.utcnow(),
+                notes=notes,
+                created_by=created_by
+            )
+            db.add(reservation)
+            db.commit()
+        except IntegrityError:
+            # A concurrent request for the same member passed the check above
+            db.rollback()
+            raise ReservationError("You already have a reservation for this class")
+        except Exception:
+            db.rollback()
+            raise
+
+        db.refresh(reservation)
+
+        if status == ReservationStatus.WAITLISTED:
+            return ReservationOutcome(
+                reservation=reservation,
+                waitlisted=True,
+                waitlist_position=self.waitlist_position(db, reservation)
+            )
+        return ReservationOutcome(reservation=reservation)
+
+    def cancel(self, db: Session, reservation: ClassReservation,
+               reason: Optional[str] = None, cancelled_by: Optional[int] = None) -> CancellationOutcome:
+        """Cancel a reservation, handing a released seat to the waitlist"""
+        if not reservation.can_cancel:
+            raise ReservationError("Reservation cannot be cancelled")
+
+        held_seat = reservation.status in SEAT_HOLDING_STATUSES
+
+        try:
+            # Conditional on the current status so a concurrent cancel of the
+            # same reservation cannot release its seat twice
+            result = db.execute(
+                update(ClassReservation)
+                .where(
+                    ClassReservation.id == reservation.id,
+                    ClassReservation.status == reservation.status
+                )
+                .values(
+                    status=ReservationStatus.CANCELLED,
+                    cancelled_at=datetime.utcnow(),
+                    cancellation_reason=reason,
+                    cancelled_by=cancelled_by
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                raise ReservationError("Reservation cannot be cancelled")
+
+            promoted_id = None
+            if held_seat:
+                promoted_id = self._promote_next(db, reservation.class_id)
+                if promoted_id is None:
+                    self._release_seat(db, reservation.class_id)
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        db.refresh(reservation)
+        promoted = db.get(ClassReservation, promoted_id) if promoted_id else None
+        return CancellationOutcome(reservation=reservation, promoted=promoted)
+
+    def waitlist_position(self, db: Session, reservation: ClassReservation) -> Optional[int]:
+        """Get 1-based position of a waitlisted reservation"""
+        if reservation.status != ReservationStatus.WAITLISTED:
+            return None
+
+        ahead = db.execute(
+            select(func.count(ClassReservation.id)).where(
+                ClassReservation.class_id == reservation.class_id,
+                ClassReservation.status == ReservationStatus.WAITLISTED,
+                ClassReservation.id < reservation.id
+            )
+        ).scalar()
+        return (ahead or 0) + 1
+
+    def get_waitlist(self, db: Session, class_id: int) -> List[ClassReservation]:
+        """Get waitlisted reservations in promotion order"""
+        return db.query(ClassReservation).filter(
+            ClassReservation.class_id == class_id,
+            ClassReservation.status == ReservationStatus.WAITLISTED
+        ).order_by(ClassReservation.id).all()
+
+    def initialize(self, db: Session) -> None:
+        """Startup backfill for databases that predate this service.
+
+        Creates the active-reservation unique index on existing tables and
+        repairs occupancy counters, which used to stay at 0.
+        """
+        active_member = next(
+            index for index in ClassReservation.__table__.indexes
+            if index.name == "ix_class_reservations_active_member"
+        )
+        try:
+            # On the session's own connection: a second pooled connection
+            # would wait on the transaction this session already holds
+            active_member.create(bind=db.connection(), checkfirst=True)
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            logger.error(f"Duplicate active class reservations, unique index not created: {e}")
+
+        repaired = self.resync_all_bookings(db)
+        if repaired:
+            logger.info(f"Repaired current_bookings of {repaired} classes")
+
+    def resync_all_bookings(self, db: Session) -> int:
+        """Resync every class whose counter disagrees with its reservations"""
+        seats = select(
+            ClassReservation.class_id,
+            func.count(ClassReservation.id).label("seats")
+        ).where(
+            ClassReservation.status.in_(SEAT_HOLDING_STATUSES)
+        ).group_by(ClassReservation.class_id).subquery()
+
+        stale = db.execute(
+            select(Class.id)
+            .outerjoin(seats, seats.c.class_id == Class.id)
+            .where(Class.current_bookings != func.coalesce(seats.c.seats, 0))
+        ).scalars().all()
+        for class_id in stale:
+            self.resync_bookings(db, class_id)
+        return len(stale)
+
+    def resync_bookings(self, db: Session, class_id: int) -> int:
+        """Recompute current_bookings from reservation rows.
+
+        Only needed to repair counters written outside this service.
+        """
+        # reserve() and cancel() change the counter under this row lock, so
+        # the count below cannot miss a seat taken or released concurrently
+        db.execute(select(Class.id).where(Class.id == class_id).with_for_update())
+
+        seats = select(func.count(ClassReservation.id)).where(
+            ClassReservation.class_id == class_id,
+            ClassReservation.status.in_(SEAT_HOLDING_STATUSES)
+        ).scalar_subquery()
+
+        db.execute(
+            update(Class)
+            .where(Class.id == class_id)
+            .values(current_bookings=seats)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return db.execute(select(Class.current_bookings).where(Class.id == class_id)).scalar()
+
+    def _acquire_seat(self, db: Session, class_id: int) -> bool:
+        """Atomically take a seat if the class has room"""
+        result = db.execute(
+            update(Class)
+            .where(
+                Class.id == class_id,
+                Class.current_bookings < Class.max_capacity
+            )
+            .values(current_bookings=Class.current_bookings + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def _release_seat(self, db: Session, class_id: int) -> None:
+        """Atomically give a seat back"""
+        db.execute(
+            update(Class)
+            .where(Class.id == class_id, Class.current_bookings > 0)
+            .values(current_bookings=Class.current_bookings - 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    def _promote_next(self, db: Session, class_id: int) -> Optional[int]:
+        """Move the oldest waitlisted reservation into a released seat.
+
+        The seat is handed over directly, so current_bookings is unchanged.
+        """
+        for _ in range(self.PROMOTION_ATTEMPTS):
+            candidate_id = db.execute(
+                select(ClassReservation.id).where(
+                    ClassReservation.class_id == class_id,
+                    ClassReservation.status == ReservationStatus.WAITLISTED
+                ).order_by(ClassReservation.id).limit(1)
+            ).scalar()
+            if candidate_id is None:
+                return None
+
+            # Another worker may promote the same candidate; only one wins
+            result = db.execute(
+                update(ClassReservation)
+                .where(
+                    ClassReservation.id == candidate_id,
+                    ClassReservation.status == ReservationStatus.WAITLISTED
+                )
+                .values(status=ReservationStatus.CONFIRMED)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                logger.info(f"Promoted reservation {candidate_id} from waitlist for class {class_id}")
+                return candidate_id
+
+        return None
+
+# Global reservation service instance
+reservation_service = ReservationService()
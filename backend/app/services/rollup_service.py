@@ -0,0 +1,401 @@
+from typing import Dict, Any, Optional, List, Tuple
+from datetime import datetime, date
+from collections import defaultdict
+import argparse
+import enum
+import logging
+from sqlalchemy import event, func, delete, update, insert, and_, Date
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..models.user import User
+from ..models.membership import Membership, Payment, PaymentStatus
+from ..models.checkin import CheckIn
+from ..models.class_reservation import ClassReservation
+from ..models.rollup import DailyRevenueRollup, DailyActivityRollup, RollupStatus
+
+logger = logging.getLogger(__name__)
+
+REVENUE_ROLLUP = "revenue"
+ACTIVITY_ROLLUP = "activity"
+
+# Day a payment counts towards: when it was paid, else when it was due
+PAYMENT_DAY = func.coalesce(Payment.payment_date, Payment.due_date)
+
+# Payment attributes that decide which revenue rollup row a payment lands in
+PAYMENT_ROLLUP_FIELDS = ["payment_date", "due_date", "payment_method", "payment_type", "status", "amount"]
+
+# Attributes read when a row of each tracked model is deleted
+DELETE_ROLLUP_FIELDS = {
+    Payment: PAYMENT_ROLLUP_FIELDS,
+    CheckIn: ["check_in_time"],
+    ClassReservation: ["created_at"],
+    User: ["created_at"],
+    Membership: ["start_date", "end_date"]
+}
+
+def status_name(status: Any) -> Any:
+    """Normalize a status value to the name used in filters and rollups"""
+    return status.name if isinstance(status, enum.Enum) else status
+
+def _as_day(value: Any) -> date:
+    """Get the calendar day of a date/datetime, defaulting to today (UTC)"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return datetime.utcnow().date()
+
+def _loaded(state, attr: str) -> Any:
+    """Current value of an attribute without triggering a lazy load"""
+    return state.dict.get(attr)
+
+def _previous(state, attr: str) -> Any:
+    """Value of an attribute before the pending change"""
+    history = state.attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return state.dict.get(attr)
+
+class RollupService:
+    """Incrementally maintained per-day revenue and activity rollups.
+
+    Rollup rows are updated in the same transaction as the payment, check-in,
+    reservation, user or membership write that changes them (via a Session
+    ``after_flush`` hook), so the rollup tables never drift from committed
+    data. Writes that bypass the ORM (bulk/core statements) are not seen;
+    run the backfill command after such imports. Report endpoints only read
+    rollups once a backfill has been recorded in ``rollup_status``.
+    """
+
+    def __init__(self):
+        self._ready: set = set()
+
+    # Read side
+
+    def is_ready(self, db: Session, name: str) -> bool:
+        """Check whether a rollup has been backfilled and can serve reads"""
+        if not settings.ROLLUPS_ENABLED:
+            return False
+        if name in self._ready:
+            return True
+
+        try:
+            ready = db.query(RollupStatus).filter(RollupStatus.name == name).first() is not None
+        except Exception as e:
+            logger.warning(f"Rollup status unavailable: {e}")
+            return False
+
+        if ready:
+            self._ready.add(name)
+        return ready
+
+    def activity_totals(self, db: Session, date_from: Optional[date] = None,
+                        date_to: Optional[date] = None) -> Dict[str, int]:
+        """Sum activity counters over a date window"""
+        query = db.query(
+            func.coalesce(func.sum(DailyActivityRollup.new_users), 0),
+            func.coalesce(func.sum(DailyActivityRollup.check_ins), 0),
+            func.coalesce(func.sum(DailyActivityRollup.reservations), 0),
+            func.coalesce(func.sum(DailyActivityRollup.membership_starts), 0),
+            func.coalesce(func.sum(DailyActivityRollup.membership_ends), 0)
+        )
+        if date_from:
+            query = query.filter(DailyActivityRollup.day >= date_from)
+        if date_to:
+            query = query.filter(DailyActivityRollup.day <= date_to)
+
+        new_users, check_ins, reservations, starts, ends = query.one()
+        return {
+            "new_users": int(new_users),
+            "check_ins": int(check_ins),
+            "reservations": int(reservations),
+            "membership_starts": int(starts),
+            "membership_ends": int(ends)
+        }
+
+    def revenue_total(self, db: Session, date_from: Optional[date] = None,
+                      date_to: Optional[date] = None, status: str = PaymentStatus.PAID.name,
+                      payment_type: Optional[str] = None) -> float:
+        """Sum rolled-up payment amounts for a status over a date window"""
+        query = db.query(func.coalesce(func.sum(DailyRevenueRollup.amount_total), 0)).filter(
+            DailyRevenueRollup.status == status
+        )
+        if date_from:
+            query = query.filter(DailyRevenueRollup.day >= date_from)
+        if date_to:
+            query = query.filter(DailyRevenueRollup.day <= date_to)
+        if payment_type:
+            query = query.filter(DailyRevenueRollup.payment_type == payment_type)
+        return float(query.scalar() or 0)
+
+    # Write side
+
+    def apply_flush(self, session: Session) -> None:
+        """Translate the flushed ORM changes into rollup increments"""
+        revenue: Dict[Tuple, List] = defaultdict(lambda: [0, 0.0])
+        activity: Dict[date, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+        for obj in session.new:
+            state = sa_inspect(obj)
+            if isinstance(obj, Payment):
+                key = self._payment_key(state, _loaded)
+                revenue[key][0] += 1
+                revenue[key][1] += float(_loaded(state, "amount") or 0)
+            elif isinstance(obj, CheckIn):
+                activity[_as_day(_loaded(state, "check_in_time"))]["check_ins"] += 1
+            elif isinstance(obj, ClassReservation):
+                activity[_as_day(_loaded(state, "created_at"))]["reservations"] += 1
+            elif isinstance(obj, User):
+                activity[_as_day(_loaded(state, "created_at"))]["new_users"] += 1
+            elif isinstance(obj, Membership):
+                activity[_as_day(_loaded(state, "start_date"))]["membership_starts"] += 1
+                activity[_as_day(_loaded(state, "end_date"))]["membership_ends"] += 1
+
+        for obj in session.dirty:
+            state = sa_inspect(obj)
+            if isinstance(obj, Payment):
+                if not any(state.attrs[attr].history.has_changes() for attr in PAYMENT_ROLLUP_FIELDS):
+                    continue
+                old_key = self._payment_key(state, _previous)
+                new_key = self._payment_key(state, _loaded)
+                revenue[old_key][0] -= 1
+                revenue[old_key][1] -= float(_previous(state, "amount") or 0)
+                revenue[new_key][0] += 1
+                revenue[new_key][1] += float(_loaded(state, "amount") or 0)
+            elif isinstance(obj, Membership):
+                for attr, counter in (("start_date", "membership_starts"), ("end_date", "membership_ends")):
+                    if state.attrs[attr].history.has_changes():
+                        activity[_as_day(_previous(state, attr))][counter] -= 1
+                        activity[_as_day(_loaded(state, attr))][counter] += 1
+
+        for obj in session.deleted:
+            state = sa_inspect(obj)
+            if isinstance(obj, Payment):
+                key = self._payment_key(state, _previous)
+                revenue[key][0] -= 1
+                revenue[key][1] -= float(_previous(state, "amount") or 0)
+            elif isinstance(obj, CheckIn):
+                activity[_as_day(_previous(state, "check_in_time"))]["check_ins"] -= 1
+            elif isinstance(obj, ClassReservation):
+                activity[_as_day(_previous(state, "created_at"))]["reservations"] -= 1
+            elif isinstance(obj, User):
+                activity[_as_day(_previous(state, "created_at"))]["new_users"] -= 1
+            elif isinstance(obj, Membership):
+                activity[_as_day(_previous(state, "start_date"))]["membership_starts"] -= 1
+                activity[_as_day(_previous(state, "end_date"))]["membership_ends"] -= 1
+
+        if not revenue and not activity:
+            return
+
+        connection = session.connection()
+        for (day, method, ptype, status), (count, amount) in revenue.items():
+            if count == 0 and amount == 0:
+                continue
+            self._increment(
+                connection, DailyRevenueRollup.__table__,
+                {"day": day, "payment_method": method, "payment_type": ptype, "status": status},
+                {"payment_count": count, "amount_total": amount}
+            )
+        for day, counters in activity.items():
+            deltas = {name: value for name, value in counters.items() if value}
+            if deltas:
+                self._increment(connection, DailyActivityRollup.__table__, {"day": day}, deltas)
+
+    def _payment_key(self, state, value_of) -> Tuple:
+        """Revenue rollup key for a payment, from current or previous values"""
+        day = value_of(state, "payment_date") or value_of(state, "due_date")
+        return (
+            _as_day(day),
+            value_of(state, "payment_method") or "",
+            value_of(state, "payment_type") or "",
+            status_name(value_of(state, "status")) or ""
+        )
+
+    def _increment(self, connection, table, key: Dict[str, Any], deltas: Dict[str, Any]) -> None:
+        """Add deltas to a rollup row, creating it if needed"""
+        dialect = connection.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            dialect_insert = None
+
+        if dialect_insert is not None:
+            stmt = dialect_insert(table).values(**key, **deltas)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(key),
+                set_={
+                    **{column: table.c[column] + stmt.excluded[column] for column in deltas},
+                    "updated_at": func.now()
+                }
+            )
+            connection.execute(stmt)
+            return
+
+        result = connection.execute(
+            update(table)
+            .where(and_(*[table.c[column] == value for column, value in key.items()]))
+            .values({column: table.c[column] + value for column, value in deltas.items()})
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(**key, **deltas))
+
+    # Backfill
+
+    def backfill(self, db: Session, start: Optional[date] = None,
+                 end: Optional[date] = None) -> Dict[str, int]:
+        """Rebuild rollups from raw rows for a date range (all history by default).
+
+        Existing rollup rows in the range are replaced. Run it while writes
+        are quiet; increments committed during the rebuild may be lost.
+        """
+        revenue_rows = self._backfill_revenue(db, start, end)
+        activity_rows = self._backfill_activity(db, start, end)
+
+        now = datetime.utcnow()
+        for name in (REVENUE_ROLLUP, ACTIVITY_ROLLUP):
+            status = db.get(RollupStatus, name)
+            if status is None:
+                db.add(RollupStatus(name=name, backfilled_at=now, backfilled_from=start))
+            else:
+                status.backfilled_at = now
+                if start is None or (status.backfilled_from and start < status.backfilled_from):
+                    status.backfilled_from = start
+
+        db.commit()
+        self._ready.update({REVENUE_ROLLUP, ACTIVITY_ROLLUP})
+
+        logger.info(f"Rollup backfill completed: {revenue_rows} revenue rows, {activity_rows} activity rows")
+        return {"revenue_rows": revenue_rows, "activity_rows": activity_rows}
+
+    def _backfill_revenue(self, db: Session, start: Optional[date], end: Optional[date]) -> int:
+        day_expr = PAYMENT_DAY
+        query = db.query(
+            day_expr,
+            Payment.payment_method,
+            Payment.payment_type,
+            Payment.status,
+            func.count(Payment.id),
+            func.coalesce(func.sum(Payment.amount), 0)
+        )
+        if start:
+            query = query.filter(day_expr >= start)
+        if end:
+            query = query.filter(day_expr <= end)
+        grouped = query.group_by(day_expr, Payment.payment_method, Payment.payment_type, Payment.status).all()
+
+        # Several raw groups can collapse into one key (e.g. NULL and "" type)
+        rows: Dict[Tuple, List] = defaultdict(lambda: [0, 0.0])
+        for day, method, ptype, status, count, amount in grouped:
+            key = (_as_day(day), method or "", ptype or "", status_name(status) or "")
+            rows[key][0] += count
+            rows[key][1] += float(amount or 0)
+
+        cleanup = delete(DailyRevenueRollup)
+        if start:
+            cleanup = cleanup.where(DailyRevenueRollup.day >= start)
+        if end:
+            cleanup = cleanup.where(DailyRevenueRollup.day <= end)
+        db.execute(cleanup)
+
+        if rows:
+            db.execute(insert(DailyRevenueRollup), [
+                {
+                    "day": day, "payment_method": method, "payment_type": ptype, "status": status,
+                    "payment_count": count, "amount_total": amount
+                }
+                for (day, method, ptype, status), (count, amount) in rows.items()
+            ])
+        return len(rows)
+
+    def _backfill_activity(self, db: Session, start: Optional[date], end: Optional[date]) -> int:
+        sources = [
+            ("new_users", func.date(User.created_at, type_=Date), User.id),
+            ("check_ins", func.date(CheckIn.check_in_time, type_=Date), CheckIn.id),
+            ("reservations", func.date(ClassReservation.created_at, type_=Date), ClassReservation.id),
+            ("membership_starts", Membership.start_date, Membership.id),
+            ("membership_ends", Membership.end_date, Membership.id)
+        ]
+
+        rows: Dict[date, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for counter, day_expr, id_column in sources:
+            query = db.query(day_expr, func.count(id_column)).filter(day_expr.isnot(None))
+            if start:
+                query = query.filter(day_expr >= start)
+            if end:
+                query = query.filter(day_expr <= end)
+            for day, count in query.group_by(day_expr).all():
+                rows[_as_day(day)][counter] += count
+
+        cleanup = delete(DailyActivityRollup)
+        if start:
+            cleanup = cleanup.where(DailyActivityRollup.day >= start)
+        if end:
+            cleanup = cleanup.where(DailyActivityRollup.day <= end)
+        db.execute(cleanup)
+
+        if rows:
+            columns = ["new_users", "check_ins", "reservations", "membership_starts", "membership_ends"]
+            db.execute(insert(DailyActivityRollup), [
+                {"day": day, **{column: counters.get(column, 0) for column in columns}}
+                for day, counters in rows.items()
+            ])
+        return len(rows)
+
+# Global rollup service instance
+rollup_service = RollupService()
+
+def _track_previous_value(target, value, oldvalue, initiator) -> None:
+    """No-op listener; registering it with active_history is what matters"""
+
+# Load the old value even when an expired attribute is overwritten, so the
+# rollup row a payment or membership moves away from can be decremented
+for _attribute in [getattr(Payment, name) for name in PAYMENT_ROLLUP_FIELDS] + [Membership.start_date, Membership.end_date]:
+    event.listen(_attribute, "set", _track_previous_value, active_history=True)
+
+@event.listens_for(Session, "before_flush")
+def _load_deleted_values(session: Session, flush_context, instances) -> None:
+    """Make sure deleted rows still carry the values their rollups need"""
+    if not settings.ROLLUPS_ENABLED:
+        return
+    for obj in session.deleted:
+        for model, fields in DELETE_ROLLUP_FIELDS.items():
+            if isinstance(obj, model):
+                for name in fields:
+                    getattr(obj, name)
+
+@event.listens_for(Session, "after_flush")
+def _update_rollups(session: Session, flush_context) -> None:
+    """Keep rollups in step with ORM writes, inside the same transaction"""
+    if settings.ROLLUPS_ENABLED:
+        rollup_service.apply_flush(session)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point: python -m app.services.rollup_service backfill"""
+    from ..core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain daily rollup tables")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser("backfill", help="Rebuild rollups from raw rows")
+    backfill_parser.add_argument("--start", type=date.fromisoformat, default=None, help="First day (YYYY-MM-DD)")
+    backfill_parser.add_argument("--end", type=date.fromisoformat, default=None, help="Last day (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        DailyRevenueRollup.__table__.create(bind=db.get_bind(), checkfirst=True)
+        DailyActivityRollup.__table__.create(bind=db.get_bind(), checkfirst=True)
+        RollupStatus.__table__.create(bind=db.get_bind(), checkfirst=True)
+        result = rollup_service.backfill(db, start=args.start, end=args.end)
+        print(f"Backfilled {result['revenue_rows']} revenue rows and {result['activity_rows']} activity rows")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
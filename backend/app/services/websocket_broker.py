@@ -0,0 +1,231 @@
+import asyncio
+import json
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Envelope fields: o=origin worker, k=target kind, t=target, x=excluded connection,
+# p=serialized frame, c=coalesce key
+Envelope = Dict[str, Any]
+
+class WebSocketBroker(ABC):
+    """Pub/sub bus that carries WebSocket fan-out between workers.
+
+    Each worker delivers to its own connections directly and publishes an
+    envelope so every other worker does the same for theirs; envelopes from
+    our own origin are ignored on receipt. Publishing is batched: envelopes
+    published within ``batch_interval`` (or until ``batch_size``) travel as
+    one bus message.
+    """
+
+    def __init__(self, batch_size: int = 100, batch_interval: float = 0.005):
+        self.origin = uuid.uuid4().hex
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._handler: Optional[Callable[[Envelope], None]] = None
+        self._pending: List[Envelope] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self.stats = {'published': 0, 'batches': 0, 'received': 0, 'errors': 0}
+
+    async def start(self, handler: Callable[[Envelope], None]):
+        """Subscribe; ``handler`` gets every envelope from other workers"""
+        self._handler = handler
+        await self._subscribe()
+
+    async def stop(self):
+        """Publish anything pending and unsubscribe"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self._flush()
+        await self._unsubscribe()
+        self._handler = None
+
+    def publish(self, kind: str, target: Any, payload: str,
+                exclude: Optional[str] = None, coalesce_key: Optional[tuple] = None):
+        """Queue an envelope for the other workers"""
+        if not self.has_peers():
+            return
+        self._pending.append({
+            'o': self.origin, 'k': kind, 't': target, 'x': exclude, 'p': payload, 'c': coalesce_key
+        })
+        self.stats['published'] += 1
+
+        if len(self._pending) >= self.batch_size:
+            self._schedule_flush(0)
+        elif self._flush_task is None:
+            self._schedule_flush(self.batch_interval)
+
+    def has_peers(self) -> bool:
+        """Whether anyone else could be listening"""
+        return True
+
+    def _schedule_flush(self, delay: float):
+        if self._flush_task is not None and delay:
+            return
+        self._flush_task = asyncio.create_task(self._flush_later(delay))
+
+    async def _flush_later(self, delay: float):
+        if delay:
+            await asyncio.sleep(delay)
+        self._flush_task = None
+        await self._flush()
+
+    async def _flush(self):
+        while self._pending:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            try:
+                await self._send(json.dumps(batch))
+                self.stats['batches'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Error publishing {len(batch)} WebSocket envelopes: {e}")
+
+    def _receive(self, data: Any):
+        """Dispatch a bus message to the handler"""
+        if self._handler is None:
+            return
+        try:
+            batch = json.loads(data)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Ignoring malformed WebSocket bus message: {e}")
+            return
+
+        for envelope in batch:
+            if envelope.get('o') == self.origin:
+                continue
+            self.stats['received'] += 1
+            try:
+                self._handler(envelope)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Error delivering WebSocket envelope: {e}")
+
+    @abstractmethod
+    async def _send(self, data: str):
+        """Publish one serialized batch to every worker"""
+
+    @abstractmethod
+    async def _subscribe(self):
+        """Start passing received batches to ``_receive``"""
+
+    @abstractmethod
+    async def _unsubscribe(self):
+        """Stop receiving batches"""
+
+class MemoryBrokerHub:
+    """In-process stand-in for a pub/sub server, shared by several brokers"""
+
+    def __init__(self):
+        self.subscribers: List['MemoryWebSocketBroker'] = []
+        self.messages = 0
+
+    def publish(self, data: str):
+        self.messages += 1
+        loop = asyncio.get_running_loop()
+        for broker in list(self.subscribers):
+            # Deliver on a later loop turn, as a real bus would
+            loop.call_soon(broker._receive, data)
+
+class MemoryWebSocketBroker(WebSocketBroker):
+    """In-process broker.
+
+    With its own hub (the default) it only serves a single worker and never
+    publishes. Brokers sharing a ``MemoryBrokerHub`` behave like workers on
+    one Redis server, which is what the tests use.
+    """
+
+    def __init__(self, hub: Optional[MemoryBrokerHub] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.hub = hub or MemoryBrokerHub()
+        self.hub.subscribers.append(self)
+
+    def has_peers(self) -> bool:
+        return len(self.hub.subscribers) > 1
+
+    async def _send(self, data: str):
+        self.hub.publish(data)
+
+    async def _subscribe(self):
+        if self not in self.hub.subscribers:
+            self.hub.subscribers.append(self)
+
+    async def _unsubscribe(self):
+        if self in self.hub.subscribers:
+            self.hub.subscribers.remove(self)
+
+class RedisWebSocketBroker(WebSocketBroker):
+    """Redis pub/sub broker; reaches every worker and node on the server.
+
+    A worker only subscribes once it has WebSocket connections of its own,
+    but any worker can publish (e.g. from an HTTP request handler).
+    """
+
+    def __init__(self, client: Any = None, url: Optional[str] = None,
+                 channel: str = "gymsystem:ws", **kwargs):
+        super().__init__(**kwargs)
+        if client is None:
+            import redis.asyncio
+            client = redis.asyncio.Redis.from_url(url or settings.REDIS_URL)
+        self.client = client
+        self.channel = channel
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def _send(self, data: str):
+        await self.client.publish(self.channel, data)
+
+    async def _subscribe(self):
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _unsubscribe(self):
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(self.channel)
+                await self._pubsub.close()
+            except Exception as e:
+                logger.warning(f"Error closing WebSocket bus subscription: {e}")
+            self._pubsub = None
+
+    async def _listen(self):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message.get('type') == 'message':
+                        self._receive(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"WebSocket bus subscription failed, retrying: {e}")
+                await asyncio.sleep(1)
+
+def create_websocket_broker(name: Optional[str] = None) -> WebSocketBroker:
+    """Create the configured broker, falling back to in-process delivery"""
+    name = (name or settings.WEBSOCKET_BROKER).lower()
+    options = {
+        'batch_size': settings.WEBSOCKET_BROKER_BATCH_SIZE,
+        'batch_interval': settings.WEBSOCKET_BROKER_BATCH_INTERVAL
+    }
+    if name == "redis":
+        try:
+            broker = RedisWebSocketBroker(
+                url=settings.WEBSOCKET_BROKER_REDIS_URL or settings.REDIS_URL,
+                channel=settings.WEBSOCKET_BROKER_CHANNEL,
+                **options
+            )
+            logger.info("Using Redis WebSocket broker")
+            return broker
+        except Exception as e:
+            logger.warning(f"Redis WebSocket broker unavailable, using in-process delivery: {e}")
+    elif name != "memory":
+        logger.warning(f"Unknown WebSocket broker '{name}', using in-process delivery")
+    return MemoryWebSocketBroker(**options)
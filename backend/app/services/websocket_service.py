@@ -1,20 +1,23 @@
 from typing import Dict, List, Any, Optional, Set, Callable
 from datetime import datetime, timedelta
 from enum import Enum
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, replace
+from functools import lru_cache
 import json
 import asyncio
+import math
+import time
 import uuid
 from fastapi import WebSocket, WebSocketDisconnect
 import logging
-from collections import defaultdict
+from collections import defaultdict, deque
 import jwt
 from ..core.config import settings
 from ..models.user import User
 from ..models.employee import Employee
 from sqlalchemy.orm import Session
 from ..core.database import get_db
-import redis
+from .websocket_broker import WebSocketBroker, create_websocket_broker
 from typing import Union
 import weakref
 
@@ -53,12 +56,52 @@ class MessageType(Enum):
     REAL_TIME_STATS = "real_time_stats"
     SYSTEM_ALERT = "system_alert"
 
+# Message types where a client only needs the newest queued update
+COALESCED_MESSAGE_TYPES = {MessageType.REAL_TIME_STATS, MessageType.EQUIPMENT_STATUS}
+
 class UserRole(Enum):
     MEMBER = "member"
     TRAINER = "trainer"
     ADMIN = "admin"
     GUEST = "guest"
 
+class WireEncoding(Enum):
+    """Frame encodings; all but JSON are negotiated as a WebSocket subprotocol"""
+    JSON = "json"  # Original verbose frames, used when the client asks for nothing
+    COMPACT_JSON = "gymsystem.json"
+    MSGPACK = "gymsystem.msgpack"
+    CBOR = "gymsystem.cbor"
+
+@lru_cache(maxsize=None)
+def _binary_codec(encoding: WireEncoding) -> Optional[tuple]:
+    """(encode, decode) for a binary encoding, or None if its package is not installed"""
+    try:
+        if encoding == WireEncoding.MSGPACK:
+            import msgpack
+            return msgpack.packb, msgpack.unpackb
+        if encoding == WireEncoding.CBOR:
+            import cbor2
+            return cbor2.dumps, cbor2.loads
+    except ImportError:
+        pass
+    return None
+
+def negotiate_encoding(offered: List[str]) -> WireEncoding:
+    """First subprotocol offered by the client that we can speak"""
+    for name in offered:
+        try:
+            encoding = WireEncoding(name)
+        except ValueError:
+            continue
+        if encoding == WireEncoding.COMPACT_JSON or _binary_codec(encoding):
+            return encoding
+    return WireEncoding.JSON
+
+class SlowClientPolicy(Enum):
+    """What to do when a connection's send queue is full"""
+    DROP_OLDEST = "drop_oldest"
+    DISCONNECT = "disconnect"
+
 @dataclass
 class WebSocketMessage:
     """WebSocket message structure"""
@@ -85,6 +128,49 @@ class WebSocketMessage:
             'message_id': self.message_id
         }
     
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+    
+    def to_compact_dict(self) -> Dict[str, Any]:
+        """Short keys, epoch-millisecond timestamp and no null fields.
+
+        Stats-like messages are superseded rather than referenced, so they
+        carry no message id.
+        """
+        frame = {'t': self.type.value, 'd': self.data, 'ts': int(self.timestamp.timestamp() * 1000)}
+        if self.sender_id is not None:
+            frame['s'] = self.sender_id
+        if self.recipient_id is not None:
+            frame['r'] = self.recipient_id
+        if self.room_id is not None:
+            frame['room'] = self.room_id
+        if self.type not in COALESCED_MESSAGE_TYPES:
+            frame['id'] = self.message_id
+        return frame
+    
+    def encode(self, encoding: WireEncoding) -> Union[str, bytes]:
+        """Serialize for the wire (text for the JSON encodings, bytes otherwise)"""
+        if encoding == WireEncoding.JSON:
+            return self.to_json()
+        if encoding == WireEncoding.COMPACT_JSON:
+            return json.dumps(self.to_compact_dict(), separators=(',', ':'))
+        return _binary_codec(encoding)[0](self.to_compact_dict())
+    
+    @classmethod
+    def decode(cls, raw: Union[str, bytes], encoding: WireEncoding) -> 'WebSocketMessage':
+        """Parse a frame received from a client using ``encoding``"""
+        if encoding == WireEncoding.JSON:
+            return cls.from_dict(json.loads(raw))
+        if encoding == WireEncoding.COMPACT_JSON:
+            return cls.from_compact_dict(json.loads(raw))
+        return cls.from_compact_dict(_binary_codec(encoding)[1](raw))
+    
+    def coalesce_key(self) -> Optional[tuple]:
+        """Key under which a newer queued message replaces an older one"""
+        if self.type not in COALESCED_MESSAGE_TYPES:
+            return None
+        return (self.type.value, self.room_id, self.data.get('equipment_id'))
+    
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'WebSocketMessage':
         return cls(
@@ -96,29 +182,231 @@ class WebSocketMessage:
             room_id=data.get('room_id'),
             message_id=data.get('message_id')
         )
+    
+    @classmethod
+    def from_compact_dict(cls, data: Dict[str, Any]) -> 'WebSocketMessage':
+        return cls(
+            type=MessageType(data['t']),
+            data=data.get('d') or {},
+            timestamp=datetime.fromtimestamp(data['ts'] / 1000) if data.get('ts') else datetime.now(),
+            sender_id=data.get('s'),
+            recipient_id=data.get('r'),
+            room_id=data.get('room'),
+            message_id=data.get('id')
+        )
 
-@dataclass
+class OutgoingFrame:
+    """A message encoded at most once per wire encoding during a fan-out.
+
+    Frames arriving from other workers start from their JSON text; the
+    message is only parsed if a client needs another encoding.
+    """
+    
+    __slots__ = ('_message', '_payloads')
+    
+    def __init__(self, message: Optional[WebSocketMessage] = None, json_payload: Optional[str] = None):
+        self._message = message
+        self._payloads: Dict[WireEncoding, Union[str, bytes]] = {}
+        if json_payload is not None:
+            self._payloads[WireEncoding.JSON] = json_payload
+    
+    @property
+    def message(self) -> WebSocketMessage:
+        if self._message is None:
+            self._message = WebSocketMessage.from_dict(json.loads(self._payloads[WireEncoding.JSON]))
+        return self._message
+    
+    def payload(self, encoding: WireEncoding) -> Union[str, bytes]:
+        payload = self._payloads.get(encoding)
+        if payload is None:
+            payload = self._payloads[encoding] = self.message.encode(encoding)
+        return payload
+
+class StatsStream:
+    """Last stats snapshot sent on one stream, for delta-encoded frames.
+
+    Frames carry a sequence number; a client that sees a gap (a frame was
+    dropped under backpressure) asks for a resync and gets the snapshot.
+    Only top-level fields are compared; a changed nested value is resent whole.
+    """
+    
+    __slots__ = ('seq', 'values')
+    
+    def __init__(self):
+        self.seq = 0
+        self.values: Dict[str, Any] = {}
+    
+    def update(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Record new stats and return the delta frame data"""
+        previous = self.values
+        self.seq += 1
+        self.values = dict(values)
+        data = {
+            'seq': self.seq,
+            'delta': {key: value for key, value in values.items() if key not in previous or previous[key] != value}
+        }
+        removed = [key for key in previous if key not in values]
+        if removed:
+            data['removed'] = removed
+        return data
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {'seq': self.seq, 'full': self.values}
+
+class ClientSendQueue:
+    """Bounded outbound queue of serialized frames for one connection.
+
+    Entries are ``[coalesce_key, payload]`` lists so a newer update for the
+    same key replaces the queued payload in place, keeping its position.
+    The deque only exists while frames are queued; idle connections are
+    the common case and should cost nothing here.
+    """
+    
+    __slots__ = ('maxsize', '_entries', '_by_key', 'dropped', 'coalesced')
+    
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: Optional[deque] = None
+        self._by_key: Optional[Dict[tuple, list]] = None  # Created on first coalesced frame
+        self.dropped = 0
+        self.coalesced = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries) if self._entries else 0
+    
+    def put(self, payload: Union[str, bytes], coalesce_key: Optional[tuple] = None,
+            coalesced_payload: Union[str, bytes, None] = None) -> bool:
+        """Queue a frame; False (and nothing queued) if the queue is full.
+
+        ``coalesced_payload`` replaces a queued frame with the same key
+        instead of ``payload`` (a snapshot standing in for two deltas).
+        """
+        if coalesce_key is not None and self._by_key:
+            entry = self._by_key.get(coalesce_key)
+            if entry is not None:
+                entry[1] = payload if coalesced_payload is None else coalesced_payload
+                self.coalesced += 1
+                return True
+        
+        if self._entries is None:
+            self._entries = deque()
+        elif len(self._entries) >= self.maxsize:
+            return False
+        
+        entry = [coalesce_key, payload]
+        self._entries.append(entry)
+        if coalesce_key is not None:
+            if self._by_key is None:
+                self._by_key = {}
+            self._by_key[coalesce_key] = entry
+        return True
+    
+    def drop_oldest(self):
+        """Discard the oldest queued frame to make room"""
+        if self._entries:
+            self._forget(self._entries.popleft())
+            self.dropped += 1
+    
+    def pop(self) -> Union[str, bytes, None]:
+        """Next frame, or None if the queue is empty"""
+        if not self._entries:
+            self._entries = None
+            return None
+        entry = self._entries.popleft()
+        self._forget(entry)
+        return entry[1]
+    
+    def _forget(self, entry: list):
+        if entry[0] is not None and self._by_key.get(entry[0]) is entry:
+            del self._by_key[entry[0]]
+
+class HeartbeatWheel:
+    """Hashed timing wheel of heartbeat deadlines.
+
+    Each connection sits in the slot of its current deadline. A heartbeat
+    only updates ``last_heartbeat``; when a slot comes due, each connection
+    in it is either expired or re-filed under its newer deadline, so a tick
+    only touches connections whose previous deadline has passed.
+    """
+    
+    __slots__ = ('tick', 'slots', 'position')
+    
+    def __init__(self, timeout: float, tick: float = 1.0, now: Optional[float] = None):
+        self.tick = tick
+        self.slots: List[Set[str]] = [set() for _ in range(math.ceil(timeout / tick) + 2)]
+        self.position = int((time.monotonic() if now is None else now) // tick)
+    
+    def schedule(self, key: str, deadline: float) -> int:
+        """File a key under its deadline; returns the slot index for cancel()"""
+        # Never file into a slot that has already been processed
+        index = max(int(deadline // self.tick), self.position + 1)
+        self.slots[index % len(self.slots)].add(key)
+        return index
+    
+    def cancel(self, key: str, index: int):
+        self.slots[index % len(self.slots)].discard(key)
+    
+    def advance(self, now: float) -> List[str]:
+        """Move to ``now`` and return every key filed in the slots passed"""
+        target = int(now // self.tick)
+        due: List[str] = []
+        # After a long stall one lap covers every slot
+        for _ in range(min(target - self.position, len(self.slots))):
+            self.position += 1
+            slot = self.slots[self.position % len(self.slots)]
+            if slot:
+                due.extend(slot)
+                slot.clear()
+        self.position = max(self.position, target)
+        return due
+
+@dataclass(slots=True)
 class ConnectedClient:
-    """Connected client information"""
+    """Connected client information (slotted: thousands are held per worker)"""
     connection_id: str
     websocket: WebSocket
     user_id: Optional[str]
     user_role: UserRole
-    connected_at: datetime
-    last_heartbeat: datetime
+    connected_at: float  # time.time()
+    last_heartbeat: float  # time.monotonic()
     rooms: Set[str]
     metadata: Dict[str, Any]
+    send_queue: Optional[ClientSendQueue] = None
+    writer_task: Optional[asyncio.Task] = None  # Only while frames are queued
+    heartbeat_slot: int = 0
+    encoding: WireEncoding = WireEncoding.JSON
     
     def __post_init__(self):
-        if not self.rooms:
+        if self.rooms is None:
             self.rooms = set()
-        if not self.metadata:
+        if self.metadata is None:
             self.metadata = {}
 
 class WebSocketManager:
-    """WebSocket connection and message management"""
+    """WebSocket connection and message management.
+
+    Outgoing messages are serialized once per send and pushed onto each
+    recipient's bounded ``ClientSendQueue``; a writer task drains it while
+    it has frames, so one slow socket never holds up a fan-out. When a queue is
+    full the slow client policy either drops that client's oldest frame or
+    disconnects it. Stats-like messages are coalesced while still queued.
+
+    Clients may negotiate a compact encoding (``WireEncoding``) as a
+    subprotocol; a fan-out encodes once per encoding in use. Such clients
+    also get real-time stats as deltas against the previous frame.
+
+    Room, user, role and broadcast addressing also goes through ``broker``
+    so connections held by other gunicorn workers or nodes are reached;
+    connection ids are only meaningful to the worker that owns them.
+    """
     
-    def __init__(self):
+    def __init__(
+        self,
+        send_queue_size: Optional[int] = None,
+        slow_client_policy: Optional[str] = None,
+        send_timeout: Optional[float] = None,
+        broker: Optional[WebSocketBroker] = None
+    ):
         # Active connections
         self.connections: Dict[str, ConnectedClient] = {}
         
@@ -131,29 +419,39 @@ class WebSocketManager:
         # Message handlers
         self.message_handlers: Dict[MessageType, List[Callable]] = defaultdict(list)
         
-        # Redis for scaling (optional)
-        self.redis_client = None
-        try:
-            if hasattr(settings, 'REDIS_URL'):
-                self.redis_client = redis.from_url(settings.REDIS_URL)
-        except Exception as e:
-            logger.warning(f"Redis not available: {e}")
+        # Outbound queueing
+        self.send_queue_size = send_queue_size or settings.WEBSOCKET_SEND_QUEUE_SIZE
+        self.slow_client_policy = SlowClientPolicy(slow_client_policy or settings.WEBSOCKET_SLOW_CLIENT_POLICY)
+        self.send_timeout = send_timeout or settings.WEBSOCKET_SEND_TIMEOUT
+        self.send_stats = {'dropped': 0, 'slow_disconnects': 0, 'send_failures': 0}
         
-        # Background tasks
-        self.background_tasks: Set[asyncio.Task] = set()
+        # Heartbeat deadlines
+        self.heartbeat_timeout = settings.WEBSOCKET_HEARTBEAT_TIMEOUT
+        self.heartbeat_wheel = HeartbeatWheel(self.heartbeat_timeout, settings.WEBSOCKET_HEARTBEAT_TICK)
         
-        # Start background services
-        self._start_background_services()
+        # Last stats sent per stream, for delta frames
+        self.stats_streams: Dict[tuple, StatsStream] = {}
+        
+        # Cross-worker delivery
+        self.broker = broker or create_websocket_broker()
+        
+        # Background tasks (started with the first connection, inside the event loop)
+        self.background_tasks: Set[asyncio.Task] = set()
+        self._background_started = False
     
     def _start_background_services(self):
         """Start background services"""
-        # Heartbeat checker
-        task = asyncio.create_task(self._heartbeat_checker())
+        if self._background_started:
+            return
+        self._background_started = True
+        
+        # Receive fan-out published by other workers
+        task = asyncio.create_task(self.broker.start(self._deliver_envelope))
         self.background_tasks.add(task)
         task.add_done_callback(self.background_tasks.discard)
         
-        # Connection cleaner
-        task = asyncio.create_task(self._connection_cleaner())
+        # Heartbeat checker
+        task = asyncio.create_task(self._heartbeat_checker())
         self.background_tasks.add(task)
         task.add_done_callback(self.background_tasks.discard)
     
@@ -164,7 +462,12 @@ class WebSocketManager:
         token: Optional[str] = None
     ) -> str:
         """Accept new WebSocket connection"""
-        await websocket.accept()
+        encoding = negotiate_encoding(websocket.scope.get('subprotocols') or [])
+        if encoding == WireEncoding.JSON:
+            await websocket.accept()
+        else:
+            await websocket.accept(subprotocol=encoding.value)
+        self._start_background_services()
         
         connection_id = str(uuid.uuid4())
         user_role = UserRole.GUEST
@@ -185,14 +488,19 @@ class WebSocketManager:
             websocket=websocket,
             user_id=user_id,
             user_role=user_role,
-            connected_at=datetime.now(),
-            last_heartbeat=datetime.now(),
+            connected_at=time.time(),
+            last_heartbeat=time.monotonic(),
             rooms=set(),
-            metadata={}
+            metadata={},
+            send_queue=ClientSendQueue(self.send_queue_size),
+            encoding=encoding
         )
         
-        # Store connection
+        # Store connection and arm its heartbeat deadline
         self.connections[connection_id] = client
+        client.heartbeat_slot = self.heartbeat_wheel.schedule(
+            connection_id, client.last_heartbeat + self.heartbeat_timeout
+        )
         
         # Map user to connection
         if user_id:
@@ -216,17 +524,22 @@ class WebSocketManager:
         # Join default rooms based on role
         await self._join_default_rooms(connection_id, user_role)
         
-        logger.info(f"WebSocket connected: {connection_id} (user: {user_id}, role: {user_role.value})")
+        logger.info(f"WebSocket connected: {connection_id} (user: {user_id}, role: {user_role.value}, encoding: {encoding.value})")
         
         return connection_id
     
-    async def disconnect(self, connection_id: str):
-        """Disconnect WebSocket connection"""
+    async def disconnect(self, connection_id: str, close_code: Optional[int] = None):
+        """Disconnect WebSocket connection (closing the socket if close_code is given)"""
         if connection_id not in self.connections:
             return
         
         client = self.connections[connection_id]
         
+        # Stop the writer; queued frames are discarded
+        if client.writer_task and client.writer_task is not asyncio.current_task():
+            client.writer_task.cancel()
+        self.heartbeat_wheel.cancel(connection_id, client.heartbeat_slot)
+        
         # Leave all rooms
         for room_id in list(client.rooms):
             await self.leave_room(connection_id, room_id)
@@ -240,6 +553,12 @@ class WebSocketManager:
         # Remove connection
         del self.connections[connection_id]
         
+        if close_code is not None:
+            try:
+                await client.websocket.close(code=close_code)
+            except Exception:
+                pass
+        
         logger.info(f"WebSocket disconnected: {connection_id}")
     
     async def _authenticate_token(self, token: str) -> Optional[Dict[str, Any]]:
@@ -319,6 +638,9 @@ class WebSocketManager:
             )
         )
         
+        # Delta stats clients need the current snapshot to apply later deltas to
+        self._send_stats_snapshot(client, room_id)
+        
         logger.debug(f"Connection {connection_id} joined room {room_id}")
     
     async def leave_room(self, connection_id: str, room_id: str):
@@ -337,71 +659,178 @@ class WebSocketManager:
         logger.debug(f"Connection {connection_id} left room {room_id}")
     
     async def send_to_connection(self, connection_id: str, message: WebSocketMessage):
-        """Send message to specific connection"""
-        if connection_id not in self.connections:
-            return False
-        
-        client = self.connections[connection_id]
-        
-        try:
-            await client.websocket.send_text(json.dumps(message.to_dict()))
-            return True
-        except Exception as e:
-            logger.error(f"Error sending message to {connection_id}: {e}")
-            # Connection is probably dead, remove it
-            await self.disconnect(connection_id)
+        """Queue message for a specific connection"""
+        client = self.connections.get(connection_id)
+        if client is None:
             return False
+        return self._enqueue(client, message.encode(client.encoding), message.coalesce_key())
     
     async def send_to_user(self, user_id: str, message: WebSocketMessage):
         """Send message to all connections of a user"""
-        if user_id not in self.user_connections:
-            return 0
+        return self._fan_out('user', user_id, message)
+    
+    async def send_to_room(self, room_id: str, message: WebSocketMessage, exclude_connection: Optional[str] = None):
+        """Send message to all connections in a room"""
+        return self._fan_out('room', room_id, message, exclude_connection)
+    
+    async def broadcast(self, message: WebSocketMessage, exclude_connection: Optional[str] = None):
+        """Broadcast message to all connections"""
+        return self._fan_out('all', None, message, exclude_connection)
+    
+    def _fan_out(self, kind: str, target: Any, message: WebSocketMessage, exclude_connection: Optional[str] = None) -> int:
+        """Encode once per encoding, queue the frame locally and publish it to other workers.
+
+        Returns how many of this worker's connections accepted the frame.
+        """
+        frame = OutgoingFrame(message)
+        coalesce_key = message.coalesce_key()
+        self.broker.publish(kind, target, frame.payload(WireEncoding.JSON), exclude_connection, coalesce_key)
+        return self._deliver(self._local_targets(kind, target), frame, coalesce_key, exclude_connection)
+    
+    def _local_targets(self, kind: str, target: Any) -> List[str]:
+        """Connection ids on this worker addressed by kind/target"""
+        if kind == 'user':
+            return list(self.user_connections.get(target, ()))
+        if kind == 'room':
+            return list(self.rooms.get(target, ()))
+        if kind == 'roles':
+            return [
+                connection_id for connection_id, client in self.connections.items()
+                if client.user_role.value in target
+            ]
+        return list(self.connections.keys())
+    
+    def _deliver(self, connection_ids: List[str], frame: OutgoingFrame, coalesce_key: Optional[tuple] = None,
+                 exclude_connection: Optional[str] = None) -> int:
+        if coalesce_key and coalesce_key[0] == MessageType.REAL_TIME_STATS.value:
+            return self._deliver_stats(connection_ids, frame, coalesce_key, exclude_connection)
         
         sent_count = 0
-        connection_ids = list(self.user_connections[user_id])  # Copy to avoid modification during iteration
-        
         for connection_id in connection_ids:
-            if await self.send_to_connection(connection_id, message):
+            if connection_id == exclude_connection:
+                continue
+            client = self.connections.get(connection_id)
+            if client is not None and self._enqueue(client, frame.payload(client.encoding), coalesce_key):
                 sent_count += 1
-        
         return sent_count
     
-    async def send_to_room(self, room_id: str, message: WebSocketMessage, exclude_connection: Optional[str] = None):
-        """Send message to all connections in a room"""
-        if room_id not in self.rooms:
-            return 0
+    def _deliver_stats(self, connection_ids: List[str], frame: OutgoingFrame, coalesce_key: tuple,
+                       exclude_connection: Optional[str] = None) -> int:
+        """Full stats for JSON clients, only the changed fields for negotiated ones.
+
+        Each worker keeps its own stream state, so deltas stay consistent
+        no matter which worker published the stats.
+        """
+        message = frame.message
+        stream = self.stats_streams.get(coalesce_key)
+        if stream is None:
+            stream = self.stats_streams[coalesce_key] = StatsStream()
+        delta = OutgoingFrame(replace(message, data=stream.update(message.data)))
+        snapshot = OutgoingFrame(replace(message, data=stream.snapshot()))
         
         sent_count = 0
-        connection_ids = list(self.rooms[room_id])  # Copy to avoid modification during iteration
-        
         for connection_id in connection_ids:
-            if connection_id != exclude_connection:
-                if await self.send_to_connection(connection_id, message):
-                    sent_count += 1
-        
+            if connection_id == exclude_connection:
+                continue
+            client = self.connections.get(connection_id)
+            if client is None:
+                continue
+            if client.encoding == WireEncoding.JSON:
+                queued = self._enqueue(client, frame.payload(WireEncoding.JSON), coalesce_key)
+            else:
+                # A delta that replaces a queued delta would lose its fields; send the snapshot instead
+                queued = self._enqueue(
+                    client, delta.payload(client.encoding), coalesce_key, snapshot.payload(client.encoding)
+                )
+            if queued:
+                sent_count += 1
         return sent_count
     
-    async def broadcast(self, message: WebSocketMessage, exclude_connection: Optional[str] = None):
-        """Broadcast message to all connections"""
-        sent_count = 0
-        connection_ids = list(self.connections.keys())  # Copy to avoid modification during iteration
+    def _send_stats_snapshot(self, client: ConnectedClient, room_id: str) -> bool:
+        """Queue the current stats snapshot of a room for a delta client"""
+        coalesce_key = (MessageType.REAL_TIME_STATS.value, room_id, None)
+        stream = self.stats_streams.get(coalesce_key)
+        if stream is None or client.encoding == WireEncoding.JSON:
+            return False
+        message = WebSocketMessage(
+            type=MessageType.REAL_TIME_STATS,
+            data=stream.snapshot(),
+            timestamp=datetime.now(),
+            room_id=room_id
+        )
+        return self._enqueue(client, message.encode(client.encoding), coalesce_key)
+    
+    def _deliver_envelope(self, envelope: Dict[str, Any]):
+        """Deliver fan-out published by another worker to our connections"""
+        coalesce_key = tuple(envelope['c']) if envelope.get('c') else None
+        self._deliver(
+            self._local_targets(envelope['k'], envelope['t']),
+            OutgoingFrame(json_payload=envelope['p']),
+            coalesce_key,
+            envelope.get('x')
+        )
+    
+    def _enqueue(self, client: ConnectedClient, payload: Union[str, bytes], coalesce_key: Optional[tuple] = None,
+                 coalesced_payload: Union[str, bytes, None] = None) -> bool:
+        """Queue a frame, applying the slow client policy if the queue is full"""
+        queue = client.send_queue
+        if queue.put(payload, coalesce_key, coalesced_payload):
+            self._start_writer(client)
+            return True
         
-        for connection_id in connection_ids:
-            if connection_id != exclude_connection:
-                if await self.send_to_connection(connection_id, message):
-                    sent_count += 1
+        if self.slow_client_policy == SlowClientPolicy.DISCONNECT:
+            logger.warning(f"Disconnecting slow WebSocket client {client.connection_id} ({len(queue)} frames queued)")
+            self.send_stats['slow_disconnects'] += 1
+            self._schedule_disconnect(client.connection_id, close_code=1013)
+            return False
         
-        return sent_count
+        queue.drop_oldest()
+        self.send_stats['dropped'] += 1
+        queue.put(payload, coalesce_key, coalesced_payload)
+        self._start_writer(client)
+        return True
     
-    async def handle_message(self, connection_id: str, raw_message: str):
-        """Handle incoming message from client"""
+    def _start_writer(self, client: ConnectedClient):
+        if client.writer_task is None:
+            client.writer_task = asyncio.create_task(self._connection_writer(client))
+    
+    async def _connection_writer(self, client: ConnectedClient):
+        """Drain a connection's send queue onto its socket, then exit"""
+        queue = client.send_queue
         try:
-            message_data = json.loads(raw_message)
-            message = WebSocketMessage.from_dict(message_data)
+            payload = queue.pop()
+            while payload is not None:
+                if isinstance(payload, bytes):
+                    send = client.websocket.send_bytes(payload)
+                else:
+                    send = client.websocket.send_text(payload)
+                await asyncio.wait_for(send, self.send_timeout)
+                payload = queue.pop()
+            # No await between the empty pop and this, so nothing can be missed
+            client.writer_task = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending message to {client.connection_id}: {e}")
+            self.send_stats['send_failures'] += 1
+            # Connection is probably dead, remove it
+            await self.disconnect(client.connection_id, close_code=1011)
+    
+    def _schedule_disconnect(self, connection_id: str, close_code: Optional[int] = None):
+        """Disconnect from synchronous code paths"""
+        task = asyncio.create_task(self.disconnect(connection_id, close_code=close_code))
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+    
+    async def handle_message(self, connection_id: str, raw_message: Union[str, bytes]):
+        """Handle incoming message from client (in the connection's negotiated encoding)"""
+        try:
+            client = self.connections.get(connection_id)
+            message = WebSocketMessage.decode(raw_message, client.encoding if client else WireEncoding.JSON)
             
             # Update heartbeat
-            if connection_id in self.connections:
-                self.connections[connection_id].last_heartbeat = datetime.now()
+            if client is not None:
+                client.last_heartbeat = time.monotonic()
             
             # Handle specific message types
             if message.type == MessageType.HEARTBEAT:
@@ -412,6 +841,11 @@ class WebSocketManager:
                 await self._handle_live_class_join(connection_id, message)
             elif message.type == MessageType.LIVE_CLASS_LEAVE:
                 await self._handle_live_class_leave(connection_id, message)
+            elif message.type == MessageType.REAL_TIME_STATS and message.data.get('resync'):
+                # The client saw a gap in stats sequence numbers
+                room_id = message.data.get('room_id', 'admin')
+                if client is not None and room_id in client.rooms:
+                    self._send_stats_snapshot(client, room_id)
             else:
                 # Call registered handlers
                 for handler in self.message_handlers[message.type]:
@@ -514,47 +948,42 @@ class WebSocketManager:
         self.message_handlers[message_type].append(handler)
     
     async def _heartbeat_checker(self):
-        """Background task to check for dead connections"""
+        """Background task to drop connections without a recent heartbeat"""
         while True:
             try:
-                await asyncio.sleep(30)  # Check every 30 seconds
-                
-                current_time = datetime.now()
-                dead_connections = []
+                await asyncio.sleep(self.heartbeat_wheel.tick)
                 
-                for connection_id, client in self.connections.items():
-                    # Consider connection dead if no heartbeat for 2 minutes
-                    if (current_time - client.last_heartbeat).total_seconds() > 120:
-                        dead_connections.append(connection_id)
-                
-                # Remove dead connections
-                for connection_id in dead_connections:
+                for connection_id in self._expire_heartbeats(time.monotonic()):
                     logger.info(f"Removing dead connection: {connection_id}")
                     await self.disconnect(connection_id)
                     
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Error in heartbeat checker: {e}")
     
-    async def _connection_cleaner(self):
-        """Background task to clean up resources"""
-        while True:
-            try:
-                await asyncio.sleep(300)  # Clean every 5 minutes
-                
-                # Clean up empty rooms
-                empty_rooms = [room_id for room_id, connections in self.rooms.items() if not connections]
-                for room_id in empty_rooms:
-                    del self.rooms[room_id]
-                
-                # Clean up empty user mappings
-                empty_users = [user_id for user_id, connections in self.user_connections.items() if not connections]
-                for user_id in empty_users:
-                    del self.user_connections[user_id]
-                
-                logger.debug(f"Cleaned up {len(empty_rooms)} empty rooms and {len(empty_users)} empty user mappings")
-                
-            except Exception as e:
-                logger.error(f"Error in connection cleaner: {e}")
+    def _expire_heartbeats(self, now: float) -> List[str]:
+        """Connections whose heartbeat deadline has passed; re-arms the rest"""
+        expired = []
+        for connection_id in self.heartbeat_wheel.advance(now):
+            client = self.connections.get(connection_id)
+            if client is None:
+                continue
+            deadline = client.last_heartbeat + self.heartbeat_timeout
+            if deadline > now:
+                client.heartbeat_slot = self.heartbeat_wheel.schedule(connection_id, deadline)
+            else:
+                expired.append(connection_id)
+        return expired
+    
+    async def shutdown(self):
+        """Stop background tasks, the broker subscription and all writers"""
+        for task in list(self.background_tasks):
+            task.cancel()
+        for client in self.connections.values():
+            if client.writer_task:
+                client.writer_task.cancel()
+        await self.broker.stop()
     
     def get_connection_stats(self) -> Dict[str, Any]:
         """Get connection statistics"""
@@ -565,7 +994,17 @@ class WebSocketManager:
             'total_rooms': len(self.rooms),
             'connections_by_role': {},
             'active_rooms': list(self.rooms.keys()),
-            'uptime_seconds': 0  # Would track actual uptime
+            'uptime_seconds': 0,  # Would track actual uptime
+            'send_queue': {
+                'policy': self.slow_client_policy.value,
+                'max_size': self.send_queue_size,
+                'queued': sum(len(c.send_queue) for c in self.connections.values() if c.send_queue),
+                **self.send_stats
+            },
+            'broker': {
+                'backend': type(self.broker).__name__,
+                **self.broker.stats
+            }
         }
         
         # Count by role
@@ -617,12 +1056,7 @@ class WebSocketManager:
         )
         
         if target_roles:
-            sent_count = 0
-            for connection_id, client in self.connections.items():
-                if client.user_role in target_roles:
-                    if await self.send_to_connection(connection_id, alert_message):
-                        sent_count += 1
-            return sent_count
+            return self._fan_out('roles', [role.value for role in target_roles], alert_message)
         else:
             return await self.broadcast(alert_message)
     
@@ -631,7 +1065,8 @@ class WebSocketManager:
         stats_message = WebSocketMessage(
             type=MessageType.REAL_TIME_STATS,
             data=stats,
-            timestamp=datetime.now()
+            timestamp=datetime.now(),
+            room_id="admin"
         )
         
         return await self.send_to_room("admin", stats_message)
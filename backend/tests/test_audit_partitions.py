@@ -0,0 +1,43 @@
+"""Monthly audit log partitions shared by several workers."""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, text
+
+from app.services.audit_partition_service import AuditPartitionService
+
+
+def _logs():
+    return Table(
+        "gym_logs", MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("timestamp", DateTime, index=True),
+        Column("action", String(20)),
+    )
+
+
+def test_workers_keep_partitions_created_by_each_other(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    first = AuditPartitionService(_logs(), engine=engine, months_ahead=0)
+    second = AuditPartitionService(_logs(), engine=engine, months_ahead=0)
+    first.enabled = second.enabled = True
+    first.initialize()
+    second.initialize()
+
+    # Each worker creates a month the other has not seen
+    second.ensure_partitions([datetime(2031, 1, 15)])
+    first.ensure_partitions([datetime(2032, 6, 15)])
+    with engine.begin() as conn:
+        for day in ("2031-01-20 10:00:00", "2032-06-20 10:00:00"):
+            conn.execute(text("INSERT INTO gym_logs (timestamp, action) VALUES (:ts, 'login')"), {"ts": day})
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM gym_logs")).scalar() == 2
+        assert conn.execute(text("SELECT COUNT(*) FROM gym_logs_203101")).scalar() == 1
+        assert conn.execute(text("SELECT COUNT(*) FROM gym_logs_203206")).scalar() == 1
+
+    # Retention in the first worker sees the second worker's month too
+    assert first.drop_before(datetime(2032, 1, 1)) == 1
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM gym_logs")).scalar() == 1
+    engine.dispose()
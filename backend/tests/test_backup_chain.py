@@ -0,0 +1,337 @@
+"""Incremental and differential backup chains, restore and verification."""
+
+import asyncio
+import json
+import zipfile
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, JSON, MetaData, String, Table, create_engine, event, insert, inspect, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.services import backup_service as backup_module
+from app.services.backup_service import (
+    BackupConfig, BackupLogModel, BackupService, BackupStorage, BackupType, RestoreLogModel
+)
+
+OLD = datetime(2020, 1, 1)
+
+
+@pytest.fixture
+def gym(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'gym.db'}")
+    metadata = MetaData()
+    members = Table(
+        "members", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("name", String(50), index=True),
+        Column("profile", JSON),
+        Column("created_at", DateTime),
+        Column("updated_at", DateTime),
+    )
+    checkins = Table(
+        "checkins", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("member_id", Integer, ForeignKey("members.id")),
+        Column("created_at", DateTime),
+    )
+    options = Table("options", metadata, Column("key", String(20), primary_key=True), Column("value", String(20)))
+    metadata.create_all(engine)
+    BackupLogModel.__table__.create(engine)
+    RestoreLogModel.__table__.create(engine)
+
+    with engine.begin() as conn:
+        conn.execute(insert(members), [
+            {"id": i, "name": f"m{i}", "profile": {"tier": "basic"}, "created_at": OLD, "updated_at": OLD}
+            for i in range(1, 201)
+        ])
+        conn.execute(insert(checkins), [{"id": i, "member_id": i % 200 + 1, "created_at": OLD} for i in range(1, 2001)])
+        conn.execute(insert(options), [{"key": "open", "value": "06:00"}, {"key": "close", "value": "22:00"}])
+
+    Session = sessionmaker(bind=engine)
+
+    def get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    service = BackupService.__new__(BackupService)
+    service.backup_dir = tmp_path
+    service.temp_dir = tmp_path
+    service.engine = engine
+    service.s3_client = None
+    service._progress = {}
+    monkeypatch.setattr("app.services.backup_service.get_db", get_db)
+    monkeypatch.setattr("app.services.backup_service.settings.BACKUP_WATERMARK_OVERLAP", 0)
+    return service, engine, (members, checkins, options)
+
+
+def _backup(service, backup_type, **kwargs):
+    config = BackupConfig(backup_type=backup_type, storage_location=BackupStorage.LOCAL, **kwargs)
+    result = asyncio.run(service.create_backup(config))
+    assert result["success"], result
+    return asyncio.run(service._get_backup_info(result["backup_id"]))
+
+
+def _state(engine, tables):
+    with engine.connect() as conn:
+        return {table.name: sorted(map(tuple, conn.execute(select(table)))) for table in tables}
+
+
+def _record_statements(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+    return statements
+
+
+def _change(engine, tables, member_ids, checkin_ids, opening):
+    members, checkins, options = tables
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for member_id in member_ids:
+            conn.execute(members.update().where(members.c.id == member_id).values(
+                name=f"renamed {member_id}", profile={"tier": "gold"}, updated_at=now
+            ))
+        conn.execute(insert(checkins), [{"id": i, "member_id": 1, "created_at": now} for i in checkin_ids])
+        conn.execute(options.update().where(options.c.key == "open").values(value=opening))
+
+
+def test_incremental_chain_exports_changes_and_restores_latest_state(gym):
+    service, engine, tables = gym
+    full = _backup(service, BackupType.FULL)
+
+    _change(engine, tables, [5], range(2001, 2101), "05:30")
+    inc1 = _backup(service, BackupType.INCREMENTAL)
+    _change(engine, tables, [5, 6], range(2101, 2111), "05:00")
+    inc2 = _backup(service, BackupType.INCREMENTAL)
+    expected = _state(engine, tables)
+
+    assert (inc1["parent_backup_id"], inc1["base_backup_id"]) == (full["backup_id"], full["backup_id"])
+    assert (inc2["parent_backup_id"], inc2["base_backup_id"]) == (inc1["backup_id"], full["backup_id"])
+    # Changed rows only, plus the small table without timestamps
+    assert [backup["record_count"] for backup in (full, inc1, inc2)] == [2202, 1 + 100 + 2, 2 + 10 + 2]
+
+    members, checkins, options = tables
+    with engine.begin() as conn:
+        conn.execute(checkins.delete())
+        conn.execute(members.update().values(name="lost"))
+
+    result = asyncio.run(service.restore_backup(inc2["backup_id"], {}))
+    assert result["success"], result
+    assert result["records_restored"] == 2200 + 110 + 2
+    assert _state(engine, tables) == expected
+
+    with engine.connect() as conn:
+        profile = conn.execute(select(members.c.profile).where(members.c.id == 6)).scalar_one()
+    assert profile == {"tier": "gold"}
+
+
+def test_differential_hangs_off_the_full_backup(gym):
+    service, engine, tables = gym
+    full = _backup(service, BackupType.FULL)
+    _change(engine, tables, [1], range(2001, 2003), "07:00")
+    _backup(service, BackupType.INCREMENTAL)
+    _change(engine, tables, [2], range(2003, 2005), "08:00")
+    diff = _backup(service, BackupType.DIFFERENTIAL)
+    expected = _state(engine, tables)
+
+    assert (diff["parent_backup_id"], diff["base_backup_id"]) == (full["backup_id"], full["backup_id"])
+    assert diff["record_count"] == 2 + 4 + 2
+    chain = asyncio.run(service._resolve_backup_chain(diff["backup_id"]))
+    assert [backup["backup_id"] for backup in chain] == [full["backup_id"], diff["backup_id"]]
+
+    with engine.begin() as conn:
+        conn.execute(tables[1].delete())
+    assert asyncio.run(service.restore_backup(diff["backup_id"], {}))["success"]
+    assert _state(engine, tables) == expected
+
+    # Retention cleanup keeps the full backup while the chain needs it
+    db = next(backup_module.get_db())
+    assert service._has_children(db, full["backup_id"])
+    db.close()
+
+
+@pytest.mark.parametrize("backup_type", [BackupType.INCREMENTAL, BackupType.DIFFERENTIAL])
+def test_hard_deletes_are_not_resurrected_by_a_chain_restore(gym, backup_type):
+    service, engine, tables = gym
+    members, checkins, _ = tables
+    _backup(service, BackupType.FULL)
+    with engine.begin() as conn:
+        conn.execute(checkins.delete().where(checkins.c.id <= 10))
+    _backup(service, BackupType.INCREMENTAL)
+    _change(engine, tables, [7], range(2001, 2004), "06:30")
+    with engine.begin() as conn:
+        conn.execute(checkins.delete().where(checkins.c.member_id == 8))
+        conn.execute(members.delete().where(members.c.id == 8))
+        # Added and deleted between two backups
+        conn.execute(checkins.delete().where(checkins.c.id == 2002))
+    latest = _backup(service, backup_type)
+    expected = _state(engine, tables)
+
+    with zipfile.ZipFile(latest["storage_path"]) as archive:
+        manifest = json.loads(archive.read("metadata.json"))
+    assert manifest["tables"]["checkins"]["keys"]["rows"] == len(expected["checkins"])
+    # Exported whole, so there is nothing to diff
+    assert "keys" not in manifest["tables"]["options"]
+
+    with engine.begin() as conn:
+        conn.execute(checkins.delete())
+    result = asyncio.run(service.restore_backup(latest["backup_id"], {}))
+    assert result["success"], result
+    assert _state(engine, tables) == expected
+
+
+def test_incremental_needs_a_full_backup(gym):
+    service, _, _ = gym
+    config = BackupConfig(backup_type=BackupType.INCREMENTAL, storage_location=BackupStorage.LOCAL)
+    result = asyncio.run(service.create_backup(config))
+    assert not result["success"]
+    assert "No completed full backup" in result["error"]
+
+
+def test_restore_defers_indexes_and_reports_progress(gym, monkeypatch):
+    service, engine, tables = gym
+    full = _backup(service, BackupType.FULL)
+    expected = _state(engine, tables)
+    monkeypatch.setattr("app.services.backup_service.settings.BACKUP_RESTORE_PROGRESS_INTERVAL", 0.01)
+
+    indexes_during_load = {}
+    insert_rows = service._insert_rows
+
+    def spy(conn, table, columns, rows):
+        indexes_during_load[table.name] = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t AND sql IS NOT NULL"),
+            {"t": table.name},
+        ).scalars().all()
+        insert_rows(conn, table, columns, rows)
+
+    monkeypatch.setattr(service, "_insert_rows", spy)
+    result = asyncio.run(service.restore_backup(full["backup_id"], {}))
+    assert result["success"], result
+    assert _state(engine, tables) == expected
+
+    assert indexes_during_load["members"] == []
+    with engine.connect() as conn:
+        assert "ix_members_name" in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars().all()
+
+    progress = service.get_restore_progress(result["restore_id"])
+    assert progress["status"] == "completed"
+    assert {t["table"]: (t["status"], t["rows"]) for t in progress["tables"]} == {
+        "members": ("restored", 200), "checkins": ("restored", 2000), "options": ("restored", 2)
+    }
+
+
+def test_staged_restore_swaps_tables_in_fk_order(gym, monkeypatch):
+    service, engine, tables = gym
+    full = _backup(service, BackupType.FULL)
+    expected = _state(engine, tables)
+    monkeypatch.setattr(service, "_restore_workers", lambda: 2)
+
+    statements = _record_statements(engine)
+    result = asyncio.run(service.restore_backup(full["backup_id"], {}))
+    assert result["success"], result
+    assert _state(engine, tables) == expected
+
+    deletes = [sql.split()[2] for sql in statements if sql.startswith("DELETE FROM")]
+    swaps = [sql.split()[2] for sql in statements if sql.startswith("INSERT INTO") and "SELECT" in sql]
+    # Children are cleared before their parents and copied in after them
+    assert deletes.index("checkins") < deletes.index("members")
+    assert swaps.index("members") < swaps.index("checkins")
+    assert set(swaps) == {"members", "checkins", "options"}
+    with engine.connect() as conn:
+        assert not [name for name in inspect(conn).get_table_names() if name.startswith("restore_staging_")]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_failed_restore_leaves_live_tables_untouched(gym, monkeypatch, workers):
+    service, engine, tables = gym
+    full = _backup(service, BackupType.FULL)
+    _change(engine, tables, [7], range(2001, 2004), "10:00")
+    before = _state(engine, tables)
+    monkeypatch.setattr(service, "_restore_workers", lambda: workers)
+
+    merged_rows = service._merged_rows
+
+    def broken(table, *args):
+        if table.name == "checkins":
+            raise ValueError("unreadable member")
+        return merged_rows(table, *args)
+
+    monkeypatch.setattr(service, "_merged_rows", broken)
+    result = asyncio.run(service.restore_backup(full["backup_id"], {}))
+    assert not result["success"]
+    assert "unreadable member" in result["error"]
+    assert _state(engine, tables) == before
+
+
+def test_corrupt_archive_fails_before_the_database_is_touched(gym):
+    service, engine, tables = gym
+    full = _backup(service, BackupType.FULL)
+    before = _state(engine, tables)
+    with zipfile.ZipFile(full["storage_path"], "a") as archive:
+        archive.writestr("extra.txt", b"tampered")
+
+    statements = _record_statements(engine)
+    result = asyncio.run(service.restore_backup(full["backup_id"], {}))
+    assert not result["success"]
+    assert "archive checksum differs" in result["error"]
+    assert not [sql for sql in statements if sql.startswith("DELETE FROM")]
+    assert _state(engine, tables) == before
+
+
+def test_verify_only_checks_counts_and_checksums_without_writing(gym, tmp_path):
+    service, engine, tables = gym
+    full = _backup(service, BackupType.FULL)
+    _change(engine, tables, [3], range(2001, 2006), "09:00")
+    inc = _backup(service, BackupType.INCREMENTAL)
+    with engine.begin() as conn:
+        conn.execute(tables[1].delete())
+
+    result = asyncio.run(service.restore_backup(inc["backup_id"], {"verify_only": True}))
+    assert result["success"], result
+    assert result["verification"]["backups"] == [full["backup_id"], inc["backup_id"]]
+    assert result["verification"]["rows"] == 2202 + 1 + 5 + 2
+    with engine.connect() as conn:
+        assert conn.execute(select(tables[1])).first() is None
+    assert service.get_restore_progress(result["restore_id"])["restore_type"] == "verify"
+
+    # Tamper with the incremental archive: one check-in row goes missing
+    path = inc["storage_path"]
+    with zipfile.ZipFile(path) as archive:
+        members = {name: archive.read(name) for name in archive.namelist()}
+    members["checkins.csv"] = b"\n".join(members["checkins.csv"].split(b"\n")[:-2]) + b"\n"
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+
+    result = asyncio.run(service.restore_backup(inc["backup_id"], {"verify_only": True}))
+    assert not result["success"]
+    assert "archive checksum differs" in result["error"]
+
+    db = next(backup_module.get_db())
+    db.query(BackupLogModel).filter(BackupLogModel.backup_id == inc["backup_id"]).update({"checksum": None})
+    db.commit()
+    db.close()
+    result = asyncio.run(service.restore_backup(inc["backup_id"], {"verify_only": True}))
+    assert "checkins: 4 rows, expected 5, checksum differs" in result["error"]
+
+
+def test_change_filters_compare_in_utc(gym):
+    service, _, _ = gym
+    metadata = MetaData()
+    table = Table(
+        "visits", metadata, Column("id", Integer, primary_key=True),
+        Column("created_at", DateTime(timezone=True)), Column("updated_at", DateTime),
+    )
+    since = datetime(2026, 3, 1, 12, 0)
+    query, mode = service._export_query(table, since)
+    params = query.compile().params
+
+    assert mode == "changes"
+    # Timezone-aware columns get an explicit UTC parameter, naive ones the stored value
+    assert sorted(params.values(), key=lambda value: value.tzinfo is not None) == [
+        since, since.replace(tzinfo=timezone.utc)
+    ]
+    assert service._database_now().tzinfo is None
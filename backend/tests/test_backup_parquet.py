@@ -0,0 +1,179 @@
+"""Parquet backup format: typed round trips, in-place table reads and size vs CSV."""
+
+import asyncio
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, Float, Integer, JSON, LargeBinary, MetaData, Numeric, String, Table, Text,
+    create_engine, insert, select,
+)
+from sqlalchemy.orm import sessionmaker
+
+from app.services.backup_formats import BackupFormat, open_parquet_member
+from app.services.backup_service import BackupConfig, BackupLogModel, BackupService, BackupStorage, BackupType, RestoreLogModel
+
+pa = pytest.importorskip("pyarrow")
+
+
+def _payment(i):
+    return {
+        "id": i,
+        "member_id": i % 500,
+        "method": ["card", "cash", "transfer"][i % 3],
+        "note": [None, "", f"receipt {i}"][i % 3],
+        "refunded": i % 17 == 0,
+        "paid_at": datetime(2024, 1, 1, 6, 0) if i % 11 else None,
+        "period": date(2024, 1 + i % 12, 1),
+        "amount": Decimal(f"{20 + i % 80}.{i % 100:02d}"),
+        "fee_rate": 0.015 + (i % 3) * 0.005,
+        "details": {"plan": "monthly", "discount": i % 10} if i % 2 else None,
+        "signature": bytes([i % 256, 7]) if i % 5 == 0 else None,
+        "updated_at": datetime(2020, 1, 1),
+    }
+
+
+@pytest.fixture
+def gym(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'gym.db'}")
+    metadata = MetaData()
+    payments = Table(
+        "payments", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("member_id", Integer),
+        Column("method", String(20)),
+        Column("note", Text),
+        Column("refunded", Boolean),
+        Column("paid_at", DateTime),
+        Column("period", Date),
+        Column("amount", Numeric(10, 2)),
+        Column("fee_rate", Float),
+        Column("details", JSON),
+        Column("signature", LargeBinary),
+        Column("updated_at", DateTime),
+    )
+    metadata.create_all(engine)
+    BackupLogModel.__table__.create(engine)
+    RestoreLogModel.__table__.create(engine)
+
+    Session = sessionmaker(bind=engine)
+
+    def get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    service = BackupService.__new__(BackupService)
+    service.backup_dir = tmp_path
+    service.temp_dir = tmp_path
+    service.engine = engine
+    service.s3_client = None
+    service._progress = {}
+    monkeypatch.setattr("app.services.backup_service.get_db", get_db)
+    return service, engine, payments
+
+
+def _fill(engine, payments, count):
+    with engine.begin() as conn:
+        for start in range(0, count, 10000):
+            conn.execute(insert(payments), [_payment(i) for i in range(start + 1, min(count, start + 10000) + 1)])
+
+
+def _rows(engine, payments):
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(select(payments).order_by(payments.c.id))]
+
+
+def _backup(service, backup_format, backup_type=BackupType.FULL):
+    config = BackupConfig(backup_type=backup_type, storage_location=BackupStorage.LOCAL, backup_format=backup_format)
+    result = asyncio.run(service.create_backup(config))
+    assert result["success"], result
+    return result
+
+
+def test_parquet_backup_keeps_types_and_restores(gym):
+    service, engine, payments = gym
+    _fill(engine, payments, 3000)
+    expected = _rows(engine, payments)
+    result = _backup(service, BackupFormat.PARQUET)
+
+    with zipfile.ZipFile(result["backup_path"]) as archive:
+        info = archive.getinfo("payments.parquet")
+        assert info.compress_type == zipfile.ZIP_STORED
+    manifest = service.read_backup_table(result["backup_path"], "payments", columns=["id"])
+    assert manifest.num_rows == 3000 and manifest.column_names == ["id"]
+
+    # One column, read in place with its type
+    amounts = service.read_backup_table(result["backup_path"], "payments", columns=["amount", "paid_at"])
+    assert amounts.schema.field("amount").type == pa.decimal128(10, 2)
+    assert amounts.schema.field("paid_at").type == pa.timestamp("us")
+    assert amounts.column("amount")[0].as_py() == Decimal("21.01")
+
+    with engine.begin() as conn:
+        conn.execute(payments.delete())
+    restored = asyncio.run(service.restore_backup(result["backup_id"], {}))
+    assert restored["success"], restored
+    assert _rows(engine, payments) == expected
+
+    verified = asyncio.run(service.restore_backup(result["backup_id"], {"verify_only": True}))
+    assert verified["success"] and verified["verification"]["rows"] == 3000
+
+
+def test_chain_can_mix_formats(gym):
+    service, engine, payments = gym
+    _fill(engine, payments, 100)
+    with engine.begin() as conn:
+        # CSV cannot tell NULL from an empty string
+        conn.execute(payments.update().where(payments.c.note.is_(None)).values(note="-"))
+    _backup(service, BackupFormat.CSV)
+    with engine.begin() as conn:
+        now = datetime.utcnow()
+        conn.execute(payments.update().where(payments.c.id == 7).values(
+            note=None, details={"plan": "annual"}, updated_at=now
+        ))
+        conn.execute(insert(payments), [{**_payment(101), "updated_at": now}])
+    diff = _backup(service, BackupFormat.PARQUET, BackupType.DIFFERENTIAL)
+    assert asyncio.run(service._get_backup_info(diff["backup_id"]))["record_count"] == 2
+    expected = _rows(engine, payments)
+
+    with engine.begin() as conn:
+        conn.execute(payments.delete())
+    assert asyncio.run(service.restore_backup(diff["backup_id"], {}))["success"]
+    assert _rows(engine, payments) == expected
+
+
+@pytest.mark.slow
+def test_parquet_is_smaller_and_one_column_reads_only_its_chunks(gym):
+    service, engine, payments = gym
+    rows = 200_000
+    _fill(engine, payments, rows)
+
+    sizes, paths = {}, {}
+    for backup_format in (BackupFormat.CSV, BackupFormat.PARQUET):
+        result = _backup(service, backup_format)
+        column = service.read_backup_table(result["backup_path"], "payments", columns=["amount"])
+        assert column.column_names == ["amount"] and column.num_rows == rows
+        sizes[backup_format], paths[backup_format] = result["size_bytes"], result["backup_path"]
+
+    assert sizes[BackupFormat.PARQUET] < sizes[BackupFormat.CSV]
+
+    # A CSV member has to be inflated and parsed whole to get one column. The
+    # Parquet member is stored uncompressed, so it is memory-mapped in place
+    # and a one-column read touches only that column's chunks.
+    with zipfile.ZipFile(paths[BackupFormat.CSV]) as archive:
+        assert archive.getinfo("payments.csv").compress_type != zipfile.ZIP_STORED
+    with zipfile.ZipFile(paths[BackupFormat.PARQUET]) as archive:
+        member = archive.getinfo("payments.parquet")
+        assert member.compress_type == zipfile.ZIP_STORED
+    metadata = open_parquet_member(paths[BackupFormat.PARQUET], "payments.parquet").metadata
+    amount_bytes = sum(
+        metadata.row_group(i).column(j).total_compressed_size
+        for i in range(metadata.num_row_groups)
+        for j in range(metadata.num_columns)
+        if metadata.row_group(i).column(j).path_in_schema == "amount"
+    )
+    assert amount_bytes < member.file_size / 5
@@ -0,0 +1,112 @@
+"""Streaming, parallel full-database backups."""
+
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import tracemalloc
+import zipfile
+
+import pytest
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, String, Table, create_engine, insert
+from sqlalchemy import select as sql_select
+
+from app.services.backup_service import BackupConfig, BackupService, BackupStorage, BackupType
+
+ROWS = 100_000
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'gym.db'}")
+    metadata = MetaData()
+    members = Table("members", metadata, Column("id", Integer, primary_key=True), Column("name", String(50)))
+    checkins = Table(
+        "checkins", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("member_id", Integer, ForeignKey("members.id")),
+        Column("note", String(100)),
+    )
+    Table("empty", metadata, Column("id", Integer, primary_key=True))
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(members), [{"id": i, "name": f"member {i}"} for i in range(1, 101)])
+        conn.execute(insert(checkins), [
+            {"id": i, "member_id": i % 100 + 1, "note": f"front desk, gate {i % 7}"} for i in range(1, ROWS + 1)
+        ])
+
+    service = BackupService.__new__(BackupService)
+    service.backup_dir = tmp_path
+    service.engine = engine
+    service._progress = {}
+    monkeypatch.setattr("app.services.backup_service.settings.BACKUP_CHUNK_SIZE", 1000)
+    monkeypatch.setattr("app.services.backup_service.settings.BACKUP_WORKERS", 2)
+    return service
+
+
+def _config(backup_type=BackupType.FULL, **kwargs):
+    return BackupConfig(backup_type=backup_type, storage_location=BackupStorage.LOCAL, **kwargs)
+
+
+def _read_csv(zipf, name):
+    with zipf.open(name) as member:
+        return list(csv.reader(io.TextIOWrapper(member, encoding="utf-8")))
+
+
+def test_full_backup_streams_every_table_into_the_archive(service):
+    config = _config(exclude_tables=["empty"])
+
+    tracemalloc.start()
+    result = asyncio.run(service._create_full_backup("b1", config))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    with zipfile.ZipFile(result["backup_path"]) as zipf:
+        assert sorted(zipf.namelist()) == ["checkins.csv", "members.csv", "metadata.json", "schema.sql"]
+        rows = _read_csv(zipf, "checkins.csv")
+        raw = zipf.read("checkins.csv")
+        metadata = json.loads(zipf.read("metadata.json"))
+
+    assert rows[0] == ["id", "member_id", "note"]
+    assert len(rows) == ROWS + 1
+    assert rows[-1] == [str(ROWS), str(ROWS % 100 + 1), f"front desk, gate {ROWS % 7}"]
+    checksum = metadata["tables"]["checkins"].pop("sha256")
+    assert [column["type"] for column in metadata["tables"]["checkins"].pop("schema")] == [
+        "INTEGER", "INTEGER", "VARCHAR(100)"
+    ]
+    assert metadata["tables"]["checkins"] == {
+        "rows": ROWS, "columns": ["id", "member_id", "note"], "primary_key": ["id"], "mode": "full"
+    }
+    assert checksum == hashlib.sha256(raw).hexdigest()
+    assert metadata["tables"]["members"]["rows"] == 100
+
+    assert result["record_count"] == ROWS + 100
+    assert [t["table"] for t in result["tables"]] == ["members", "checkins"]
+    assert all(t["status"] == "written" and t["bytes"] > 0 for t in result["tables"])
+    assert result["compression_ratio"] > 1
+    assert service._progress == {}
+    # Only a few chunks are ever in flight, never the table
+    assert peak < 8 * 1024 * 1024
+
+
+def test_data_backup_skips_schema(service):
+    config = _config(BackupType.DATA_ONLY, include_tables=["members", "empty"])
+    result = asyncio.run(service._create_data_backup("b2", config))
+
+    with zipfile.ZipFile(result["backup_path"]) as zipf:
+        assert sorted(zipf.namelist()) == ["empty.csv", "members.csv", "metadata.json"]
+        assert _read_csv(zipf, "empty.csv") == [["id"]]
+    assert result["table_count"] == 2
+
+
+def test_failed_table_removes_partial_archive(service, monkeypatch):
+    def select(table):
+        if table.name == "checkins":
+            raise RuntimeError("connection lost")
+        return sql_select(table)
+
+    monkeypatch.setattr("app.services.backup_service.select", select)
+    with pytest.raises(RuntimeError, match="connection lost"):
+        asyncio.run(service._create_full_backup("b3", _config()))
+    assert not (service.backup_dir / "b3.zip").exists()
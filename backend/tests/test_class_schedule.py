@@ -0,0 +1,103 @@
+"""Class schedule endpoint: grouped occupancy and conditional requests."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base, get_db
+from app import models  # noqa: F401  (registers every mapper)
+from app.api import classes
+from app.core.auth import get_current_active_user
+from app.models.class_model import Class, ClassType
+from app.models.class_reservation import ClassReservation, ReservationStatus
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def client(session_factory):
+    app = FastAPI()
+    app.include_router(classes.router, prefix="/classes")
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_active_user] = lambda: None
+    return TestClient(app)
+
+
+def _seed(session_factory):
+    monday = datetime(2026, 3, 2, 7, 0)
+    db = session_factory()
+    spinning, yoga, later = (
+        Class(
+            name=name, class_type=class_type, instructor_id=1, start_time=start,
+            end_time=start + timedelta(hours=1), duration_minutes=60, max_capacity=capacity,
+        )
+        for name, class_type, start, capacity in (
+            ("Spinning 7am", ClassType.SPINNING, monday, 3),
+            ("Yoga 6pm", ClassType.YOGA, monday.replace(hour=18), 10),
+            ("Spinning Tuesday", ClassType.SPINNING, monday + timedelta(days=1), 3),
+        )
+    )
+    db.add_all([spinning, yoga, later])
+    db.flush()
+    db.add_all([
+        ClassReservation(class_id=spinning.id, user_id=user_id, status=status)
+        for user_id, status in (
+            (1, ReservationStatus.CONFIRMED),
+            (2, ReservationStatus.PENDING),
+            (3, ReservationStatus.WAITLISTED),
+            (4, ReservationStatus.CANCELLED),
+        )
+    ])
+    db.commit()
+    ids = spinning.id, yoga.id
+    db.close()
+    return ids
+
+
+def test_schedule_counts_held_seats_and_honours_if_none_match(client, session_factory):
+    spinning_id, yoga_id = _seed(session_factory)
+    params = {"date_from": "2026-03-02", "date_to": "2026-03-02"}
+
+    response = client.get("/classes/schedule", params=params)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+    [day] = response.json()
+    assert day["date"] == "2026-03-02"
+    assert (day["total_classes"], day["total_capacity"], day["total_reservations"]) == (2, 13, 2)
+    spots = {c["id"]: (c["reservation_count"], c["available_spots"]) for c in day["classes"]}
+    assert spots == {spinning_id: (2, 1), yoga_id: (0, 10)}
+
+    unchanged = client.get("/classes/schedule", params=params, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == etag
+    assert unchanged.content == b""
+
+    db = session_factory()
+    db.add(ClassReservation(class_id=yoga_id, user_id=5, status=ReservationStatus.CONFIRMED))
+    db.commit()
+    db.close()
+
+    changed = client.get("/classes/schedule", params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["total_reservations"] == 3
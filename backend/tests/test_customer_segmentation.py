@@ -0,0 +1,119 @@
+"""Vectorized customer segmentation feature build."""
+
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sklearn")
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app import models  # noqa: F401  (registers every mapper)
+from app.models.user import User
+from app.models.membership import Payment, PaymentStatus
+from app.services.analytics_service import (
+    AnalyticsService, AnalyticsRequest, AnalyticsType, TimeFrame
+)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _seed(engine, members):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {
+                "user_id": f"M{i:06d}",
+                "email": f"member{i}@gym.test",
+                "phone": f"+54{i:09d}",
+                "password_hash": "x",
+                "first_name": "Member",
+                "last_name": str(i),
+                "created_at": now - timedelta(days=i % 720),
+            }
+            for i in range(members)
+        ])
+        conn.execute(insert(Payment), [
+            {
+                "user_id": (i % members) + 1,
+                "amount": 1000 + (i % 7) * 250,
+                "payment_method": "cash",
+                "status": PaymentStatus.PAID,
+                "due_date": date.today(),
+                "payment_date": date.today(),
+            }
+            for i in range(members * 3)
+        ])
+
+
+def _run_segmentation(engine, members):
+    _seed(engine, members)
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db = sessionmaker(bind=engine)()
+    request = AnalyticsRequest(
+        analytics_type=AnalyticsType.CUSTOMER_SEGMENTATION,
+        time_frame=TimeFrame.MONTHLY,
+        start_date=datetime.utcnow() - timedelta(days=365),
+        end_date=datetime.utcnow(),
+    )
+    result = asyncio.run(AnalyticsService()._perform_customer_segmentation(db, request))
+    db.close()
+    event.remove(engine, "before_cursor_execute", _count)
+    return result, len(statements)
+
+
+@pytest.mark.slow
+def test_query_count_is_constant_in_member_count(engine):
+    small, small_queries = _run_segmentation(engine, 200)
+    assert small["total_customers"] == 200
+
+    other = create_engine("sqlite://")
+    Base.metadata.create_all(bind=other)
+    large, large_queries = _run_segmentation(other, 20000)
+    other.dispose()
+
+    assert large["total_customers"] == 20000
+    assert large_queries == small_queries
+    assert sum(large["segment_distribution"].values()) == 20000
+
+
+def test_revenue_features_count_paid_payments_only(engine):
+    members = 50
+    _seed(engine, members)
+    with engine.begin() as conn:
+        conn.execute(insert(Payment), [
+            {
+                "user_id": 1, "amount": 9999, "payment_method": "cash", "status": status,
+                "due_date": date.today(), "payment_date": date.today(),
+            }
+            for status in (PaymentStatus.PENDING, PaymentStatus.OVERDUE, PaymentStatus.REFUNDED)
+        ])
+
+    expected = {}
+    for i in range(members * 3):
+        revenue, count = expected.get((i % members) + 1, (0.0, 0))
+        expected[(i % members) + 1] = (revenue + 1000 + (i % 7) * 250, count + 1)
+
+    db = sessionmaker(bind=engine)()
+    features = AnalyticsService()._build_customer_features(db).set_index("user_id")
+    db.close()
+
+    assert {
+        user_id: (row.total_revenue, row.payment_frequency)
+        for user_id, row in features.iterrows()
+    } == expected
+    assert features.loc[1, "avg_payment"] == expected[1][0] / 3
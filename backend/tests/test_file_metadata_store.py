@@ -0,0 +1,153 @@
+"""Database-backed file metadata: lookups, concurrency and the metadata.json migration."""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import pytest
+from fastapi import UploadFile
+from sqlalchemy import create_engine, event
+from starlette.datastructures import Headers
+
+pytest.importorskip("boto3")
+pytest.importorskip("cv2")
+
+from app.services.file_storage_service import FileStorageService, FileType, StoredFileModel
+
+
+def _upload(data, filename="plan.pdf"):
+    return UploadFile(BytesIO(data), filename=filename, headers=Headers({"content-type": "application/pdf"}))
+
+
+def _record(file_id, checksum, storage_path, expires_at=None):
+    return {
+        "file_id": file_id, "original_name": f"{file_id}.pdf", "file_type": "document",
+        "mime_type": "application/pdf", "size_bytes": 10, "checksum": checksum,
+        "storage_provider": "local", "storage_path": storage_path, "public_url": f"/files/{storage_path}",
+        "thumbnail_url": None, "created_at": "2026-01-05T10:00:00", "expires_at": expires_at,
+        "metadata": {"original_size": 10},
+    }
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine(f"sqlite:///{tmp_path / 'files.db'}")
+    monkeypatch.setattr("app.services.file_storage_service.engine", engine)
+    return engine
+
+
+def test_concurrent_uploads_are_all_recorded(engine):
+    storage = FileStorageService()
+
+    async def run():
+        results = await asyncio.gather(*(
+            storage.upload_file(_upload(f"plan {i % 10}".encode() * 50), expires_in_days=1 if i % 2 else None)
+            for i in range(40)
+        ))
+        ids = [result.file_metadata.file_id for result in results]
+        assert all(result.success for result in results)
+        assert all([await storage.get_file_metadata(file_id) for file_id in ids])
+
+        stats = storage.get_storage_stats()
+        assert (stats["total_files"], stats["unique_blobs"]) == (40, 10)
+        assert stats["files_by_type"]["document"]["count"] == 40
+
+        checksum = results[0].file_metadata.checksum
+        same = await storage.find_files(checksum=checksum)
+        assert sorted(f.file_id for f in same) == sorted(ids[0::10])
+        assert len(await storage.find_files(file_type=FileType.IMAGE)) == 0
+        expiring = await storage.find_files(expires_before=datetime.now() + timedelta(days=2), limit=100)
+        assert len(expiring) == 20
+
+    asyncio.run(run())
+
+
+def test_cleanup_uses_the_expiry_index(engine):
+    storage = FileStorageService()
+
+    async def run():
+        kept = (await storage.upload_file(_upload(b"kept" * 10))).file_metadata
+        expired = (await storage.upload_file(_upload(b"gone" * 10), expires_in_days=1)).file_metadata
+        with storage.SessionLocal() as db:
+            db.query(StoredFileModel).filter(StoredFileModel.file_id == expired.file_id).update(
+                {StoredFileModel.expires_at: datetime.now() - timedelta(minutes=1)}
+            )
+            db.commit()
+
+        await storage.cleanup_expired_files()
+        assert await storage.get_file_metadata(kept.file_id)
+        assert await storage.get_file_metadata(expired.file_id) is None
+        assert storage._get_blob(expired.checksum) is None
+
+    asyncio.run(run())
+
+
+def test_metadata_json_is_migrated_once(engine, tmp_path):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    digest = "ab" * 32
+    blob_path = f"document/ab/{digest}.pdf"
+    (uploads / "document" / "ab").mkdir(parents=True)
+    (uploads / blob_path).write_bytes(b"x" * 10)
+    (uploads / "metadata.json").write_text(json.dumps([
+        _record("legacy", "0" * 32, "document/legacy.pdf", "2026-02-01T00:00:00"),
+        _record("shared-1", digest, blob_path),
+        _record("shared-2", digest, blob_path),
+    ]))
+    (uploads / "blobs.json").write_text(json.dumps({
+        digest: {"storage_path": blob_path, "public_url": f"/files/{blob_path}", "size_bytes": 10, "ref_count": 5}
+    }))
+
+    storage = FileStorageService()
+    assert not (uploads / "metadata.json").exists()
+    assert (uploads / "metadata.json.migrated").exists() and (uploads / "blobs.json.migrated").exists()
+
+    async def run():
+        legacy = await storage.get_file_metadata("legacy")
+        assert legacy.expires_at == datetime(2026, 2, 1) and legacy.metadata == {"original_size": 10}
+        # Reference counts are recounted from the records, not trusted from blobs.json
+        assert storage._get_blob(digest).ref_count == 2
+
+        assert await storage.delete_file("shared-1")
+        assert (uploads / blob_path).exists()
+        assert await storage.delete_file("shared-2")
+        assert not (uploads / blob_path).exists()
+
+    asyncio.run(run())
+    # A restart has nothing left to import
+    assert FileStorageService().migrate_json_metadata() == 0
+
+
+def test_lookups_search_an_index(engine):
+    storage = FileStorageService()
+    with storage.SessionLocal() as db:
+        db.bulk_insert_mappings(StoredFileModel, [
+            {**_record(f"file-{i}", f"{i:064x}", f"document/{i}.pdf"), "created_at": datetime.now(),
+             "expires_at": None, "file_metadata": None}
+            for i in range(200)
+        ])
+        db.commit()
+
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    async def run():
+        assert await storage.get_file_metadata("file-150")
+        assert len(await storage.find_files(checksum=f"{150:064x}")) == 1
+
+    asyncio.run(run())
+    event.remove(engine, "before_cursor_execute", _capture)
+
+    selects = [(statement, parameters) for statement, parameters in statements if statement.lstrip().startswith("SELECT")]
+    assert len(selects) == 2
+    with engine.connect() as conn:
+        for statement, parameters in selects:
+            plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            # A lookup that scans the table grows with the store
+            assert any(step.startswith("SEARCH stored_files USING INDEX") for step in plan), plan
+            assert not any(step.startswith("SCAN stored_files") for step in plan), plan
@@ -0,0 +1,131 @@
+"""Content-addressed, reference-counted uploads in FileStorageService."""
+
+import asyncio
+from io import BytesIO
+
+import pytest
+from fastapi import UploadFile
+from sqlalchemy import create_engine
+from starlette.datastructures import Headers
+
+pytest.importorskip("boto3")
+pytest.importorskip("cv2")
+
+from app.services.file_storage_service import FileStorageService, StorageProvider
+
+GUIDE = b"%PDF-1.4 squat technique, 3x8 " * 200
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+        self.puts = 0
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.puts += 1
+        self.objects[Key] = Body
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+
+def _upload(data, filename="guide.pdf"):
+    return UploadFile(BytesIO(data), filename=filename, headers=Headers({"content-type": "application/pdf"}))
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("app.services.file_storage_service.engine", create_engine(f"sqlite:///{tmp_path / 'files.db'}"))
+    return FileStorageService()
+
+
+def test_identical_uploads_share_one_blob_until_the_last_delete(storage, tmp_path):
+    async def run():
+        first = (await storage.upload_file(_upload(GUIDE))).file_metadata
+        second = (await storage.upload_file(_upload(GUIDE, "guide (1).pdf"))).file_metadata
+        other = (await storage.upload_file(_upload(GUIDE + b"v2"))).file_metadata
+
+        assert first.file_id != second.file_id
+        assert first.storage_path == second.storage_path != other.storage_path
+        assert first.checksum == second.checksum and len(first.checksum) == 64
+        assert (first.metadata["deduplicated"], second.metadata["deduplicated"]) == (False, True)
+        blob = tmp_path / "uploads" / first.storage_path
+        assert blob.read_bytes() == GUIDE
+
+        stats = storage.get_storage_stats()
+        assert (stats["total_files"], stats["unique_blobs"]) == (3, 2)
+        assert stats["stored_size_bytes"] == stats["total_size_bytes"] - len(GUIDE)
+
+        # Reference counts survive a restart
+        restarted = FileStorageService()
+        assert restarted._get_blob(first.checksum).ref_count == 2
+
+        assert await restarted.delete_file(first.file_id)
+        assert blob.exists()
+        assert not await restarted.delete_file(first.file_id)
+        assert restarted._get_blob(first.checksum).ref_count == 1
+        assert await restarted.delete_file(second.file_id)
+        assert not blob.exists()
+        assert restarted._get_blob(first.checksum) is None
+        assert (tmp_path / "uploads" / other.storage_path).exists()
+
+    asyncio.run(run())
+
+
+def test_duplicate_uploads_skip_the_s3_put(storage):
+    s3 = FakeS3()
+    storage.storage_provider = StorageProvider.AWS_S3
+    storage.s3_client, storage.s3_bucket = s3, "gym"
+
+    async def run():
+        results = await asyncio.gather(*(storage.upload_file(_upload(GUIDE)) for _ in range(5)))
+        assert all(result.success for result in results)
+        assert s3.puts == 1
+        assert list(s3.objects) == [results[0].file_metadata.storage_path]
+
+        for result in results:
+            assert await storage.delete_file(result.file_metadata.file_id)
+        assert s3.objects == {} and storage.get_storage_stats()["unique_blobs"] == 0
+
+    asyncio.run(run())
+
+
+def test_files_stored_before_content_addressing_are_deleted_directly(storage, tmp_path):
+    async def run():
+        legacy = (await storage.upload_file(_upload(GUIDE), custom_path="document/legacy.pdf")).file_metadata
+        shared = (await storage.upload_file(_upload(GUIDE))).file_metadata
+
+        assert legacy.storage_path == "document/legacy.pdf"
+        assert storage._get_blob(shared.checksum).ref_count == 1
+        assert await storage.delete_file(legacy.file_id)
+        assert not (tmp_path / "uploads" / "document" / "legacy.pdf").exists()
+        assert (tmp_path / "uploads" / shared.storage_path).exists()
+
+    asyncio.run(run())
+
+
+def test_upload_restores_a_blob_released_by_another_worker(storage, tmp_path):
+    async def run():
+        first = (await storage.upload_file(_upload(GUIDE))).file_metadata
+        blob = tmp_path / "uploads" / first.storage_path
+        # Another worker has its own locks: it releases the last reference
+        # after this upload found the blob but before it records its reference
+        other_worker = FileStorageService()
+        save = storage._save_file_metadata
+
+        async def release_then_save(metadata, stored_blob=None, deduplicated=False):
+            if deduplicated and blob.exists():
+                assert await other_worker._release_blob(other_worker._get_blob(first.checksum), first.file_id)
+                assert not blob.exists()
+            return await save(metadata, stored_blob, deduplicated)
+
+        storage._save_file_metadata = release_then_save
+        second = (await storage.upload_file(_upload(GUIDE, "guide (1).pdf"))).file_metadata
+
+        assert second.metadata["deduplicated"] is False
+        assert blob.read_bytes() == GUIDE
+        assert storage._get_blob(first.checksum).ref_count == 1
+        assert await storage.get_file_metadata(first.file_id) is None
+
+    asyncio.run(run())
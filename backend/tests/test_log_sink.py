@@ -0,0 +1,103 @@
+"""System log sink: batched writes, overflow accounting and draining on stop."""
+
+import time
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.log_sink import SystemLogSink
+from app.models.configuration import SystemLog
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SystemLog.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+def _sink(engine, **kwargs):
+    options = {"max_queue_size": 100, "batch_size": 3, "flush_interval": 60, "overflow_policy": "drop"}
+    options.update(kwargs)
+    return SystemLogSink(session_factory=sessionmaker(bind=engine), **options)
+
+
+def _idle(sink, monkeypatch):
+    # No writer thread: the queue only drains on an explicit flush
+    monkeypatch.setattr(sink, "start", lambda: None)
+    return sink
+
+
+def _rows(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(SystemLog)).scalar_one()
+
+
+def test_flush_writes_in_batches(engine, monkeypatch):
+    sink = _idle(_sink(engine), monkeypatch)
+    for i in range(7):
+        assert sink.emit("INFO", "request", f"GET /{i}", extra_data={"i": i})
+
+    assert sink.flush() == 7
+    metrics = sink.get_metrics()
+    assert (metrics["written"], metrics["batches"], metrics["queue_depth"]) == (7, 3, 0)
+    assert _rows(engine) == 7
+
+
+def test_writer_flushes_a_full_batch_before_the_interval(engine):
+    sink = _sink(engine)
+    for i in range(3):
+        sink.emit("INFO", "request", f"GET /{i}")
+
+    # The interval is a minute; a full batch must not wait for it
+    deadline = time.monotonic() + 10
+    while sink.get_metrics()["written"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    try:
+        assert sink.get_metrics()["batches"] == 1
+        assert _rows(engine) == 3
+    finally:
+        sink.stop()
+
+
+def test_drop_policy_counts_records_refused_by_a_full_queue(engine, monkeypatch):
+    sink = _idle(_sink(engine, max_queue_size=2), monkeypatch)
+
+    accepted = [sink.emit(level, "request", "GET /") for level in ("INFO", "INFO", "INFO", "ERROR")]
+    assert accepted == [True, True, False, False]
+    metrics = sink.get_metrics()
+    assert (metrics["enqueued"], metrics["dropped"], metrics["sampled_out"]) == (2, 2, 0)
+    assert metrics["max_queue_depth"] == 2
+
+
+def test_sample_policy_thins_info_past_the_threshold_but_keeps_warnings(engine, monkeypatch):
+    sink = _idle(
+        _sink(engine, max_queue_size=4, overflow_policy="sample", sample_rate=0.0, sample_threshold=0.5),
+        monkeypatch
+    )
+
+    accepted = [
+        sink.emit(level, "request", "GET /")
+        for level in ("INFO", "INFO", "INFO", "WARNING", "ERROR", "ERROR")
+    ]
+    # Two INFO fill the queue to the threshold; after that only priority
+    # levels get in, and they are dropped once the queue is full
+    assert accepted == [True, True, False, True, True, False]
+    metrics = sink.get_metrics()
+    assert (metrics["enqueued"], metrics["sampled_out"], metrics["dropped"]) == (4, 1, 1)
+
+
+def test_stop_drains_the_queue_and_stops_the_writer(engine):
+    sink = _sink(engine, batch_size=100)
+    for i in range(5):
+        sink.emit("INFO", "request", f"GET /{i}")
+    assert sink.get_metrics()["running"]
+
+    # Below one batch and inside the interval: only stop() writes these
+    sink.stop()
+    metrics = sink.get_metrics()
+    assert (metrics["written"], metrics["queue_depth"], metrics["running"]) == (5, 0, False)
+    assert _rows(engine) == 5
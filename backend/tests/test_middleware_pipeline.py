@@ -0,0 +1,118 @@
+"""Behaviour and per-request overhead of the pure-ASGI middleware pipeline."""
+
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.middleware import (
+    MiddlewarePipeline, SecurityMiddleware, LoggingMiddleware, MaintenanceMiddleware,
+    RequestSizeLimitMiddleware, DatabaseMiddleware, APIVersionMiddleware,
+)
+
+
+def _endpoint_app():
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping(request: Request):
+        return PlainTextResponse(getattr(request.state, "request_id", ""))
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f"chunk{i};".encode()
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return app
+
+
+def _stages():
+    return [
+        SecurityMiddleware(),
+        LoggingMiddleware(log_requests=False, log_responses=False),
+        MaintenanceMiddleware(maintenance_mode=False),
+        RequestSizeLimitMiddleware(max_body_size=1024),
+        DatabaseMiddleware(),
+        APIVersionMiddleware(),
+    ]
+
+
+def _pipeline_app():
+    app = _endpoint_app()
+    app.add_middleware(MiddlewarePipeline, stages=_stages())
+    return app
+
+
+def _layers(app):
+    """ASGI layers a request passes through before the router"""
+    layers, layer = [], app.build_middleware_stack()
+    while layer is not app.router:
+        layers.append(layer)
+        layer = layer.app
+    return layers
+
+
+def test_pipeline_shares_request_id_and_streams():
+    client = TestClient(_pipeline_app())
+
+    response = client.get("/ping", headers={"X-Request-ID": "abc123"})
+    assert response.text == "abc123"
+    assert response.headers["X-Request-ID"] == "abc123"
+    assert response.headers["X-Frame-Options"] == "DENY"
+    assert response.headers["API-Version"] == "v1"
+    assert float(response.headers["X-Process-Time"]) >= 0
+
+    streamed = client.get("/stream")
+    assert streamed.text == "chunk0;chunk1;chunk2;"
+
+    too_large = client.post("/ping", content=b"x" * 2048)
+    assert too_large.status_code == 413
+    assert too_large.headers["X-Frame-Options"] == "DENY"
+    assert "X-Request-ID" in too_large.headers
+
+
+async def _drive(app, requests):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/ping", "raw_path": b"/ping",
+        "query_string": b"", "headers": [(b"host", b"test")],
+        "client": ("127.0.0.1", 1234), "server": ("test", 80),
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message["type"])
+
+    for _ in range(requests):
+        await app(dict(scope, state={}), receive, send)
+    return sent
+
+
+def test_pipeline_adds_one_layer_and_no_tasks_per_request():
+    requests = 50
+    created = []
+
+    async def run(app):
+        loop = asyncio.get_running_loop()
+
+        def counting_factory(loop, coro, **kwargs):
+            created.append(coro)
+            return asyncio.Task(coro, loop=loop, **kwargs)
+
+        loop.set_task_factory(counting_factory)
+        sent = await _drive(app, requests)
+        loop.set_task_factory(None)
+        return sent
+
+    app = _pipeline_app()
+    # Six stages run as a single ASGI layer on top of FastAPI's own
+    assert len(_layers(app)) == len(_layers(_endpoint_app())) + 1
+    assert asyncio.run(run(app)) == ["http.response.start", "http.response.body"] * requests
+    # BaseHTTPMiddleware spawns a task per layer per request; the pipeline none
+    assert created == []
@@ -0,0 +1,95 @@
+"""Password hashing pool: bounded queueing and a free event loop during a login storm."""
+
+import asyncio
+import threading
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from passlib.context import CryptContext
+
+from app.core.auth import PasswordHashPool
+
+context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=10)
+HASHED = context.hash("secret")
+
+
+def _app(pool):
+    app = FastAPI()
+
+    @app.post("/login")
+    async def login():
+        return {"valid": await pool.verify("secret", HASHED)}
+
+    @app.get("/ping")
+    async def ping():
+        return PlainTextResponse("pong")
+
+    return app
+
+
+class GatedContext:
+    """Stands in for bcrypt: each verify holds a pool thread until the gate opens"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.threads = set()
+
+    def verify(self, secret, hashed):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            self.threads.add(threading.get_ident())
+        try:
+            return self.gate.wait(timeout=5)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def test_pool_rejects_past_queue_limit():
+    pool = PasswordHashPool(context=context, max_workers=1, max_pending=1)
+
+    async def run():
+        return await asyncio.gather(
+            *(pool.verify("secret", HASHED) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    pool.shutdown()
+    assert results.count(True) == 2
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 1 and rejected[0].status_code == 503
+    assert pool.get_metrics()["rejected"] == 1
+
+
+def test_event_loop_serves_requests_while_every_worker_hashes():
+    gated = GatedContext()
+    pool = PasswordHashPool(context=gated, max_workers=2, max_pending=64)
+    logins = 6
+
+    async def run():
+        transport = httpx.ASGITransport(app=_app(pool))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            pending = [asyncio.create_task(client.post("/login")) for _ in range(logins)]
+            for _ in range(500):
+                if pool.get_metrics()["in_flight"] == logins:
+                    break
+                await asyncio.sleep(0.01)
+
+            # Both workers are stuck in a hash and four logins wait, yet the loop answers
+            assert (await client.get("/ping")).text == "pong"
+            metrics = pool.get_metrics()
+            assert (metrics["in_flight"], metrics["queued"]) == (logins, logins - 2)
+
+            gated.gate.set()
+            return threading.get_ident(), await asyncio.gather(*pending)
+
+    loop_thread, responses = asyncio.run(run())
+    pool.shutdown()
+    assert all(r.status_code == 200 and r.json()["valid"] for r in responses)
+    assert gated.peak == 2
+    assert loop_thread not in gated.threads
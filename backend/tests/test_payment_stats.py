@@ -0,0 +1,66 @@
+"""Payment stats read the same figures from raw payments and from rollups."""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app import models  # noqa: F401  (registers every mapper)
+from app.models.membership import Payment, PaymentStatus
+from app.services import payment_stats_service as stats_module
+from app.services.payment_stats_service import PaymentStatsService, PAID_STATUS, FAILED_STATUSES
+from app.services.rollup_service import RollupService, REVENUE_ROLLUP
+
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(stats_module, "rollup_service", RollupService())
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _figures(aggregate):
+    return {
+        "total": aggregate.total_payments,
+        "paid": aggregate.count_for(PAID_STATUS),
+        "pending": aggregate.count_for(PaymentStatus.PENDING.name),
+        "failed": aggregate.count_for(*FAILED_STATUSES),
+        "revenue": aggregate.total_revenue,
+        "daily": aggregate.daily_revenue,
+    }
+
+
+def test_unpaid_payments_land_on_the_same_day_with_and_without_rollups(db):
+    db.add_all([
+        Payment(user_id=1, amount=100, payment_method="cash", status=status,
+                due_date=due_date, payment_date=payment_date)
+        for status, due_date, payment_date in (
+            (PaymentStatus.PAID, date(2026, 3, 1), date(2026, 3, 5)),
+            (PaymentStatus.PAID, date(2026, 3, 2), date(2026, 2, 27)),  # Paid early, before the window
+            (PaymentStatus.PENDING, date(2026, 3, 10), None),
+            (PaymentStatus.OVERDUE, date(2026, 3, 3), None),
+            (PaymentStatus.CANCELLED, date(2026, 3, 20), None),
+            (PaymentStatus.PENDING, date(2026, 4, 2), None),  # Due after the window
+        )
+    ])
+    db.commit()
+    service = PaymentStatsService()
+    window = {"date_from": date(2026, 3, 1), "date_to": date(2026, 3, 31)}
+
+    assert not stats_module.rollup_service.is_ready(db, REVENUE_ROLLUP)
+    raw = _figures(service.aggregate(db, **window))
+    assert raw == {
+        "total": 4, "paid": 1, "pending": 1, "failed": 2,
+        "revenue": 100.0, "daily": [(date(2026, 3, 5), 100.0)],
+    }
+
+    stats_module.rollup_service.backfill(db)
+    assert stats_module.rollup_service.is_ready(db, REVENUE_ROLLUP)
+    assert _figures(service.aggregate(db, **window)) == raw
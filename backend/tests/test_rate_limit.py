@@ -0,0 +1,158 @@
+"""Sliding-window rate limit backends and the middleware/login limiters that share them."""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from app.core.auth import RateLimiter, auth_manager
+from app.core.middleware import MiddlewarePipeline, RateLimitMiddleware
+from app.core.rate_limit import MemoryRateLimitBackend, RateLimitBackend, RedisRateLimitBackend
+
+
+class FakeRedis:
+    """Just enough of the redis-py client for RedisRateLimitBackend"""
+
+    def __init__(self):
+        self.data = {}
+        self.ttl = {}
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def incrby(self, key, amount):
+        self.data[key] = int(self.data.get(key, 0)) + amount
+        return self.data[key]
+
+    def expire(self, key, seconds):
+        self.ttl[key] = seconds
+        return True
+
+    def get(self, key):
+        value = self.data.get(key)
+        return None if value is None else str(value).encode()
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+
+class _FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.calls.append((name, args))
+        return queue
+
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.calls]
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    if request.param == "memory":
+        return MemoryRateLimitBackend()
+    return RedisRateLimitBackend(client=FakeRedis())
+
+
+def test_backend_limits_and_resets(backend):
+    results = [backend.hit("client", limit=3, window_seconds=3600) for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert results[-1].retry_after >= 1
+    assert not backend.peek("client", limit=3, window_seconds=3600).allowed
+    assert backend.peek("other", limit=3, window_seconds=3600).allowed
+
+    backend.reset("client", window_seconds=3600)
+    assert backend.hit("client", limit=3, window_seconds=3600).allowed
+
+
+def test_login_limiter_uses_shared_backend(backend):
+    limiter = RateLimiter(backend=backend)
+    for _ in range(5):
+        assert not limiter.is_rate_limited("login_a", max_attempts=5)
+        limiter.record_attempt("login_a")
+    assert limiter.is_rate_limited("login_a", max_attempts=5)
+
+    limiter.clear_attempts("login_a")
+    assert not limiter.is_rate_limited("login_a", max_attempts=5)
+
+
+def test_middleware_route_and_user_limits():
+    app = FastAPI()
+
+    @app.get("/api/v1/items")
+    async def items():
+        return PlainTextResponse("ok")
+
+    @app.post("/api/v1/auth/login")
+    async def login():
+        return PlainTextResponse("ok")
+
+    app.add_middleware(MiddlewarePipeline, stages=[RateLimitMiddleware(
+        requests_per_minute=3,
+        authenticated_per_minute=5,
+        route_limits={"/api/v1/auth/login": 2},
+        user_limits={"42": 1},
+        backend=MemoryRateLimitBackend()
+    )])
+    client = TestClient(app)
+
+    assert [client.post("/api/v1/auth/login").status_code for _ in range(3)] == [200, 200, 429]
+
+    responses = [client.get("/api/v1/items") for _ in range(4)]
+    assert [r.status_code for r in responses] == [200, 200, 200, 429]
+    assert responses[0].headers["X-RateLimit-Remaining"] == "2"
+    assert int(responses[-1].headers["Retry-After"]) >= 1
+
+    # Authenticated users are counted by user id with their own limits
+    headers = {"Authorization": f"Bearer {auth_manager.create_access_token({'sub': '7'})}"}
+    assert client.get("/api/v1/items", headers=headers).status_code == 200
+    vip = {"Authorization": f"Bearer {auth_manager.create_access_token({'sub': '42'})}"}
+    assert [client.get("/api/v1/items", headers=vip).status_code for _ in range(2)] == [200, 429]
+
+
+class UnreachableBackend(RateLimitBackend):
+    """A network backend whose server went away after startup"""
+
+    blocking = True
+
+    def __init__(self):
+        self.calls_on_event_loop = []
+
+    def hit(self, key, limit, window_seconds, cost=1):
+        try:
+            asyncio.get_running_loop()
+            self.calls_on_event_loop.append(True)
+        except RuntimeError:
+            self.calls_on_event_loop.append(False)
+        raise ConnectionError("Connection refused")
+
+    def peek(self, key, limit, window_seconds):
+        raise ConnectionError("Connection refused")
+
+    def reset(self, key, window_seconds):
+        raise ConnectionError("Connection refused")
+
+
+def test_middleware_falls_back_when_the_backend_fails():
+    app = FastAPI()
+
+    @app.get("/api/v1/items")
+    async def items():
+        return PlainTextResponse("ok")
+
+    backend = UnreachableBackend()
+    app.add_middleware(MiddlewarePipeline, stages=[RateLimitMiddleware(requests_per_minute=2, backend=backend)])
+    client = TestClient(app)
+
+    # Still limited, by the in-process fallback, instead of failing with 500
+    assert [client.get("/api/v1/items").status_code for _ in range(3)] == [200, 200, 429]
+    # The blocking backend was tried every time, never on the event loop
+    assert backend.calls_on_event_loop == [False, False, False]
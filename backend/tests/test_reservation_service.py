@@ -0,0 +1,235 @@
+"""Concurrency tests for the class reservation engine."""
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.core.database import Base
+from app import models  # noqa: F401  (registers every mapper)
+from app.models.class_model import Class, ClassType
+from app.models.class_reservation import ClassReservation, ReservationStatus
+from app.services.reservation_service import ReservationService, ReservationError
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """File-backed SQLite so every thread gets its own connection."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'reservations.db'}",
+        connect_args={"check_same_thread": False, "timeout": 60},
+        # Workers outnumber a default pool and would time out waiting for it
+        poolclass=NullPool,
+    )
+
+    @event.listens_for(engine, "begin")
+    def _begin_immediate(conn):
+        # Take the write lock up front, like a row lock on PostgreSQL
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def _create_class(session_factory, capacity, waiting_list_enabled=True):
+    db = session_factory()
+    start = datetime.utcnow() + timedelta(days=1)
+    gym_class = Class(
+        name="Spinning 7am",
+        class_type=ClassType.SPINNING,
+        instructor_id=1,
+        start_time=start,
+        end_time=start + timedelta(hours=1),
+        duration_minutes=60,
+        max_capacity=capacity,
+        current_bookings=0,
+        waiting_list_enabled=waiting_list_enabled,
+    )
+    db.add(gym_class)
+    db.commit()
+    class_id = gym_class.id
+    db.close()
+    return class_id
+
+
+def _count(session_factory, class_id, status):
+    db = session_factory()
+    try:
+        return db.query(ClassReservation).filter(
+            ClassReservation.class_id == class_id,
+            ClassReservation.status == status,
+        ).count()
+    finally:
+        db.close()
+
+
+def _run_concurrently(session_factory, count, action, workers=32):
+    """Run action(db, n) for n in range(count) from a pool of threads."""
+    errors = []
+    next_index = iter(range(count))
+    lock = threading.Lock()
+    barrier = threading.Barrier(workers)
+
+    def worker():
+        db = session_factory()
+        barrier.wait()
+        try:
+            while True:
+                with lock:
+                    n = next(next_index, None)
+                if n is None:
+                    return
+                try:
+                    action(db, n)
+                except Exception as e:
+                    # Not only ReservationError: a crash must fail the test, not end the thread
+                    errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+@pytest.mark.slow
+def test_simultaneous_reservations_never_overbook(session_factory):
+    """Thousands of simultaneous reservations fill the class exactly once."""
+    service = ReservationService()
+    capacity, requests = 50, 2000
+    class_id = _create_class(session_factory, capacity)
+
+    errors = _run_concurrently(
+        session_factory, requests,
+        lambda db, n: service.reserve(db, class_id, user_id=1000 + n),
+    )
+
+    assert errors == []
+    assert _count(session_factory, class_id, ReservationStatus.CONFIRMED) == capacity
+    assert _count(session_factory, class_id, ReservationStatus.WAITLISTED) == requests - capacity
+
+    db = session_factory()
+    assert db.get(Class, class_id).current_bookings == capacity
+    db.close()
+
+
+@pytest.mark.slow
+def test_full_class_without_waitlist_rejects_overflow(session_factory):
+    service = ReservationService()
+    capacity, requests = 20, 500
+    class_id = _create_class(session_factory, capacity, waiting_list_enabled=False)
+
+    errors = _run_concurrently(
+        session_factory, requests,
+        lambda db, n: service.reserve(db, class_id, user_id=1000 + n),
+    )
+
+    assert [str(e) for e in errors] == ["Class is full"] * (requests - capacity)
+    assert _count(session_factory, class_id, ReservationStatus.CONFIRMED) == capacity
+
+
+@pytest.mark.slow
+def test_concurrent_cancellations_promote_waitlist(session_factory):
+    """Released seats go to the waitlist and the counter stays exact."""
+    service = ReservationService()
+    capacity, requests = 30, 300
+    class_id = _create_class(session_factory, capacity)
+
+    assert _run_concurrently(
+        session_factory, requests,
+        lambda db, n: service.reserve(db, class_id, user_id=1000 + n),
+    ) == []
+
+    db = session_factory()
+    confirmed_ids = [
+        r.id for r in db.query(ClassReservation).filter(
+            ClassReservation.class_id == class_id,
+            ClassReservation.status == ReservationStatus.CONFIRMED,
+        )
+    ]
+    db.close()
+
+    def cancel(db, n):
+        reservation = db.get(ClassReservation, confirmed_ids[n])
+        service.cancel(db, reservation)
+
+    errors = _run_concurrently(session_factory, len(confirmed_ids), cancel, workers=8)
+
+    assert errors == []
+    assert _count(session_factory, class_id, ReservationStatus.CONFIRMED) == capacity
+    assert _count(session_factory, class_id, ReservationStatus.WAITLISTED) == requests - 2 * capacity
+
+    db = session_factory()
+    assert db.get(Class, class_id).current_bookings == capacity
+    assert service.resync_bookings(db, class_id) == capacity
+    db.close()
+
+
+def test_duplicate_reservation_is_rejected(session_factory):
+    service = ReservationService()
+    class_id = _create_class(session_factory, 5)
+    db = session_factory()
+
+    service.reserve(db, class_id, user_id=1)
+    with pytest.raises(ReservationError):
+        service.reserve(db, class_id, user_id=1)
+
+    db.close()
+
+
+def test_active_reservations_are_unique_per_member(session_factory):
+    service = ReservationService()
+    class_id = _create_class(session_factory, 5)
+    db = session_factory()
+
+    reservation = service.reserve(db, class_id, user_id=1).reservation
+    # A second writer that skipped the service's SELECT still cannot double-book
+    db.add(ClassReservation(class_id=class_id, user_id=1, status=ReservationStatus.CONFIRMED))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+    # Cancelled reservations do not count, so the member can book again
+    service.cancel(db, reservation)
+    assert service.reserve(db, class_id, user_id=1).reservation.status == ReservationStatus.CONFIRMED
+    db.close()
+
+
+def test_initialize_backfills_counters_of_existing_bookings(session_factory):
+    """Classes booked before the counter was maintained cannot be overbooked."""
+    service = ReservationService()
+    class_id = _create_class(session_factory, 3)
+    db = session_factory()
+    db.add_all([
+        ClassReservation(class_id=class_id, user_id=n, status=ReservationStatus.CONFIRMED)
+        for n in range(1, 4)
+    ])
+    db.add(ClassReservation(class_id=class_id, user_id=9, status=ReservationStatus.CANCELLED))
+    db.commit()
+    engine = db.get_bind()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_class_reservations_active_member")
+    # The caller's session has a transaction open while the index is created
+    assert db.get(Class, class_id).current_bookings == 0
+
+    service.initialize(db)
+    db.expire_all()
+    assert db.get(Class, class_id).current_bookings == 3
+    assert service.reserve(db, class_id, user_id=10).waitlisted
+    assert service.resync_all_bookings(db) == 0
+    db.close()
+    assert "ix_class_reservations_active_member" in {
+        index["name"] for index in inspect(engine).get_indexes("class_reservations")
+    }
@@ -0,0 +1,96 @@
+"""User list cursor pagination: stable pages over tied sort values and bound cursors."""
+
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base, get_db
+from app import models  # noqa: F401  (registers every mapper)
+from app.api import users
+from app.core.auth import get_current_staff_user
+from app.models.user import User
+
+
+@pytest.fixture
+def client():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = session_factory()
+    db.add_all([
+        User(
+            user_id=f"U{i:03d}", email=f"member{i}@gym.test", phone=f"+54{i:08d}", password_hash="x",
+            first_name="Member", last_name=f"Last{i % 3}",
+            # Three users per timestamp, so the id tiebreak decides page edges
+            created_at=datetime(2026, 3, 1 + i // 3, tzinfo=timezone.utc),
+        )
+        for i in range(11)
+    ])
+    db.commit()
+    db.close()
+
+    app = FastAPI()
+    app.include_router(users.router, prefix="/users")
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_staff_user] = lambda: None
+    yield TestClient(app)
+    engine.dispose()
+
+
+def _walk(client, **params):
+    pages, cursor = [], None
+    while True:
+        query = {"pagination": "cursor", "per_page": 4, **params}
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get("/users/", params=query)
+        assert response.status_code == 200
+        body = response.json()
+        pages.append([user["email"] for user in body["users"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages, body
+
+
+@pytest.mark.parametrize("sort_by", ["created_at", "last_name"])
+@pytest.mark.parametrize("sort_order", ["asc", "desc"])
+def test_cursor_pages_cover_every_user_once_despite_ties(client, sort_by, sort_order):
+    pages, last = _walk(client, sort_by=sort_by, sort_order=sort_order)
+    seen = [email for page in pages for email in page]
+    assert sorted(seen) == sorted(f"member{i}@gym.test" for i in range(11))
+    assert [len(page) for page in pages] == [4, 4, 3]
+
+    previous = client.get("/users/", params={
+        "sort_by": sort_by, "sort_order": sort_order, "per_page": 4, "cursor": last["prev_cursor"],
+    })
+    assert [user["email"] for user in previous.json()["users"]] == pages[1]
+
+
+@pytest.mark.parametrize("sort_by", ["password_hash", "memberships", "full_name"])
+def test_unlisted_sort_fields_are_rejected(client, sort_by):
+    response = client.get("/users/", params={"pagination": "cursor", "sort_by": sort_by})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("changed", [{"sort_order": "asc"}, {"sort_by": "email"}])
+def test_cursor_is_bound_to_its_sort_field_and_order(client, changed):
+    first = client.get("/users/", params={"pagination": "cursor", "per_page": 4}).json()
+    params = {"sort_by": "created_at", "sort_order": "desc", "cursor": first["next_cursor"], **changed}
+
+    response = client.get("/users/", params=params)
+    assert response.status_code == 400
+    assert "does not match the requested sort" in response.json()["detail"]
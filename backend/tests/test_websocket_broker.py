@@ -0,0 +1,162 @@
+"""Cross-worker WebSocket delivery through the pub/sub broker."""
+
+import asyncio
+import json
+from datetime import datetime
+
+from app.services.websocket_broker import MemoryBrokerHub, MemoryWebSocketBroker, RedisWebSocketBroker
+from app.services.websocket_service import MessageType, UserRole, WebSocketManager, WebSocketMessage
+
+
+class FakeWebSocket:
+    scope = {}
+
+    def __init__(self):
+        self.frames = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.frames.append(json.loads(text))
+
+    async def close(self, code=1000):
+        pass
+
+    def received(self, kind):
+        return [frame["data"] for frame in self.frames if frame["type"] == kind.value]
+
+
+class FakeAsyncRedis:
+    """Just enough of redis.asyncio for RedisWebSocketBroker"""
+
+    def __init__(self):
+        self.subscribers = []
+        self.published = 0
+
+    async def publish(self, channel, data):
+        self.published += 1
+        for pubsub in self.subscribers:
+            if channel in pubsub.channels:
+                pubsub.queue.put_nowait({"type": "message", "data": data.encode()})
+
+    def pubsub(self, ignore_subscribe_messages=True):
+        return _FakePubSub(self)
+
+
+class _FakePubSub:
+    def __init__(self, client):
+        self.client = client
+        self.channels = set()
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.channels.add(channel)
+        self.client.subscribers.append(self)
+
+    async def unsubscribe(self, channel):
+        self.channels.discard(channel)
+
+    async def close(self):
+        self.client.subscribers.remove(self)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+
+def _message(kind=MessageType.NOTIFICATION, **data):
+    return WebSocketMessage(type=kind, data=data, timestamp=datetime.now())
+
+
+async def _settle(delay=0.05):
+    await asyncio.sleep(delay)
+
+
+async def _workers(brokers):
+    workers = [WebSocketManager(broker=broker) for broker in brokers]
+    sockets = [FakeWebSocket() for _ in workers]
+    for i, (worker, ws) in enumerate(zip(workers, sockets)):
+        await worker.connect(ws, user_id=f"user{i}")
+    await _settle()
+    return workers, sockets
+
+
+async def _shutdown(workers):
+    for worker in workers:
+        await worker.shutdown()
+
+
+def test_user_room_and_role_addressing_across_workers():
+    async def run():
+        hub = MemoryBrokerHub()
+        workers, sockets = await _workers([MemoryWebSocketBroker(hub), MemoryWebSocketBroker(hub)])
+        a, b = workers
+
+        # Worker a has no connection for user1; it is delivered by worker b
+        assert await a.send_to_user("user1", _message(text="hi")) == 0
+        connection_id = next(iter(a.connections))
+        await a.send_to_room("notifications", _message(text="room"), exclude_connection=connection_id)
+        await a.broadcast(_message(text="all"))
+        b.connections[next(iter(b.connections))].user_role = UserRole.ADMIN
+        await a.send_system_alert("maintenance", "tonight", target_roles=[UserRole.ADMIN])
+        await _settle()
+
+        assert sockets[1].received(MessageType.NOTIFICATION)[-3:] == [
+            {"text": "hi"}, {"text": "room"}, {"text": "all"}
+        ]
+        assert sockets[1].received(MessageType.SYSTEM_ALERT)[0]["message"] == "tonight"
+        # The sender's own connections get exactly one copy and respect exclusions
+        assert [d for d in sockets[0].received(MessageType.NOTIFICATION) if "text" in d] == [{"text": "all"}]
+        assert sockets[0].received(MessageType.SYSTEM_ALERT) == []
+        await _shutdown(workers)
+
+    asyncio.run(run())
+
+
+def test_envelopes_are_batched_on_the_bus():
+    async def run():
+        hub = MemoryBrokerHub()
+        workers, sockets = await _workers([MemoryWebSocketBroker(hub, batch_interval=0.01), MemoryWebSocketBroker(hub)])
+        before = hub.messages
+
+        for i in range(50):
+            await workers[0].send_to_user("user1", _message(n=i))
+        await _settle()
+
+        assert hub.messages - before == 1
+        assert [d["n"] for d in sockets[1].received(MessageType.NOTIFICATION) if "n" in d] == list(range(50))
+        await _shutdown(workers)
+
+    asyncio.run(run())
+
+
+def test_single_worker_broker_does_not_publish():
+    async def run():
+        broker = MemoryWebSocketBroker()
+        workers, sockets = await _workers([broker])
+        await workers[0].broadcast(_message(text="all"))
+        await _settle()
+        assert broker.stats["published"] == 0
+        assert sockets[0].received(MessageType.NOTIFICATION)[-1] == {"text": "all"}
+        await _shutdown(workers)
+
+    asyncio.run(run())
+
+
+def test_redis_broker_delivers_between_workers():
+    async def run():
+        redis = FakeAsyncRedis()
+        workers, sockets = await _workers([RedisWebSocketBroker(client=redis), RedisWebSocketBroker(client=redis)])
+
+        await workers[1].send_to_user("user0", _message(text="from b"))
+        await workers[1].update_real_time_stats({"checkins": 1})
+        await workers[1].update_real_time_stats({"checkins": 2})
+        await _settle()
+
+        assert sockets[0].received(MessageType.NOTIFICATION)[-1] == {"text": "from b"}
+        assert redis.published == 1
+        await _shutdown(workers)
+        assert redis.subscribers == []
+
+    asyncio.run(run())
@@ -0,0 +1,108 @@
+"""Heartbeat timer wheel and per-connection footprint of WebSocketManager."""
+
+import asyncio
+import gc
+import time
+import tracemalloc
+
+import pytest
+
+from app.services.websocket_service import HeartbeatWheel, WebSocketManager
+
+
+class IdleWebSocket:
+    __slots__ = ()
+    scope = {}
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+
+async def _connect(manager, count):
+    ids = [await manager.connect(IdleWebSocket()) for _ in range(count)]
+    # Let the connect/joined-room frames drain so the clients are idle
+    while any(manager.connections[i].writer_task for i in ids):
+        await asyncio.sleep(0.01)
+    return ids
+
+
+def test_wheel_returns_only_due_slots():
+    wheel = HeartbeatWheel(timeout=10, tick=1, now=100)
+    first = wheel.schedule("a", 103.5)
+    wheel.schedule("b", 105)
+    wheel.schedule("late", 50)  # Already past: lands in the next slot
+    wheel.cancel("a", first)
+    wheel.schedule("a", 104)
+
+    assert wheel.advance(101) == ["late"]
+    assert wheel.advance(104) == ["a"]
+    assert wheel.advance(104.9) == []
+    assert wheel.advance(200) == ["b"]
+
+
+def test_expiry_rearms_active_connections():
+    async def run():
+        manager = WebSocketManager()
+        quiet, active = await _connect(manager, 2)
+        start = manager.connections[quiet].last_heartbeat
+        timeout = manager.heartbeat_timeout
+
+        manager.connections[active].last_heartbeat = start + 60
+        assert manager._expire_heartbeats(start + timeout + 2) == [quiet]
+        # The active connection was re-filed under its later deadline
+        assert manager._expire_heartbeats(start + timeout + 30) == []
+        assert manager._expire_heartbeats(start + timeout + 62) == [active]
+        await manager.shutdown()
+
+    asyncio.run(run())
+
+
+@pytest.mark.slow
+def test_connection_capacity(monkeypatch):
+    connections = 20000
+    touched = []
+    advance = HeartbeatWheel.advance
+
+    def counting_advance(wheel, now):
+        due = advance(wheel, now)
+        touched.append(len(due))
+        return due
+
+    async def run():
+        manager = WebSocketManager()
+        gc.collect()
+        tracemalloc.start()
+        ids = await _connect(manager, connections)
+        gc.collect()
+        footprint = tracemalloc.get_traced_memory()[0] / connections
+        tracemalloc.stop()
+
+        # Spread heartbeats evenly over the timeout, as live clients would
+        start = time.monotonic()
+        timeout = manager.heartbeat_timeout
+        for i, connection_id in enumerate(ids):
+            manager.connections[connection_id].last_heartbeat = start + (i % 120) * timeout / 120
+
+        last = start + timeout + 30
+        stale = {cid for cid, c in manager.connections.items() if c.last_heartbeat + timeout <= last}
+        monkeypatch.setattr(HeartbeatWheel, "advance", counting_advance)
+        expired = set()
+        for second in range(1, 31):
+            expired.update(manager._expire_heartbeats(start + timeout + second))
+
+        await manager.shutdown()
+        return footprint, stale, expired
+
+    footprint, stale, expired = asyncio.run(run())
+    assert footprint < 4096
+    assert expired == stale
+    # Each client is touched once to re-file the deadline armed at connect and
+    # once more if it expires; a full scan would touch all of them every tick
+    assert sum(touched) <= connections + len(stale)
+    assert sorted(touched)[len(touched) // 2] <= 2 * connections / 120
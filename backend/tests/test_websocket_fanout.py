@@ -0,0 +1,151 @@
+"""WebSocket fan-out: serialize-once, per-client send queues and slow client policies."""
+
+import asyncio
+import json
+from datetime import datetime
+from unittest import mock
+
+import pytest
+
+from app.services.websocket_service import (
+    MessageType,
+    WebSocketManager,
+    WebSocketMessage,
+)
+
+
+class FakeWebSocket:
+    """Records frames; ``delay`` makes every send take that long"""
+
+    scope = {}
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.frames = []
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames.append(text)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+def _message(kind=MessageType.ADMIN_BROADCAST, **data):
+    return WebSocketMessage(type=kind, data=data, timestamp=datetime.now())
+
+
+async def _connect(manager, count, delay=0.0):
+    sockets = [FakeWebSocket(delay) for _ in range(count)]
+    ids = [await manager.connect(ws) for ws in sockets]
+    return sockets, ids
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def _close(manager):
+    for connection_id in list(manager.connections):
+        await manager.disconnect(connection_id)
+    for task in list(manager.background_tasks):
+        task.cancel()
+
+
+def test_broadcast_serializes_once_and_skips_past_slow_client():
+    async def run():
+        manager = WebSocketManager(send_queue_size=8)
+        fast, _ = await _connect(manager, 20)
+        slow, _ = await _connect(manager, 1, delay=10)
+        await _settle()
+
+        with mock.patch("app.services.websocket_service.json.dumps", wraps=json.dumps) as dumps:
+            sent = await manager.broadcast(_message(text="hello"))
+        assert sent == 21
+        assert dumps.call_count == 1
+
+        await _settle()
+        assert all(json.loads(ws.frames[-1])["data"] == {"text": "hello"} for ws in fast)
+        assert slow[0].frames == []
+        await _close(manager)
+
+    asyncio.run(run())
+
+
+def test_drop_oldest_and_coalescing():
+    async def run():
+        manager = WebSocketManager(send_queue_size=3, slow_client_policy="drop_oldest")
+        [ws], [connection_id] = await _connect(manager, 1, delay=10)
+        await _settle()
+        queue = manager.connections[connection_id].send_queue
+        queue._entries.clear()
+
+        for i in range(5):
+            await manager.send_to_connection(connection_id, _message(kind=MessageType.REAL_TIME_STATS, n=i))
+        assert len(queue) == 1 and queue.coalesced == 4
+
+        for i in range(4):
+            await manager.send_to_connection(connection_id, _message(n=i))
+        assert len(queue) == 3 and manager.send_stats["dropped"] == 2
+        assert [json.loads(entry[1])["data"]["n"] for entry in queue._entries] == [1, 2, 3]
+        await _close(manager)
+
+    asyncio.run(run())
+
+
+def test_disconnect_policy_closes_slow_client():
+    async def run():
+        manager = WebSocketManager(send_queue_size=2, slow_client_policy="disconnect")
+        [ws], [connection_id] = await _connect(manager, 1, delay=10)
+        await _settle()
+
+        results = [await manager.send_to_connection(connection_id, _message(n=i)) for i in range(4)]
+        await _settle()
+        assert results[-1] is False
+        assert connection_id not in manager.connections
+        assert ws.closed_with == 1013
+        assert manager.send_stats["slow_disconnects"] >= 1
+        await _close(manager)
+
+    asyncio.run(run())
+
+
+@pytest.mark.slow
+def test_broadcast_to_5000_connections():
+    clients, slow_clients, messages = 5000, 50, 20
+
+    async def run():
+        manager = WebSocketManager(send_queue_size=64)
+        fast, _ = await _connect(manager, clients - slow_clients)
+        # Stalled for the whole test: never finish sending a frame
+        slow, _ = await _connect(manager, slow_clients, delay=3600)
+        await _settle()
+        for ws in fast:
+            ws.frames.clear()
+
+        with mock.patch("app.services.websocket_service.json.dumps", wraps=json.dumps) as dumps:
+            sent = [
+                await manager.broadcast(_message(n=i, text="Pool closed for maintenance"))
+                for i in range(messages)
+            ]
+        assert sent == [clients] * messages
+        assert dumps.call_count == messages
+
+        for _ in range(3000):
+            if all(len(ws.frames) == messages for ws in fast):
+                break
+            await asyncio.sleep(0.01)
+
+        # Every fast client got every message in order while the slow ones are still stuck
+        assert all([json.loads(frame)["data"]["n"] for frame in ws.frames] == list(range(messages)) for ws in fast)
+        assert all(ws.frames == [] for ws in slow)
+        assert manager.send_stats["dropped"] == 0
+        await _close(manager)
+
+    asyncio.run(run())
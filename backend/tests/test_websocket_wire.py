@@ -0,0 +1,120 @@
+"""Negotiated compact WebSocket encodings and delta-encoded real-time stats."""
+
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from app.services.websocket_service import (
+    MessageType,
+    WebSocketManager,
+    WebSocketMessage,
+    WireEncoding,
+    negotiate_encoding,
+)
+
+
+class FakeWebSocket:
+    def __init__(self, subprotocols=(), delay=0.0):
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.delay = delay
+        self.subprotocol = None
+        self.frames = []
+
+    async def accept(self, subprotocol=None):
+        self.subprotocol = subprotocol
+
+    async def send_text(self, text):
+        await self._send(text)
+
+    async def send_bytes(self, data):
+        await self._send(data)
+
+    async def _send(self, frame):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames.append(frame)
+
+    async def close(self, code=1000):
+        pass
+
+    def stats(self):
+        frames = [json.loads(f) for f in self.frames]
+        return [f.get("data", f.get("d")) for f in frames if f.get("type", f.get("t")) == "real_time_stats"]
+
+
+async def _admin(manager, ws):
+    connection_id = await manager.connect(ws)
+    await manager.join_room(connection_id, "admin")
+    await asyncio.sleep(0.01)
+    return connection_id
+
+
+def test_negotiation_prefers_client_order_and_falls_back_to_json():
+    assert negotiate_encoding(["chat", "gymsystem.json", "gymsystem.msgpack"]) == WireEncoding.COMPACT_JSON
+    assert negotiate_encoding(["chat"]) == WireEncoding.JSON
+
+
+def test_msgpack_frames_round_trip():
+    pytest.importorskip("msgpack")
+    assert negotiate_encoding(["chat", "gymsystem.msgpack", "gymsystem.json"]) == WireEncoding.MSGPACK
+
+    message = WebSocketMessage(type=MessageType.NOTIFICATION, data={"title": "hi"}, timestamp=datetime.now())
+    compact = message.encode(WireEncoding.MSGPACK)
+    assert isinstance(compact, bytes) and len(compact) < len(message.to_json()) / 2
+    decoded = WebSocketMessage.decode(compact, WireEncoding.MSGPACK)
+    assert (decoded.type, decoded.data, decoded.message_id) == (message.type, message.data, message.message_id)
+
+
+def test_stats_are_delta_encoded_for_negotiated_clients():
+    async def run():
+        manager = WebSocketManager()
+        legacy, compact = FakeWebSocket(), FakeWebSocket(["gymsystem.json"])
+        await _admin(manager, legacy)
+        await _admin(manager, compact)
+        assert compact.subprotocol == "gymsystem.json" and legacy.subprotocol is None
+
+        stats = {"checkins_today": 120, "active_members": 850, "revenue": {"today": 1000}}
+        for update in (stats, {**stats, "checkins_today": 121}, {"checkins_today": 121, "active_members": 850}):
+            await manager.update_real_time_stats(update)
+            await asyncio.sleep(0.01)
+
+        assert legacy.stats()[-1] == {"checkins_today": 121, "active_members": 850}
+        assert compact.stats() == [
+            {"seq": 1, "delta": stats},
+            {"seq": 2, "delta": {"checkins_today": 121}},
+            {"seq": 3, "delta": {}, "removed": ["revenue"]},
+        ]
+
+        # A late joiner starts from the snapshot
+        late = FakeWebSocket(["gymsystem.json"])
+        await _admin(manager, late)
+        assert late.stats() == [{"seq": 3, "full": {"checkins_today": 121, "active_members": 850}}]
+        await manager.shutdown()
+
+    asyncio.run(run())
+
+
+def test_coalesced_deltas_become_a_snapshot_and_resync_sends_one():
+    async def run():
+        manager = WebSocketManager()
+        ws = FakeWebSocket(["gymsystem.json"], delay=0.05)
+        connection_id = await _admin(manager, ws)
+        await asyncio.sleep(0.2)
+
+        # The first frame is in flight; the next two collapse in the queue
+        await manager.update_real_time_stats({"n": 0, "fixed": True})
+        await asyncio.sleep(0.01)
+        for n in (1, 2):
+            await manager.update_real_time_stats({"n": n, "fixed": True})
+        await asyncio.sleep(0.2)
+        assert ws.stats() == [{"seq": 1, "delta": {"n": 0, "fixed": True}}, {"seq": 3, "full": {"n": 2, "fixed": True}}]
+
+        resync = WebSocketMessage(type=MessageType.REAL_TIME_STATS, data={"resync": True}, timestamp=datetime.now())
+        await manager.handle_message(connection_id, resync.encode(WireEncoding.COMPACT_JSON))
+        await asyncio.sleep(0.1)
+        assert ws.stats()[-1] == {"seq": 3, "full": {"n": 2, "fixed": True}}
+        await manager.shutdown()
+
+    asyncio.run(run())